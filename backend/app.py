@@ -35,7 +35,13 @@ def setup_logging():
     return root_logger
 
 
-def create_app():
+def create_app(test_config=None):
+    """
+    创建 Flask 应用
+
+    Args:
+        test_config: 覆盖的应用配置（测试使用，TESTING 为 True 时不启动后台任务 worker）
+    """
     # 设置日志
     logger = setup_logging()
     logger.info("🚀 正在启动 LitBanana AI图文生成器...")
@@ -54,12 +60,14 @@ def create_app():
         app = Flask(__name__)
 
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
 
     CORS(app, resources={
         r"/api/*": {
             "origins": Config.CORS_ORIGINS,
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type"],
+            "allow_headers": ["Content-Type", "Last-Event-ID", "Idempotency-Key"],
         }
     })
 
@@ -69,6 +77,11 @@ def create_app():
     # 启动时验证配置
     _validate_config_on_startup(logger)
 
+    # 启动后台生成任务 worker（继续执行上次退出时未完成的任务）；
+    # 测试时不启动，需要时由提交任务的接口按需启动
+    if not app.config.get('TESTING'):
+        _start_job_workers(logger)
+
     # 根据是否有前端构建产物决定根路由行为
     if frontend_dist.exists():
         @app.route('/')
@@ -96,6 +109,16 @@ def create_app():
     return app
 
 
+def _start_job_workers(logger):
+    """启动后台图片生成任务 worker"""
+    from backend.services.jobs import get_job_workers
+
+    try:
+        get_job_workers()
+    except Exception as e:
+        logger.error(f"❌ 启动后台生成任务 worker 失败: {e}")
+
+
 def _validate_config_on_startup(logger):
     """启动时验证配置"""
     from pathlib import Path
@@ -12,6 +12,48 @@ class Config:
     CORS_ORIGINS = ['http://localhost:5173', 'http://localhost:3000']
     OUTPUT_DIR = 'output'
 
+    # 任务状态存储（用于重试）：sqlite 可被多个 worker 进程共享，memory 仅限单进程
+    TASK_STATE_BACKEND = 'sqlite'
+    TASK_STATE_DB = None  # 为 None 时使用 history/task_states.db
+    TASK_STATE_TTL = 24 * 3600  # 任务状态在最后一次更新后保留的时间（秒）
+
+    # 图片文件的 HTTP 缓存
+    # 不带版本参数的 URL 每次重新验证（/retry、/regenerate 会原地覆盖同名图片）
+    IMAGE_VERSIONED_MAX_AGE = 365 * 24 * 3600  # 带版本参数（?t= / ?v=）的图片缓存时间（秒）
+    # 交给前置服务器发送文件：None（Flask 直接发送）/ 'x-accel-redirect'（nginx）/ 'x-sendfile'（Apache、lighttpd）
+    IMAGE_SENDFILE = None
+    IMAGE_ACCEL_PREFIX = '/_history/'  # X-Accel-Redirect 使用的 nginx internal location，指向 history 目录
+
+    # 缩略图等衍生文件的后台生成：'process'（进程池）或 'thread'（线程池）
+    DERIVATIVE_EXECUTOR = 'process'
+    DERIVATIVE_WORKERS = 2
+
+    # 参考图（封面、用户上传图片）压缩和 base64 编码结果的缓存上限（字节）
+    REFERENCE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+    # 客户端主动限流（服务商配置中的 requests_per_minute / max_concurrent_requests）的共享状态，
+    # 为 None 时使用 history/rate_limits.db，同一台机器上的 worker 进程共享配额
+    RATE_LIMIT_DB = None
+
+    # 后台图片生成任务：队列和事件日志的数据库（为 None 时使用 history/jobs.db），
+    # 以及每个进程同时执行的任务数上限（页面级的并发由各服务商的自适应并发和主动限流控制，这里只是兜底）
+    JOB_DB = None
+    JOB_WORKERS = 64
+    # 进程内事件总线中每个任务保留的最近事件数（同一任务的多个 SSE 连接共用，落后更多时读数据库）
+    EVENT_BUFFER_SIZE = 256
+
+    # 大纲结果缓存（主题 + 参考图 + 提示词模板 + 模型参数相同时直接复用），
+    # 为 None 时使用 history/outline_cache.db；有效期（秒）设为 0 时关闭缓存
+    OUTLINE_CACHE_DB = None
+    OUTLINE_CACHE_TTL = 7 * 24 * 3600
+    OUTLINE_CACHE_MAX_ENTRIES = 500
+
+    # 生成请求（/generate、/retry、/regenerate）的幂等键记录，为 None 时使用 history/idempotency.db
+    IDEMPOTENCY_DB = None
+    IDEMPOTENCY_TTL = 24 * 3600  # 客户端提供的幂等键（Idempotency-Key）及其结果的保留时间（秒）
+    IDEMPOTENCY_REPLAY_WINDOW = 30  # 按请求内容去重时，已完成的结果在这段时间内直接返回（秒）
+    IDEMPOTENCY_WAIT_TIMEOUT = 300  # 等待相同的执行中请求完成的最长时间（秒）
+
     _image_providers_config = None
     _text_providers_config = None
 
@@ -89,6 +131,27 @@ class Config:
         logger.debug(f"当前激活的图片服务商: {active}")
         return active
 
+    @classmethod
+    def get_image_provider_pool(cls, primary: str = None) -> list:
+        """
+        获取参与负载均衡的图片服务商
+
+        Args:
+            primary: 主服务商，None 时使用激活的服务商
+
+        Returns:
+            服务商名称列表，主服务商在前，其后是 provider_pool 中的其他服务商
+        """
+        config = cls.load_image_providers_config()
+        if primary is None:
+            primary = cls.get_active_image_provider()
+
+        pool = [primary]
+        for name in config.get('provider_pool') or []:
+            if name not in pool:
+                pool.append(name)
+        return pool
+
     @classmethod
     def get_image_provider_config(cls, provider_name: str = None):
         config = cls.load_image_providers_config()
@@ -1,6 +1,9 @@
 """图片生成器抽象基类"""
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from ..utils.http_pool import HttpPool, get_http_pool
+from ..utils.retry_policy import UpstreamError, parse_retry_after
 
 
 class ImageGeneratorBase(ABC):
@@ -16,6 +19,8 @@ class ImageGeneratorBase(ABC):
         self.config = config
         self.api_key = config.get('api_key')
         self.base_url = config.get('base_url')
+        # 连接池由 ImageGeneratorFactory 注入，同一服务商的生成器共享
+        self.http_pool: Optional[HttpPool] = None
 
     @abstractmethod
     def generate_image(
@@ -35,6 +40,80 @@ class ImageGeneratorBase(ABC):
         """
         pass
 
+    async def agenerate_image(
+        self,
+        prompt: str,
+        **kwargs
+    ) -> bytes:
+        """
+        异步生成图片
+
+        默认实现把同步的 generate_image 放到线程池中执行；
+        基于 HTTP 接口的生成器应覆盖此方法，改用异步 HTTP 客户端。
+
+        Args:
+            prompt: 提示词
+            **kwargs: 与 generate_image 相同的参数
+
+        Returns:
+            图片二进制数据
+        """
+        return await asyncio.to_thread(self.generate_image, prompt, **kwargs)
+
+    @property
+    def http(self) -> HttpPool:
+        """获取 HTTP 连接池（未经工厂创建时按 base_url 获取）"""
+        if self.http_pool is None:
+            self.http_pool = get_http_pool(f"{type(self).__name__}:{self.base_url}", self.config)
+        return self.http_pool
+
+    async def _async_post_json(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        timeout: float
+    ) -> Tuple[int, str]:
+        """
+        异步发送 JSON POST 请求（payload 中可包含 EncodedJSON，如参考图的 data URI）
+
+        Returns:
+            (状态码, 响应文本)
+        """
+        response = await self.http.apost_json(url, payload, headers=headers, timeout=timeout)
+        self._check_retry_after(response)
+        return response.status_code, response.text
+
+    def _check_retry_after(self, response: Any):
+        """
+        服务端限流或暂时不可用并给出 Retry-After 时，抛出携带等待时间的错误（交给重试策略处理）
+
+        Args:
+            response: requests 或 httpx 的响应对象
+        """
+        if response.status_code not in (429, 503):
+            return
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None:
+            return
+        raise UpstreamError(
+            f"{type(self).__name__} 请求被限流 (状态码: {response.status_code})\n"
+            f"错误详情: {response.text[:500]}\n"
+            f"服务端要求 {retry_after:.0f} 秒后重试",
+            status_code=response.status_code,
+            retry_after=retry_after
+        )
+
+    async def _async_get_bytes(self, url: str, timeout: float) -> Tuple[int, bytes]:
+        """
+        异步下载二进制内容
+
+        Returns:
+            (状态码, 响应内容)
+        """
+        response = await self.http.arequest("GET", url, timeout=timeout)
+        return response.status_code, response.content
+
     @abstractmethod
     def validate_config(self) -> bool:
         """
@@ -5,6 +5,7 @@ from .google_genai import GoogleGenAIGenerator
 from .openai_compatible import OpenAICompatibleGenerator
 from .image_api import ImageApiGenerator
 from .jimeng import JiMengGenerator
+from ..utils.http_pool import get_http_pool
 
 
 class ImageGeneratorFactory:
@@ -47,7 +48,10 @@ class ImageGeneratorFactory:
             )
 
         generator_class = cls.GENERATORS[provider]
-        return generator_class(config)
+        generator = generator_class(config)
+        # 同一服务商（类型 + base_url）的生成器复用同一个连接池
+        generator.http_pool = get_http_pool(f"{provider}:{config.get('base_url')}", config)
+        return generator
 
     @classmethod
     def register_generator(cls, name: str, generator_class: type):
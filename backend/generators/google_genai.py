@@ -1,14 +1,12 @@
 """Google GenAI 图片生成器"""
 import logging
-import time
-import random
 import base64
-from functools import wraps
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from google import genai
 from google.genai import types
 from .base import ImageGeneratorBase
-from ..utils.image_compressor import compress_image
+from ..utils.retry_policy import retry_on_error
+from ..utils.reference_images import get_reference_image
 
 logger = logging.getLogger(__name__)
 
@@ -279,58 +277,6 @@ def parse_genai_error(error: Exception) -> str:
     )
 
 
-def retry_on_error(max_retries=5, base_delay=3):
-    """智能重试装饰器，根据错误类型决定是否重试"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    error_str = str(e).lower()
-
-                    # 不可重试的错误类型
-                    non_retryable = [
-                        "401", "unauthenticated",  # 认证错误
-                        "403", "permission_denied", "forbidden",  # 权限错误
-                        "404", "not_found",  # 资源不存在
-                        "invalid_argument",  # 参数错误
-                        "safety", "blocked", "filter",  # 安全过滤
-                    ]
-
-                    should_retry = True
-                    for keyword in non_retryable:
-                        if keyword in error_str:
-                            should_retry = False
-                            break
-
-                    if not should_retry:
-                        # 直接抛出，不重试
-                        raise Exception(parse_genai_error(e))
-
-                    # 可重试的错误
-                    if attempt < max_retries - 1:
-                        if "429" in error_str or "resource_exhausted" in error_str:
-                            wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            logger.warning(f"⏳ 遇到速率限制，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                        else:
-                            wait_time = min(2 ** attempt, 10) + random.uniform(0, 1)
-                            logger.warning(f"⚠️ 请求失败，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                        time.sleep(wait_time)
-                        continue
-
-                    # 重试次数耗尽
-                    raise Exception(parse_genai_error(e))
-
-            # 理论上不会到这里，但保险起见
-            raise Exception(parse_genai_error(last_error))
-        return wrapper
-    return decorator
-
-
 class GoogleGenAIGenerator(ImageGeneratorBase):
     """Google GenAI 图片生成器"""
 
@@ -381,7 +327,7 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
         """验证配置"""
         return bool(self.api_key)
 
-    @retry_on_error(max_retries=5, base_delay=3)
+    @retry_on_error(max_retries=3, base_delay=2, on_giveup=lambda e: Exception(parse_genai_error(e)))
     def generate_image(
         self,
         prompt: str,
@@ -405,6 +351,75 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
         Returns:
             图片二进制数据
         """
+        contents, generate_content_config = self._build_request(
+            prompt, aspect_ratio, temperature, model, reference_image
+        )
+
+        image_data = None
+        logger.debug(f"  开始调用 API: model={model}")
+        for chunk in self.client.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=generate_content_config,
+        ):
+            chunk_image = self._extract_image_data(chunk)
+            if chunk_image:
+                image_data = chunk_image
+
+        return self._check_image_data(image_data)
+
+    async def agenerate_image(
+        self,
+        prompt: str,
+        aspect_ratio: str = "3:4",
+        temperature: float = 1.0,
+        model: str = "gemini-3-pro-image-preview",
+        reference_image: Optional[bytes] = None,
+        **kwargs
+    ) -> bytes:
+        """
+        异步生成图片（参数与 generate_image 相同，使用 SDK 的 aio 接口）
+
+        不在内部重试，由 ImageService 按统一重试策略重试。
+
+        Returns:
+            图片二进制数据
+        """
+        contents, generate_content_config = self._build_request(
+            prompt, aspect_ratio, temperature, model, reference_image
+        )
+
+        image_data = None
+        logger.debug(f"  开始调用 API: model={model}")
+        try:
+            async for chunk in await self.client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            ):
+                chunk_image = self._extract_image_data(chunk)
+                if chunk_image:
+                    image_data = chunk_image
+        except Exception as e:
+            # 重试由调用方的统一重试策略负责（根据原始错误判断），这里只转换为友好提示
+            raise Exception(parse_genai_error(e)) from e
+
+        return self._check_image_data(image_data)
+
+    def _build_request(
+        self,
+        prompt: str,
+        aspect_ratio: str,
+        temperature: float,
+        model: str,
+        reference_image: Optional[bytes]
+    ) -> Tuple[list, types.GenerateContentConfig]:
+        """
+        构建请求内容和生成配置
+
+        Returns:
+            (contents, generate_content_config)
+        """
         logger.info(f"Google GenAI 生成图片: model={model}, aspect_ratio={aspect_ratio}")
         logger.debug(f"  prompt 长度: {len(prompt)} 字符, 有参考图: {reference_image is not None}")
 
@@ -414,14 +429,14 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
         # 如果有参考图，先添加参考图和说明
         if reference_image:
             logger.debug(f"  添加参考图片 ({len(reference_image)} bytes)")
-            # 压缩参考图到 200KB 以内
-            compressed_ref = compress_image(reference_image, max_size_kb=200)
-            logger.debug(f"  参考图压缩后: {len(compressed_ref)} bytes")
+            # 压缩参考图到 200KB 以内（同一张图的压缩结果在各页之间共用）
+            compressed_ref = get_reference_image(reference_image, max_size_kb=200)
+            logger.debug(f"  参考图压缩后: {len(compressed_ref.data)} bytes")
             # 添加参考图
             parts.append(types.Part(
                 inline_data=types.Blob(
-                    mime_type="image/png",
-                    data=compressed_ref
+                    mime_type=compressed_ref.mime_type,
+                    data=compressed_ref.data
                 )
             ))
             # 添加带参考说明的提示词
@@ -463,22 +478,21 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
             safety_settings=self.safety_settings,
             image_config=types.ImageConfig(**image_config_kwargs),
         )
-
-        image_data = None
-        logger.debug(f"  开始调用 API: model={model}")
-        for chunk in self.client.models.generate_content_stream(
-            model=model,
-            contents=contents,
-            config=generate_content_config,
-        ):
-            if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                for part in chunk.candidates[0].content.parts:
-                    # 检查是否有图片数据
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        image_data = part.inline_data.data
-                        logger.debug(f"  收到图片数据: {len(image_data)} bytes")
-                        break
-
+        return contents, generate_content_config
+
+    def _extract_image_data(self, chunk) -> Optional[bytes]:
+        """从流式响应块中提取图片数据"""
+        if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+            for part in chunk.candidates[0].content.parts:
+                # 检查是否有图片数据
+                if hasattr(part, 'inline_data') and part.inline_data:
+                    image_data = part.inline_data.data
+                    logger.debug(f"  收到图片数据: {len(image_data)} bytes")
+                    return image_data
+        return None
+
+    def _check_image_data(self, image_data: Optional[bytes]) -> bytes:
+        """检查是否拿到了图片数据"""
         if not image_data:
             logger.error("API 返回为空，未生成图片")
             raise ValueError(
@@ -1,35 +1,18 @@
 """Image API 图片生成器"""
 import logging
-import time
-import random
+import re
 import base64
+import json
+import httpx
 import requests
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Tuple, Union
 from .base import ImageGeneratorBase
-from ..utils.image_compressor import compress_image
+from ..utils.retry_policy import retry_on_error
+from ..utils.reference_images import get_reference_image
 
 logger = logging.getLogger(__name__)
 
 
-def retry_on_error(max_retries: int = 3, base_delay: float = 2):
-    """错误重试装饰器"""
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        logger.warning(f"请求失败，{delay:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries}): {str(e)[:100]}")
-                        time.sleep(delay)
-            raise last_error
-        return wrapper
-    return decorator
-
-
 class ImageApiGenerator(ImageGeneratorBase):
     """Image API 生成器"""
 
@@ -110,6 +93,59 @@ class ImageApiGenerator(ImageGeneratorBase):
         Returns:
             生成的图片二进制数据
         """
+        api_url, headers, payload, timeout, parse = self._prepare_request(
+            prompt, aspect_ratio, model, reference_image, reference_images
+        )
+
+        response = self.http.post_json(api_url, payload, headers=headers, timeout=timeout)
+        self._check_retry_after(response)
+        image_data, image_url = parse(response.status_code, response.text, api_url, payload["model"])
+        if image_data is not None:
+            return image_data
+        return self._download_image(image_url)
+
+    async def agenerate_image(
+        self,
+        prompt: str,
+        aspect_ratio: str = None,
+        temperature: float = 1.0,
+        model: str = None,
+        reference_image: Optional[bytes] = None,
+        reference_images: Optional[List[bytes]] = None,
+        **kwargs
+    ) -> bytes:
+        """
+        异步生成图片（参数与 generate_image 相同）
+
+        不在内部重试，由 ImageService 按统一重试策略重试。
+
+        Returns:
+            生成的图片二进制数据
+        """
+        api_url, headers, payload, timeout, parse = self._prepare_request(
+            prompt, aspect_ratio, model, reference_image, reference_images
+        )
+
+        status_code, body = await self._async_post_json(api_url, headers, payload, timeout)
+        image_data, image_url = parse(status_code, body, api_url, payload["model"])
+        if image_data is not None:
+            return image_data
+        return await self._adownload_image(image_url)
+
+    def _prepare_request(
+        self,
+        prompt: str,
+        aspect_ratio: Optional[str],
+        model: Optional[str],
+        reference_image: Optional[bytes],
+        reference_images: Optional[List[bytes]]
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any], float, Any]:
+        """
+        根据端点类型构建请求
+
+        Returns:
+            (请求地址, 请求头, 请求体, 超时时间, 响应解析函数)
+        """
         self.validate_config()
 
         if aspect_ratio is None:
@@ -120,45 +156,45 @@ class ImageApiGenerator(ImageGeneratorBase):
 
         logger.info(f"Image API 生成图片: model={model}, aspect_ratio={aspect_ratio}, endpoint={self.endpoint_type}")
 
+        # 收集所有参考图片
+        all_reference_images = []
+        if reference_images and len(reference_images) > 0:
+            all_reference_images.extend(reference_images)
+        if reference_image and reference_image not in all_reference_images:
+            all_reference_images.append(reference_image)
+
         # 根据端点类型选择不同的生成方式
         if 'chat' in self.endpoint_type or 'completions' in self.endpoint_type:
-            return self._generate_via_chat_api(prompt, aspect_ratio, model, reference_image, reference_images)
+            api_url, payload = self._build_chat_api_request(prompt, model, all_reference_images)
+            parse = self._parse_chat_api_response
         else:
-            return self._generate_via_images_api(prompt, aspect_ratio, model, reference_image, reference_images)
+            api_url, payload = self._build_images_api_request(prompt, aspect_ratio, model, all_reference_images)
+            parse = self._parse_images_api_response
 
-    def _generate_via_images_api(
-        self,
-        prompt: str,
-        aspect_ratio: str,
-        model: str,
-        reference_image: Optional[bytes] = None,
-        reference_images: Optional[List[bytes]] = None
-    ) -> bytes:
-        """通过 /v1/images/generations 或 /v1/images/compositions 端点生成图片"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        return api_url, headers, payload, 300, parse
 
-        # 收集所有参考图片
-        all_reference_images = []
-        if reference_images and len(reference_images) > 0:
-            all_reference_images.extend(reference_images)
-        if reference_image and reference_image not in all_reference_images:
-            all_reference_images.append(reference_image)
-
+    def _build_images_api_request(
+        self,
+        prompt: str,
+        aspect_ratio: str,
+        model: str,
+        all_reference_images: List[bytes]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """构建 /v1/images/generations 或 /v1/images/compositions 端点的请求"""
         # 如果有参考图片，使用图生图端点
         if all_reference_images:
             logger.debug(f"  使用图生图模式，添加 {len(all_reference_images)} 张参考图片")
 
-            # 压缩参考图片
+            # 压缩参考图片（压缩和编码结果按内容缓存，各页共用）
             image_uris = []
             for idx, img_data in enumerate(all_reference_images):
-                compressed_img = compress_image(img_data, max_size_kb=200)
-                logger.debug(f"  参考图 {idx}: {len(img_data)} -> {len(compressed_img)} bytes")
-                base64_image = base64.b64encode(compressed_img).decode('utf-8')
-                data_uri = f"data:image/png;base64,{base64_image}"
-                image_uris.append(data_uri)
+                compressed_img = get_reference_image(img_data, max_size_kb=200)
+                logger.debug(f"  参考图 {idx}: {len(img_data)} -> {len(compressed_img.data)} bytes")
+                image_uris.append(compressed_img.data_uri_json)
 
             # 使用 /v1/images/compositions 端点
             payload = {
@@ -181,13 +217,26 @@ class ImageApiGenerator(ImageGeneratorBase):
             api_url = f"{self.base_url}{self.endpoint_type}"
 
         logger.debug(f"  发送请求到: {api_url}")
-        response = requests.post(api_url, headers=headers, json=payload, timeout=300)
+        return api_url, payload
 
-        if response.status_code != 200:
-            error_detail = response.text[:500]
-            logger.error(f"Image API 请求失败: status={response.status_code}, error={error_detail}")
+    def _parse_images_api_response(
+        self,
+        status_code: int,
+        body: str,
+        api_url: str,
+        model: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        解析 images 端点的响应
+
+        Returns:
+            (图片数据, 图片URL)，两者只有一个不为 None
+        """
+        if status_code != 200:
+            error_detail = body[:500]
+            logger.error(f"Image API 请求失败: status={status_code}, error={error_detail}")
             raise Exception(
-                f"Image API 请求失败 (状态码: {response.status_code})\n"
+                f"Image API 请求失败 (状态码: {status_code})\n"
                 f"错误详情: {error_detail}\n"
                 f"请求地址: {api_url}\n"
                 "可能原因：\n"
@@ -198,7 +247,7 @@ class ImageApiGenerator(ImageGeneratorBase):
                 "建议：检查API密钥和base_url配置"
             )
 
-        result = response.json()
+        result = json.loads(body)
         data_list = result.get('data', [])
         logger.debug(f"  API 响应: data 长度={len(data_list) if data_list else 0}")
 
@@ -213,12 +262,12 @@ class ImageApiGenerator(ImageGeneratorBase):
                     b64_string = b64_data_uri
                 image_data = base64.b64decode(b64_string)
                 logger.info(f"✅ Image API 图片生成成功: {len(image_data)} bytes")
-                return image_data
+                return image_data, None
             elif "url" in item:
                 # 处理 URL 格式的响应
                 image_url = item["url"]
                 logger.info(f"✅ 从 Image API 获取到图片 URL: {image_url}")
-                return self._download_image(image_url)
+                return None, image_url
 
         logger.error(f"无法从响应中提取图片数据: {str(result)[:200]}")
         raise Exception(
@@ -230,44 +279,27 @@ class ImageApiGenerator(ImageGeneratorBase):
             "建议：检查API文档确认返回格式要求"
         )
 
-    def _generate_via_chat_api(
+    def _build_chat_api_request(
         self,
         prompt: str,
-        aspect_ratio: str,
         model: str,
-        reference_image: Optional[bytes] = None,
-        reference_images: Optional[List[bytes]] = None
-    ) -> bytes:
-        """通过 /v1/chat/completions 端点生成图片（如即梦 API）"""
-        import re
-
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
+        all_reference_images: List[bytes]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """构建 /v1/chat/completions 端点的请求（如即梦 API）"""
         # 构建用户消息内容
         user_content: Any = [{"type": "text", "text": prompt}]
 
-        # 收集所有参考图片
-        all_reference_images = []
-        if reference_images and len(reference_images) > 0:
-            all_reference_images.extend(reference_images)
-        if reference_image and reference_image not in all_reference_images:
-            all_reference_images.append(reference_image)
-
         # 如果有参考图片，构建多模态消息
         if all_reference_images:
             logger.debug(f"  添加 {len(all_reference_images)} 张参考图片到 chat 消息")
             content_parts = [{"type": "text", "text": prompt}]
 
             for idx, img_data in enumerate(all_reference_images):
-                compressed_img = compress_image(img_data, max_size_kb=200)
-                logger.debug(f"  参考图 {idx}: {len(img_data)} -> {len(compressed_img)} bytes")
-                base64_image = base64.b64encode(compressed_img).decode('utf-8')
+                compressed_img = get_reference_image(img_data, max_size_kb=200)
+                logger.debug(f"  参考图 {idx}: {len(img_data)} -> {len(compressed_img.data)} bytes")
                 content_parts.append({
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{base64_image}"}
+                    "image_url": {"url": compressed_img.data_uri_json}
                 })
 
             user_content = content_parts
@@ -281,12 +313,23 @@ class ImageApiGenerator(ImageGeneratorBase):
 
         api_url = f"{self.base_url}{self.endpoint_type}"
         logger.info(f"Chat API 生成图片: {api_url}, model={model}")
+        return api_url, payload
 
-        response = requests.post(api_url, headers=headers, json=payload, timeout=300)
+    def _parse_chat_api_response(
+        self,
+        status_code: int,
+        body: str,
+        api_url: str,
+        model: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        解析 chat 端点的响应
 
-        if response.status_code != 200:
-            error_detail = response.text[:500]
-            status_code = response.status_code
+        Returns:
+            (图片数据, 图片URL)，两者只有一个不为 None
+        """
+        if status_code != 200:
+            error_detail = body[:500]
 
             if status_code == 401:
                 raise Exception(
@@ -312,7 +355,7 @@ class ImageApiGenerator(ImageGeneratorBase):
                     f"【模型】{model}"
                 )
 
-        result = response.json()
+        result = json.loads(body)
         logger.debug(f"Chat API 响应: {str(result)[:500]}")
 
         # 解析响应
@@ -327,7 +370,7 @@ class ImageApiGenerator(ImageGeneratorBase):
                     urls = re.findall(pattern, content)
                     if urls:
                         logger.info(f"从 Markdown 提取到 {len(urls)} 张图片，下载第一张...")
-                        return self._download_image(urls[0])
+                        return None, urls[0]
 
                     # Markdown 图片 Base64: ![xxx](data:image/...)
                     base64_pattern = r'!\[.*?\]\((data:image\/[^;]+;base64,[^\s\)]+)\)'
@@ -335,18 +378,18 @@ class ImageApiGenerator(ImageGeneratorBase):
                     if base64_urls:
                         logger.info("从 Markdown 提取到 Base64 图片数据")
                         base64_data = base64_urls[0].split(",")[1]
-                        return base64.b64decode(base64_data)
+                        return base64.b64decode(base64_data), None
 
                     # 纯 Base64 data URL
                     if content.startswith("data:image"):
                         logger.info("检测到 Base64 图片数据")
                         base64_data = content.split(",")[1]
-                        return base64.b64decode(base64_data)
+                        return base64.b64decode(base64_data), None
 
                     # 纯 URL
                     if content.startswith("http://") or content.startswith("https://"):
                         logger.info("检测到图片 URL")
-                        return self._download_image(content.strip())
+                        return None, content.strip()
 
         raise Exception(
             "❌ 无法从 Chat API 响应中提取图片数据\n\n"
@@ -364,7 +407,7 @@ class ImageApiGenerator(ImageGeneratorBase):
         """下载图片并返回二进制数据"""
         logger.info(f"下载图片: {url[:100]}...")
         try:
-            response = requests.get(url, timeout=60)
+            response = self.http.session.get(url, timeout=60)
             if response.status_code == 200:
                 logger.info(f"✅ 图片下载成功: {len(response.content)} bytes")
                 return response.content
@@ -374,3 +417,18 @@ class ImageApiGenerator(ImageGeneratorBase):
             raise Exception("❌ 下载图片超时，请重试")
         except Exception as e:
             raise Exception(f"❌ 下载图片失败: {str(e)}")
+
+    async def _adownload_image(self, url: str) -> bytes:
+        """异步下载图片并返回二进制数据"""
+        logger.info(f"下载图片: {url[:100]}...")
+        try:
+            status_code, content = await self._async_get_bytes(url, timeout=60)
+            if status_code == 200:
+                logger.info(f"✅ 图片下载成功: {len(content)} bytes")
+                return content
+            else:
+                raise Exception(f"下载图片失败: HTTP {status_code}")
+        except httpx.TimeoutException:
+            raise Exception("❌ 下载图片超时，请重试")
+        except Exception as e:
+            raise Exception(f"❌ 下载图片失败: {str(e)}")
@@ -1,12 +1,10 @@
 """即梦4.5图片生成器"""
 import logging
-import time
-import random
 import json
-from functools import wraps
-from typing import Dict, Any, Optional, List
-import requests
+from typing import Dict, Any, Optional, List, Tuple
 from .base import ImageGeneratorBase
+from ..utils.retry_policy import retry_on_error
+from ..utils.prompt_template import normalize_prompt
 
 logger = logging.getLogger(__name__)
 
@@ -32,43 +30,6 @@ DEFAULT_RESOLUTION = "2k"
 MAX_PROMPT_LENGTH = 1500
 
 
-def retry_on_error(max_retries=5, base_delay=3):
-    """错误自动重试装饰器"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    error_str = str(e)
-                    # 检查是否是速率限制错误
-                    if "429" in error_str or "rate" in error_str.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            logger.warning(f"遇到速率限制，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                            time.sleep(wait_time)
-                            continue
-                    # 其他错误或重试耗尽
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt
-                        logger.warning(f"请求失败: {error_str[:100]}，{wait_time}秒后重试")
-                        time.sleep(wait_time)
-                        continue
-                    raise
-            logger.error(f"图片生成失败: 重试 {max_retries} 次后仍失败")
-            raise Exception(
-                f"图片生成失败：重试 {max_retries} 次后仍失败。\n"
-                "可能原因：\n"
-                "1. API持续限流或配额不足\n"
-                "2. 网络连接持续不稳定\n"
-                "3. API服务暂时不可用\n"
-                "建议：稍后再试，或检查API配额和网络状态"
-            )
-        return wrapper
-    return decorator
-
-
 class JiMengGenerator(ImageGeneratorBase):
     """即梦4.5图片生成器"""
 
@@ -99,27 +60,10 @@ class JiMengGenerator(ImageGeneratorBase):
         logger.info(f"JiMengGenerator 初始化完成: base_url={self.base_url}, model={self.default_model}")
 
     def _clean_prompt(self, prompt: str) -> str:
-        """清理和标准化提示词"""
+        """清理和标准化提示词（单次扫描，重试时直接命中缓存）"""
         if not isinstance(prompt, str):
             prompt = str(prompt)
-
-        # 移除可能导致问题的字符
-        cleaned = prompt.strip()
-
-        # 替换可能有问题的字符
-        cleaned = cleaned.replace('\x00', '')  # 移除null字符
-        cleaned = cleaned.replace('\r\n', '\n')  # 统一换行符
-        cleaned = cleaned.replace('\r', '\n')
-
-        # 移除过多的连续换行
-        while '\n\n\n' in cleaned:
-            cleaned = cleaned.replace('\n\n\n', '\n\n')
-
-        # 移除过多的连续空格
-        while '  ' in cleaned:
-            cleaned = cleaned.replace('  ', ' ')
-
-        return cleaned
+        return normalize_prompt(prompt)
 
     def validate_config(self) -> bool:
         """验证配置"""
@@ -148,7 +92,7 @@ class JiMengGenerator(ImageGeneratorBase):
         logger.warning(f"尺寸 {size} 无法转换为支持的比例，使用默认值 {DEFAULT_RATIO}")
         return DEFAULT_RATIO
 
-    @retry_on_error(max_retries=5, base_delay=3)
+    @retry_on_error(max_retries=3, base_delay=2)
     def generate_image(
         self,
         prompt: str,
@@ -174,6 +118,61 @@ class JiMengGenerator(ImageGeneratorBase):
         Returns:
             图片二进制数据
         """
+        url, headers, payload = self._build_request(
+            prompt, size, model, reference_image_urls, **kwargs
+        )
+
+        response = self.http.session.post(url, headers=headers, json=payload, timeout=180)
+        self._check_retry_after(response)
+        image_url = self._parse_response(response.status_code, response.text, url, payload["model"])
+
+        # 下载图片
+        img_response = self.http.session.get(image_url, timeout=60)
+        return self._check_download(img_response.status_code, img_response.content)
+
+    async def agenerate_image(
+        self,
+        prompt: str,
+        size: str = "1536x864",
+        model: str = None,
+        reference_image: Optional[bytes] = None,
+        reference_images: Optional[List[bytes]] = None,
+        reference_image_urls: Optional[List[str]] = None,
+        **kwargs
+    ) -> bytes:
+        """
+        异步生成图片（参数与 generate_image 相同）
+
+        不在内部重试，由 ImageService 按统一重试策略重试。
+
+        Returns:
+            图片二进制数据
+        """
+        url, headers, payload = self._build_request(
+            prompt, size, model, reference_image_urls, **kwargs
+        )
+
+        status_code, body = await self._async_post_json(url, headers, payload, timeout=180)
+        image_url = self._parse_response(status_code, body, url, payload["model"])
+
+        # 下载图片
+        status_code, content = await self._async_get_bytes(image_url, timeout=60)
+        return self._check_download(status_code, content)
+
+    def _build_request(
+        self,
+        prompt: str,
+        size: str,
+        model: Optional[str],
+        reference_image_urls: Optional[List[str]],
+        **kwargs
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """
+        构建请求
+
+        Returns:
+            (请求地址, 请求头, 请求体)
+        """
         if model is None:
             model = self.default_model
 
@@ -235,13 +234,20 @@ class JiMengGenerator(ImageGeneratorBase):
         logger.debug(f"请求头: Authorization: Bearer ***")
         logger.debug(f"请求参数: {json.dumps(payload, ensure_ascii=False)}")
 
-        response = requests.post(url, headers=headers, json=payload, timeout=180)
+        return url, headers, payload
 
-        if response.status_code != 200:
-            error_detail = response.text[:500]
-            logger.error(f"即梦 API 请求失败: status={response.status_code}, error={error_detail}")
+    def _parse_response(self, status_code: int, body: str, url: str, model: str) -> str:
+        """
+        解析生成接口的响应
+
+        Returns:
+            生成图片的下载地址
+        """
+        if status_code != 200:
+            error_detail = body[:500]
+            logger.error(f"即梦 API 请求失败: status={status_code}, error={error_detail}")
             raise Exception(
-                f"即梦 API 请求失败 (状态码: {response.status_code})\n"
+                f"即梦 API 请求失败 (状态码: {status_code})\n"
                 f"错误详情: {error_detail}\n"
                 f"请求地址: {url}\n"
                 f"模型: {model}\n"
@@ -254,7 +260,7 @@ class JiMengGenerator(ImageGeneratorBase):
                 "建议：检查API密钥、base_url和模型名称配置"
             )
 
-        result = response.json()
+        result = json.loads(body)
         logger.debug(f"  API 响应: {json.dumps(result, ensure_ascii=False)[:500]}")
 
         # 检查 API 响应体中的错误码（某些代理 API 即使错误也返回 HTTP 200）
@@ -281,15 +287,7 @@ class JiMengGenerator(ImageGeneratorBase):
             if "url" in first_image:
                 image_url = first_image["url"]
                 logger.info(f"获取到图片URL: {image_url}")
-
-                # 下载图片
-                img_response = requests.get(image_url, timeout=60)
-                if img_response.status_code == 200:
-                    logger.info(f"✅ 即梦 API 图片生成成功: {len(img_response.content)} bytes")
-                    return img_response.content
-                else:
-                    logger.error(f"下载图片失败: {img_response.status_code}")
-                    raise Exception(f"下载图片失败: {img_response.status_code}")
+                return image_url
 
         logger.error(f"API 未返回图片数据: {result}")
         raise ValueError(
@@ -303,6 +301,14 @@ class JiMengGenerator(ImageGeneratorBase):
             "建议：修改提示词或检查模型配置"
         )
 
+    def _check_download(self, status_code: int, content: bytes) -> bytes:
+        """检查图片下载结果"""
+        if status_code == 200:
+            logger.info(f"✅ 即梦 API 图片生成成功: {len(content)} bytes")
+            return content
+        logger.error(f"下载图片失败: {status_code}")
+        raise Exception(f"下载图片失败: {status_code}")
+
     def get_supported_sizes(self) -> list:
         """
         获取支持的图片尺寸
@@ -1,53 +1,16 @@
 """OpenAI 兼容接口图片生成器"""
 import logging
-import time
-import random
 import base64
-from functools import wraps
-from typing import Dict, Any
+import json
+from typing import Dict, Any, Optional, Tuple
+import httpx
 import requests
 from .base import ImageGeneratorBase
+from ..utils.retry_policy import retry_on_error
 
 logger = logging.getLogger(__name__)
 
 
-def retry_on_error(max_retries=5, base_delay=3):
-    """错误自动重试装饰器"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    error_str = str(e)
-                    # 检查是否是速率限制错误
-                    if "429" in error_str or "rate" in error_str.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            logger.warning(f"遇到速率限制，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                            time.sleep(wait_time)
-                            continue
-                    # 其他错误或重试耗尽
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt
-                        logger.warning(f"请求失败: {error_str[:100]}，{wait_time}秒后重试")
-                        time.sleep(wait_time)
-                        continue
-                    raise
-            logger.error(f"图片生成失败: 重试 {max_retries} 次后仍失败")
-            raise Exception(
-                f"图片生成失败：重试 {max_retries} 次后仍失败。\n"
-                "可能原因：\n"
-                "1. API持续限流或配额不足\n"
-                "2. 网络连接持续不稳定\n"
-                "3. API服务暂时不可用\n"
-                "建议：稍后再试，或检查API配额和网络状态"
-            )
-        return wrapper
-    return decorator
-
-
 class OpenAICompatibleGenerator(ImageGeneratorBase):
     """OpenAI 兼容接口图片生成器"""
 
@@ -90,7 +53,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         """验证配置"""
         return bool(self.api_key and self.base_url)
 
-    @retry_on_error(max_retries=5, base_delay=3)
+    @retry_on_error(max_retries=3, base_delay=2)
     def generate_image(
         self,
         prompt: str,
@@ -112,36 +75,84 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         Returns:
             图片二进制数据
         """
-        if model is None:
-            model = self.default_model
+        url, headers, payload, parse = self._prepare_request(prompt, size, model, quality)
 
-        logger.info(f"OpenAI 兼容 API 生成图片: model={model}, size={size}, endpoint={self.endpoint_type}")
+        response = self.http.session.post(url, headers=headers, json=payload, timeout=180)
+        self._check_retry_after(response)
+        image_data, image_url = parse(response.status_code, response.text, url, payload["model"])
+        if image_data is not None:
+            return image_data
+        return self._download_image(image_url)
 
-        # 根据端点路径决定使用哪种 API 方式
-        if 'chat' in self.endpoint_type or 'completions' in self.endpoint_type:
-            return self._generate_via_chat_api(prompt, size, model)
-        else:
-            # 默认使用 images API
-            return self._generate_via_images_api(prompt, size, model, quality)
+    async def agenerate_image(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        model: str = None,
+        quality: str = "standard",
+        **kwargs
+    ) -> bytes:
+        """
+        异步生成图片（参数与 generate_image 相同）
+
+        不在内部重试，由 ImageService 按统一重试策略重试。
 
-    def _generate_via_images_api(
+        Returns:
+            图片二进制数据
+        """
+        url, headers, payload, parse = self._prepare_request(prompt, size, model, quality)
+
+        status_code, body = await self._async_post_json(url, headers, payload, timeout=180)
+        image_data, image_url = parse(status_code, body, url, payload["model"])
+        if image_data is not None:
+            return image_data
+        return await self._adownload_image(image_url)
+
+    def _prepare_request(
         self,
         prompt: str,
         size: str,
-        model: str,
+        model: Optional[str],
         quality: str
-    ) -> bytes:
-        """通过 images API 端点生成"""
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any], Any]:
+        """
+        根据端点路径构建请求
+
+        Returns:
+            (请求地址, 请求头, 请求体, 响应解析函数)
+        """
+        if model is None:
+            model = self.default_model
+
+        logger.info(f"OpenAI 兼容 API 生成图片: model={model}, size={size}, endpoint={self.endpoint_type}")
+
         # 确保端点以 / 开头
         endpoint = self.endpoint_type if self.endpoint_type.startswith('/') else '/' + self.endpoint_type
         url = f"{self.base_url}{endpoint}"
-        logger.debug(f"  发送请求到: {url}")
 
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
 
+        # 根据端点路径决定使用哪种 API 方式
+        if 'chat' in self.endpoint_type or 'completions' in self.endpoint_type:
+            logger.info(f"Chat API 生成图片: {url}, model={model}")
+            payload = {
+                "model": model,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                "max_tokens": 4096,
+                "temperature": 1.0
+            }
+            return url, headers, payload, self._parse_chat_api_response
+
+        # 默认使用 images API
+        logger.debug(f"  发送请求到: {url}")
         payload = {
             "model": model,
             "prompt": prompt,
@@ -154,13 +165,26 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         if quality and model.startswith('dall-e'):
             payload["quality"] = quality
 
-        response = requests.post(url, headers=headers, json=payload, timeout=180)
+        return url, headers, payload, self._parse_images_api_response
 
-        if response.status_code != 200:
-            error_detail = response.text[:500]
-            logger.error(f"OpenAI Images API 请求失败: status={response.status_code}, error={error_detail}")
+    def _parse_images_api_response(
+        self,
+        status_code: int,
+        body: str,
+        url: str,
+        model: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        解析 images API 端点的响应
+
+        Returns:
+            (图片数据, 图片URL)，两者只有一个不为 None
+        """
+        if status_code != 200:
+            error_detail = body[:500]
+            logger.error(f"OpenAI Images API 请求失败: status={status_code}, error={error_detail}")
             raise Exception(
-                f"OpenAI Images API 请求失败 (状态码: {response.status_code})\n"
+                f"OpenAI Images API 请求失败 (状态码: {status_code})\n"
                 f"错误详情: {error_detail}\n"
                 f"请求地址: {url}\n"
                 f"模型: {model}\n"
@@ -173,7 +197,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                 "建议：检查API密钥、base_url和模型名称配置"
             )
 
-        result = response.json()
+        result = json.loads(body)
         logger.debug(f"  API 响应: data 长度={len(result.get('data', []))}")
 
         if "data" not in result or len(result["data"]) == 0:
@@ -194,18 +218,12 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         if "b64_json" in image_data:
             img_bytes = base64.b64decode(image_data["b64_json"])
             logger.info(f"✅ OpenAI Images API 图片生成成功: {len(img_bytes)} bytes")
-            return img_bytes
+            return img_bytes, None
 
         # 处理URL格式
         elif "url" in image_data:
             logger.debug(f"  下载图片 URL...")
-            img_response = requests.get(image_data["url"], timeout=60)
-            if img_response.status_code == 200:
-                logger.info(f"✅ OpenAI Images API 图片生成成功: {len(img_response.content)} bytes")
-                return img_response.content
-            else:
-                logger.error(f"下载图片失败: {img_response.status_code}")
-                raise Exception(f"下载图片失败: {img_response.status_code}")
+            return None, image_data["url"]
 
         else:
             logger.error(f"无法从响应中提取图片数据: {str(image_data)[:200]}")
@@ -218,47 +236,26 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                 "建议：检查API文档确认图片返回格式"
             )
 
-    def _generate_via_chat_api(
+    def _parse_chat_api_response(
         self,
-        prompt: str,
-        size: str,
+        status_code: int,
+        body: str,
+        url: str,
         model: str
-    ) -> bytes:
+    ) -> Tuple[Optional[bytes], Optional[str]]:
         """
-        通过 chat/completions 端点生成图片
+        解析 chat/completions 端点的响应
 
         支持多种返回格式：
         1. Markdown 图片链接: ![xxx](url) - 即梦、部分中转站使用
         2. Base64 data URL: data:image/xxx;base64,xxx
         3. 纯图片 URL
-        """
-        # 确保端点以 / 开头
-        endpoint = self.endpoint_type if self.endpoint_type.startswith('/') else '/' + self.endpoint_type
-        url = f"{self.base_url}{endpoint}"
-        logger.info(f"Chat API 生成图片: {url}, model={model}")
-
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 4096,
-            "temperature": 1.0
-        }
-
-        response = requests.post(url, headers=headers, json=payload, timeout=180)
 
-        if response.status_code != 200:
-            error_detail = response.text[:500]
-            status_code = response.status_code
+        Returns:
+            (图片数据, 图片URL)，两者只有一个不为 None
+        """
+        if status_code != 200:
+            error_detail = body[:500]
 
             # 详细的错误信息
             if status_code == 401:
@@ -285,7 +282,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                     f"【模型】{model}"
                 )
 
-        result = response.json()
+        result = json.loads(body)
         logger.debug(f"Chat API 响应: {str(result)[:500]}")
 
         # 解析响应
@@ -300,18 +297,18 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                     if image_urls:
                         # 下载第一张图片
                         logger.info(f"从 Markdown 提取到 {len(image_urls)} 张图片，下载第一张...")
-                        return self._download_image(image_urls[0])
+                        return None, image_urls[0]
 
                     # 2. 尝试解析 Base64 data URL
                     if content.startswith("data:image"):
                         logger.info("检测到 Base64 图片数据")
                         base64_data = content.split(",")[1]
-                        return base64.b64decode(base64_data)
+                        return base64.b64decode(base64_data), None
 
                     # 3. 尝试作为纯 URL 处理
                     if content.startswith("http://") or content.startswith("https://"):
                         logger.info("检测到图片 URL")
-                        return self._download_image(content.strip())
+                        return None, content.strip()
 
         raise ValueError(
             "❌ 无法从 Chat API 响应中提取图片数据\n\n"
@@ -342,7 +339,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         """下载图片并返回二进制数据"""
         logger.info(f"下载图片: {url[:100]}...")
         try:
-            response = requests.get(url, timeout=60)
+            response = self.http.session.get(url, timeout=60)
             if response.status_code == 200:
                 logger.info(f"✅ 图片下载成功: {len(response.content)} bytes")
                 return response.content
@@ -353,6 +350,21 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         except Exception as e:
             raise Exception(f"❌ 下载图片失败: {str(e)}")
 
+    async def _adownload_image(self, url: str) -> bytes:
+        """异步下载图片并返回二进制数据"""
+        logger.info(f"下载图片: {url[:100]}...")
+        try:
+            status_code, content = await self._async_get_bytes(url, timeout=60)
+            if status_code == 200:
+                logger.info(f"✅ 图片下载成功: {len(content)} bytes")
+                return content
+            else:
+                raise Exception(f"下载图片失败: HTTP {status_code}")
+        except httpx.TimeoutException:
+            raise Exception("❌ 下载图片超时，请重试")
+        except Exception as e:
+            raise Exception(f"❌ 下载图片失败: {str(e)}")
+
     def get_supported_sizes(self) -> list:
         """获取支持的图片尺寸"""
         # 默认OpenAI支持的尺寸
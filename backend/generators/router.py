@@ -0,0 +1,296 @@
+"""图片服务商路由
+
+把 image_providers.yaml 中的多个服务商、多个 API Key 组成一个池：
+- 每个（服务商, API Key）是一条线路，各自有并发限制器和熔断器
+- 每次请求选择负载最低的线路（进行中请求数 / (并发上限 × 权重)），页面分散到整个池
+- 配置了 requests_per_minute / max_concurrent_requests 的线路在拿到并发名额之后、发出请求之前按配额等待
+  （在自适应并发限制器中排队的请求不占用配额）
+- 线路熔断或被限流时立即换下一条线路；其他错误由重试策略重试，重试时避开失败过的线路
+- 启用对冲（hedge_percentile）时，请求超过线路最近耗时的分位数仍未返回，
+  就在另一条线路上再发一个，先返回的结果生效（见 utils/hedging.py）
+
+配置示例：
+    active_provider: vertex
+    provider_pool: [vertex, openai_image]   # 参与负载均衡的其他服务商（可选）
+    providers:
+      vertex:
+        weight: 2                           # 权重（可选，默认 1）
+        api_keys: [key-2, key-3]            # 额外的 API Key（可选，每个 Key 一条线路）
+        hedge_percentile: 95                # 对冲请求（可选）
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ..config import Config
+from ..utils.adaptive_limiter import AdaptiveLimiter, get_concurrency_limiter
+from ..utils.circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from ..utils.hedging import HedgeSettings, LatencyTracker, get_latency_tracker
+from ..utils.rate_limiter import RateLimiter, get_rate_limiter
+from ..utils.retry_policy import RetryBudget, classify_error, get_retry_budget
+from .base import ImageGeneratorBase
+from .factory import ImageGeneratorFactory
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderRoute:
+    """一条线路：一个服务商的一个 API Key"""
+
+    def __init__(self, name: str, provider_name: str, config: Dict[str, Any]):
+        """
+        Args:
+            name: 线路名称（第一个 Key 为服务商名称，其余为 "服务商#序号"）
+            provider_name: 服务商名称
+            config: 该线路使用的服务商配置（api_key 已替换为该线路的 Key）
+        """
+        self.name = name
+        self.provider_name = provider_name
+        self.config = config
+        self.provider_type = config.get('type', provider_name)
+        self.weight = max(float(config.get('weight') or 1), 0.01)
+        self.generator: ImageGeneratorBase = ImageGeneratorFactory.create(self.provider_type, config)
+        # 未启用高并发的服务商（如试用账号）每条线路同时只发一个请求
+        limiter_config = config
+        if not config.get('high_concurrency') and not config.get('max_concurrency'):
+            limiter_config = dict(config, max_concurrency=1)
+        self.limiter: AdaptiveLimiter = get_concurrency_limiter(name, limiter_config)
+        self.breaker: CircuitBreaker = get_circuit_breaker(name, config)
+        # 按 API Key 的主动限流（多个 worker 进程共享配额）
+        self.rate_limiter: RateLimiter = get_rate_limiter(f"image:{provider_name}", config)
+        # 最近请求的耗时（决定何时发起对冲请求）
+        self.latency: LatencyTracker = get_latency_tracker(name)
+        # 线路级重试预算（所有任务共享，一条线路出问题时不会用掉其他线路的预算）
+        self.retry_budget: RetryBudget = get_retry_budget(f"image:{name}")
+
+    def load(self) -> float:
+        """再分配一个请求后的负载（按权重折算）"""
+        return (self.limiter.load + 1) / (self.limiter.limit * self.weight)
+
+
+class ImageProviderRouter:
+    """在多条线路之间分配图片生成请求"""
+
+    def __init__(self, routes: List[ProviderRoute]):
+        """
+        Args:
+            routes: 线路列表，第一条为主线路（激活的服务商）
+        """
+        if not routes:
+            raise ValueError("图片服务商池为空")
+        self.routes = routes
+        # 对冲配置以主线路（激活的服务商）为准
+        self.hedge = HedgeSettings(routes[0].config)
+
+    @classmethod
+    def from_config(cls, provider_name: Optional[str] = None) -> "ImageProviderRouter":
+        """
+        根据 image_providers.yaml 创建路由
+
+        Args:
+            provider_name: 主服务商名称，None 时使用激活的服务商
+
+        Returns:
+            ImageProviderRouter 实例
+
+        Raises:
+            ValueError: 主服务商配置无效（池中其他服务商配置无效时跳过）
+        """
+        routes: List[ProviderRoute] = []
+        pool = Config.get_image_provider_pool(provider_name)
+        for position, name in enumerate(pool):
+            try:
+                routes.extend(cls._build_routes(name, Config.get_image_provider_config(name)))
+            except Exception as e:
+                if position == 0:
+                    raise
+                logger.warning(f"⚠️ 服务商池中的 [{name}] 配置无效，已跳过: {str(e).splitlines()[0]}")
+
+        if len(routes) > 1:
+            logger.info(f"图片服务商池: {', '.join(route.name for route in routes)}")
+        return cls(routes)
+
+    @staticmethod
+    def _build_routes(provider_name: str, config: Dict[str, Any]) -> List[ProviderRoute]:
+        """为服务商的每个 API Key 创建一条线路"""
+        keys = [config.get('api_key')]
+        for key in config.get('api_keys') or []:
+            if key and key not in keys:
+                keys.append(key)
+
+        routes = []
+        for i, key in enumerate(keys):
+            route_config = dict(config, api_key=key)
+            route_config.pop('api_keys', None)
+            name = provider_name if i == 0 else f"{provider_name}#{i + 1}"
+            routes.append(ProviderRoute(name, provider_name, route_config))
+        return routes
+
+    @property
+    def primary(self) -> ProviderRoute:
+        """主线路"""
+        return self.routes[0]
+
+    def candidates(self, exclude: Set[str] = frozenset()) -> List[ProviderRoute]:
+        """
+        按优先级排列可用的线路
+
+        熔断中的线路排除在外；失败过的线路（exclude）排在最后，没有其他线路时仍会使用。
+
+        Args:
+            exclude: 本页失败过的线路名称
+
+        Returns:
+            线路列表（负载低的在前，负载相同时随机）
+        """
+        available = [route for route in self.routes if route.breaker.available]
+        return sorted(
+            available,
+            key=lambda route: (route.name in exclude, route.load(), random.random())
+        )
+
+    async def agenerate(
+        self,
+        call: Callable[[ProviderRoute], Awaitable[bytes]],
+        failed: Set[str],
+        hedge_budget: Optional[RetryBudget] = None
+    ) -> Tuple[bytes, ProviderRoute]:
+        """
+        选择线路执行一次生成
+
+        线路熔断或被限流时立即换下一条线路；其他错误直接抛出（由重试策略重试），
+        失败的线路会加入 failed，下次重试时优先避开。
+        传入 hedge_budget 且启用了对冲时，请求过慢会在另一条线路上发起对冲请求。
+
+        Args:
+            call: 在指定线路上生成图片的异步函数
+            failed: 本页失败过的线路名称（会被更新）
+            hedge_budget: 任务级对冲预算（None 表示不对冲）
+
+        Returns:
+            (图片数据, 生成该图片的线路)
+
+        Raises:
+            CircuitOpenError: 所有线路都处于熔断状态
+        """
+        if hedge_budget is None or not self.hedge.enabled:
+            return await self._agenerate_once(call, failed)
+        return await self._agenerate_hedged(call, failed, hedge_budget)
+
+    async def _agenerate_hedged(
+        self,
+        call: Callable[[ProviderRoute], Awaitable[bytes]],
+        failed: Set[str],
+        hedge_budget: RetryBudget
+    ) -> Tuple[bytes, ProviderRoute]:
+        """
+        带对冲的一次生成
+
+        第一个请求真正发出（拿到并发名额和限流配额）后开始计时，超过该线路最近耗时的分位数仍未返回、
+        且任务还有对冲预算时，避开这条线路再发一个请求；先成功的结果生效，另一个请求被取消。
+        两个请求都失败时抛出第一个请求的错误。
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def on_start(route: ProviderRoute):
+            if not started.done():
+                started.set_result((route, time.monotonic()))
+
+        primary = asyncio.ensure_future(self._agenerate_once(call, failed, on_start))
+        backup: Optional[asyncio.Future] = None
+        try:
+            # 排队等待并发名额、限流配额的时间不计入
+            await asyncio.wait({primary, started}, return_when=asyncio.FIRST_COMPLETED)
+            if primary.done():
+                return primary.result()
+
+            route, call_started = started.result()
+            delay = self.hedge.delay(route.latency)
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=max(0.0, delay - (time.monotonic() - call_started)))
+            if done:
+                return primary.result()
+            if not hedge_budget.try_acquire():
+                logger.debug(f"对冲预算已用完，继续等待线路 [{route.name}]")
+                return await primary
+
+            logger.info(f"🪝 线路 [{route.name}] 超过 {delay:.0f} 秒未返回，发起对冲请求")
+            backup_failed = set(failed) | {route.name}
+            backup = asyncio.ensure_future(self._agenerate_once(call, backup_failed))
+            pending = {primary, backup}
+            first_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary, backup):
+                    if task not in done:
+                        continue
+                    if task.exception() is None:
+                        image_data, winner = task.result()
+                        if task is backup:
+                            logger.info(f"🪝 对冲请求先完成（线路 [{winner.name}]），取消原请求")
+                        return image_data, winner
+                    if first_error is None or task is primary:
+                        first_error = task.exception()
+            failed.update(backup_failed - {route.name})
+            raise first_error
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _agenerate_once(
+        self,
+        call: Callable[[ProviderRoute], Awaitable[bytes]],
+        failed: Set[str],
+        on_start: Optional[Callable[[ProviderRoute], None]] = None
+    ) -> Tuple[bytes, ProviderRoute]:
+        """
+        按优先级在线路上执行一次生成（参数和返回值同 agenerate）
+
+        Args:
+            on_start: 请求在某条线路上发出时的回调（已经拿到并发名额和限流配额）
+        """
+        last_error: Optional[Exception] = None
+        for route in self.candidates(failed):
+            try:
+                # 先排队等待自适应并发名额，发出请求前才占用主动限流的配额；
+                # 熔断器只包住实际的请求（可用性已经在 candidates 中检查过）
+                async with route.limiter.slot() as ticket, route.rate_limiter.aslot(), route.breaker.guard():
+                    ticket.restart()
+                    if on_start is not None:
+                        on_start(route)
+                    started = time.monotonic()
+                    failed_call = False
+                    try:
+                        return await call(route), route
+                    except Exception:
+                        failed_call = True
+                        raise
+                    finally:
+                        # 被取消的请求（对冲中落败、任务取消）按已经等待的时间记录，作为耗时的下限，
+                        # 否则最慢的请求总是被对冲掉、不进入统计，分位数会越来越低
+                        if not failed_call:
+                            route.latency.record(time.monotonic() - started)
+            except CircuitOpenError as e:
+                # 熔断不如限流有参考价值（限流错误还可以按重试策略重试）
+                last_error = last_error or e
+                continue
+            except Exception as e:
+                failed.add(route.name)
+                if classify_error(e) == "throttle":
+                    logger.warning(f"🔀 线路 [{route.name}] 被限流，尝试其他线路")
+                    last_error = e
+                    continue
+                raise
+
+        if last_error is None:
+            # 所有线路都在熔断中
+            retry_in = min(route.breaker.retry_in for route in self.routes)
+            last_error = CircuitOpenError(
+                ", ".join(route.name for route in self.routes), retry_in
+            )
+        raise last_error
@@ -11,6 +11,7 @@ import logging
 from pathlib import Path
 import yaml
 from flask import Blueprint, request, jsonify
+from backend.utils.circuit_breaker import get_breaker_stats
 from .utils import prepare_providers_for_response
 
 logger = logging.getLogger(__name__)
@@ -36,7 +37,7 @@ def create_config_blueprint():
         - success: 是否成功
         - config: 配置对象
           - text_generation: 文本生成配置
-          - image_generation: 图片生成配置
+          - image_generation: 图片生成配置（health 为各服务商的熔断状态和健康评分）
         """
         try:
             # 读取图片生成配置
@@ -64,7 +65,8 @@ def create_config_blueprint():
                         "active_provider": image_config.get('active_provider', ''),
                         "providers": prepare_providers_for_response(
                             image_config.get('providers', {})
-                        )
+                        ),
+                        "health": get_breaker_stats()
                     }
                 }
             })
@@ -213,9 +215,17 @@ def _update_provider_config(config_path: Path, new_data: dict):
                 else:
                     new_provider_config.pop('api_key', None)
 
+            # 额外的 API Key（负载均衡用）不返回给前端，未提交时保留原有的
+            if not new_provider_config.get('api_keys'):
+                if name in existing_providers and existing_providers[name].get('api_keys'):
+                    new_provider_config['api_keys'] = existing_providers[name]['api_keys']
+                else:
+                    new_provider_config.pop('api_keys', None)
+
             # 移除不需要保存的字段
             new_provider_config.pop('api_key_env', None)
             new_provider_config.pop('api_key_masked', None)
+            new_provider_config.pop('api_keys_masked', None)
 
         existing_config['providers'] = new_providers
 
@@ -10,11 +10,13 @@
 """
 
 import os
-import io
-import zipfile
 import logging
-from flask import Blueprint, request, jsonify, send_file
+import unicodedata
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from backend.services.history import get_history_service
+from backend.utils.zip_stream import ZipStream
 
 logger = logging.getLogger(__name__)
 
@@ -225,15 +227,24 @@ def create_history_blueprint():
         """
         搜索历史记录
 
+        在标题和大纲内容中全文检索，结果按相关度排序
+
         查询参数：
         - keyword: 搜索关键词（必填）
+        - page: 页码（默认 1）
+        - page_size: 每页数量（默认 20）
 
         返回：
         - success: 是否成功
         - records: 匹配的记录列表
+        - total: 匹配总数
+        - page: 当前页码
+        - total_pages: 总页数
         """
         try:
             keyword = request.args.get('keyword', '')
+            page = int(request.args.get('page', 1))
+            page_size = int(request.args.get('page_size', 20))
 
             if not keyword:
                 return jsonify({
@@ -242,11 +253,11 @@ def create_history_blueprint():
                 }), 400
 
             history_service = get_history_service()
-            results = history_service.search_records(keyword)
+            result = history_service.search_records(keyword, page, page_size)
 
             return jsonify({
                 "success": True,
-                "records": results
+                **result
             }), 200
 
         except Exception as e:
@@ -379,20 +390,12 @@ def create_history_blueprint():
                     "error": f"任务目录不存在：{task_id}"
                 }), 404
 
-            # 创建内存中的 ZIP 文件
-            zip_buffer = _create_images_zip(task_dir)
-
             # 生成安全的下载文件名
             title = record.get('title', 'images')
             safe_title = _sanitize_filename(title)
             filename = f"{safe_title}.zip"
 
-            return send_file(
-                zip_buffer,
-                mimetype='application/zip',
-                as_attachment=True,
-                download_name=filename
-            )
+            return _zip_response(_collect_task_images(task_dir), filename)
 
         except Exception as e:
             error_msg = str(e)
@@ -401,43 +404,158 @@ def create_history_blueprint():
                 "error": f"下载失败。\n错误详情: {error_msg}"
             }), 500
 
+    @history_bp.route('/history/download', methods=['GET', 'POST'])
+    def download_history_batch():
+        """
+        批量下载多条历史记录的图片（打包为一个 ZIP，每条记录一个文件夹）
+
+        参数（二选一）：
+        - GET 查询参数 ids: 逗号分隔的记录 ID（支持断点续传）
+        - POST JSON body record_ids: 记录 ID 列表
+
+        返回：
+        - 成功：ZIP 文件下载
+        - 失败：JSON 错误信息
+        """
+        try:
+            if request.method == 'POST':
+                data = request.get_json(silent=True) or {}
+                record_ids = data.get('record_ids') or []
+            else:
+                record_ids = [i for i in request.args.get('ids', '').split(',') if i]
+
+            if not record_ids:
+                return jsonify({
+                    "success": False,
+                    "error": "参数错误：记录 ID 列表不能为空。\n请提供要下载的记录 ID。"
+                }), 400
+
+            history_service = get_history_service()
+            files = []
+            used_folders: Dict[str, int] = {}
+
+            for record_id in record_ids:
+                record = history_service.get_record(record_id)
+                if not record:
+                    continue
+
+                task_id = record.get('images', {}).get('task_id')
+                task_dir = os.path.join(history_service.history_dir, task_id) if task_id else None
+                if not task_dir or not os.path.isdir(task_dir):
+                    continue
+
+                # 同名标题的文件夹追加序号
+                folder = _sanitize_filename(record.get('title', 'images'))
+                used_folders[folder] = used_folders.get(folder, 0) + 1
+                if used_folders[folder] > 1:
+                    folder = f"{folder}_{used_folders[folder]}"
+
+                files.extend(_collect_task_images(task_dir, prefix=f"{folder}/"))
+
+            if not files:
+                return jsonify({
+                    "success": False,
+                    "error": "所选记录都没有可下载的图片"
+                }), 404
+
+            return _zip_response(files, "images.zip")
+
+        except Exception as e:
+            error_msg = str(e)
+            return jsonify({
+                "success": False,
+                "error": f"批量下载失败。\n错误详情: {error_msg}"
+            }), 500
+
     return history_bp
 
 
-def _create_images_zip(task_dir: str) -> io.BytesIO:
+def _collect_task_images(task_dir: str, prefix: str = "") -> List[Tuple[str, str]]:
     """
-    创建包含所有图片的 ZIP 文件
+    列出任务目录中需要打包的图片（排除缩略图），按页码排序
 
     Args:
         task_dir: 任务目录路径
+        prefix: 归档内的目录前缀
+
+    Returns:
+        [(文件路径, 归档文件名), ...]
+    """
+    files = []
+    for filename in os.listdir(task_dir):
+        # 跳过缩略图文件
+        if filename.startswith('thumb_'):
+            continue
+
+        if filename.endswith(('.png', '.jpg', '.jpeg')):
+            file_path = os.path.join(task_dir, filename)
+
+            # 生成归档文件名（page_N.png 格式）
+            name, ext = os.path.splitext(filename)
+            try:
+                index = int(name)
+                archive_name = f"page_{index + 1}{ext}"
+            except ValueError:
+                index = None
+                archive_name = filename
+
+            files.append((index is None, index or 0, filename, file_path, prefix + archive_name))
+
+    files.sort()
+    return [(file_path, archive_name) for *_, file_path, archive_name in files]
+
+
+def _zip_response(files: List[Tuple[str, str]], download_name: str) -> Response:
+    """
+    以流式 ZIP 返回文件（支持 Range 断点续传）
+
+    Args:
+        files: [(文件路径, 归档文件名), ...]
+        download_name: 下载文件名
 
     Returns:
-        io.BytesIO: 内存中的 ZIP 文件
+        Flask Response
     """
-    memory_file = io.BytesIO()
-
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # 遍历任务目录中的所有图片（排除缩略图）
-        for filename in os.listdir(task_dir):
-            # 跳过缩略图文件
-            if filename.startswith('thumb_'):
-                continue
-
-            if filename.endswith(('.png', '.jpg', '.jpeg')):
-                file_path = os.path.join(task_dir, filename)
-
-                # 生成归档文件名（page_N.png 格式）
-                try:
-                    index = int(filename.split('.')[0])
-                    archive_name = f"page_{index + 1}.png"
-                except ValueError:
-                    archive_name = filename
-
-                zf.write(file_path, archive_name)
-
-    # 将指针移到开始位置
-    memory_file.seek(0)
-    return memory_file
+    archive = ZipStream(files)
+    etag = archive.etag
+    start, end = 0, archive.size
+    status = 200
+
+    # Range 请求（带 If-Range 时归档必须未变化）
+    byte_range = request.range
+    if_range = request.if_range
+    range_valid = (if_range.etag is None and if_range.date is None) or if_range.etag == etag
+    if byte_range is not None and range_valid:
+        range_for_length = byte_range.range_for_length(archive.size)
+        if range_for_length is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{archive.size}"
+            return response
+        start, end = range_for_length
+        status = 206
+
+    response = Response(
+        stream_with_context(archive.iter_bytes(start, end)),
+        status=status,
+        mimetype='application/zip',
+        direct_passthrough=True
+    )
+    response.content_length = end - start
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.set_etag(etag)
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{end - 1}/{archive.size}"
+
+    # 非 ASCII 文件名使用 RFC 5987 编码（与 send_file 一致）
+    try:
+        download_name.encode('ascii')
+        names = {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple or 'images.zip', 'filename*': f"UTF-8''{quote(download_name)}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+
+    return response
 
 
 def _sanitize_filename(title: str) -> str:
@@ -2,23 +2,50 @@
 图片生成相关 API 路由
 
 包含功能：
-- 批量生成图片（SSE 流式返回）
+- 批量生成图片（后台任务，SSE 流式返回，断线后可按 Last-Event-ID 续接）
+- 一键生成（大纲和图片流水线执行，SSE 流式返回）
+- 提交/查询/取消/续跑后台生成任务
 - 获取图片
 - 重试/重新生成单张图片
 - 批量重试失败图片
 - 获取任务状态
+
+/generate、/retry、/regenerate 按幂等键去重（Idempotency-Key 请求头、请求体中的 idempotency_key，
+或按请求内容计算）：重复的请求接上正在执行的任务，已完成的请求直接返回保存的结果。
 """
 
 import os
 import json
+import uuid
 import base64
+import hashlib
 import logging
+from typing import Optional
 from flask import Blueprint, request, jsonify, Response, send_file
+from werkzeug.security import safe_join
+from backend.config import Config
+from backend.services.idempotency import (
+    client_idempotency_key, derive_idempotency_key, get_idempotency_store, is_replayable
+)
 from backend.services.image import get_image_service
+from backend.services.jobs import (
+    CANCELLED, DONE, FAILED, MODE_ONESHOT, QUEUED, RUNNING, get_job_queue, get_job_workers
+)
+from backend.utils.adaptive_limiter import get_limiter_stats
+from backend.utils.circuit_breaker import get_breaker_stats
+from backend.utils.event_bus import get_event_bus
+from backend.utils.file_meta import get_file_meta
+from backend.utils.rate_limiter import get_rate_limiter_stats
 from .utils import log_request, log_error
 
 logger = logging.getLogger(__name__)
 
+# 生成的图片所在的 history 目录
+HISTORY_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "history"
+)
+
 
 def create_image_blueprint():
     """创建图片路由蓝图（工厂函数，支持多次调用）"""
@@ -29,79 +56,193 @@ def create_image_blueprint():
     @image_bp.route('/generate', methods=['POST'])
     def generate_images():
         """
-        批量生成图片（SSE 流式返回）
+        批量生成图片（后台任务，SSE 流式返回）
+
+        任务提交到后台队列执行，客户端断开不影响生成；
+        同一 task_id 的任务正在执行时不会重复提交，而是接上它的事件流。
+
+        幂等：相同的请求（同一幂等键）不会重复生成——
+        任务执行中时接上它的事件流，已完成时从事件日志重放结果，
+        失败或已取消时在原任务上续跑（跳过已经生成的页面）。
 
         请求体：
         - pages: 页面列表（必填）
-        - task_id: 任务 ID
+        - task_id: 任务 ID（为空时自动生成）
         - full_outline: 完整大纲文本
         - user_topic: 用户原始输入主题
         - user_images: base64 编码的用户参考图片列表
+        - resume: 是否跳过 history/<task_id>/ 中已经生成的页面
+        - idempotency_key: 幂等键（可选，也可以用 Idempotency-Key 请求头；未提供时按请求内容计算）
+
+        请求头：
+        - Last-Event-ID: 已收到的最后一个事件 ID（也可以用查询参数 last_event_id）
+        - Idempotency-Key: 幂等键
 
         返回：
-        SSE 事件流，包含以下事件类型：
-        - image: 单张图片生成完成
-        - error: 生成错误
-        - complete: 全部完成
+        SSE 事件流（每个事件带 id），包含以下事件类型：
+        - progress: 开始生成某张图片
+        - complete: 单张图片生成完成
+        - error: 单张图片生成失败
+        - finish: 全部完成
         """
         try:
-            data = request.get_json()
-            pages = data.get('pages')
-            task_id = data.get('task_id')
-            full_outline = data.get('full_outline', '')
-            user_topic = data.get('user_topic', '')
+            task_id, _, after_id, error_response = _submit_job('/generate')
+            if error_response is not None:
+                return error_response
+            return _job_stream_response(task_id, after_id)
 
-            # 解析 base64 格式的用户参考图片
-            user_images = _parse_base64_images(data.get('user_images', []))
+        except Exception as e:
+            log_error('/generate', e)
+            error_msg = str(e)
+            return jsonify({
+                "success": False,
+                "error": f"图片生成异常。\n错误详情: {error_msg}\n建议：检查图片生成服务配置和后端日志"
+            }), 500
+
+    @image_bp.route('/generate/oneshot', methods=['POST'])
+    def generate_oneshot():
+        """
+        一键生成：大纲和图片流水线执行（后台任务，SSE 流式返回）
+
+        不需要先调用 /outline：第一页大纲解析出来就开始生成封面，
+        后续页面边解析边排队生成，适合直接接受模型大纲的场景。
+
+        请求体：
+        - topic: 主题文本（必填）
+        - images: base64 编码的用户参考图片列表
+        - task_id: 任务 ID（为空时自动生成）
 
-            log_request('/generate', {
-                'pages_count': len(pages) if pages else 0,
+        返回：
+        SSE 事件流（每个事件带 id，可按 Last-Event-ID 续接），在 /generate 的事件之外还包含：
+        - outline_page: 一页大纲解析完成
+        - outline: 大纲完成（outline / pages / has_images，与 /outline 的返回值相同）
+        - outline_error: 大纲生成失败
+        """
+        try:
+            data = request.get_json()
+            topic = data.get('topic')
+            task_id = data.get('task_id') or f"task_{uuid.uuid4().hex[:8]}"
+            user_images = _parse_base64_images(data.get('images', []))
+
+            log_request('/generate/oneshot', {
+                'topic': topic,
                 'task_id': task_id,
-                'user_topic': user_topic[:50] if user_topic else None,
                 'user_images': user_images
             })
 
-            if not pages:
-                logger.warning("图片生成请求缺少 pages 参数")
+            if not topic:
+                logger.warning("一键生成请求缺少 topic 参数")
                 return jsonify({
                     "success": False,
-                    "error": "参数错误：pages 不能为空。\n请提供要生成的页面列表数据。"
+                    "error": "参数错误：topic 不能为空。\n请提供要生成图文的主题内容。"
                 }), 400
 
-            logger.info(f"🖼️  开始图片生成任务: {task_id}, 共 {len(pages)} 页")
-            image_service = get_image_service()
+            created = get_job_queue().submit(
+                task_id, [],
+                user_topic=topic,
+                user_images=user_images or None,
+                mode=MODE_ONESHOT
+            )
+            get_job_workers().notify()
+            if created:
+                logger.info(f"🖼️  已提交一键生成任务: {task_id}, 主题: {topic[:50]}")
+            return _job_stream_response(task_id)
 
-            def generate():
-                """SSE 事件生成器"""
-                for event in image_service.generate_images(
-                    pages, task_id, full_outline,
-                    user_images=user_images if user_images else None,
-                    user_topic=user_topic
-                ):
-                    event_type = event["event"]
-                    event_data = event["data"]
+        except Exception as e:
+            log_error('/generate/oneshot', e)
+            error_msg = str(e)
+            return jsonify({
+                "success": False,
+                "error": f"一键生成异常。\n错误详情: {error_msg}\n建议：检查文本和图片生成服务配置和后端日志"
+            }), 500
 
-                    # 格式化为 SSE 格式
-                    yield f"event: {event_type}\n"
-                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+    @image_bp.route('/generate/submit', methods=['POST'])
+    def submit_generate_job():
+        """
+        提交后台生成任务（立即返回，不等待生成）
 
-            return Response(
-                generate(),
-                mimetype='text/event-stream',
-                headers={
-                    'Cache-Control': 'no-cache',
-                    'X-Accel-Buffering': 'no',
-                }
-            )
+        请求体：同 /generate
+
+        返回：
+        - success: 是否成功
+        - task_id: 任务 ID（用于 /generate/<task_id>/events 获取进度）
+        - created: 是否创建了新任务（同一任务正在执行、或重复请求复用已有任务时为 false）
+        """
+        try:
+            task_id, created, _, error_response = _submit_job('/generate/submit')
+            if error_response is not None:
+                return error_response
+            return jsonify({
+                "success": True,
+                "task_id": task_id,
+                "created": created
+            }), 200
 
         except Exception as e:
-            log_error('/generate', e)
+            log_error('/generate/submit', e)
             error_msg = str(e)
             return jsonify({
                 "success": False,
-                "error": f"图片生成异常。\n错误详情: {error_msg}\n建议：检查图片生成服务配置和后端日志"
+                "error": f"提交生成任务失败。\n错误详情: {error_msg}"
             }), 500
 
+    @image_bp.route('/generate/<task_id>/events', methods=['GET'])
+    def get_generate_events(task_id):
+        """
+        获取生成任务的事件流（SSE）
+
+        先补发 Last-Event-ID（或查询参数 last_event_id）之后的历史事件，再实时推送，任务结束后关闭。
+        """
+        if get_job_queue().get(task_id) is None:
+            return jsonify({
+                "success": False,
+                "error": f"生成任务不存在：{task_id}\n可能原因：\n1. 任务ID错误\n2. 任务已过期或被清理"
+            }), 404
+        return _job_stream_response(task_id)
+
+    @image_bp.route('/generate/<task_id>/status', methods=['GET'])
+    def get_generate_status(task_id):
+        """
+        获取生成任务状态
+
+        返回：
+        - success: 是否成功
+        - job: status（queued / running / done / failed / cancelled）、error、attempts、last_event_id 等
+        """
+        job = get_job_queue().get(task_id)
+        if job is None:
+            return jsonify({
+                "success": False,
+                "error": f"生成任务不存在：{task_id}\n可能原因：\n1. 任务ID错误\n2. 任务已过期或被清理"
+            }), 404
+        return jsonify({"success": True, "job": job}), 200
+
+    @image_bp.route('/generate/<task_id>/cancel', methods=['POST'])
+    def cancel_generate_job(task_id):
+        """取消排队中或执行中的生成任务（已经生成的图片保留，可以续跑）"""
+        cancelled = get_job_queue().cancel(task_id)
+        if not cancelled:
+            return jsonify({
+                "success": False,
+                "error": f"无法取消任务：{task_id}\n可能原因：\n1. 任务不存在\n2. 任务已经结束"
+            }), 409
+        get_job_workers().cancel(task_id)
+        logger.info(f"⏹️ 已取消生成任务: {task_id}")
+        return jsonify({"success": True, "task_id": task_id}), 200
+
+    @image_bp.route('/generate/<task_id>/resume', methods=['POST'])
+    def resume_generate_job(task_id):
+        """让失败或已取消的任务从断点续跑（跳过已经生成的页面）"""
+        queue = get_job_queue()
+        if not queue.resubmit(task_id):
+            return jsonify({
+                "success": False,
+                "error": f"无法续跑任务：{task_id}\n可能原因：\n1. 任务不存在或已过期\n2. 任务仍在执行"
+            }), 409
+        get_job_workers().notify()
+        logger.info(f"🔁 生成任务已重新排队（断点续跑）: {task_id}")
+        return jsonify({"success": True, "task_id": task_id}), 200
+
     # ==================== 图片获取 ====================
 
     @image_bp.route('/images/<task_id>/<filename>', methods=['GET'])
@@ -126,30 +267,25 @@ def create_image_blueprint():
             # 检查是否请求缩略图
             thumbnail = request.args.get('thumbnail', 'true').lower() == 'true'
 
-            # 构建 history 目录路径
-            history_root = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-                "history"
-            )
-
             if thumbnail:
                 # 尝试返回缩略图
-                thumb_filename = f"thumb_{filename}"
-                thumb_filepath = os.path.join(history_root, task_id, thumb_filename)
+                thumb_relpath = safe_join(task_id, f"thumb_{filename}")
+                thumb_filepath = safe_join(HISTORY_ROOT, thumb_relpath) if thumb_relpath else None
 
-                if os.path.exists(thumb_filepath):
-                    return send_file(thumb_filepath, mimetype='image/png')
+                if thumb_filepath and os.path.exists(thumb_filepath):
+                    return _send_image(thumb_filepath, thumb_relpath)
 
-            # 返回原图
-            filepath = os.path.join(history_root, task_id, filename)
+            # 返回原图（缩略图还在后台生成时也返回原图）
+            relpath = safe_join(task_id, filename)
+            filepath = safe_join(HISTORY_ROOT, relpath) if relpath else None
 
-            if not os.path.exists(filepath):
+            if not filepath or not os.path.exists(filepath):
                 return jsonify({
                     "success": False,
                     "error": f"图片不存在：{task_id}/{filename}"
                 }), 404
 
-            return send_file(filepath, mimetype='image/png')
+            return _send_image(filepath, relpath, revalidate=thumbnail)
 
         except Exception as e:
             log_error('/images', e)
@@ -170,10 +306,12 @@ def create_image_blueprint():
         - task_id: 任务 ID（必填）
         - page: 页面信息（必填）
         - use_reference: 是否使用参考图（默认 true）
+        - idempotency_key: 幂等键（可选，也可以用 Idempotency-Key 请求头）
 
         返回：
         - success: 是否成功
         - image_url: 新图片 URL
+        - deduplicated: 重复请求、直接返回了之前的结果时为 true
         """
         try:
             data = request.get_json()
@@ -194,8 +332,11 @@ def create_image_blueprint():
                 }), 400
 
             logger.info(f"🔄 重试生成图片: task={task_id}, page={page.get('index')}")
-            image_service = get_image_service()
-            result = image_service.retry_single_image(task_id, page, use_reference)
+            result = _run_idempotent('retry', task_id, {
+                'task_id': task_id,
+                'page': page,
+                'use_reference': use_reference
+            }, lambda: get_image_service().retry_single_image(task_id, page, use_reference))
 
             if result["success"]:
                 logger.info(f"✅ 图片重试成功: {result.get('image_url')}")
@@ -281,10 +422,12 @@ def create_image_blueprint():
         - use_reference: 是否使用参考图（默认 true）
         - full_outline: 完整大纲文本（用于上下文）
         - user_topic: 用户原始输入主题
+        - idempotency_key: 幂等键（可选，也可以用 Idempotency-Key 请求头）
 
         返回：
         - success: 是否成功
         - image_url: 新图片 URL
+        - deduplicated: 重复请求、直接返回了之前的结果时为 true
         """
         try:
             data = request.get_json()
@@ -307,12 +450,17 @@ def create_image_blueprint():
                 }), 400
 
             logger.info(f"🔄 重新生成图片: task={task_id}, page={page.get('index')}")
-            image_service = get_image_service()
-            result = image_service.regenerate_image(
+            result = _run_idempotent('regenerate', task_id, {
+                'task_id': task_id,
+                'page': page,
+                'use_reference': use_reference,
+                'full_outline': full_outline,
+                'user_topic': user_topic
+            }, lambda: get_image_service().regenerate_image(
                 task_id, page, use_reference,
                 full_outline=full_outline,
                 user_topic=user_topic
-            )
+            ))
 
             if result["success"]:
                 logger.info(f"✅ 图片重新生成成功: {result.get('image_url')}")
@@ -344,6 +492,7 @@ def create_image_blueprint():
         - state: 任务状态
           - generated: 已生成的图片
           - failed: 失败的图片
+          - providers: 生成各页图片的服务商线路
           - has_cover: 是否有封面图
         """
         try:
@@ -353,13 +502,14 @@ def create_image_blueprint():
             if state is None:
                 return jsonify({
                     "success": False,
-                    "error": f"任务不存在：{task_id}\n可能原因：\n1. 任务ID错误\n2. 任务已过期或被清理\n3. 服务重启导致状态丢失"
+                    "error": f"任务不存在：{task_id}\n可能原因：\n1. 任务ID错误\n2. 任务已过期或被清理\n3. 任务状态超过保留时间已被淘汰"
                 }), 404
 
             # 不返回封面图片数据（太大）
             safe_state = {
                 "generated": state.get("generated", {}),
                 "failed": state.get("failed", {}),
+                "providers": state.get("providers", {}),
                 "has_cover": state.get("cover_image") is not None
             }
 
@@ -385,10 +535,18 @@ def create_image_blueprint():
         返回：
         - success: 服务是否正常
         - message: 状态消息
+        - concurrency: 各图片服务商当前的自适应并发状态
+        - providers: 各图片服务商的熔断状态和健康评分
+        - rate_limits: 已配置主动限流的配额状态（按服务商 + API Key 摘要）
+        - event_bus: 本进程事件总线中的任务数（topics）和执行中的任务数（live）
         """
         return jsonify({
             "success": True,
-            "message": "服务正常运行"
+            "message": "服务正常运行",
+            "concurrency": get_limiter_stats(),
+            "providers": get_breaker_stats(),
+            "rate_limits": get_rate_limiter_stats(),
+            "event_bus": get_event_bus().stats()
         }), 200
 
     return image_bp
@@ -396,6 +554,212 @@ def create_image_blueprint():
 
 # ==================== 辅助函数 ====================
 
+def _submit_job(endpoint: str):
+    """
+    解析生成请求并提交到后台队列（按幂等键去重）
+
+    Returns:
+        (task_id, 是否创建了新任务, 事件流的起始事件 ID（None 表示按 Last-Event-ID）, 参数错误时的错误响应)
+    """
+    data = request.get_json()
+    pages = data.get('pages')
+    requested_task_id = data.get('task_id')
+    task_id = requested_task_id or f"task_{uuid.uuid4().hex[:8]}"
+    full_outline = data.get('full_outline', '')
+    user_topic = data.get('user_topic', '')
+    resume = bool(data.get('resume', False))
+
+    # 解析 base64 格式的用户参考图片
+    user_images = _parse_base64_images(data.get('user_images', []))
+
+    log_request(endpoint, {
+        'pages_count': len(pages) if pages else 0,
+        'task_id': task_id,
+        'user_topic': user_topic[:50] if user_topic else None,
+        'user_images': user_images,
+        'resume': resume
+    })
+
+    if not pages:
+        logger.warning("图片生成请求缺少 pages 参数")
+        return task_id, False, None, (jsonify({
+            "success": False,
+            "error": "参数错误：pages 不能为空。\n请提供要生成的页面列表数据。"
+        }), 400)
+
+    idem_key = _idempotency_key('generate', {
+        'task_id': requested_task_id,
+        'pages': pages,
+        'full_outline': full_outline,
+        'user_topic': user_topic,
+        'user_images': [hashlib.sha256(img).hexdigest() for img in user_images],
+        'resume': resume
+    })
+    store = get_idempotency_store()
+    queue = get_job_queue()
+
+    record = store.acquire(idem_key, task_id)
+    if record is not None:
+        job = queue.get(record["task_id"])
+        if job is not None and job["status"] in (QUEUED, RUNNING):
+            logger.info(f"🖼️  重复的生成请求，接上执行中的任务: {job['task_id']}")
+            return job["task_id"], False, None, None
+        if job is not None and job["status"] == DONE and is_replayable(idem_key, record, job["updated_at"]):
+            logger.info(f"🖼️  重复的生成请求，任务已完成，重放保存的结果: {job['task_id']}")
+            return job["task_id"], False, None, None
+        if job is not None and job["status"] in (FAILED, CANCELLED) and queue.resubmit(job["task_id"]):
+            get_job_workers().notify()
+            logger.info(f"🔁 重复的生成请求，原任务已结束，从断点续跑: {job['task_id']}")
+            return job["task_id"], False, job["last_event_id"], None
+        store.takeover(idem_key, task_id)
+
+    try:
+        created = queue.submit(
+            task_id, pages, full_outline,
+            user_topic=user_topic,
+            user_images=user_images or None,
+            resume=resume
+        )
+    except Exception:
+        store.release(idem_key)
+        raise
+    store.complete(idem_key, {"task_id": task_id})
+    get_job_workers().notify()
+    if created:
+        logger.info(f"🖼️  已提交图片生成任务: {task_id}, 共 {len(pages)} 页")
+    else:
+        logger.info(f"🖼️  图片生成任务已在执行，接上事件流: {task_id}")
+    return task_id, created, None, None
+
+
+def _idempotency_key(scope: str, material: dict) -> str:
+    """
+    获取请求的幂等键
+
+    优先使用 Idempotency-Key 请求头或请求体中的 idempotency_key，否则按请求内容计算。
+
+    Args:
+        scope: 接口名称
+        material: 决定结果的请求参数（用于计算幂等键）
+    """
+    key = request.headers.get('Idempotency-Key') or (request.get_json(silent=True) or {}).get('idempotency_key')
+    if key:
+        return client_idempotency_key(scope, str(key))
+    return derive_idempotency_key(scope, material)
+
+
+def _run_idempotent(scope: str, task_id: str, material: dict, run) -> dict:
+    """
+    按幂等键执行单张图片请求
+
+    相同的请求正在执行时等待其结果，已经成功时直接返回保存的结果；
+    失败的结果不保存，重复请求会重新执行。
+
+    Args:
+        scope: 接口名称
+        task_id: 任务 ID
+        material: 决定结果的请求参数
+        run: 实际执行请求的函数，返回结果字典
+
+    Returns:
+        结果字典（直接返回之前的结果时带 deduplicated=True）
+    """
+    idem_key = _idempotency_key(scope, material)
+    store = get_idempotency_store()
+
+    record = store.acquire(idem_key, task_id)
+    if record is not None:
+        if record["result"] is not None and is_replayable(idem_key, record, record["updated_at"]):
+            logger.info(f"♻️ 重复的请求，直接返回之前的结果: task={task_id}")
+            return dict(record["result"], deduplicated=True)
+        store.takeover(idem_key, task_id)
+
+    try:
+        result = run()
+    except Exception:
+        store.release(idem_key)
+        raise
+    if result.get("success"):
+        store.complete(idem_key, result)
+    else:
+        store.release(idem_key)
+    return result
+
+
+def _job_stream_response(task_id: str, after_id: Optional[int] = None) -> Response:
+    """
+    生成任务的 SSE 响应（从 Last-Event-ID 之后开始）
+
+    Args:
+        task_id: 任务 ID
+        after_id: 至少从该事件 ID 之后开始（续跑的任务不重放上一次执行的事件）
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    if after_id is not None:
+        last_event_id = max(last_event_id, after_id)
+
+    return Response(
+        get_job_queue().stream(task_id, last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        }
+    )
+
+
+def _send_image(filepath: str, relpath: str, revalidate: bool = False) -> Response:
+    """
+    发送图片文件（带 ETag / Last-Modified 条件请求和缓存头）
+
+    缓存策略：
+    - URL 带版本参数（前端重新生成后追加 ?t=）：长期缓存且 immutable
+    - 其他：每次重新验证，未变化时返回 304
+      （任务完成后 /retry、/regenerate 仍会原地覆盖 N.png 和 thumb_N.png，同一 URL 的内容会变化）
+
+    Args:
+        filepath: 图片的完整路径
+        relpath: 相对 history 目录的路径（用于 X-Accel-Redirect）
+        revalidate: 强制每次重新验证（缩略图生成后同一 URL 的内容会变化）
+
+    Returns:
+        Flask Response
+    """
+    meta = get_file_meta(filepath)
+
+    if Config.IMAGE_SENDFILE == 'x-accel-redirect':
+        # 由 nginx 发送文件内容，这里只负责响应头
+        response = Response(mimetype=meta.mimetype)
+        response.headers['X-Accel-Redirect'] = Config.IMAGE_ACCEL_PREFIX + relpath.replace(os.sep, '/')
+    elif Config.IMAGE_SENDFILE == 'x-sendfile':
+        response = Response(mimetype=meta.mimetype)
+        response.headers['X-Sendfile'] = os.path.abspath(filepath)
+    else:
+        response = send_file(filepath, mimetype=meta.mimetype, conditional=False, etag=False)
+
+    response.set_etag(meta.etag)
+    response.last_modified = meta.mtime
+    # 覆盖 send_file 默认的 Cache-Control
+    del response.headers['Cache-Control']
+
+    if revalidate:
+        response.cache_control.no_cache = True
+    elif request.args.get('t') or request.args.get('v'):
+        response.cache_control.public = True
+        response.cache_control.max_age = Config.IMAGE_VERSIONED_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    if Config.IMAGE_SENDFILE:
+        return response.make_conditional(request)
+    return response.make_conditional(request, accept_ranges=True, complete_length=meta.size)
+
+
 def _parse_base64_images(images_base64: list) -> list:
     """
     解析 base64 编码的图片列表
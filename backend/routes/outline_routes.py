@@ -3,12 +3,16 @@
 
 包含功能：
 - 生成大纲（支持图片上传）
+- 流式生成大纲（SSE，每页生成完立即返回）
+
+相同的主题、参考图和模型配置会直接返回缓存的大纲，请求中带 no_cache 时重新生成。
 """
 
 import time
+import json
 import base64
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from backend.services.outline import get_outline_service
 from .utils import log_request, log_error
 
@@ -28,15 +32,20 @@ def create_outline_blueprint():
         1. multipart/form-data（带图片文件）
            - topic: 主题文本
            - images: 图片文件列表
+           - no_cache: 为 true 时不读取大纲缓存（可选）
 
         2. application/json（无图片或 base64 图片）
            - topic: 主题文本
            - images: base64 编码的图片数组（可选）
+           - no_cache: 为 true 时不读取大纲缓存（可选）
+
+        也可以通过查询参数 ?no_cache=1 跳过缓存。
 
         返回：
         - success: 是否成功
         - outline: 原始大纲文本
         - pages: 解析后的页面列表
+        - cached: 结果来自大纲缓存时为 true
         """
         start_time = time.time()
 
@@ -57,12 +66,15 @@ def create_outline_blueprint():
             # 调用大纲生成服务
             logger.info(f"🔄 开始生成大纲，主题: {topic[:50]}...")
             outline_service = get_outline_service()
-            result = outline_service.generate_outline(topic, images if images else None)
+            result = outline_service.generate_outline(
+                topic, images if images else None, use_cache=not _bypass_cache()
+            )
 
             # 记录结果
             elapsed = time.time() - start_time
             if result["success"]:
-                logger.info(f"✅ 大纲生成成功，耗时 {elapsed:.2f}s，共 {len(result.get('pages', []))} 页")
+                source = "（缓存）" if result.get("cached") else ""
+                logger.info(f"✅ 大纲生成成功{source}，耗时 {elapsed:.2f}s，共 {len(result.get('pages', []))} 页")
                 return jsonify(result), 200
             else:
                 logger.error(f"❌ 大纲生成失败: {result.get('error', '未知错误')}")
@@ -76,6 +88,70 @@ def create_outline_blueprint():
                 "error": f"大纲生成异常。\n错误详情: {error_msg}\n建议：检查后端日志获取更多信息"
             }), 500
 
+    @outline_bp.route('/outline/stream', methods=['POST'])
+    def generate_outline_stream():
+        """
+        流式生成大纲（SSE）
+
+        请求格式：同 /outline（包括 no_cache）
+
+        返回：
+        SSE 事件流，包含以下事件类型：
+        - page: 一页大纲生成完成（index / type / content）
+        - finish: 全部完成（outline / pages / has_images，与 /outline 的返回值相同）
+        - error: 生成失败
+        """
+        try:
+            topic, images = _parse_outline_request()
+
+            log_request('/outline/stream', {'topic': topic, 'images': images})
+
+            if not topic:
+                logger.warning("大纲生成请求缺少 topic 参数")
+                return jsonify({
+                    "success": False,
+                    "error": "参数错误：topic 不能为空。\n请提供要生成图文的主题内容。"
+                }), 400
+
+            logger.info(f"🔄 开始流式生成大纲，主题: {topic[:50]}...")
+            outline_service = get_outline_service()
+            use_cache = not _bypass_cache()
+
+            def generate():
+                """SSE 事件生成器"""
+                start_time = time.time()
+                events = outline_service.generate_outline_stream(
+                    topic, images if images else None, use_cache=use_cache
+                )
+                for event in events:
+                    event_type = event["event"]
+                    event_data = event["data"]
+                    if event_type == "finish":
+                        elapsed = time.time() - start_time
+                        logger.info(f"✅ 大纲生成成功，耗时 {elapsed:.2f}s，共 {len(event_data['pages'])} 页")
+                    elif event_type == "error":
+                        logger.error(f"❌ 大纲生成失败: {event_data.get('error', '未知错误')}")
+
+                    yield f"event: {event_type}\n"
+                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+
+            return Response(
+                generate(),
+                mimetype='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no',
+                }
+            )
+
+        except Exception as e:
+            log_error('/outline/stream', e)
+            error_msg = str(e)
+            return jsonify({
+                "success": False,
+                "error": f"大纲生成异常。\n错误详情: {error_msg}\n建议：检查后端日志获取更多信息"
+            }), 500
+
     return outline_bp
 
 
@@ -120,3 +196,19 @@ def _parse_outline_request():
             images.append(base64.b64decode(img_b64))
 
     return topic, images
+
+
+def _bypass_cache() -> bool:
+    """
+    请求是否要求跳过大纲缓存
+
+    依次检查查询参数、表单字段和 JSON 中的 no_cache。
+    """
+    value = request.args.get('no_cache')
+    if value is None and request.content_type and 'multipart/form-data' in request.content_type:
+        value = request.form.get('no_cache')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('no_cache')
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
@@ -92,6 +92,11 @@ def prepare_providers_for_response(providers: dict) -> dict:
             provider_copy['api_key_masked'] = ''
             provider_copy['api_key'] = ''
 
+        # 额外的 API Key 同样只返回脱敏版本
+        if provider_copy.get('api_keys'):
+            provider_copy['api_keys_masked'] = [mask_api_key(key) for key in provider_copy['api_keys']]
+            provider_copy['api_keys'] = []
+
         result[name] = provider_copy
 
     return result
@@ -0,0 +1,161 @@
+"""图片衍生文件（缩略图等）生成流水线
+
+原图保存后立即返回，缩略图等衍生文件交给后台进程池生成，
+不再占用生成请求的时间。衍生文件生成完成前，图片接口返回原图。
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 衍生文件类型：文件名前缀 -> 目标大小（KB）
+DERIVATIVES = {
+    "thumb_": 50,  # 缩略图，用于列表和预览
+}
+
+
+def derivative_filenames(filename: str) -> List[str]:
+    """获取原图对应的所有衍生文件名"""
+    return [prefix + filename for prefix in DERIVATIVES]
+
+
+def _build_derivatives(task_dir: str, filename: str) -> List[str]:
+    """
+    生成一张原图的所有衍生文件（在工作进程中执行）
+
+    衍生文件先写入临时文件再重命名，图片接口不会读到写了一半的文件。
+    如果生成期间原图又被覆盖（重新生成），放弃本次结果，由新提交的任务生成。
+
+    Returns:
+        生成的衍生文件名列表
+    """
+    from backend.utils.image_compressor import compress_image
+
+    source_path = os.path.join(task_dir, filename)
+    source_mtime = os.stat(source_path).st_mtime_ns
+    with open(source_path, "rb") as f:
+        image_data = f.read()
+
+    created = []
+    for prefix, max_size_kb in DERIVATIVES.items():
+        derivative_name = prefix + filename
+        tmp_path = os.path.join(task_dir, f".{derivative_name}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(compress_image(image_data, max_size_kb=max_size_kb))
+        if os.stat(source_path).st_mtime_ns != source_mtime:
+            os.remove(tmp_path)
+            return []
+        os.replace(tmp_path, os.path.join(task_dir, derivative_name))
+        created.append(derivative_name)
+    return created
+
+
+class DerivativePipeline:
+    """衍生文件生成流水线"""
+
+    def __init__(self, executor_type: str = "process", max_workers: int = 2):
+        """
+        初始化流水线（执行器在第一次提交时创建）
+
+        Args:
+            executor_type: 'process'（进程池，不占用 GIL）或 'thread'（线程池）
+            max_workers: 工作进程/线程数
+        """
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # 正在生成的任务（原图路径 -> Future）
+        self._pending: Dict[str, Future] = {}
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == "process":
+                    # spawn：后台事件循环等线程不会被复制到子进程
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="derivatives"
+                    )
+                logger.debug(f"衍生文件流水线已启动: {self.executor_type} x {self.max_workers}")
+            return self._executor
+
+    def submit(self, task_dir: str, filename: str) -> Future:
+        """
+        提交一张原图，后台生成其衍生文件
+
+        Args:
+            task_dir: 任务目录
+            filename: 原图文件名
+
+        Returns:
+            Future，结果为生成的衍生文件名列表
+        """
+        key = os.path.join(task_dir, filename)
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            # 原图已被覆盖，尚未开始的旧任务无需再执行
+            pending.cancel()
+
+        try:
+            future = self._get_executor().submit(_build_derivatives, task_dir, filename)
+        except Exception as e:
+            # 进程池不可用（如被系统回收）时退回到线程池
+            logger.warning(f"衍生文件进程池不可用，改用线程池: {e}")
+            with self._lock:
+                self._executor = None
+            self.executor_type = "thread"
+            future = self._get_executor().submit(_build_derivatives, task_dir, filename)
+
+        with self._lock:
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return future
+
+    def pending(self, task_dir: str, filename: str) -> Optional[Future]:
+        """获取原图尚未完成的衍生任务（已完成或未提交时返回 None）"""
+        with self._lock:
+            return self._pending.get(os.path.join(task_dir, filename))
+
+    def _on_done(self, key: str, future: Future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"生成衍生文件失败 [{key}]: {future.exception()}")
+
+    def invalidate(self, task_dir: str, filename: str):
+        """删除原图已过期的衍生文件（原图被覆盖前调用）"""
+        for derivative_name in derivative_filenames(filename):
+            try:
+                os.remove(os.path.join(task_dir, derivative_name))
+            except FileNotFoundError:
+                pass
+
+
+_pipeline_instance: Optional[DerivativePipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_derivative_pipeline() -> DerivativePipeline:
+    """获取全局衍生文件流水线"""
+    global _pipeline_instance
+    with _pipeline_lock:
+        if _pipeline_instance is None:
+            _pipeline_instance = DerivativePipeline(
+                Config.DERIVATIVE_EXECUTOR,
+                Config.DERIVATIVE_WORKERS
+            )
+    return _pipeline_instance
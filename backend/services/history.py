@@ -5,37 +5,179 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
+from backend.utils.search_tokenizer import build_match_query, substring_terms, tokenize_for_index
+from backend.utils.sqlite_db import SQLiteDatabase
+
 
 class HistoryService:
-    def __init__(self):
-        self.history_dir = os.path.join(
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'draft',
+            thumbnail TEXT,
+            page_count INTEGER NOT NULL DEFAULT 0,
+            task_id TEXT,
+            outline TEXT NOT NULL,
+            images TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_created_at ON records(created_at);
+        CREATE INDEX IF NOT EXISTS idx_records_status_created_at ON records(status, created_at);
+        -- task_id -> 记录 的反向索引（扫描同步时按任务查找记录）
+        CREATE INDEX IF NOT EXISTS idx_records_task_id ON records(task_id, created_at);
+
+        -- 按状态计数，由触发器维护，统计接口无需扫描全表
+        CREATE TABLE IF NOT EXISTS record_stats (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_records_insert AFTER INSERT ON records BEGIN
+            INSERT INTO record_stats (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_records_delete AFTER DELETE ON records BEGIN
+            UPDATE record_stats SET count = count - 1 WHERE status = OLD.status;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_records_status AFTER UPDATE OF status ON records
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            UPDATE record_stats SET count = count - 1 WHERE status = OLD.status;
+            INSERT INTO record_stats (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET count = count + 1;
+        END;
+
+        -- 标题和大纲内容的全文索引（rowid 与 records 一致，写入的是分词后的文本）
+        CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(title, content);
+        CREATE TRIGGER IF NOT EXISTS trg_records_fts_delete AFTER DELETE ON records BEGIN
+            DELETE FROM records_fts WHERE rowid = OLD.rowid;
+        END;
+    """
+
+    # 列表接口返回的字段（与旧版 index.json 中的条目一致）
+    SUMMARY_COLUMNS = "id, title, created_at, updated_at, status, thumbnail, page_count, task_id"
+
+    # 搜索排序时标题命中的权重（相对大纲内容）
+    SEARCH_TITLE_WEIGHT = 10.0
+
+    def __init__(self, history_dir: Optional[str] = None):
+        self.history_dir = history_dir or os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
             "history"
         )
         os.makedirs(self.history_dir, exist_ok=True)
 
+        self.db = SQLiteDatabase(os.path.join(self.history_dir, "history.db"), self.SCHEMA)
+
+        # 旧版索引文件，存在时一次性迁移到数据库
         self.index_file = os.path.join(self.history_dir, "index.json")
-        self._init_index()
+        self._migrate_from_json()
+        self._backfill_search_index()
 
-    def _init_index(self):
+    def _migrate_from_json(self):
+        """把旧版 index.json + <record_id>.json 导入数据库（只执行一次）"""
         if not os.path.exists(self.index_file):
-            with open(self.index_file, "w", encoding="utf-8") as f:
-                json.dump({"records": []}, f, ensure_ascii=False, indent=2)
-
-    def _load_index(self) -> Dict:
-        try:
-            with open(self.index_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {"records": []}
-
-    def _save_index(self, index: Dict):
-        with open(self.index_file, "w", encoding="utf-8") as f:
-            json.dump(index, f, ensure_ascii=False, indent=2)
+            return
+
+        with self.db.transaction() as conn:
+            # 其他进程可能已经完成迁移
+            if not os.path.exists(self.index_file):
+                return
+
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except Exception:
+                index = {"records": []}
+
+            migrated = 0
+            # index.json 中最新的记录在最前面，倒序插入以保持顺序
+            for entry in reversed(index.get("records", [])):
+                record_path = self._get_record_path(entry["id"])
+                try:
+                    with open(record_path, "r", encoding="utf-8") as f:
+                        record = json.load(f)
+                except Exception:
+                    continue
+                self._insert_record(conn, record, or_ignore=True)
+                migrated += 1
+
+            os.replace(self.index_file, self.index_file + ".migrated")
+
+        print(f"已将 {migrated} 条历史记录迁移到数据库，原索引已重命名为 index.json.migrated")
+
+    def _backfill_search_index(self):
+        """为尚未建立全文索引的记录补建索引（升级已有数据库时）"""
+        conn = self.db.connection()
+        missing = conn.execute(
+            "SELECT r.rowid FROM records r LEFT JOIN records_fts f ON f.rowid = r.rowid "
+            "WHERE f.rowid IS NULL LIMIT 1"
+        ).fetchone()
+        if missing is None:
+            return
+
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT r.rowid, r.title, r.outline FROM records r "
+                "LEFT JOIN records_fts f ON f.rowid = r.rowid WHERE f.rowid IS NULL"
+            ).fetchall()
+            for row in rows:
+                self._index_record(conn, row["rowid"], row["title"], json.loads(row["outline"]))
+
+        print(f"已为 {len(rows)} 条历史记录建立全文索引")
+
+    @staticmethod
+    def _index_record(conn, rowid: int, title: str, outline: Dict):
+        """写入（或重建）一条记录的全文索引"""
+        content = "\n".join(
+            page.get("content", "") for page in (outline or {}).get("pages", [])
+            if isinstance(page, dict)
+        )
+        conn.execute("DELETE FROM records_fts WHERE rowid = ?", (rowid,))
+        conn.execute(
+            "INSERT INTO records_fts (rowid, title, content) VALUES (?, ?, ?)",
+            (rowid, tokenize_for_index(title), tokenize_for_index(content))
+        )
 
     def _get_record_path(self, record_id: str) -> str:
+        """旧版记录文件路径（仅用于迁移和清理）"""
         return os.path.join(self.history_dir, f"{record_id}.json")
 
+    def _insert_record(self, conn, record: Dict, or_ignore: bool = False):
+        images = record.get("images") or {}
+        cursor = conn.execute(
+            f"INSERT {'OR IGNORE ' if or_ignore else ''}INTO records "
+            "(id, title, created_at, updated_at, status, thumbnail, page_count, task_id, outline, images) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record["id"],
+                record.get("title", ""),
+                record["created_at"],
+                record.get("updated_at", record["created_at"]),
+                record.get("status") or "draft",
+                record.get("thumbnail"),
+                len((record.get("outline") or {}).get("pages", [])),
+                images.get("task_id"),
+                json.dumps(record.get("outline") or {}, ensure_ascii=False),
+                json.dumps(images, ensure_ascii=False)
+            )
+        )
+        if cursor.rowcount:
+            self._index_record(conn, cursor.lastrowid, record.get("title", ""), record.get("outline"))
+
+    @staticmethod
+    def _row_to_record(row) -> Dict:
+        return {
+            "id": row["id"],
+            "title": row["title"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "outline": json.loads(row["outline"]),
+            "images": json.loads(row["images"]),
+            "status": row["status"],
+            "thumbnail": row["thumbnail"]
+        }
+
     def create_record(
         self,
         topic: str,
@@ -59,36 +201,16 @@ class HistoryService:
             "thumbnail": None
         }
 
-        record_path = self._get_record_path(record_id)
-        with open(record_path, "w", encoding="utf-8") as f:
-            json.dump(record, f, ensure_ascii=False, indent=2)
-
-        index = self._load_index()
-        index["records"].insert(0, {
-            "id": record_id,
-            "title": topic,
-            "created_at": now,
-            "updated_at": now,
-            "status": "draft",
-            "thumbnail": None,
-            "page_count": len(outline.get("pages", [])),
-            "task_id": task_id
-        })
-        self._save_index(index)
+        with self.db.transaction() as conn:
+            self._insert_record(conn, record)
 
         return record_id
 
     def get_record(self, record_id: str) -> Optional[Dict]:
-        record_path = self._get_record_path(record_id)
-
-        if not os.path.exists(record_path):
-            return None
-
-        try:
-            with open(record_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return None
+        row = self.db.connection().execute(
+            "SELECT * FROM records WHERE id = ?", (record_id,)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
 
     def update_record(
         self,
@@ -98,44 +220,44 @@ class HistoryService:
         status: Optional[str] = None,
         thumbnail: Optional[str] = None
     ) -> bool:
-        record = self.get_record(record_id)
-        if not record:
-            return False
-
-        now = datetime.now().isoformat()
-        record["updated_at"] = now
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT rowid, * FROM records WHERE id = ?", (record_id,)).fetchone()
+            if not row:
+                return False
+
+            record = self._row_to_record(row)
+            record["updated_at"] = datetime.now().isoformat()
+
+            if outline is not None:
+                record["outline"] = outline
+
+            if images is not None:
+                record["images"] = images
+
+            if status is not None:
+                record["status"] = status
+
+            if thumbnail is not None:
+                record["thumbnail"] = thumbnail
+
+            conn.execute(
+                "UPDATE records SET updated_at = ?, status = ?, thumbnail = ?, page_count = ?, "
+                "task_id = ?, outline = ?, images = ? WHERE id = ?",
+                (
+                    record["updated_at"],
+                    record["status"],
+                    record["thumbnail"],
+                    len(record["outline"].get("pages", [])),
+                    (record["images"] or {}).get("task_id"),
+                    json.dumps(record["outline"], ensure_ascii=False),
+                    json.dumps(record["images"], ensure_ascii=False),
+                    record_id
+                )
+            )
+
+            if outline is not None:
+                self._index_record(conn, row["rowid"], record["title"], outline)
 
-        if outline is not None:
-            record["outline"] = outline
-
-        if images is not None:
-            record["images"] = images
-
-        if status is not None:
-            record["status"] = status
-
-        if thumbnail is not None:
-            record["thumbnail"] = thumbnail
-
-        record_path = self._get_record_path(record_id)
-        with open(record_path, "w", encoding="utf-8") as f:
-            json.dump(record, f, ensure_ascii=False, indent=2)
-
-        index = self._load_index()
-        for idx_record in index["records"]:
-            if idx_record["id"] == record_id:
-                idx_record["updated_at"] = now
-                if status:
-                    idx_record["status"] = status
-                if thumbnail:
-                    idx_record["thumbnail"] = thumbnail
-                if outline:
-                    idx_record["page_count"] = len(outline.get("pages", []))
-                if images is not None and images.get("task_id"):
-                    idx_record["task_id"] = images.get("task_id")
-                break
-
-        self._save_index(index)
         return True
 
     def delete_record(self, record_id: str) -> bool:
@@ -155,17 +277,18 @@ class HistoryService:
                 except Exception as e:
                     print(f"删除任务目录失败: {task_dir}, {e}")
 
-        # 删除记录JSON文件
-        record_path = self._get_record_path(record_id)
-        try:
-            os.remove(record_path)
-        except Exception:
-            return False
+        with self.db.transaction() as conn:
+            cursor = conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+            if not cursor.rowcount:
+                return False
 
-        # 更新索引
-        index = self._load_index()
-        index["records"] = [r for r in index["records"] if r["id"] != record_id]
-        self._save_index(index)
+        # 删除迁移前遗留的记录JSON文件
+        record_path = self._get_record_path(record_id)
+        if os.path.exists(record_path):
+            try:
+                os.remove(record_path)
+            except Exception:
+                pass
 
         return True
 
@@ -175,53 +298,167 @@ class HistoryService:
         page_size: int = 20,
         status: Optional[str] = None
     ) -> Dict:
-        index = self._load_index()
-        records = index.get("records", [])
+        conn = self.db.connection()
+        offset = (page - 1) * page_size
 
         if status:
-            records = [r for r in records if r.get("status") == status]
-
-        total = len(records)
-        start = (page - 1) * page_size
-        end = start + page_size
-        page_records = records[start:end]
+            rows = conn.execute(
+                f"SELECT {self.SUMMARY_COLUMNS} FROM records WHERE status = ? "
+                "ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+                (status, page_size, offset)
+            ).fetchall()
+            count_row = conn.execute(
+                "SELECT count FROM record_stats WHERE status = ?", (status,)
+            ).fetchone()
+            total = count_row["count"] if count_row else 0
+        else:
+            rows = conn.execute(
+                f"SELECT {self.SUMMARY_COLUMNS} FROM records "
+                "ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+                (page_size, offset)
+            ).fetchall()
+            total = conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM record_stats"
+            ).fetchone()[0]
 
         return {
-            "records": page_records,
+            "records": [dict(row) for row in rows],
             "total": total,
             "page": page,
             "page_size": page_size,
             "total_pages": (total + page_size - 1) // page_size
         }
 
-    def search_records(self, keyword: str) -> List[Dict]:
-        index = self._load_index()
-        records = index.get("records", [])
+    def search_records(self, keyword: str, page: int = 1, page_size: int = 20) -> Dict:
+        """
+        全文检索标题和大纲内容，按相关度排序并分页
 
-        keyword_lower = keyword.lower()
-        results = [
-            r for r in records
-            if keyword_lower in r.get("title", "").lower()
-        ]
+        Args:
+            keyword: 关键词（按子串匹配，多个词之间为 AND）
+            page: 页码
+            page_size: 每页数量
 
-        return results
+        Returns:
+            与 list_records 相同结构的分页结果
+        """
+        # 中文走 FTS5 索引；英文等单词在索引文本（已转小写）上按子串匹配，
+        # FTS5 只支持词前缀匹配，"atte" 找不到 "Latte"
+        query = build_match_query(keyword)
+        terms = substring_terms(keyword)
+        if query is None and not terms:
+            rows, total = [], 0
+        else:
+            conditions, params = [], []
+            if query is not None:
+                conditions.append("records_fts MATCH ?")
+                params.append(query)
+            for term in terms:
+                conditions.append("(f.title LIKE ? OR f.content LIKE ?)")
+                params.extend([f"%{term}%"] * 2)
+            where = " AND ".join(conditions)
+
+            if query is not None:
+                order = "bm25(records_fts, ?, 1.0), r.created_at DESC"
+                order_params = [self.SEARCH_TITLE_WEIGHT]
+            else:
+                # 没有中文时无法计算相关度，标题命中的排在前面
+                order = "(f.title LIKE ?) DESC, r.created_at DESC"
+                order_params = [f"%{terms[0]}%"]
+
+            conn = self.db.connection()
+            columns = ", ".join(f"r.{column.strip()}" for column in self.SUMMARY_COLUMNS.split(","))
+            rows = conn.execute(
+                f"SELECT {columns} FROM records_fts f JOIN records r ON r.rowid = f.rowid "
+                f"WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + order_params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+            total = conn.execute(
+                f"SELECT count(*) FROM records_fts f WHERE {where}", params
+            ).fetchone()[0]
 
-    def get_statistics(self) -> Dict:
-        index = self._load_index()
-        records = index.get("records", [])
+        return {
+            "records": [dict(row) for row in rows],
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size
+        }
 
-        total = len(records)
-        status_count = {}
+    def get_statistics(self) -> Dict:
+        rows = self.db.connection().execute(
+            "SELECT status, count FROM record_stats WHERE count > 0"
+        ).fetchall()
 
-        for record in records:
-            status = record.get("status", "draft")
-            status_count[status] = status_count.get(status, 0) + 1
+        status_count = {row["status"]: row["count"] for row in rows}
 
         return {
-            "total": total,
+            "total": sum(status_count.values()),
             "by_status": status_count
         }
 
+    # 批量同步时每次查询的 task_id 数量（低于 SQLite 变量个数上限）
+    SCAN_BATCH_SIZE = 500
+
+    @staticmethod
+    def _list_task_images(task_dir: str) -> List[str]:
+        """列出任务目录中的图片（排除缩略图），按页码排序"""
+        image_files = []
+        with os.scandir(task_dir) as entries:
+            for entry in entries:
+                filename = entry.name
+                # 跳过缩略图文件（以 thumb_ 开头）
+                if filename.startswith('thumb_'):
+                    continue
+                if filename.endswith('.png') or filename.endswith('.jpg') or filename.endswith('.jpeg'):
+                    image_files.append(filename)
+
+        # 按文件名排序（数字排序）
+        def get_index(filename):
+            try:
+                return int(filename.split('.')[0])
+            except:
+                return 999
+
+        image_files.sort(key=get_index)
+        return image_files
+
+    @staticmethod
+    def _images_status(actual_count: int, expected_count: int) -> str:
+        """根据图片数量判断记录状态"""
+        if actual_count == 0:
+            return "draft"
+        if actual_count >= expected_count:
+            return "completed"
+        return "partial"
+
+    def _find_records_by_task_ids(self, conn, task_ids: List[str]) -> Dict[str, Any]:
+        """
+        批量查找任务对应的记录（同一任务有多条记录时取最新的一条）
+
+        Returns:
+            task_id -> 记录行
+        """
+        records = {}
+        for start in range(0, len(task_ids), self.SCAN_BATCH_SIZE):
+            batch = task_ids[start:start + self.SCAN_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT id, task_id, page_count, status, thumbnail, images FROM records "
+                f"WHERE task_id IN ({placeholders}) ORDER BY created_at, rowid",
+                batch
+            ).fetchall()
+            for row in rows:
+                records[row["task_id"]] = row
+        return records
+
+    def get_task_status(self, task_id: str) -> Optional[str]:
+        """获取任务关联记录的状态（通过 task_id 索引，没有关联记录时返回 None）"""
+        row = self.db.connection().execute(
+            "SELECT status FROM records WHERE task_id = ? ORDER BY created_at DESC, rowid DESC LIMIT 1",
+            (task_id,)
+        ).fetchone()
+        return row["status"] if row else None
+
     def scan_and_sync_task_images(self, task_id: str) -> Dict[str, Any]:
         """
         扫描任务文件夹，同步图片列表
@@ -241,68 +478,38 @@ class HistoryService:
             }
 
         try:
-            # 扫描目录下所有图片文件（排除缩略图）
-            image_files = []
-            for filename in os.listdir(task_dir):
-                # 跳过缩略图文件（以 thumb_ 开头）
-                if filename.startswith('thumb_'):
-                    continue
-                if filename.endswith('.png') or filename.endswith('.jpg') or filename.endswith('.jpeg'):
-                    image_files.append(filename)
-
-            # 按文件名排序（数字排序）
-            def get_index(filename):
-                try:
-                    return int(filename.split('.')[0])
-                except:
-                    return 999
-
-            image_files.sort(key=get_index)
-
-            # 查找关联的历史记录
-            index = self._load_index()
-            record_id = None
-            for rec in index.get("records", []):
-                # 通过遍历所有记录，找到 task_id 匹配的记录
-                record_detail = self.get_record(rec["id"])
-                if record_detail and record_detail.get("images", {}).get("task_id") == task_id:
-                    record_id = rec["id"]
-                    break
-
-            if record_id:
-                # 更新历史记录
-                record = self.get_record(record_id)
-                if record:
-                    # 判断状态
-                    expected_count = len(record.get("outline", {}).get("pages", []))
-                    actual_count = len(image_files)
-
-                    if actual_count == 0:
-                        status = "draft"
-                    elif actual_count >= expected_count:
-                        status = "completed"
-                    else:
-                        status = "partial"
-
-                    # 更新图片列表和状态
-                    self.update_record(
-                        record_id,
-                        images={
-                            "task_id": task_id,
-                            "generated": image_files
-                        },
-                        status=status,
-                        thumbnail=image_files[0] if image_files else None
-                    )
-
-                    return {
-                        "success": True,
-                        "record_id": record_id,
+            image_files = self._list_task_images(task_dir)
+
+            # 通过 task_id 索引查找关联的历史记录
+            row = self.db.connection().execute(
+                "SELECT id, page_count FROM records WHERE task_id = ? "
+                "ORDER BY created_at DESC, rowid DESC LIMIT 1",
+                (task_id,)
+            ).fetchone()
+
+            if row:
+                record_id = row["id"]
+                status = self._images_status(len(image_files), row["page_count"])
+
+                # 更新图片列表和状态
+                self.update_record(
+                    record_id,
+                    images={
                         "task_id": task_id,
-                        "images_count": len(image_files),
-                        "images": image_files,
-                        "status": status
-                    }
+                        "generated": image_files
+                    },
+                    status=status,
+                    thumbnail=image_files[0] if image_files else None
+                )
+
+                return {
+                    "success": True,
+                    "record_id": record_id,
+                    "task_id": task_id,
+                    "images_count": len(image_files),
+                    "images": image_files,
+                    "status": status
+                }
 
             # 没有关联的记录，返回扫描结果
             return {
@@ -323,6 +530,9 @@ class HistoryService:
         """
         扫描所有任务文件夹，同步图片列表
 
+        只遍历一次 history 目录，按批次查询关联记录，
+        并在一个事务中只更新图片列表确实发生变化的记录。
+
         Returns:
             扫描结果统计
         """
@@ -338,28 +548,65 @@ class HistoryService:
             orphan_tasks = []  # 没有关联记录的任务
             results = []
 
-            # 遍历 history 目录
-            for item in os.listdir(self.history_dir):
-                item_path = os.path.join(self.history_dir, item)
-
-                # 只处理目录（任务文件夹）
-                if not os.path.isdir(item_path):
-                    continue
-
-                # 假设任务文件夹名就是 task_id
-                task_id = item
-
-                # 扫描并同步
-                result = self.scan_and_sync_task_images(task_id)
-                results.append(result)
-
-                if result.get("success"):
-                    if result.get("no_record"):
+            # 遍历 history 目录（只处理目录，假设任务文件夹名就是 task_id）
+            with os.scandir(self.history_dir) as entries:
+                task_ids = [entry.name for entry in entries if entry.is_dir()]
+
+            now = datetime.now().isoformat()
+            with self.db.transaction() as conn:
+                records = self._find_records_by_task_ids(conn, task_ids)
+
+                for task_id in task_ids:
+                    try:
+                        image_files = self._list_task_images(os.path.join(self.history_dir, task_id))
+                    except OSError as e:
+                        failed_count += 1
+                        results.append({
+                            "success": False,
+                            "error": f"扫描任务失败: {str(e)}"
+                        })
+                        continue
+
+                    row = records.get(task_id)
+                    if row is None:
                         orphan_tasks.append(task_id)
-                    else:
-                        synced_count += 1
-                else:
-                    failed_count += 1
+                        results.append({
+                            "success": True,
+                            "task_id": task_id,
+                            "images_count": len(image_files),
+                            "images": image_files,
+                            "no_record": True
+                        })
+                        continue
+
+                    status = self._images_status(len(image_files), row["page_count"])
+                    images = {
+                        "task_id": task_id,
+                        "generated": image_files
+                    }
+                    thumbnail = image_files[0] if image_files else row["thumbnail"]
+
+                    # 图片列表、状态、封面都没变化时跳过写入
+                    if (
+                        json.loads(row["images"]) != images
+                        or row["status"] != status
+                        or row["thumbnail"] != thumbnail
+                    ):
+                        conn.execute(
+                            "UPDATE records SET images = ?, status = ?, thumbnail = ?, updated_at = ? "
+                            "WHERE id = ?",
+                            (json.dumps(images, ensure_ascii=False), status, thumbnail, now, row["id"])
+                        )
+
+                    synced_count += 1
+                    results.append({
+                        "success": True,
+                        "record_id": row["id"],
+                        "task_id": task_id,
+                        "images_count": len(image_files),
+                        "images": image_files,
+                        "status": status
+                    })
 
             return {
                 "success": True,
@@ -0,0 +1,217 @@
+"""生成请求的幂等处理
+
+双击“生成”按钮、或者网络抖动后客户端重发请求，不应该再跑一遍同样的任务。
+/generate、/retry、/regenerate 按幂等键去重：
+
+- 幂等键优先使用客户端提供的 Idempotency-Key 请求头（或请求体中的 idempotency_key），
+  否则按请求内容（页面、大纲、参考图等）计算
+- 相同的请求正在执行时，重复请求等待它完成（或接上同一个后台任务的事件流）
+- 已经完成的请求直接返回保存的结果：客户端提供的幂等键保留 IDEMPOTENCY_TTL 秒，
+  按内容计算的幂等键只在完成后 IDEMPOTENCY_REPLAY_WINDOW 秒内有效（之后相同的内容视为有意重新生成）
+- 记录保存在 SQLite 中，多个 worker 进程共享
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.config import Config
+from backend.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+
+# 执行中的记录超过该时间（秒）没有完成，视为执行者已经退出
+PENDING_TIMEOUT = 600
+# 等待相同请求完成时的轮询间隔（秒）
+POLL_INTERVAL = 0.5
+
+
+def derive_idempotency_key(scope: str, material: Dict[str, Any]) -> str:
+    """
+    按请求内容计算幂等键
+
+    Args:
+        scope: 接口名称（不同接口的相同内容互不影响）
+        material: 决定结果的请求参数（参考图等二进制数据应先转换为哈希）
+
+    Returns:
+        幂等键
+    """
+    encoded = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+    return f"{scope}:auto:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+
+
+def client_idempotency_key(scope: str, key: str) -> str:
+    """客户端提供的幂等键（按接口区分）"""
+    return f"{scope}:key:{key}"
+
+
+def is_client_key(key: str) -> bool:
+    """是否为客户端提供的幂等键"""
+    return ":key:" in key
+
+
+class IdempotencyStore:
+    """幂等键记录（SQLite，线程和进程间共享）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            idem_key TEXT PRIMARY KEY,
+            task_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_idempotency_updated ON idempotency_keys(updated_at);
+    """
+
+    def __init__(self, db_path: str, ttl: float):
+        """
+        Args:
+            db_path: 数据库文件路径
+            ttl: 记录保留时间（秒）
+        """
+        self.db = SQLiteDatabase(db_path, self.SCHEMA)
+        self.ttl = ttl
+
+    @staticmethod
+    def _record(row) -> Dict[str, Any]:
+        return {
+            "key": row["idem_key"],
+            "task_id": row["task_id"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def reserve(self, key: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        占用幂等键
+
+        Args:
+            key: 幂等键
+            task_id: 本次请求对应的任务 ID
+
+        Returns:
+            已有的记录（status / task_id / result / updated_at）；键未被占用时记为执行中并返回 None
+        """
+        with self.db.transaction() as conn:
+            now = time.time()
+            conn.execute(
+                "DELETE FROM idempotency_keys WHERE updated_at < ? OR (status = ? AND updated_at < ?)",
+                (now - self.ttl, PENDING, now - PENDING_TIMEOUT)
+            )
+            row = conn.execute(
+                "SELECT * FROM idempotency_keys WHERE idem_key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                return self._record(row)
+            conn.execute(
+                "INSERT INTO idempotency_keys (idem_key, task_id, status, result, created_at, updated_at) "
+                "VALUES (?, ?, ?, NULL, ?, ?)",
+                (key, task_id, PENDING, now, now)
+            )
+        return None
+
+    def takeover(self, key: str, task_id: str):
+        """重新占用幂等键（已有的结果不能复用时，由新的请求执行）"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_keys "
+                "(idem_key, task_id, status, result, created_at, updated_at) VALUES (?, ?, ?, NULL, ?, ?)",
+                (key, task_id, PENDING, now, now)
+            )
+
+    def complete(self, key: str, result: Optional[Dict[str, Any]] = None):
+        """记录请求已完成及其结果"""
+        encoded = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE idempotency_keys SET status = ?, result = ?, updated_at = ? WHERE idem_key = ?",
+                (DONE, encoded, time.time(), key)
+            )
+
+    def release(self, key: str):
+        """释放幂等键（请求失败，允许重新执行）"""
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE idem_key = ?", (key,))
+
+    def wait(self, key: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待执行中的请求完成
+
+        Returns:
+            完成后的记录；请求失败（键被释放）或等待超时时返回 None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self.db.connection().execute(
+                "SELECT * FROM idempotency_keys WHERE idem_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == DONE:
+                return self._record(row)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def acquire(self, key: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        占用幂等键，相同的请求正在执行时等待它完成
+
+        Returns:
+            已完成的记录（由调用方判断能否复用，不能复用时调用 takeover；
+            等到了执行中请求的结果时带 waited=True）；
+            返回 None 表示本次请求占用了该键，执行后应调用 complete 或 release
+        """
+        record = self.reserve(key, task_id)
+        if record is None or record["status"] == DONE:
+            return record
+        logger.info(f"⏳ 相同的请求正在执行，等待其完成: task={record['task_id']}")
+        record = self.wait(key, Config.IDEMPOTENCY_WAIT_TIMEOUT)
+        if record is None:
+            self.takeover(key, task_id)
+            return None
+        record["waited"] = True
+        return record
+
+
+def is_replayable(key: str, record: Dict[str, Any], finished_at: float) -> bool:
+    """
+    已完成的结果能否直接返回
+
+    Args:
+        key: 幂等键
+        record: acquire 返回的记录
+        finished_at: 请求完成的时间戳
+    """
+    if is_client_key(key) or record.get("waited"):
+        return True
+    return time.time() - finished_at <= Config.IDEMPOTENCY_REPLAY_WINDOW
+
+
+_store_instance: Optional[IdempotencyStore] = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """获取全局幂等键记录"""
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None:
+            db_path = Config.IDEMPOTENCY_DB or os.path.join(
+                Path(__file__).parent.parent.parent, "history", "idempotency.db"
+            )
+            _store_instance = IdempotencyStore(db_path, Config.IDEMPOTENCY_TTL)
+        return _store_instance
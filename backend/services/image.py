@@ -1,14 +1,17 @@
 """图片生成服务"""
+import asyncio
 import logging
 import os
 import uuid
-import time
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, Any, Generator, List, Optional, Tuple
+from typing import Dict, Any, AsyncGenerator, AsyncIterator, Generator, List, Optional, Tuple
 from backend.config import Config
-from backend.generators.factory import ImageGeneratorFactory
-from backend.utils.image_compressor import compress_image
+from backend.generators.router import ImageProviderRouter, ProviderRoute
+from backend.services.derivatives import get_derivative_pipeline
+from backend.services.task_state import create_task_state_store
+from backend.utils.async_runner import get_async_runner
+from backend.utils.prompt_template import PromptTemplate
+from backend.utils.reference_images import get_reference_image
+from backend.utils.retry_policy import RetryBudget, RetryPolicy, RoutedRetryBudget
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +20,9 @@ class ImageService:
     """图片生成服务类"""
 
     # 并发配置
-    MAX_CONCURRENT = 15  # 最大并发数
-    AUTO_RETRY_COUNT = 3  # 自动重试次数
+    MAX_CONCURRENT = 15  # 单个任务的最大并发数（服务商的实际并发由自适应限制器控制）
+    AUTO_RETRY_COUNT = 3  # 单张图片最多尝试次数（生成器内部不再重试）
+    TASK_RETRY_BUDGET_PER_PAGE = 1  # 单个任务的重试预算：平均每页可重试的次数
 
     def __init__(self, provider_name: str = None):
         """
@@ -34,23 +38,28 @@ class ImageService:
             provider_name = Config.get_active_image_provider()
 
         logger.info(f"使用图片服务商: {provider_name}")
-        provider_config = Config.get_image_provider_config(provider_name)
 
-        # 创建生成器实例
-        provider_type = provider_config.get('type', provider_name)
+        # 创建服务商路由：激活的服务商为主线路，provider_pool 中的服务商和额外的 API Key 参与负载均衡。
+        # 每条线路有自己的生成器、自适应并发限制（根据延迟和 429/5xx 自动调整）和熔断器，所有任务共享
+        self.router = ImageProviderRouter.from_config(provider_name)
+        primary = self.router.primary
+        provider_type = primary.provider_type
         logger.debug(f"创建生成器: type={provider_type}")
-        self.generator = ImageGeneratorFactory.create(provider_type, provider_config)
+        self.generator = primary.generator
 
         # 保存配置信息
         self.provider_name = provider_name
-        self.provider_config = provider_config
+        self.provider_config = primary.config
+
+        # 统一重试策略（线路级重试预算在每次生成时按实际使用的线路申请，见 _agenerate_single_image）
+        self.retry_policy = RetryPolicy(max_attempts=self.AUTO_RETRY_COUNT)
 
         # 检查是否启用短 prompt 模式
-        self.use_short_prompt = provider_config.get('short_prompt', False)
+        self.use_short_prompt = self.provider_config.get('short_prompt', False)
 
-        # 加载提示词模板
-        self.prompt_template = self._load_prompt_template()
-        self.prompt_template_short = self._load_prompt_template(short=True)
+        # 加载提示词模板（预解析，渲染结果会被缓存）
+        self.prompt_template = PromptTemplate(self._load_prompt_template())
+        self.prompt_template_short = PromptTemplate(self._load_prompt_template(short=True))
 
         # 历史记录根目录
         self.history_root_dir = os.path.join(
@@ -59,11 +68,11 @@ class ImageService:
         )
         os.makedirs(self.history_root_dir, exist_ok=True)
 
-        # 当前任务的输出目录（每个任务一个子文件夹）
-        self.current_task_dir = None
+        # 任务状态存储（用于重试，持久化且可在多个 worker 间共享）
+        self.task_states = create_task_state_store(self.history_root_dir)
 
-        # 存储任务状态（用于重试）
-        self._task_states: Dict[str, Dict] = {}
+        # 缩略图等衍生文件在后台生成
+        self.derivatives = get_derivative_pipeline()
 
         logger.info(f"ImageService 初始化完成: provider={provider_name}, type={provider_type}")
 
@@ -81,39 +90,196 @@ class ImageService:
         with open(prompt_path, "r", encoding="utf-8") as f:
             return f.read()
 
-    def _save_image(self, image_data: bytes, filename: str, task_dir: str = None) -> str:
+    def _save_image(self, image_data: bytes, filename: str, task_dir: str) -> str:
         """
-        保存图片到本地，同时生成缩略图
+        保存原图到本地（缩略图由衍生文件流水线在后台生成）
 
         Args:
             image_data: 图片二进制数据
             filename: 文件名
-            task_dir: 任务目录（如果为None则使用当前任务目录）
+            task_dir: 任务目录
 
         Returns:
             保存的文件路径
         """
-        if task_dir is None:
-            task_dir = self.current_task_dir
-
-        if task_dir is None:
-            raise ValueError("任务目录未设置")
+        # 删除旧的缩略图（重新生成时），新缩略图完成前图片接口返回原图
+        self.derivatives.invalidate(task_dir, filename)
 
-        # 保存原图
+        # 保存原图（先写临时文件再替换，磁盘上的图片总是完整的，可作为断点续跑的依据）
         filepath = os.path.join(task_dir, filename)
-        with open(filepath, "wb") as f:
+        tmp_path = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as f:
             f.write(image_data)
-
-        # 生成缩略图（50KB左右）
-        thumbnail_data = compress_image(image_data, max_size_kb=50)
-        thumbnail_filename = f"thumb_{filename}"
-        thumbnail_path = os.path.join(task_dir, thumbnail_filename)
-        with open(thumbnail_path, "wb") as f:
-            f.write(thumbnail_data)
+        os.replace(tmp_path, filepath)
 
         return filepath
 
-    def _generate_single_image(
+    @staticmethod
+    def _existing_pages(task_dir: str, pages: List[Dict]) -> Dict[int, str]:
+        """任务目录中已经生成的页面（断点续跑时跳过）"""
+        existing = {}
+        for page in pages:
+            filename = f"{page['index']}.png"
+            if os.path.exists(os.path.join(task_dir, filename)):
+                existing[page["index"]] = filename
+        return existing
+
+    async def _await_thumbnail(
+        self,
+        task_id: str,
+        task_dir: str,
+        index: int,
+        filename: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        等待页面的缩略图生成完成
+
+        Returns:
+            thumbnail_ready 事件；缩略图生成失败或被新的生成覆盖时返回 None
+        """
+        future = self.derivatives.pending(task_dir, filename)
+        if future is not None:
+            try:
+                await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    return None
+                raise
+            except Exception:
+                return None
+        elif not os.path.exists(os.path.join(task_dir, f"thumb_{filename}")):
+            return None
+
+        return {
+            "event": "thumbnail_ready",
+            "data": {
+                "index": index,
+                "thumbnail_url": f"/api/images/{task_id}/{filename}?thumbnail=true"
+            }
+        }
+
+    @staticmethod
+    def _ready_thumbnail_events(thumbnail_tasks: List["asyncio.Task"]) -> List[Dict[str, Any]]:
+        """取出已完成的缩略图事件（从列表中移除已完成的任务）"""
+        ready = [task for task in thumbnail_tasks if task.done()]
+        for task in ready:
+            thumbnail_tasks.remove(task)
+        return [task.result() for task in ready if not task.cancelled() and task.result()]
+
+    def _render_prompt(
+        self,
+        page: Dict,
+        full_outline: str = "",
+        user_topic: str = "",
+        short_prompt: Optional[bool] = None
+    ) -> str:
+        """
+        渲染单页提示词
+
+        大纲和用户需求对同一任务的所有页面都一样，先填入模板并缓存，
+        每页只需插入页面内容；相同页面（自动重试、手动重试）直接返回缓存结果。
+
+        Args:
+            page: 页面数据
+            full_outline: 完整的大纲文本
+            user_topic: 用户原始输入
+            short_prompt: 是否使用短 prompt（None 时使用主服务商的配置）
+
+        Returns:
+            提示词
+        """
+        if short_prompt is None:
+            short_prompt = self.use_short_prompt
+
+        # 根据配置选择模板（短 prompt 或完整 prompt）
+        if short_prompt and self.prompt_template_short:
+            # 短 prompt 模式：只包含页面类型和内容
+            prompt = self.prompt_template_short.render(
+                page_content=page["content"],
+                page_type=page["type"]
+            )
+            logger.debug(f"  使用短 prompt 模式 ({len(prompt)} 字符)")
+            return prompt
+
+        # 完整 prompt 模式：包含大纲和用户需求
+        task_template = self.prompt_template.partial(
+            full_outline=full_outline,
+            user_topic=user_topic if user_topic else "未提供"
+        )
+        return task_template.render(
+            page_content=page["content"],
+            page_type=page["type"]
+        )
+
+    def _build_generator_kwargs(
+        self,
+        prompt: str,
+        reference_image: Optional[bytes] = None,
+        user_images: Optional[List[bytes]] = None,
+        provider_config: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        根据服务商类型构建生成器调用参数
+
+        Args:
+            prompt: 提示词
+            reference_image: 参考图片（封面图）
+            user_images: 用户上传的参考图片列表
+            provider_config: 服务商配置（None 时使用主服务商的配置）
+
+        Returns:
+            generate_image / agenerate_image 的关键字参数
+        """
+        if provider_config is None:
+            provider_config = self.provider_config
+        provider_type = provider_config.get('type')
+
+        if provider_type == 'google_genai':
+            logger.debug(f"  使用 Google GenAI 生成器")
+            return {
+                "prompt": prompt,
+                "aspect_ratio": provider_config.get('default_aspect_ratio', '3:4'),
+                "temperature": provider_config.get('temperature', 1.0),
+                "model": provider_config.get('model', 'gemini-3-pro-image-preview'),
+                "reference_image": reference_image,
+            }
+
+        if provider_type in ('image_api', 'jimeng'):
+            # Image API / 即梦 API 支持多张参考图片
+            # 组合参考图片：用户上传的图片 + 封面图
+            reference_images = []
+            if user_images:
+                reference_images.extend(user_images)
+            if reference_image:
+                reference_images.append(reference_image)
+
+            if provider_type == 'image_api':
+                logger.debug(f"  使用 Image API 生成器")
+                return {
+                    "prompt": prompt,
+                    "aspect_ratio": provider_config.get('default_aspect_ratio', '3:4'),
+                    "temperature": provider_config.get('temperature', 1.0),
+                    "model": provider_config.get('model', 'nano-banana-2'),
+                    "reference_images": reference_images if reference_images else None,
+                }
+
+            logger.debug(f"  使用即梦生成器")
+            return {
+                "prompt": prompt,
+                "size": provider_config.get('default_size', '1536x864'),
+                "model": provider_config.get('model', 'jimeng-4.5'),
+                "reference_images": reference_images if reference_images else None,
+            }
+
+        logger.debug(f"  使用 OpenAI 兼容生成器")
+        return {
+            "prompt": prompt,
+            "size": provider_config.get('default_size', '1024x1024'),
+            "model": provider_config.get('model'),
+            "quality": provider_config.get('quality', 'standard'),
+        }
+
+    async def _agenerate_single_image(
         self,
         page: Dict,
         task_id: str,
@@ -121,10 +287,16 @@ class ImageService:
         retry_count: int = 0,
         full_outline: str = "",
         user_images: Optional[List[bytes]] = None,
-        user_topic: str = ""
-    ) -> Tuple[int, bool, Optional[str], Optional[str]]:
+        user_topic: str = "",
+        task_dir: Optional[str] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        hedge_budget: Optional[RetryBudget] = None
+    ) -> Tuple[int, bool, Optional[str], Optional[str], Optional[str]]:
         """
-        生成单张图片（带自动重试）
+        生成单张图片（按统一重试策略自动重试，在事件循环中运行）
+
+        每次尝试由服务商路由选择线路，重试时优先避开失败过的线路；
+        启用对冲时，过慢的请求会在另一条线路上再发一次。
 
         Args:
             page: 页面数据
@@ -134,130 +306,140 @@ class ImageService:
             full_outline: 完整的大纲文本
             user_images: 用户上传的参考图片列表
             user_topic: 用户原始输入
+            task_dir: 任务目录（为None时根据 task_id 推导）
+            retry_budget: 任务级重试预算（可选）
+            hedge_budget: 任务级对冲预算（可选，None 表示不对冲）
 
         Returns:
-            (index, success, filename, error_message)
+            (index, success, filename, error_message, provider)，provider 为生成该图片的线路名称
         """
         index = page["index"]
         page_type = page["type"]
-        page_content = page["content"]
-
-        max_retries = self.AUTO_RETRY_COUNT
-
-        for attempt in range(max_retries):
-            try:
-                logger.debug(f"生成图片 [{index}]: type={page_type}, attempt={attempt + 1}/{max_retries}")
-
-                # 根据配置选择模板（短 prompt 或完整 prompt）
-                if self.use_short_prompt and self.prompt_template_short:
-                    # 短 prompt 模式：只包含页面类型和内容
-                    prompt = self.prompt_template_short.format(
-                        page_content=page_content,
-                        page_type=page_type
-                    )
-                    logger.debug(f"  使用短 prompt 模式 ({len(prompt)} 字符)")
-                else:
-                    # 完整 prompt 模式：包含大纲和用户需求
-                    prompt = self.prompt_template.format(
-                        page_content=page_content,
-                        page_type=page_type,
-                        full_outline=full_outline,
-                        user_topic=user_topic if user_topic else "未提供"
-                    )
-
-                # 调用生成器生成图片
-                if self.provider_config.get('type') == 'google_genai':
-                    logger.debug(f"  使用 Google GenAI 生成器")
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        aspect_ratio=self.provider_config.get('default_aspect_ratio', '3:4'),
-                        temperature=self.provider_config.get('temperature', 1.0),
-                        model=self.provider_config.get('model', 'gemini-3-pro-image-preview'),
-                        reference_image=reference_image,
-                    )
-                elif self.provider_config.get('type') == 'image_api':
-                    logger.debug(f"  使用 Image API 生成器")
-                    # Image API 支持多张参考图片
-                    # 组合参考图片：用户上传的图片 + 封面图
-                    reference_images = []
-                    if user_images:
-                        reference_images.extend(user_images)
-                    if reference_image:
-                        reference_images.append(reference_image)
-
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        aspect_ratio=self.provider_config.get('default_aspect_ratio', '3:4'),
-                        temperature=self.provider_config.get('temperature', 1.0),
-                        model=self.provider_config.get('model', 'nano-banana-2'),
-                        reference_images=reference_images if reference_images else None,
-                    )
-                elif self.provider_config.get('type') == 'jimeng':
-                    logger.debug(f"  使用即梦生成器")
-                    # 即梦 API 支持多张参考图片
-                    # 组合参考图片：用户上传的图片 + 封面图
-                    reference_images = []
-                    if user_images:
-                        reference_images.extend(user_images)
-                    if reference_image:
-                        reference_images.append(reference_image)
-
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        size=self.provider_config.get('default_size', '1536x864'),
-                        model=self.provider_config.get('model', 'jimeng-4.5'),
-                        reference_images=reference_images if reference_images else None,
-                    )
-                else:
-                    logger.debug(f"  使用 OpenAI 兼容生成器")
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        size=self.provider_config.get('default_size', '1024x1024'),
-                        model=self.provider_config.get('model'),
-                        quality=self.provider_config.get('quality', 'standard'),
-                    )
 
-                # 保存图片（使用当前任务目录）
-                filename = f"{index}.png"
-                self._save_image(image_data, filename, self.current_task_dir)
-                logger.info(f"✅ 图片 [{index}] 生成成功: {filename}")
+        if task_dir is None:
+            task_dir = os.path.join(self.history_root_dir, task_id)
+
+        # 重试由失败所在线路的预算承担（线路级预算由所有任务共享）
+        route_budget = RoutedRetryBudget()
+        policy = self.retry_policy.with_budgets(route_budget, retry_budget)
+        # 生成参数在重试之间不变，每个服务商只构建一次
+        generator_kwargs: Dict[str, Dict[str, Any]] = {}
+        failed_routes = set()
+        attempt = 0
+
+        async def call(route: ProviderRoute) -> bytes:
+            route_budget.use(route.retry_budget)
+            kwargs = generator_kwargs.get(route.provider_name)
+            if kwargs is None:
+                prompt = self._render_prompt(
+                    page, full_outline, user_topic,
+                    short_prompt=route.config.get('short_prompt', False)
+                )
+                kwargs = self._build_generator_kwargs(prompt, reference_image, user_images, route.config)
+                generator_kwargs[route.provider_name] = kwargs
+            return await route.generator.agenerate_image(**kwargs)
+
+        async def generate_once() -> Tuple[str, str]:
+            nonlocal attempt
+            attempt += 1
+            logger.debug(f"生成图片 [{index}]: type={page_type}, attempt={attempt}/{policy.max_attempts}")
+
+            # 由路由选择线路调用生成器（熔断的线路跳过；占用该线路的并发名额）
+            image_data, route = await self.router.agenerate(call, failed_routes, hedge_budget)
+
+            # 保存原图（文件写入放到线程中，避免阻塞事件循环），缩略图交给后台生成
+            filename = f"{index}.png"
+            await asyncio.to_thread(self._save_image, image_data, filename, task_dir)
+            self.derivatives.submit(task_dir, filename)
+            return filename, route.name
+
+        try:
+            filename, provider = await policy.arun(generate_once, label=f"图片 [{index}]")
+        except Exception as e:
+            logger.error(f"❌ 图片 [{index}] 生成失败（共尝试 {attempt} 次）: {str(e)[:200]}")
+            return (index, False, None, str(e), None)
+
+        logger.info(f"✅ 图片 [{index}] 生成成功: {filename} (服务商: {provider})")
+        return (index, True, filename, None, provider)
 
-                return (index, True, filename, None)
+    def _generate_single_image(
+        self,
+        page: Dict,
+        task_id: str,
+        reference_image: Optional[bytes] = None,
+        retry_count: int = 0,
+        full_outline: str = "",
+        user_images: Optional[List[bytes]] = None,
+        user_topic: str = "",
+        task_dir: Optional[str] = None
+    ) -> Tuple[int, bool, Optional[str], Optional[str], Optional[str]]:
+        """
+        生成单张图片（同步接口，在后台事件循环中执行 _agenerate_single_image）
 
-            except Exception as e:
-                error_msg = str(e)
-                logger.warning(f"图片 [{index}] 生成失败 (尝试 {attempt + 1}/{max_retries}): {error_msg[:200]}")
+        Returns:
+            (index, success, filename, error_message, provider)
+        """
+        return get_async_runner().run(self._agenerate_single_image(
+            page, task_id, reference_image, retry_count,
+            full_outline, user_images, user_topic, task_dir
+        ))
 
-                if attempt < max_retries - 1:
-                    # 等待后重试
-                    wait_time = 2 ** attempt
-                    logger.debug(f"  等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
-                    continue
+    def generate_images(
+        self,
+        pages: list,
+        task_id: str = None,
+        full_outline: str = "",
+        user_images: Optional[List[bytes]] = None,
+        user_topic: str = "",
+        resume: bool = False
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        生成图片（同步生成器，支持 SSE 流式返回）
 
-                logger.error(f"❌ 图片 [{index}] 生成失败，已达最大重试次数")
-                return (index, False, None, error_msg)
+        实际的生成流程在后台事件循环中由 agenerate_images 执行，
+        这里只负责把事件逐个转交给调用方。
 
-        return (index, False, None, "超过最大重试次数")
+        Args:
+            pages: 页面列表
+            task_id: 任务 ID（可选）
+            full_outline: 完整的大纲文本（用于保持风格一致）
+            user_images: 用户上传的参考图片列表（可选）
+            user_topic: 用户原始输入（用于保持意图一致）
+            resume: 是否从断点续跑（跳过任务目录中已有的页面）
 
-    def generate_images(
+        Yields:
+            进度事件字典
+        """
+        yield from get_async_runner().iterate(self.agenerate_images(
+            pages, task_id, full_outline,
+            user_images=user_images,
+            user_topic=user_topic,
+            resume=resume
+        ))
+
+    async def agenerate_images(
         self,
         pages: list,
         task_id: str = None,
         full_outline: str = "",
         user_images: Optional[List[bytes]] = None,
-        user_topic: str = ""
-    ) -> Generator[Dict[str, Any], None, None]:
+        user_topic: str = "",
+        resume: bool = False
+    ) -> AsyncGenerator[Dict[str, Any], None]:
         """
-        生成图片（生成器，支持 SSE 流式返回）
+        生成图片（异步生成器）
         优化版本：先生成封面，然后并发生成其他页面
 
+        所有页面在同一个事件循环中以协程方式并发执行，
+        不再为每个页面占用一个线程。
+
         Args:
             pages: 页面列表
             task_id: 任务 ID（可选）
             full_outline: 完整的大纲文本（用于保持风格一致）
             user_images: 用户上传的参考图片列表（可选）
             user_topic: 用户原始输入（用于保持意图一致）
+            resume: 是否从断点续跑（任务目录中已有的页面直接视为完成，不再生成）
 
         Yields:
             进度事件字典
@@ -268,30 +450,39 @@ class ImageService:
         logger.info(f"开始图片生成任务: task_id={task_id}, pages={len(pages)}")
 
         # 创建任务专属目录
-        self.current_task_dir = os.path.join(self.history_root_dir, task_id)
-        os.makedirs(self.current_task_dir, exist_ok=True)
-        logger.debug(f"任务目录: {self.current_task_dir}")
+        task_dir = os.path.join(self.history_root_dir, task_id)
+        os.makedirs(task_dir, exist_ok=True)
+        logger.debug(f"任务目录: {task_dir}")
 
         total = len(pages)
         generated_images = []
+        # 整个任务共享的重试预算，避免服务商出问题时每页都重试满次数
+        retry_budget = RetryBudget.fixed(total * self.TASK_RETRY_BUDGET_PER_PAGE)
+        # 对冲请求的额外请求数同样按任务限制（未启用对冲时为 None）
+        hedge_budget = self.router.hedge.task_budget(total)
+        thumbnail_tasks: List[asyncio.Task] = []
         failed_pages = []
         cover_image_data = None
 
         # 压缩用户上传的参考图到200KB以内（减少内存和传输开销）
         compressed_user_images = None
         if user_images:
-            compressed_user_images = [compress_image(img, max_size_kb=200) for img in user_images]
+            compressed_user_images = await asyncio.to_thread(
+                lambda: [get_reference_image(img, max_size_kb=200).data for img in user_images]
+            )
 
         # 初始化任务状态
-        self._task_states[task_id] = {
-            "pages": pages,
-            "generated": {},
-            "failed": {},
-            "cover_image": None,
-            "full_outline": full_outline,
-            "user_images": compressed_user_images,
-            "user_topic": user_topic
-        }
+        await asyncio.to_thread(
+            self.task_states.create,
+            task_id, pages, full_outline, user_topic, compressed_user_images
+        )
+
+        # 断点续跑：任务目录中已有的页面直接视为完成
+        existing: Dict[int, str] = {}
+        if resume:
+            existing = await asyncio.to_thread(self._existing_pages, task_dir, pages)
+            if existing:
+                logger.info(f"♻️ 断点续跑: 跳过已生成的 {len(existing)} 页")
 
         # ==================== 第一阶段：生成封面 ====================
         cover_page = None
@@ -308,7 +499,15 @@ class ImageService:
             cover_page = pages[0]
             other_pages = pages[1:]
 
-        if cover_page:
+        if cover_page and cover_page["index"] in existing:
+            filename = existing[cover_page["index"]]
+            generated_images.append(filename)
+            cover_image_data = await asyncio.to_thread(
+                self._load_compressed_cover, os.path.join(task_dir, filename)
+            )
+            await asyncio.to_thread(self.task_states.set_cover, task_id, cover_image_data)
+            yield await self._resumed_page_event(task_id, task_dir, cover_page["index"], filename, "cover", thumbnail_tasks)
+        elif cover_page:
             # 发送封面生成进度
             yield {
                 "event": "progress",
@@ -323,23 +522,26 @@ class ImageService:
             }
 
             # 生成封面（使用用户上传的图片作为参考）
-            index, success, filename, error = self._generate_single_image(
+            index, success, filename, error, provider = await self._agenerate_single_image(
                 cover_page, task_id, reference_image=None, full_outline=full_outline,
-                user_images=compressed_user_images, user_topic=user_topic
+                user_images=compressed_user_images, user_topic=user_topic,
+                task_dir=task_dir, retry_budget=retry_budget, hedge_budget=hedge_budget
             )
 
             if success:
                 generated_images.append(filename)
-                self._task_states[task_id]["generated"][index] = filename
+                await asyncio.to_thread(self.task_states.mark_generated, task_id, index, filename, provider)
+                thumbnail_tasks.append(asyncio.create_task(
+                    self._await_thumbnail(task_id, task_dir, index, filename)
+                ))
 
                 # 读取封面图片作为参考，并立即压缩到200KB以内
-                cover_path = os.path.join(self.current_task_dir, filename)
-                with open(cover_path, "rb") as f:
-                    cover_image_data = f.read()
-
-                # 压缩封面图（减少内存占用和后续传输开销）
-                cover_image_data = compress_image(cover_image_data, max_size_kb=200)
-                self._task_states[task_id]["cover_image"] = cover_image_data
+                # （减少内存占用和后续传输开销）
+                cover_path = os.path.join(task_dir, filename)
+                cover_image_data = await asyncio.to_thread(
+                    self._load_compressed_cover, cover_path
+                )
+                await asyncio.to_thread(self.task_states.set_cover, task_id, cover_image_data)
 
                 yield {
                     "event": "complete",
@@ -347,12 +549,13 @@ class ImageService:
                         "index": index,
                         "status": "done",
                         "image_url": f"/api/images/{task_id}/{filename}",
+                        "provider": provider,
                         "phase": "cover"
                     }
                 }
             else:
                 failed_pages.append(cover_page)
-                self._task_states[task_id]["failed"][index] = error
+                await asyncio.to_thread(self.task_states.mark_failed, task_id, index, error)
 
                 yield {
                     "event": "error",
@@ -366,9 +569,15 @@ class ImageService:
                 }
 
         # ==================== 第二阶段：生成其他页面 ====================
+        for page in [p for p in other_pages if p["index"] in existing]:
+            filename = existing[page["index"]]
+            generated_images.append(filename)
+            yield await self._resumed_page_event(task_id, task_dir, page["index"], filename, "content", thumbnail_tasks)
+        other_pages = [p for p in other_pages if p["index"] not in existing]
+
         if other_pages:
-            # 检查是否启用高并发模式
-            high_concurrency = self.provider_config.get('high_concurrency', False)
+            # 检查是否启用高并发模式（有多条线路时总是并发，每条线路的并发由各自的限制器控制）
+            high_concurrency = self.provider_config.get('high_concurrency', False) or len(self.router.routes) > 1
 
             if high_concurrency:
                 # 高并发模式：并行生成
@@ -383,23 +592,29 @@ class ImageService:
                     }
                 }
 
-                # 使用线程池并发生成
-                with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT) as executor:
-                    # 提交所有任务
-                    future_to_page = {
-                        executor.submit(
-                            self._generate_single_image,
-                            page,
-                            task_id,
-                            cover_image_data,  # 使用封面作为参考
-                            0,  # retry_count
-                            full_outline,  # 传入完整大纲
-                            compressed_user_images,  # 用户上传的参考图片（已压缩）
-                            user_topic  # 用户原始输入
-                        ): page
-                        for page in other_pages
-                    }
+                # 用信号量限制单个任务的并发数
+                semaphore = asyncio.Semaphore(self.MAX_CONCURRENT)
 
+                async def generate_page(page: Dict):
+                    async with semaphore:
+                        try:
+                            return page, await self._agenerate_single_image(
+                                page,
+                                task_id,
+                                cover_image_data,  # 使用封面作为参考
+                                0,  # retry_count
+                                full_outline,  # 传入完整大纲
+                                compressed_user_images,  # 用户上传的参考图片（已压缩）
+                                user_topic,  # 用户原始输入
+                                task_dir,
+                                retry_budget=retry_budget,
+                                hedge_budget=hedge_budget
+                            )
+                        except Exception as e:
+                            return page, (page["index"], False, None, str(e), None)
+
+                tasks = [asyncio.create_task(generate_page(page)) for page in other_pages]
+                try:
                     # 发送每个页面的进度
                     for page in other_pages:
                         yield {
@@ -413,55 +628,48 @@ class ImageService:
                             }
                         }
 
-                    # 收集结果
-                    for future in as_completed(future_to_page):
-                        page = future_to_page[future]
-                        try:
-                            index, success, filename, error = future.result()
-
-                            if success:
-                                generated_images.append(filename)
-                                self._task_states[task_id]["generated"][index] = filename
-
-                                yield {
-                                    "event": "complete",
-                                    "data": {
-                                        "index": index,
-                                        "status": "done",
-                                        "image_url": f"/api/images/{task_id}/{filename}",
-                                        "phase": "content"
-                                    }
-                                }
-                            else:
-                                failed_pages.append(page)
-                                self._task_states[task_id]["failed"][index] = error
-
-                                yield {
-                                    "event": "error",
-                                    "data": {
-                                        "index": index,
-                                        "status": "error",
-                                        "message": error,
-                                        "retryable": True,
-                                        "phase": "content"
-                                    }
-                                }
+                    # 按完成顺序收集结果
+                    for next_done in asyncio.as_completed(tasks):
+                        page, (index, success, filename, error, provider) = await next_done
 
-                        except Exception as e:
+                        for event in self._ready_thumbnail_events(thumbnail_tasks):
+                            yield event
+
+                        if success:
+                            generated_images.append(filename)
+                            await asyncio.to_thread(self.task_states.mark_generated, task_id, index, filename, provider)
+                            thumbnail_tasks.append(asyncio.create_task(
+                                self._await_thumbnail(task_id, task_dir, index, filename)
+                            ))
+
+                            yield {
+                                "event": "complete",
+                                "data": {
+                                    "index": index,
+                                    "status": "done",
+                                    "image_url": f"/api/images/{task_id}/{filename}",
+                                    "provider": provider,
+                                    "phase": "content"
+                                }
+                            }
+                        else:
                             failed_pages.append(page)
-                            error_msg = str(e)
-                            self._task_states[task_id]["failed"][page["index"]] = error_msg
+                            await asyncio.to_thread(self.task_states.mark_failed, task_id, index, error)
 
                             yield {
                                 "event": "error",
                                 "data": {
-                                    "index": page["index"],
+                                    "index": index,
                                     "status": "error",
-                                    "message": error_msg,
+                                    "message": error,
                                     "retryable": True,
                                     "phase": "content"
                                 }
                             }
+                finally:
+                    # 调用方提前结束（如客户端断开）时取消未完成的页面
+                    for task in tasks:
+                        task.cancel()
             else:
                 # 顺序模式：逐个生成
                 yield {
@@ -489,19 +697,28 @@ class ImageService:
                     }
 
                     # 生成单张图片
-                    index, success, filename, error = self._generate_single_image(
+                    index, success, filename, error, provider = await self._agenerate_single_image(
                         page,
                         task_id,
                         cover_image_data,
                         0,
                         full_outline,
                         compressed_user_images,
-                        user_topic
+                        user_topic,
+                        task_dir,
+                        retry_budget=retry_budget,
+                        hedge_budget=hedge_budget
                     )
 
+                    for event in self._ready_thumbnail_events(thumbnail_tasks):
+                        yield event
+
                     if success:
                         generated_images.append(filename)
-                        self._task_states[task_id]["generated"][index] = filename
+                        await asyncio.to_thread(self.task_states.mark_generated, task_id, index, filename, provider)
+                        thumbnail_tasks.append(asyncio.create_task(
+                            self._await_thumbnail(task_id, task_dir, index, filename)
+                        ))
 
                         yield {
                             "event": "complete",
@@ -509,12 +726,13 @@ class ImageService:
                                 "index": index,
                                 "status": "done",
                                 "image_url": f"/api/images/{task_id}/{filename}",
+                                "provider": provider,
                                 "phase": "content"
                             }
                         }
                     else:
                         failed_pages.append(page)
-                        self._task_states[task_id]["failed"][index] = error
+                        await asyncio.to_thread(self.task_states.mark_failed, task_id, index, error)
 
                         yield {
                             "event": "error",
@@ -527,6 +745,12 @@ class ImageService:
                             }
                         }
 
+        # 等待剩余的缩略图生成完成
+        if thumbnail_tasks:
+            await asyncio.wait(thumbnail_tasks)
+        for event in self._ready_thumbnail_events(thumbnail_tasks):
+            yield event
+
         # ==================== 完成 ====================
         yield {
             "event": "finish",
@@ -541,6 +765,275 @@ class ImageService:
             }
         }
 
+    async def agenerate_images_pipelined(
+        self,
+        outline_events: AsyncIterator[Dict[str, Any]],
+        task_id: str,
+        user_images: Optional[List[bytes]] = None,
+        user_topic: str = ""
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        边生成大纲边生成图片（一键生成模式）
+
+        outline_events 为 OutlineService.generate_outline_stream 的事件（page / finish / error）：
+        - 封面页（type 为 cover，没有时使用第一页，与 agenerate_images 相同）解析出来后立即开始生成，
+          不等整份大纲；第一页不是封面时先保留，直到出现封面页或大纲结束
+        - 其余页面每解析出一页就排队，封面完成后以封面为参考图并发生成
+        - 每页提示词中的大纲是该页及之前已经解析出的部分；大纲完成后写入任务状态，
+          重试、重新生成时使用完整大纲
+        - 大纲生成失败时停止还未完成的页面
+
+        Args:
+            outline_events: 大纲流式事件
+            task_id: 任务 ID
+            user_images: 用户上传的参考图片列表（可选）
+            user_topic: 用户原始输入
+
+        Yields:
+            进度事件字典：outline_page（一页大纲）、outline（大纲完成）、outline_error（大纲失败），
+            以及与 agenerate_images 相同的 progress / complete / error / thumbnail_ready / finish
+        """
+        logger.info(f"开始一键生成任务: task_id={task_id}")
+
+        task_dir = os.path.join(self.history_root_dir, task_id)
+        os.makedirs(task_dir, exist_ok=True)
+
+        pages: List[Dict] = []
+        generated_images = []
+        failed_pages = []
+        thumbnail_tasks: List[asyncio.Task] = []
+        page_tasks: List[asyncio.Task] = []
+        # 页数事先未知，每解析出一页追加一份重试预算
+        retry_budget = RetryBudget.fixed(0)
+        hedge_budget = self.router.hedge.task_budget(0)
+        cover_done = asyncio.Event()
+        cover_image_data: Optional[bytes] = None
+        outline_error: Optional[str] = None
+        # 封面是否已经确定，以及确定前暂存的第一页（可能作为封面）
+        cover_chosen = False
+        first_page: Optional[Tuple[Dict, str]] = None
+        events: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+        compressed_user_images = None
+        if user_images:
+            compressed_user_images = await asyncio.to_thread(
+                lambda: [get_reference_image(img, max_size_kb=200).data for img in user_images]
+            )
+
+        # 先建立任务状态，大纲完成后再补上页面列表
+        await asyncio.to_thread(
+            self.task_states.create,
+            task_id, [], "", user_topic, compressed_user_images
+        )
+
+        high_concurrency = self.provider_config.get('high_concurrency', False) or len(self.router.routes) > 1
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT if high_concurrency else 1)
+
+        async def generate_page(page: Dict, outline_so_far: str, is_cover: bool):
+            nonlocal cover_image_data
+            phase = "cover" if is_cover else "content"
+            try:
+                if not is_cover:
+                    # 内容页以封面为参考图
+                    await cover_done.wait()
+                async with semaphore:
+                    await events.put({
+                        "event": "progress",
+                        "data": {
+                            "index": page["index"],
+                            "status": "generating",
+                            "current": len(generated_images) + 1,
+                            "total": len(pages),
+                            "phase": phase
+                        }
+                    })
+                    try:
+                        index, success, filename, error, provider = await self._agenerate_single_image(
+                            page, task_id,
+                            None if is_cover else cover_image_data,
+                            0,
+                            outline_so_far,
+                            compressed_user_images,
+                            user_topic,
+                            task_dir,
+                            retry_budget=retry_budget,
+                            hedge_budget=hedge_budget
+                        )
+                    except Exception as e:
+                        index, success, filename, error, provider = page["index"], False, None, str(e), None
+
+                    if success:
+                        generated_images.append(filename)
+                        await asyncio.to_thread(self.task_states.mark_generated, task_id, index, filename, provider)
+                        if is_cover:
+                            cover_image_data = await asyncio.to_thread(
+                                self._load_compressed_cover, os.path.join(task_dir, filename)
+                            )
+                            await asyncio.to_thread(self.task_states.set_cover, task_id, cover_image_data)
+                        await events.put({
+                            "event": "complete",
+                            "data": {
+                                "index": index,
+                                "status": "done",
+                                "image_url": f"/api/images/{task_id}/{filename}",
+                                "provider": provider,
+                                "phase": phase
+                            }
+                        })
+                    else:
+                        failed_pages.append(page)
+                        await asyncio.to_thread(self.task_states.mark_failed, task_id, index, error)
+                        await events.put({
+                            "event": "error",
+                            "data": {
+                                "index": index,
+                                "status": "error",
+                                "message": error,
+                                "retryable": True,
+                                "phase": phase
+                            }
+                        })
+            finally:
+                if is_cover:
+                    cover_done.set()
+
+        def start_page(page: Dict, outline_so_far: str, is_cover: bool):
+            page_tasks.append(asyncio.create_task(generate_page(page, outline_so_far, is_cover)))
+
+        def add_page(page: Dict, outline_so_far: str):
+            nonlocal cover_chosen, first_page
+            if cover_chosen:
+                start_page(page, outline_so_far, is_cover=False)
+            elif page["type"] == "cover":
+                cover_chosen = True
+                start_page(page, outline_so_far, is_cover=True)
+                if first_page is not None:
+                    start_page(*first_page, is_cover=False)
+                    first_page = None
+            elif first_page is None:
+                first_page = (page, outline_so_far)
+            else:
+                start_page(page, outline_so_far, is_cover=False)
+
+        async def read_outline():
+            nonlocal outline_error
+            async for event in outline_events:
+                if event["event"] == "page":
+                    page = event["data"]
+                    pages.append(page)
+                    retry_budget.reserve += self.TASK_RETRY_BUDGET_PER_PAGE
+                    if hedge_budget is not None:
+                        hedge_budget.reserve += self.router.hedge.budget_per_page
+                    await events.put({"event": "outline_page", "data": page})
+                    outline_so_far = "\n\n<page>\n\n".join(p["content"] for p in pages)
+                    add_page(page, outline_so_far)
+                elif event["event"] == "finish":
+                    data = event["data"]
+                    await asyncio.to_thread(
+                        self.task_states.set_outline, task_id, data["pages"], data["outline"]
+                    )
+                    logger.info(f"📝 大纲完成，共 {len(data['pages'])} 页: task_id={task_id}")
+                    await events.put({"event": "outline", "data": data})
+                elif event["event"] == "error":
+                    outline_error = event["data"].get("error", "大纲生成失败")
+                    await events.put({"event": "outline_error", "data": {"message": outline_error}})
+
+        async def run():
+            nonlocal outline_error
+            try:
+                await read_outline()
+            except Exception as e:
+                outline_error = f"大纲生成异常。\n错误详情: {e}"
+                await events.put({"event": "outline_error", "data": {"message": outline_error}})
+            if not outline_error and first_page is not None:
+                # 大纲中没有封面页，使用第一页作为封面
+                start_page(*first_page, is_cover=True)
+            if outline_error:
+                logger.error(f"❌ 大纲生成失败，停止一键生成任务: {task_id}")
+                for task in page_tasks:
+                    task.cancel()
+            await asyncio.gather(*page_tasks, return_exceptions=True)
+            await events.put(None)
+
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                for ready in self._ready_thumbnail_events(thumbnail_tasks):
+                    yield ready
+                yield event
+                if event["event"] == "complete":
+                    # 在发出 complete 之后才等待缩略图，保证 thumbnail_ready 总在对应的 complete 之后
+                    index = event["data"]["index"]
+                    filename = event["data"]["image_url"].rsplit("/", 1)[-1]
+                    thumbnail_tasks.append(asyncio.create_task(
+                        self._await_thumbnail(task_id, task_dir, index, filename)
+                    ))
+        finally:
+            # 调用方提前结束（如任务被取消）时停止大纲和未完成的页面
+            runner.cancel()
+            for task in page_tasks:
+                task.cancel()
+
+        # 等待剩余的缩略图生成完成
+        if thumbnail_tasks:
+            await asyncio.wait(thumbnail_tasks)
+        for event in self._ready_thumbnail_events(thumbnail_tasks):
+            yield event
+
+        finish = {
+            "success": outline_error is None and bool(pages) and len(failed_pages) == 0,
+            "task_id": task_id,
+            "images": generated_images,
+            "total": len(pages),
+            "completed": len(generated_images),
+            "failed": len(failed_pages),
+            "failed_indices": [p["index"] for p in failed_pages]
+        }
+        if outline_error:
+            finish["error"] = outline_error
+        yield {"event": "finish", "data": finish}
+
+    async def _resumed_page_event(
+        self,
+        task_id: str,
+        task_dir: str,
+        index: int,
+        filename: str,
+        phase: str,
+        thumbnail_tasks: List["asyncio.Task"]
+    ) -> Dict[str, Any]:
+        """
+        记录断点续跑时跳过的页面（缺少缩略图时补生成）
+
+        Returns:
+            该页的 complete 事件
+        """
+        await asyncio.to_thread(self.task_states.mark_generated, task_id, index, filename)
+        if not os.path.exists(os.path.join(task_dir, f"thumb_{filename}")):
+            self.derivatives.submit(task_dir, filename)
+        thumbnail_tasks.append(asyncio.create_task(
+            self._await_thumbnail(task_id, task_dir, index, filename)
+        ))
+        return {
+            "event": "complete",
+            "data": {
+                "index": index,
+                "status": "done",
+                "image_url": f"/api/images/{task_id}/{filename}",
+                "phase": phase,
+                "resumed": True
+            }
+        }
+
+    def _load_compressed_cover(self, cover_path: str) -> bytes:
+        """读取封面图并压缩到 200KB 以内（用作后续页面的参考图）"""
+        with open(cover_path, "rb") as f:
+            cover_data = f.read()
+        return get_reference_image(cover_data, max_size_kb=200).data
+
     def retry_single_image(
         self,
         task_id: str,
@@ -562,15 +1055,15 @@ class ImageService:
         Returns:
             生成结果
         """
-        self.current_task_dir = os.path.join(self.history_root_dir, task_id)
-        os.makedirs(self.current_task_dir, exist_ok=True)
+        task_dir = os.path.join(self.history_root_dir, task_id)
+        os.makedirs(task_dir, exist_ok=True)
 
         reference_image = None
         user_images = None
 
         # 首先尝试从任务状态中获取上下文
-        if task_id in self._task_states:
-            task_state = self._task_states[task_id]
+        task_state = self.task_states.get(task_id)
+        if task_state is not None:
             if use_reference:
                 reference_image = task_state.get("cover_image")
             # 如果没有传入上下文，则使用任务状态中的
@@ -582,33 +1075,30 @@ class ImageService:
 
         # 如果任务状态中没有封面图，尝试从文件系统加载
         if use_reference and reference_image is None:
-            cover_path = os.path.join(self.current_task_dir, "0.png")
+            cover_path = os.path.join(task_dir, "0.png")
             if os.path.exists(cover_path):
-                with open(cover_path, "rb") as f:
-                    cover_data = f.read()
                 # 压缩封面图到 200KB
-                reference_image = compress_image(cover_data, max_size_kb=200)
+                reference_image = self._load_compressed_cover(cover_path)
 
-        index, success, filename, error = self._generate_single_image(
+        index, success, filename, error, provider = self._generate_single_image(
             page,
             task_id,
             reference_image,
             0,
             full_outline,
             user_images,
-            user_topic
+            user_topic,
+            task_dir
         )
 
         if success:
-            if task_id in self._task_states:
-                self._task_states[task_id]["generated"][index] = filename
-                if index in self._task_states[task_id]["failed"]:
-                    del self._task_states[task_id]["failed"][index]
+            self.task_states.mark_generated(task_id, index, filename, provider)
 
             return {
                 "success": True,
                 "index": index,
-                "image_url": f"/api/images/{task_id}/{filename}"
+                "image_url": f"/api/images/{task_id}/{filename}",
+                "provider": provider
             }
         else:
             return {
@@ -624,7 +1114,7 @@ class ImageService:
         pages: List[Dict]
     ) -> Generator[Dict[str, Any], None, None]:
         """
-        批量重试失败的图片
+        批量重试失败的图片（同步生成器，实际在后台事件循环中执行）
 
         Args:
             task_id: 任务ID
@@ -633,13 +1123,38 @@ class ImageService:
         Yields:
             进度事件
         """
-        # 获取参考图
+        yield from get_async_runner().iterate(self.aretry_failed_images(task_id, pages))
+
+    async def aretry_failed_images(
+        self,
+        task_id: str,
+        pages: List[Dict]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        批量重试失败的图片（异步生成器）
+
+        Args:
+            task_id: 任务ID
+            pages: 需要重试的页面列表
+
+        Yields:
+            进度事件
+        """
+        # 获取参考图和完整大纲
         reference_image = None
-        if task_id in self._task_states:
-            reference_image = self._task_states[task_id].get("cover_image")
+        full_outline = ""
+        task_state = await asyncio.to_thread(self.task_states.get, task_id)
+        if task_state is not None:
+            reference_image = task_state.get("cover_image")
+            full_outline = task_state.get("full_outline", "")
+
+        task_dir = os.path.join(self.history_root_dir, task_id)
+        thumbnail_tasks: List[asyncio.Task] = []
 
         total = len(pages)
         success_count = 0
+        retry_budget = RetryBudget.fixed(total * self.TASK_RETRY_BUDGET_PER_PAGE)
+        hedge_budget = self.router.hedge.task_budget(total)
         failed_count = 0
 
         yield {
@@ -651,67 +1166,66 @@ class ImageService:
         }
 
         # 并发重试
-        # 从任务状态中获取完整大纲
-        full_outline = ""
-        if task_id in self._task_states:
-            full_outline = self._task_states[task_id].get("full_outline", "")
-
-        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT) as executor:
-            future_to_page = {
-                executor.submit(
-                    self._generate_single_image,
-                    page,
-                    task_id,
-                    reference_image,
-                    0,  # retry_count
-                    full_outline  # 传入完整大纲
-                ): page
-                for page in pages
-            }
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT)
 
-            for future in as_completed(future_to_page):
-                page = future_to_page[future]
+        async def retry_page(page: Dict):
+            async with semaphore:
                 try:
-                    index, success, filename, error = future.result()
+                    return page, await self._agenerate_single_image(
+                        page,
+                        task_id,
+                        reference_image,
+                        0,  # retry_count
+                        full_outline,  # 传入完整大纲
+                        retry_budget=retry_budget,
+                        hedge_budget=hedge_budget
+                    )
+                except Exception as e:
+                    return page, (page["index"], False, None, str(e), None)
 
-                    if success:
-                        success_count += 1
-                        if task_id in self._task_states:
-                            self._task_states[task_id]["generated"][index] = filename
-                            if index in self._task_states[task_id]["failed"]:
-                                del self._task_states[task_id]["failed"][index]
+        tasks = [asyncio.create_task(retry_page(page)) for page in pages]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                page, (index, success, filename, error, provider) = await next_done
 
-                        yield {
-                            "event": "complete",
-                            "data": {
-                                "index": index,
-                                "status": "done",
-                                "image_url": f"/api/images/{task_id}/{filename}"
-                            }
-                        }
-                    else:
-                        failed_count += 1
-                        yield {
-                            "event": "error",
-                            "data": {
-                                "index": index,
-                                "status": "error",
-                                "message": error,
-                                "retryable": True
-                            }
-                        }
+                for event in self._ready_thumbnail_events(thumbnail_tasks):
+                    yield event
 
-                except Exception as e:
+                if success:
+                    success_count += 1
+                    await asyncio.to_thread(self.task_states.mark_generated, task_id, index, filename, provider)
+                    thumbnail_tasks.append(asyncio.create_task(
+                        self._await_thumbnail(task_id, task_dir, index, filename)
+                    ))
+
+                    yield {
+                        "event": "complete",
+                        "data": {
+                            "index": index,
+                            "status": "done",
+                            "image_url": f"/api/images/{task_id}/{filename}",
+                            "provider": provider
+                        }
+                    }
+                else:
                     failed_count += 1
                     yield {
                         "event": "error",
                         "data": {
-                            "index": page["index"],
+                            "index": index,
                             "status": "error",
-                            "message": str(e),
+                            "message": error,
                             "retryable": True
                         }
                     }
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if thumbnail_tasks:
+            await asyncio.wait(thumbnail_tasks)
+        for event in self._ready_thumbnail_events(thumbnail_tasks):
+            yield event
 
         yield {
             "event": "retry_finish",
@@ -766,12 +1280,11 @@ class ImageService:
 
     def get_task_state(self, task_id: str) -> Optional[Dict]:
         """获取任务状态"""
-        return self._task_states.get(task_id)
+        return self.task_states.get(task_id)
 
     def cleanup_task(self, task_id: str):
-        """清理任务状态（释放内存）"""
-        if task_id in self._task_states:
-            del self._task_states[task_id]
+        """清理任务状态（同时释放不再被引用的参考图）"""
+        self.task_states.delete(task_id)
 
 
 # 全局服务实例
@@ -0,0 +1,612 @@
+"""后台图片生成任务队列
+
+/generate 不再在 HTTP 请求里跑完整个任务：任务先写入持久化队列，由后台 worker 执行，
+每个进度事件都追加到事件日志中。客户端断开不影响任务继续执行，
+重新连接时带上 Last-Event-ID 即可从断开的位置继续接收事件。
+
+- 队列和事件日志保存在 SQLite 中（默认 history/jobs.db），多个 worker 进程共享
+- 领取到的任务各自作为后台事件循环中的协程执行，同时执行的任务数上限由 Config.JOB_WORKERS 控制；
+  实际的上游请求量由页面级的自适应并发和主动限流控制
+- 一键生成任务（mode=oneshot）先流式生成大纲、边解析边生成图片；大纲完成后转为普通任务，
+  之后的续跑直接使用已经生成的大纲
+- 事件同时发布到进程内事件总线，同一任务的多个 SSE 连接直接读内存缓冲区，
+  任务在其他进程执行或订阅者落后太多时才读数据库
+- 执行中的任务定期更新心跳；进程退出后心跳超时的任务会被其他 worker 接手，
+  并从断点续跑（跳过 history/<task_id>/ 中已经生成的页面）
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.config import Config
+from backend.utils.async_runner import aiterate_in_thread, get_async_runner
+from backend.utils.event_bus import get_event_bus
+from backend.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATUSES = (DONE, FAILED, CANCELLED)
+
+# 任务类型：按给定的页面生成图片 / 一键生成（大纲和图片流水线执行）
+MODE_PAGES = "pages"
+MODE_ONESHOT = "oneshot"
+
+
+class JobQueue:
+    """持久化的任务队列和事件日志"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            task_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            owner TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            heartbeat_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+
+        CREATE TABLE IF NOT EXISTS job_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_events_task ON job_events(task_id, event_id);
+    """
+
+    # 心跳超过该时间（秒）未更新的执行中任务视为 worker 已退出，可以被接手
+    LEASE_SECONDS = 60
+    # 淘汰检查的最小间隔（秒）
+    EVICT_INTERVAL = 600
+    # 事件流等待新事件的间隔（秒）
+    STREAM_POLL_INTERVAL = 1.0
+
+    def __init__(self, db_path: str, ttl: float):
+        """
+        Args:
+            db_path: 数据库文件路径
+            ttl: 已结束任务及其事件的保留时间（秒）
+        """
+        self.db = SQLiteDatabase(db_path, self.SCHEMA)
+        self.ttl = ttl
+        self._last_evict = 0.0
+        self.bus = get_event_bus()
+
+    def submit(
+        self,
+        task_id: str,
+        pages: List[Dict],
+        full_outline: str = "",
+        user_topic: str = "",
+        user_images: Optional[List[bytes]] = None,
+        resume: bool = False,
+        mode: str = MODE_PAGES
+    ) -> bool:
+        """
+        提交任务
+
+        Args:
+            task_id: 任务 ID
+            pages: 页面列表（一键生成时为空）
+            full_outline: 完整大纲文本
+            user_topic: 用户原始输入（一键生成时为大纲主题）
+            user_images: 用户上传的参考图片
+            resume: 是否从断点续跑（跳过已经生成的页面，保留之前的事件）
+            mode: 任务类型（MODE_PAGES / MODE_ONESHOT）
+
+        Returns:
+            是否创建了新任务（同一任务正在排队或执行时返回 False，不重复提交）
+        """
+        self.maybe_evict()
+        payload = json.dumps({
+            "pages": pages,
+            "full_outline": full_outline or "",
+            "user_topic": user_topic or "",
+            "user_images": [base64.b64encode(img).decode("ascii") for img in user_images or []],
+            "resume": resume,
+            "mode": mode,
+        }, ensure_ascii=False)
+
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None and row[0] not in TERMINAL_STATUSES:
+                return False
+            if not resume:
+                conn.execute("DELETE FROM job_events WHERE task_id = ?", (task_id,))
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(task_id, payload, status, error, owner, attempts, created_at, updated_at, heartbeat_at) "
+                "VALUES (?, ?, ?, NULL, NULL, 0, ?, ?, NULL)",
+                (task_id, payload, QUEUED, now, now)
+            )
+        return True
+
+    def resubmit(self, task_id: str) -> bool:
+        """
+        让已结束（失败或取消）的任务从断点续跑
+
+        Returns:
+            是否重新排队（任务不存在或仍在执行时返回 False）
+        """
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT payload, status FROM jobs WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None or row[1] not in TERMINAL_STATUSES:
+                return False
+            payload = json.loads(row[0])
+            payload["resume"] = True
+            conn.execute(
+                "UPDATE jobs SET payload = ?, status = ?, error = NULL, owner = NULL, updated_at = ? "
+                "WHERE task_id = ?",
+                (json.dumps(payload, ensure_ascii=False), QUEUED, time.time(), task_id)
+            )
+            return True
+
+    def update_payload(self, task_id: str, owner: str, fields: Dict[str, Any]):
+        """更新执行中任务的参数（如一键生成的大纲完成后写入页面列表）"""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT payload FROM jobs WHERE task_id = ? AND owner = ? AND status = ?",
+                (task_id, owner, RUNNING)
+            ).fetchone()
+            if row is None:
+                return
+            payload = json.loads(row[0])
+            payload.update(fields)
+            conn.execute(
+                "UPDATE jobs SET payload = ?, updated_at = ? WHERE task_id = ?",
+                (json.dumps(payload, ensure_ascii=False), time.time(), task_id)
+            )
+
+    def claim(self, owner: str) -> Optional[Tuple[str, Dict[str, Any], int]]:
+        """
+        领取一个待执行的任务（排队中的，或心跳超时的执行中任务）
+
+        Args:
+            owner: worker 标识
+
+        Returns:
+            (task_id, payload, 第几次执行)，没有任务时返回 None
+        """
+        with self.db.transaction() as conn:
+            now = time.time()
+            row = conn.execute(
+                "SELECT task_id, payload, attempts FROM jobs "
+                "WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now - self.LEASE_SECONDS)
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, payload, attempts = row
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, attempts = ?, updated_at = ?, heartbeat_at = ? "
+                "WHERE task_id = ?",
+                (RUNNING, owner, attempts + 1, now, now, task_id)
+            )
+        data = json.loads(payload)
+        data["user_images"] = [base64.b64decode(img) for img in data.get("user_images") or []]
+        return task_id, data, attempts + 1
+
+    def heartbeat(self, task_ids: List[str], owner: str) -> List[str]:
+        """
+        更新执行中任务的心跳
+
+        Returns:
+            已经不归该 worker 执行的任务（被取消或被接手），应停止执行
+        """
+        lost = []
+        with self.db.transaction() as conn:
+            now = time.time()
+            for task_id in task_ids:
+                cursor = conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE task_id = ? AND owner = ? AND status = ?",
+                    (now, task_id, owner, RUNNING)
+                )
+                if not cursor.rowcount:
+                    lost.append(task_id)
+        return lost
+
+    def finish(self, task_id: str, owner: str, status: str, error: Optional[str] = None):
+        """记录任务结束（任务已被取消或被其他 worker 接手时不覆盖）"""
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE task_id = ? AND owner = ? AND status = ?",
+                (status, error, time.time(), task_id, owner, RUNNING)
+            )
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        取消排队中或执行中的任务
+
+        Returns:
+            是否取消成功
+        """
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE task_id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), task_id, QUEUED, RUNNING)
+            )
+            if cursor.rowcount == 0:
+                return False
+            data = json.dumps({"task_id": task_id})
+            cursor = conn.execute(
+                "INSERT INTO job_events (task_id, event, data) VALUES (?, ?, ?)",
+                (task_id, "cancelled", data)
+            )
+            event_id = cursor.lastrowid
+        self.bus.publish(task_id, event_id, "cancelled", data)
+        return True
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态
+
+        Returns:
+            status / error / attempts / created_at / updated_at / last_event_id，任务不存在时返回 None
+        """
+        conn = self.db.connection()
+        row = conn.execute(
+            "SELECT status, error, attempts, created_at, updated_at FROM jobs WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        (last_event_id,) = conn.execute(
+            "SELECT MAX(event_id) FROM job_events WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return {
+            "task_id": task_id,
+            "status": row[0],
+            "error": row[1],
+            "attempts": row[2],
+            "created_at": row[3],
+            "updated_at": row[4],
+            "last_event_id": last_event_id or 0,
+        }
+
+    def append_event(self, task_id: str, event: str, data: Dict[str, Any]) -> int:
+        """
+        追加进度事件
+
+        Returns:
+            事件 ID（单调递增，用作 SSE 的 id）
+        """
+        data = json.dumps(data, ensure_ascii=False)
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO job_events (task_id, event, data) VALUES (?, ?, ?)",
+                (task_id, event, data)
+            )
+            event_id = cursor.lastrowid
+        self.bus.publish(task_id, event_id, event, data)
+        return event_id
+
+    def events_after(self, task_id: str, after_id: int = 0, limit: int = 500) -> List[Tuple[int, str, str]]:
+        """
+        读取事件日志
+
+        Returns:
+            [(事件 ID, 事件类型, JSON 数据)]
+        """
+        return [
+            tuple(row) for row in self.db.connection().execute(
+                "SELECT event_id, event, data FROM job_events "
+                "WHERE task_id = ? AND event_id > ? ORDER BY event_id LIMIT ?",
+                (task_id, after_id, limit)
+            )
+        ]
+
+    def stream(self, task_id: str, last_event_id: int = 0, keepalive: float = 15.0) -> Iterator[str]:
+        """
+        以 SSE 格式输出任务事件，先补发 last_event_id 之后的历史事件，再实时推送，任务结束后停止
+
+        Args:
+            task_id: 任务 ID
+            last_event_id: 客户端已经收到的最后一个事件 ID（Last-Event-ID）
+            keepalive: 没有事件时发送心跳注释的间隔（秒）
+
+        Yields:
+            SSE 文本（event / data / id，id 放在 data 之后）
+        """
+        last_sent = time.monotonic()
+        while True:
+            live = self.bus.read(task_id, last_event_id, timeout=self.STREAM_POLL_INTERVAL)
+            if live is not None and not live.closed:
+                # 任务在本进程执行中：直接读事件总线的缓冲区（没有新事件时 read 已经等待过）
+                events = live.events
+            else:
+                events = self.events_after(task_id, last_event_id)
+
+            for event_id, event, data in events:
+                last_event_id = event_id
+                yield f"event: {event}\ndata: {data}\nid: {event_id}\n\n"
+            if events:
+                last_sent = time.monotonic()
+                continue
+
+            if live is None or live.closed:
+                job = self.get(task_id)
+                if job is None or job["status"] in TERMINAL_STATUSES:
+                    # 结束前再读一次，避免漏掉状态更新之前写入的事件
+                    if not self.events_after(task_id, last_event_id, limit=1):
+                        return
+                    continue
+                # 任务在其他进程执行、还在排队，或本进程的发布者已经停止（租约丢失、worker 退出）
+                # 但任务还没有结束：轮询事件日志（此时 read 不会等待，必须在这里等待）
+                time.sleep(self.STREAM_POLL_INTERVAL)
+
+            if time.monotonic() - last_sent >= keepalive:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+
+    def maybe_evict(self):
+        """删除过期的已结束任务及其事件"""
+        now = time.time()
+        if now - self._last_evict < self.EVICT_INTERVAL:
+            return
+        self._last_evict = now
+        try:
+            with self.db.transaction() as conn:
+                expired = [
+                    task_id for (task_id,) in conn.execute(
+                        "SELECT task_id FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+                        (*TERMINAL_STATUSES, now - self.ttl)
+                    )
+                ]
+                for task_id in expired:
+                    conn.execute("DELETE FROM jobs WHERE task_id = ?", (task_id,))
+                    conn.execute("DELETE FROM job_events WHERE task_id = ?", (task_id,))
+            if expired:
+                logger.info(f"🧹 已淘汰 {len(expired)} 个过期生成任务")
+        except Exception as e:
+            logger.warning(f"淘汰过期生成任务失败: {e}")
+
+
+class JobWorkers:
+    """在后台事件循环中执行队列任务的 worker"""
+
+    # 心跳和取消检查的间隔（秒）
+    HEARTBEAT_INTERVAL = 5
+    # 没有任务时轮询队列的间隔（秒）
+    POLL_INTERVAL = 2
+
+    def __init__(self, queue: JobQueue, concurrency: int):
+        """
+        Args:
+            queue: 任务队列
+            concurrency: 同时执行的任务数上限
+        """
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._future = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动 worker（重复调用无副作用）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        runner = get_async_runner()
+        self._future = runner.submit(self._run())
+        logger.info(f"后台生成任务 worker 已启动（同时执行的任务数上限: {self.concurrency}）")
+
+    def stop(self):
+        """停止领取新任务，并停止本进程中正在执行的任务（心跳超时后可被其他 worker 接手续跑）"""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        self._future.cancel()
+
+        def cancel_running():
+            for task in list(self._running.values()):
+                task.cancel()
+        get_async_runner().loop.call_soon_threadsafe(cancel_running)
+
+    def notify(self):
+        """有新任务时唤醒 worker"""
+        if self._wakeup is not None:
+            get_async_runner().loop.call_soon_threadsafe(self._wakeup.set)
+
+    def cancel(self, task_id: str):
+        """取消本进程中正在执行的任务"""
+        def cancel_task():
+            task = self._running.get(task_id)
+            if task is not None:
+                task.cancel()
+        get_async_runner().loop.call_soon_threadsafe(cancel_task)
+
+    async def _run(self):
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(self._dispatch(), self._heartbeat())
+
+    async def _dispatch(self):
+        """领取任务，每个任务作为独立的协程执行（不等它结束就继续领取下一个）"""
+        while True:
+            await self._slots.acquire()
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.owner)
+            except Exception as e:
+                logger.error(f"领取生成任务失败: {e}")
+                job = None
+
+            if job is None:
+                self._slots.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task_id, payload, attempt = job
+            task = asyncio.create_task(self._execute(task_id, payload, attempt))
+            self._running[task_id] = task
+            task.add_done_callback(lambda done, task_id=task_id: self._job_done(task_id, done))
+
+    def _job_done(self, task_id: str, task: asyncio.Task):
+        """任务协程结束：归还名额"""
+        if self._running.get(task_id) is task:
+            del self._running[task_id]
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ 生成任务协程异常退出: {task_id}: {task.exception()}")
+
+    async def _heartbeat(self):
+        """定期更新心跳；任务在数据库中被取消或被接手时停止执行"""
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            if not self._running:
+                continue
+            try:
+                lost = await asyncio.to_thread(self.queue.heartbeat, list(self._running), self.owner)
+            except Exception as e:
+                logger.warning(f"更新生成任务心跳失败: {e}")
+                continue
+            for task_id in lost:
+                task = self._running.get(task_id)
+                if task is not None:
+                    logger.info(f"⏹️ 生成任务已取消: {task_id}")
+                    task.cancel()
+
+    async def _execute(self, task_id: str, payload: Dict[str, Any], attempt: int):
+        """执行一个任务，执行期间把事件同时发布到本进程的事件总线"""
+        job = await asyncio.to_thread(self.queue.get, task_id)
+        bus = self.queue.bus
+        bus.open(task_id, job["last_event_id"] if job else 0)
+        try:
+            await self._generate(task_id, payload, attempt)
+        finally:
+            bus.close(task_id)
+
+    async def _generate(self, task_id: str, payload: Dict[str, Any], attempt: int):
+        """生成任务中的图片，把进度事件写入事件日志"""
+        from backend.services.image import get_image_service
+
+        # 重新执行（worker 退出后被接手）或手动续跑时跳过已经生成的页面
+        oneshot = payload.get("mode") == MODE_ONESHOT
+        # 一键生成的大纲还没完成时没有断点可用，重新生成大纲
+        resume = not oneshot and (payload.get("resume", False) or attempt > 1)
+        logger.info(
+            f"▶️ 开始执行{'一键' if oneshot else ''}生成任务: {task_id} "
+            f"(第 {attempt} 次{', 断点续跑' if resume else ''})"
+        )
+
+        pages = payload["pages"]
+        status, error = DONE, None
+        images = []
+        try:
+            image_service = await asyncio.to_thread(get_image_service)
+            if oneshot:
+                events = await self._pipelined_events(image_service, task_id, payload)
+            else:
+                events = image_service.agenerate_images(
+                    pages, task_id, payload.get("full_outline", ""),
+                    user_images=payload.get("user_images") or None,
+                    user_topic=payload.get("user_topic", ""),
+                    resume=resume
+                )
+            async for event in events:
+                await asyncio.to_thread(self.queue.append_event, task_id, event["event"], event["data"])
+                if event["event"] == "complete":
+                    images.append(f"{event['data']['index']}.png")
+                elif event["event"] == "outline_page":
+                    pages = pages + [event["data"]]
+                elif event["event"] == "outline":
+                    # 大纲已完成：之后续跑按普通任务处理，不再重新生成大纲
+                    pages = event["data"]["pages"]
+                    await asyncio.to_thread(self.queue.update_payload, task_id, self.owner, {
+                        "mode": MODE_PAGES,
+                        "pages": pages,
+                        "full_outline": event["data"]["outline"],
+                    })
+                elif event["event"] == "finish" and not event["data"].get("success"):
+                    status = FAILED
+        except asyncio.CancelledError:
+            logger.info(f"⏹️ 生成任务已停止: {task_id}")
+            raise
+        except Exception as e:
+            logger.error(f"❌ 生成任务异常: {task_id}: {e}")
+            status, error = FAILED, str(e)
+            # 补发 finish 事件，客户端不会一直等待
+            done = {image.split(".")[0] for image in images}
+            failed_indices = [page["index"] for page in pages if str(page["index"]) not in done]
+            await asyncio.to_thread(self.queue.append_event, task_id, "finish", {
+                "success": False,
+                "task_id": task_id,
+                "images": images,
+                "total": len(pages),
+                "completed": len(images),
+                "failed": len(failed_indices),
+                "failed_indices": failed_indices,
+                "error": f"图片生成异常。\n错误详情: {error}\n建议：检查图片生成服务配置和后端日志"
+            })
+
+        await asyncio.to_thread(self.queue.finish, task_id, self.owner, status, error)
+
+    @staticmethod
+    async def _pipelined_events(image_service, task_id: str, payload: Dict[str, Any]):
+        """一键生成：流式大纲（在线程中读取）接入图片生成流水线"""
+        from backend.services.outline import get_outline_service
+
+        topic = payload.get("user_topic", "")
+        user_images = payload.get("user_images") or None
+        outline_service = await asyncio.to_thread(get_outline_service)
+        outline_events = aiterate_in_thread(outline_service.generate_outline_stream(topic, user_images))
+        return image_service.agenerate_images_pipelined(
+            outline_events, task_id, user_images=user_images, user_topic=topic
+        )
+
+
+_queue_instance: Optional[JobQueue] = None
+_workers_instance: Optional[JobWorkers] = None
+_instance_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """获取全局任务队列"""
+    global _queue_instance
+    with _instance_lock:
+        if _queue_instance is None:
+            db_path = Config.JOB_DB or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "history", "jobs.db"
+            )
+            _queue_instance = JobQueue(db_path, Config.TASK_STATE_TTL)
+        return _queue_instance
+
+
+def get_job_workers() -> JobWorkers:
+    """获取本进程的任务 worker（首次调用时启动）"""
+    global _workers_instance
+    queue = get_job_queue()
+    with _instance_lock:
+        if _workers_instance is None:
+            _workers_instance = JobWorkers(queue, Config.JOB_WORKERS)
+    _workers_instance.start()
+    return _workers_instance
@@ -4,12 +4,75 @@ import re
 import base64
 import yaml
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
 from backend.utils.text_client import get_text_chat_client
+from .outline_cache import get_outline_cache, outline_cache_key
 
 logger = logging.getLogger(__name__)
 
 
+def _make_page(index: int, page_text: str) -> Optional[Dict[str, Any]]:
+    """把一段大纲文本转换为页面（空白段落返回 None）"""
+    page_text = page_text.strip()
+    if not page_text:
+        return None
+
+    page_type = "content"
+    type_match = re.match(r"\[(\S+)\]", page_text)
+    if type_match:
+        type_cn = type_match.group(1)
+        type_mapping = {
+            "封面": "cover",
+            "内容": "content",
+            "总结": "summary",
+        }
+        page_type = type_mapping.get(type_cn, "content")
+
+    return {
+        "index": index,
+        "type": page_type,
+        "content": page_text
+    }
+
+
+class OutlinePageParser:
+    """
+    增量解析流式输出的大纲
+
+    每收到下一个 <page> 标签，说明上一页已经完整，立即返回该页。
+    页面序号与 OutlineService._parse_outline 解析完整文本的结果一致；
+    最后一页（后面没有 <page>）由调用方在输出结束后按完整文本补齐。
+    """
+
+    PAGE_TAG = re.compile(r'<page>', re.IGNORECASE)
+    # 标签可能被拆在两段输出之间，每次从末尾往回这么多字符开始查找
+    TAG_OVERLAP = len('<page>') - 1
+
+    def __init__(self):
+        self.text = ""
+        self._segment_start = 0
+        self._segment_index = 0
+        self._scan_from = 0
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """
+        追加一段输出
+
+        Returns:
+            新解析完成的页面
+        """
+        self.text += delta
+        pages = []
+        for match in self.PAGE_TAG.finditer(self.text, self._scan_from):
+            page = _make_page(self._segment_index, self.text[self._segment_start:match.start()])
+            if page is not None:
+                pages.append(page)
+            self._segment_index += 1
+            self._segment_start = match.end()
+        self._scan_from = max(self._segment_start, len(self.text) - self.TAG_OVERLAP)
+        return pages
+
+
 class OutlineService:
     def __init__(self):
         logger.debug("初始化 OutlineService...")
@@ -95,10 +158,12 @@ class OutlineService:
         with open(prompt_path, "r", encoding="utf-8") as f:
             return f.read()
 
-    def _parse_outline(self, outline_text: str) -> List[Dict[str, Any]]:
-        # 按 <page> 分割页面（兼容旧的 --- 分隔符）
-        if '<page>' in outline_text:
-            pages_raw = re.split(r'<page>', outline_text, flags=re.IGNORECASE)
+    @staticmethod
+    def _parse_outline(outline_text: str) -> List[Dict[str, Any]]:
+        # 按 <page> 分割页面（兼容旧的 --- 分隔符）；
+        # 与流式解析使用同一个规则（不区分大小写），已经推送的页面和最终结果一致
+        if OutlinePageParser.PAGE_TAG.search(outline_text):
+            pages_raw = OutlinePageParser.PAGE_TAG.split(outline_text)
         else:
             # 向后兼容：如果没有 <page> 则使用 ---
             pages_raw = outline_text.split("---")
@@ -106,129 +171,238 @@ class OutlineService:
         pages = []
 
         for index, page_text in enumerate(pages_raw):
-            page_text = page_text.strip()
-            if not page_text:
-                continue
-
-            page_type = "content"
-            type_match = re.match(r"\[(\S+)\]", page_text)
-            if type_match:
-                type_cn = type_match.group(1)
-                type_mapping = {
-                    "封面": "cover",
-                    "内容": "content",
-                    "总结": "summary",
-                }
-                page_type = type_mapping.get(type_cn, "content")
-
-            pages.append({
-                "index": index,
-                "type": page_type,
-                "content": page_text
-            })
+            page = _make_page(index, page_text)
+            if page is not None:
+                pages.append(page)
 
         return pages
 
+    def _build_prompt(self, topic: str, images: Optional[List[bytes]] = None) -> str:
+        prompt = self.prompt_template.format(topic=topic)
+
+        if images and len(images) > 0:
+            prompt += f"\n\n注意：用户提供了 {len(images)} 张参考图片，请在生成大纲时考虑这些图片的内容和风格。这些图片可能是产品图、个人照片或场景图，请根据图片内容来优化大纲，使生成的内容与图片相关联。"
+            logger.debug(f"添加了 {len(images)} 张参考图片到提示词")
+        return prompt
+
+    def _model_params(self) -> Dict[str, Any]:
+        """从配置中获取模型参数"""
+        active_provider = self.text_config.get('active_provider', 'google_gemini')
+        providers = self.text_config.get('providers', {})
+        provider_config = providers.get(active_provider, {})
+
+        return {
+            "model": provider_config.get('model', 'gemini-2.0-flash-exp'),
+            "temperature": provider_config.get('temperature', 1.0),
+            "max_output_tokens": provider_config.get('max_output_tokens', 8000),
+        }
+
+    def _cache_key(self, topic: str, images: Optional[List[bytes]]) -> Optional[str]:
+        """大纲缓存键（缓存已关闭时返回 None）"""
+        if get_outline_cache() is None:
+            return None
+        active_provider = self.text_config.get('active_provider', 'google_gemini')
+        provider_config = self.text_config.get('providers', {}).get(active_provider, {})
+        return outline_cache_key(
+            topic, images, self.prompt_template, active_provider, provider_config, self._model_params()
+        )
+
+    def _cached_outline(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """读取缓存的大纲（缓存出错时视为未命中，不影响生成）"""
+        if cache_key is None:
+            return None
+        try:
+            result = get_outline_cache().get(cache_key)
+        except Exception as e:
+            logger.warning(f"读取大纲缓存失败: {e}")
+            return None
+        if result is not None:
+            logger.info(f"♻️ 命中大纲缓存，共 {len(result.get('pages', []))} 页")
+            result["cached"] = True
+        return result
+
+    def _store_outline(self, cache_key: Optional[str], result: Dict[str, Any]):
+        """保存生成成功的大纲"""
+        if cache_key is None:
+            return
+        try:
+            get_outline_cache().put(cache_key, result)
+        except Exception as e:
+            logger.warning(f"写入大纲缓存失败: {e}")
+
     def generate_outline(
         self,
         topic: str,
-        images: Optional[List[bytes]] = None
+        images: Optional[List[bytes]] = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
+        """
+        生成大纲
+
+        Args:
+            topic: 主题
+            images: 用户参考图片
+            use_cache: 是否读取大纲缓存（为 False 时重新生成，结果仍会写入缓存）
+        """
         try:
             logger.info(f"开始生成大纲: topic={topic[:50]}..., images={len(images) if images else 0}")
-            prompt = self.prompt_template.format(topic=topic)
-
-            if images and len(images) > 0:
-                prompt += f"\n\n注意：用户提供了 {len(images)} 张参考图片，请在生成大纲时考虑这些图片的内容和风格。这些图片可能是产品图、个人照片或场景图，请根据图片内容来优化大纲，使生成的内容与图片相关联。"
-                logger.debug(f"添加了 {len(images)} 张参考图片到提示词")
-
-            # 从配置中获取模型参数
-            active_provider = self.text_config.get('active_provider', 'google_gemini')
-            providers = self.text_config.get('providers', {})
-            provider_config = providers.get(active_provider, {})
-
-            model = provider_config.get('model', 'gemini-2.0-flash-exp')
-            temperature = provider_config.get('temperature', 1.0)
-            max_output_tokens = provider_config.get('max_output_tokens', 8000)
-
-            logger.info(f"调用文本生成 API: model={model}, temperature={temperature}")
-            outline_text = self.client.generate_text(
-                prompt=prompt,
-                model=model,
-                temperature=temperature,
-                max_output_tokens=max_output_tokens,
-                images=images
-            )
+            cache_key = self._cache_key(topic, images)
+            if use_cache:
+                cached = self._cached_outline(cache_key)
+                if cached is not None:
+                    return cached
+
+            prompt = self._build_prompt(topic, images)
+            params = self._model_params()
+
+            logger.info(f"调用文本生成 API: model={params['model']}, temperature={params['temperature']}")
+            outline_text = self.client.generate_text(prompt=prompt, images=images, **params)
 
             logger.debug(f"API 返回文本长度: {len(outline_text)} 字符")
             pages = self._parse_outline(outline_text)
             logger.info(f"大纲解析完成，共 {len(pages)} 页")
 
-            return {
+            result = {
                 "success": True,
                 "outline": outline_text,
                 "pages": pages,
                 "has_images": images is not None and len(images) > 0
             }
+            self._store_outline(cache_key, result)
+            return result
 
         except Exception as e:
             error_msg = str(e)
             logger.error(f"大纲生成失败: {error_msg}")
-
-            # 根据错误类型提供更详细的错误信息
-            if "api_key" in error_msg.lower() or "unauthorized" in error_msg.lower() or "401" in error_msg:
-                detailed_error = (
-                    f"API 认证失败。\n"
-                    f"错误详情: {error_msg}\n"
-                    "可能原因：\n"
-                    "1. API Key 无效或已过期\n"
-                    "2. API Key 没有访问该模型的权限\n"
-                    "解决方案：在系统设置页面检查并更新 API Key"
-                )
-            elif "model" in error_msg.lower() or "404" in error_msg:
-                detailed_error = (
-                    f"模型访问失败。\n"
-                    f"错误详情: {error_msg}\n"
-                    "可能原因：\n"
-                    "1. 模型名称不正确\n"
-                    "2. 没有访问该模型的权限\n"
-                    "解决方案：在系统设置页面检查模型名称配置"
-                )
-            elif "timeout" in error_msg.lower() or "连接" in error_msg:
-                detailed_error = (
-                    f"网络连接失败。\n"
-                    f"错误详情: {error_msg}\n"
-                    "可能原因：\n"
-                    "1. 网络连接不稳定\n"
-                    "2. API 服务暂时不可用\n"
-                    "3. Base URL 配置错误\n"
-                    "解决方案：检查网络连接，稍后重试"
-                )
-            elif "rate" in error_msg.lower() or "429" in error_msg or "quota" in error_msg.lower():
-                detailed_error = (
-                    f"API 配额限制。\n"
-                    f"错误详情: {error_msg}\n"
-                    "可能原因：\n"
-                    "1. API 调用次数超限\n"
-                    "2. 账户配额用尽\n"
-                    "解决方案：等待配额重置，或升级 API 套餐"
-                )
-            else:
-                detailed_error = (
-                    f"大纲生成失败。\n"
-                    f"错误详情: {error_msg}\n"
-                    "可能原因：\n"
-                    "1. Text API 配置错误或密钥无效\n"
-                    "2. 网络连接问题\n"
-                    "3. 模型无法访问或不存在\n"
-                    "建议：检查配置文件 text_providers.yaml"
-                )
-
             return {
                 "success": False,
-                "error": detailed_error
+                "error": self._detailed_error(error_msg)
+            }
+
+    def generate_outline_stream(
+        self,
+        topic: str,
+        images: Optional[List[bytes]] = None,
+        use_cache: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式生成大纲：模型每输出完一页就返回该页
+
+        命中大纲缓存时直接依次返回缓存的各页。
+
+        Args:
+            topic: 主题
+            images: 用户参考图片
+            use_cache: 是否读取大纲缓存
+
+        Yields:
+            事件字典 {"event": 类型, "data": 数据}
+            - page: 一页大纲解析完成（index / type / content）
+            - finish: 全部完成（数据与 generate_outline 的返回值相同）
+            - error: 生成失败（success=False, error）
+        """
+        parser = OutlinePageParser()
+        sent = set()
+        try:
+            logger.info(f"开始流式生成大纲: topic={topic[:50]}..., images={len(images) if images else 0}")
+            cache_key = self._cache_key(topic, images)
+            cached = self._cached_outline(cache_key) if use_cache else None
+            if cached is not None:
+                for page in cached["pages"]:
+                    yield {"event": "page", "data": page}
+                yield {"event": "finish", "data": cached}
+                return
+
+            prompt = self._build_prompt(topic, images)
+            params = self._model_params()
+
+            logger.info(f"调用文本生成 API（流式）: model={params['model']}, temperature={params['temperature']}")
+            for delta in self.client.stream_text(prompt=prompt, images=images, **params):
+                for page in parser.feed(delta):
+                    sent.add(page["index"])
+                    yield {"event": "page", "data": page}
+
+            outline_text = parser.text
+            logger.debug(f"API 返回文本长度: {len(outline_text)} 字符")
+            # 以完整文本的解析结果为准（最后一页、以及没有 <page> 标签时用 --- 分隔的页面在这里补发）
+            pages = self._parse_outline(outline_text)
+            for page in pages:
+                if page["index"] not in sent:
+                    yield {"event": "page", "data": page}
+            logger.info(f"大纲解析完成，共 {len(pages)} 页")
+
+            result = {
+                "success": True,
+                "outline": outline_text,
+                "pages": pages,
+                "has_images": images is not None and len(images) > 0
+            }
+            self._store_outline(cache_key, result)
+            yield {"event": "finish", "data": result}
+
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"大纲生成失败: {error_msg}")
+            yield {
+                "event": "error",
+                "data": {
+                    "success": False,
+                    "error": self._detailed_error(error_msg)
+                }
             }
 
+    @staticmethod
+    def _detailed_error(error_msg: str) -> str:
+        """根据错误类型给出更详细的错误说明"""
+        if "api_key" in error_msg.lower() or "unauthorized" in error_msg.lower() or "401" in error_msg:
+            detailed_error = (
+                f"API 认证失败。\n"
+                f"错误详情: {error_msg}\n"
+                "可能原因：\n"
+                "1. API Key 无效或已过期\n"
+                "2. API Key 没有访问该模型的权限\n"
+                "解决方案：在系统设置页面检查并更新 API Key"
+            )
+        elif "model" in error_msg.lower() or "404" in error_msg:
+            detailed_error = (
+                f"模型访问失败。\n"
+                f"错误详情: {error_msg}\n"
+                "可能原因：\n"
+                "1. 模型名称不正确\n"
+                "2. 没有访问该模型的权限\n"
+                "解决方案：在系统设置页面检查模型名称配置"
+            )
+        elif "timeout" in error_msg.lower() or "连接" in error_msg:
+            detailed_error = (
+                f"网络连接失败。\n"
+                f"错误详情: {error_msg}\n"
+                "可能原因：\n"
+                "1. 网络连接不稳定\n"
+                "2. API 服务暂时不可用\n"
+                "3. Base URL 配置错误\n"
+                "解决方案：检查网络连接，稍后重试"
+            )
+        elif "rate" in error_msg.lower() or "429" in error_msg or "quota" in error_msg.lower():
+            detailed_error = (
+                f"API 配额限制。\n"
+                f"错误详情: {error_msg}\n"
+                "可能原因：\n"
+                "1. API 调用次数超限\n"
+                "2. 账户配额用尽\n"
+                "解决方案：等待配额重置，或升级 API 套餐"
+            )
+        else:
+            detailed_error = (
+                f"大纲生成失败。\n"
+                f"错误详情: {error_msg}\n"
+                "可能原因：\n"
+                "1. Text API 配置错误或密钥无效\n"
+                "2. 网络连接问题\n"
+                "3. 模型无法访问或不存在\n"
+                "建议：检查配置文件 text_providers.yaml"
+            )
+        return detailed_error
+
 
 def get_outline_service() -> OutlineService:
     """
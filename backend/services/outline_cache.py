@@ -0,0 +1,158 @@
+"""大纲结果缓存
+
+同一个主题、同样的参考图、同一份提示词模板和模型参数，生成的大纲可以直接复用，
+不必每次都调用文本模型（重复提交、刷新页面、对比不同图片服务商时都会出现）。
+
+- 缓存键：规范化后的主题 + 每张参考图的内容哈希 + 提示词模板哈希 + 服务商和模型参数
+- 保存在 SQLite 中，多个 worker 进程共享，重启后仍然有效
+- 条目在写入 OUTLINE_CACHE_TTL 秒后过期，总数超过 OUTLINE_CACHE_MAX_ENTRIES 时淘汰最久未使用的条目
+- 只缓存生成成功的结果
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from backend.config import Config
+from backend.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# 缓存内容格式版本（结果结构变化时递增，旧条目自然失效）
+CACHE_FORMAT_VERSION = 1
+# 参与缓存键的服务商配置项（api_key 不影响输出，不参与）
+PROVIDER_KEY_FIELDS = ("type", "base_url", "model", "temperature", "max_output_tokens")
+
+
+def normalize_topic(topic: str) -> str:
+    """规范化主题：统一全角/半角字符，合并空白，去掉首尾空白"""
+    topic = unicodedata.normalize("NFKC", topic or "")
+    return re.sub(r"\s+", " ", topic).strip()
+
+
+def outline_cache_key(
+    topic: str,
+    images: Optional[List[bytes]],
+    prompt_template: str,
+    provider_name: str,
+    provider_config: Dict[str, Any],
+    params: Dict[str, Any]
+) -> str:
+    """
+    计算大纲缓存键
+
+    Args:
+        topic: 主题
+        images: 参考图片（按顺序参与计算）
+        prompt_template: 提示词模板原文
+        provider_name: 当前文本服务商名称
+        provider_config: 当前文本服务商配置
+        params: 实际使用的模型参数（model / temperature / max_output_tokens）
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    material = {
+        "version": CACHE_FORMAT_VERSION,
+        "topic": normalize_topic(topic),
+        "images": [hashlib.sha256(image).hexdigest() for image in images or []],
+        "template": hashlib.sha256(prompt_template.encode("utf-8")).hexdigest(),
+        "provider": provider_name,
+        "provider_config": {field: provider_config.get(field) for field in PROVIDER_KEY_FIELDS},
+        "params": params,
+    }
+    encoded = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class OutlineCache:
+    """大纲结果缓存（SQLite，线程和进程间共享）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outline_cache (
+            cache_key TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_outline_cache_created ON outline_cache(created_at);
+        CREATE INDEX IF NOT EXISTS idx_outline_cache_accessed ON outline_cache(accessed_at);
+    """
+
+    def __init__(self, db_path: str, ttl: float, max_entries: int):
+        """
+        Args:
+            db_path: 数据库文件路径
+            ttl: 条目有效期（秒）
+            max_entries: 最多保留的条目数
+        """
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.db = SQLiteDatabase(db_path, self.SCHEMA)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的大纲
+
+        Returns:
+            generate_outline 的返回值；未命中或已过期时返回 None
+        """
+        now = time.time()
+        row = self.db.connection().execute(
+            "SELECT result, created_at FROM outline_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row["created_at"] > self.ttl:
+            return None
+        self.db.connection().execute(
+            "UPDATE outline_cache SET accessed_at = ? WHERE cache_key = ?", (now, key)
+        )
+        return json.loads(row["result"])
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """写入大纲，并清理过期和超出数量上限的条目"""
+        now = time.time()
+        encoded = json.dumps(result, ensure_ascii=False)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO outline_cache (cache_key, result, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, encoded, now, now)
+            )
+            conn.execute("DELETE FROM outline_cache WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM outline_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM outline_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+_cache_instance: Optional[OutlineCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_outline_cache() -> Optional[OutlineCache]:
+    """
+    获取全局大纲缓存
+
+    Returns:
+        OutlineCache 实例；OUTLINE_CACHE_TTL 不大于 0 时（缓存已关闭）返回 None
+    """
+    global _cache_instance
+    if not Config.OUTLINE_CACHE_TTL or Config.OUTLINE_CACHE_TTL <= 0:
+        return None
+    with _cache_lock:
+        if _cache_instance is None:
+            db_path = Config.OUTLINE_CACHE_DB or os.path.join(
+                Path(__file__).parent.parent.parent, "history", "outline_cache.db"
+            )
+            _cache_instance = OutlineCache(
+                db_path, Config.OUTLINE_CACHE_TTL, Config.OUTLINE_CACHE_MAX_ENTRIES
+            )
+            logger.info(f"大纲缓存: {db_path}（有效期 {Config.OUTLINE_CACHE_TTL} 秒）")
+        return _cache_instance
@@ -0,0 +1,450 @@
+"""任务状态存储
+
+保存图片生成任务的上下文（页面、大纲、封面参考图、用户参考图、各页结果及生成它的服务商），
+供 /retry、/retry-failed、/task/<task_id> 等接口使用。
+
+- 参考图片按内容 SHA-256 存为 blob，任务状态中只记录哈希
+- 超过 TTL 未更新的任务会被淘汰，不再被引用的 blob 随之删除
+- 默认使用 SQLite（WAL 模式），多个 worker 进程可共享同一份状态
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from backend.config import Config
+from backend.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+def _blob_hash(data: bytes) -> str:
+    """计算 blob 的内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class TaskStateStore(ABC):
+    """任务状态存储抽象基类"""
+
+    # 淘汰检查的最小间隔（秒）
+    EVICT_INTERVAL = 600
+
+    def __init__(self, ttl: float):
+        """
+        初始化存储
+
+        Args:
+            ttl: 任务状态的存活时间（秒），从最后一次更新开始计算
+        """
+        self.ttl = ttl
+        self._last_evict = 0.0
+
+    @abstractmethod
+    def create(
+        self,
+        task_id: str,
+        pages: List[Dict],
+        full_outline: str = "",
+        user_topic: str = "",
+        user_images: Optional[List[bytes]] = None
+    ):
+        """创建（或覆盖）任务状态"""
+        pass
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态
+
+        Returns:
+            与旧版内存字典结构相同的状态（cover_image / user_images 为图片字节），
+            任务不存在或已过期时返回 None
+        """
+        pass
+
+    @abstractmethod
+    def set_cover(self, task_id: str, image_data: bytes):
+        """保存封面参考图"""
+        pass
+
+    @abstractmethod
+    def set_outline(self, task_id: str, pages: List[Dict], full_outline: str):
+        """更新页面列表和大纲（一键生成模式下大纲在图片生成过程中才完成）"""
+        pass
+
+    @abstractmethod
+    def mark_generated(self, task_id: str, index: int, filename: str, provider: Optional[str] = None):
+        """记录页面生成成功及生成它的服务商线路（同时清除该页的失败记录）"""
+        pass
+
+    @abstractmethod
+    def mark_failed(self, task_id: str, index: int, error: str):
+        """记录页面生成失败"""
+        pass
+
+    @abstractmethod
+    def delete(self, task_id: str):
+        """删除任务状态"""
+        pass
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """
+        淘汰过期的任务状态
+
+        Returns:
+            被淘汰的任务数
+        """
+        pass
+
+    def maybe_evict(self):
+        """距离上次淘汰超过 EVICT_INTERVAL 时执行一次淘汰"""
+        now = time.time()
+        if now - self._last_evict < self.EVICT_INTERVAL:
+            return
+        self._last_evict = now
+        try:
+            evicted = self.evict_expired()
+            if evicted:
+                logger.info(f"🧹 已淘汰 {evicted} 个过期任务状态")
+        except Exception as e:
+            logger.warning(f"淘汰过期任务状态失败: {e}")
+
+
+class MemoryTaskStateStore(TaskStateStore):
+    """进程内存储（单进程部署或调试使用）"""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _put_blob(self, data: bytes) -> str:
+        digest = _blob_hash(data)
+        self._blobs.setdefault(digest, data)
+        return digest
+
+    def _drop_unreferenced_blobs(self):
+        referenced = set()
+        for task in self._tasks.values():
+            if task["cover_hash"]:
+                referenced.add(task["cover_hash"])
+            referenced.update(task["user_image_hashes"])
+        for digest in list(self._blobs):
+            if digest not in referenced:
+                del self._blobs[digest]
+
+    def create(self, task_id, pages, full_outline="", user_topic="", user_images=None):
+        self.maybe_evict()
+        with self._lock:
+            self._tasks[task_id] = {
+                "pages": pages,
+                "generated": {},
+                "failed": {},
+                "providers": {},
+                "cover_hash": None,
+                "full_outline": full_outline,
+                "user_image_hashes": [self._put_blob(img) for img in user_images or []],
+                "user_topic": user_topic,
+                "updated_at": time.time()
+            }
+            self._drop_unreferenced_blobs()
+
+    def get(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or time.time() - task["updated_at"] > self.ttl:
+                return None
+            return {
+                "pages": task["pages"],
+                "generated": dict(task["generated"]),
+                "failed": dict(task["failed"]),
+                "providers": dict(task["providers"]),
+                "cover_image": self._blobs.get(task["cover_hash"]) if task["cover_hash"] else None,
+                "full_outline": task["full_outline"],
+                "user_images": [self._blobs[h] for h in task["user_image_hashes"]] or None,
+                "user_topic": task["user_topic"]
+            }
+
+    def set_cover(self, task_id, image_data):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["cover_hash"] = self._put_blob(image_data)
+                task["updated_at"] = time.time()
+                self._drop_unreferenced_blobs()
+
+    def set_outline(self, task_id, pages, full_outline):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["pages"] = pages
+                task["full_outline"] = full_outline
+                task["updated_at"] = time.time()
+
+    def mark_generated(self, task_id, index, filename, provider=None):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["generated"][index] = filename
+                task["failed"].pop(index, None)
+                if provider:
+                    task["providers"][index] = provider
+                task["updated_at"] = time.time()
+
+    def mark_failed(self, task_id, index, error):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["failed"][index] = error
+                task["updated_at"] = time.time()
+
+    def delete(self, task_id):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._drop_unreferenced_blobs()
+
+    def evict_expired(self):
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [tid for tid, task in self._tasks.items() if task["updated_at"] < deadline]
+            for task_id in expired:
+                del self._tasks[task_id]
+            self._drop_unreferenced_blobs()
+        return len(expired)
+
+
+class SQLiteTaskStateStore(TaskStateStore):
+    """基于 SQLite 的存储（WAL 模式，可被多个 worker 进程共享）"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            pages TEXT NOT NULL,
+            full_outline TEXT NOT NULL DEFAULT '',
+            user_topic TEXT NOT NULL DEFAULT '',
+            cover_hash TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at);
+
+        CREATE TABLE IF NOT EXISTS task_pages (
+            task_id TEXT NOT NULL,
+            page_index INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (task_id, page_index)
+        );
+
+        CREATE TABLE IF NOT EXISTS task_page_providers (
+            task_id TEXT NOT NULL,
+            page_index INTEGER NOT NULL,
+            provider TEXT NOT NULL,
+            PRIMARY KEY (task_id, page_index)
+        );
+
+        CREATE TABLE IF NOT EXISTS task_blobs (
+            task_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            blob_hash TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_task_blobs_hash ON task_blobs(blob_hash);
+
+        CREATE TABLE IF NOT EXISTS blobs (
+            blob_hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str, ttl: float):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径
+            ttl: 任务状态的存活时间（秒）
+        """
+        super().__init__(ttl)
+        self.db = SQLiteDatabase(db_path, self.SCHEMA)
+
+    def _put_blob(self, conn: sqlite3.Connection, data: bytes) -> str:
+        digest = _blob_hash(data)
+        conn.execute(
+            "INSERT OR IGNORE INTO blobs (blob_hash, data) VALUES (?, ?)",
+            (digest, sqlite3.Binary(data))
+        )
+        return digest
+
+    def _get_blob(self, conn: sqlite3.Connection, digest: str) -> Optional[bytes]:
+        row = conn.execute("SELECT data FROM blobs WHERE blob_hash = ?", (digest,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def _drop_unreferenced_blobs(self, conn: sqlite3.Connection):
+        conn.execute(
+            "DELETE FROM blobs WHERE blob_hash NOT IN ("
+            "  SELECT blob_hash FROM task_blobs"
+            "  UNION SELECT cover_hash FROM tasks WHERE cover_hash IS NOT NULL"
+            ")"
+        )
+
+    def _delete_task(self, conn: sqlite3.Connection, task_id: str):
+        conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        conn.execute("DELETE FROM task_pages WHERE task_id = ?", (task_id,))
+        conn.execute("DELETE FROM task_page_providers WHERE task_id = ?", (task_id,))
+        conn.execute("DELETE FROM task_blobs WHERE task_id = ?", (task_id,))
+
+    def create(self, task_id, pages, full_outline="", user_topic="", user_images=None):
+        self.maybe_evict()
+        with self.db.transaction() as conn:
+            self._delete_task(conn, task_id)
+            conn.execute(
+                "INSERT INTO tasks (task_id, pages, full_outline, user_topic, cover_hash, updated_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                (task_id, json.dumps(pages, ensure_ascii=False), full_outline or "",
+                 user_topic or "", time.time())
+            )
+            for position, image_data in enumerate(user_images or []):
+                conn.execute(
+                    "INSERT INTO task_blobs (task_id, position, blob_hash) VALUES (?, ?, ?)",
+                    (task_id, position, self._put_blob(conn, image_data))
+                )
+            self._drop_unreferenced_blobs(conn)
+
+    def get(self, task_id):
+        conn = self.db.connection()
+        row = conn.execute(
+            "SELECT pages, full_outline, user_topic, cover_hash, updated_at FROM tasks WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if row is None or time.time() - row[4] > self.ttl:
+            return None
+
+        pages, full_outline, user_topic, cover_hash, _ = row
+
+        generated, failed = {}, {}
+        for page_index, status, value in conn.execute(
+            "SELECT page_index, status, value FROM task_pages WHERE task_id = ?", (task_id,)
+        ):
+            (generated if status == "generated" else failed)[page_index] = value
+
+        providers = dict(conn.execute(
+            "SELECT page_index, provider FROM task_page_providers WHERE task_id = ?", (task_id,)
+        ).fetchall())
+
+        user_images = []
+        for (digest,) in conn.execute(
+            "SELECT blob_hash FROM task_blobs WHERE task_id = ? ORDER BY position", (task_id,)
+        ):
+            image_data = self._get_blob(conn, digest)
+            if image_data is not None:
+                user_images.append(image_data)
+
+        return {
+            "pages": json.loads(pages),
+            "generated": generated,
+            "failed": failed,
+            "providers": providers,
+            "cover_image": self._get_blob(conn, cover_hash) if cover_hash else None,
+            "full_outline": full_outline,
+            "user_images": user_images or None,
+            "user_topic": user_topic
+        }
+
+    def set_cover(self, task_id, image_data):
+        with self.db.transaction() as conn:
+            cover_hash = self._put_blob(conn, image_data)
+            conn.execute(
+                "UPDATE tasks SET cover_hash = ?, updated_at = ? WHERE task_id = ?",
+                (cover_hash, time.time(), task_id)
+            )
+            self._drop_unreferenced_blobs(conn)
+
+    def set_outline(self, task_id, pages, full_outline):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET pages = ?, full_outline = ?, updated_at = ? WHERE task_id = ?",
+                (json.dumps(pages, ensure_ascii=False), full_outline or "", time.time(), task_id)
+            )
+
+    def _set_page(self, task_id: str, index: int, status: str, value: str, provider: Optional[str] = None):
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET updated_at = ? WHERE task_id = ?", (time.time(), task_id)
+            )
+            if cursor.rowcount:
+                conn.execute(
+                    "INSERT OR REPLACE INTO task_pages (task_id, page_index, status, value) "
+                    "VALUES (?, ?, ?, ?)",
+                    (task_id, index, status, value)
+                )
+                if provider:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO task_page_providers (task_id, page_index, provider) "
+                        "VALUES (?, ?, ?)",
+                        (task_id, index, provider)
+                    )
+
+    def mark_generated(self, task_id, index, filename, provider=None):
+        self._set_page(task_id, index, "generated", filename, provider)
+
+    def mark_failed(self, task_id, index, error):
+        self._set_page(task_id, index, "failed", error)
+
+    def delete(self, task_id):
+        with self.db.transaction() as conn:
+            self._delete_task(conn, task_id)
+            self._drop_unreferenced_blobs(conn)
+
+    def evict_expired(self):
+        deadline = time.time() - self.ttl
+        with self.db.transaction() as conn:
+            expired = [
+                task_id for (task_id,) in
+                conn.execute("SELECT task_id FROM tasks WHERE updated_at < ?", (deadline,))
+            ]
+            for task_id in expired:
+                self._delete_task(conn, task_id)
+            if expired:
+                self._drop_unreferenced_blobs(conn)
+        return len(expired)
+
+
+# 注册的存储后端
+TASK_STATE_BACKENDS = {
+    'sqlite': SQLiteTaskStateStore,
+    'memory': MemoryTaskStateStore,
+}
+
+
+def create_task_state_store(history_root_dir: str) -> TaskStateStore:
+    """
+    根据配置创建任务状态存储
+
+    Args:
+        history_root_dir: 历史记录根目录（SQLite 数据库默认放在此目录下）
+
+    Returns:
+        TaskStateStore 实例
+    """
+    backend = Config.TASK_STATE_BACKEND
+    if backend not in TASK_STATE_BACKENDS:
+        available = ', '.join(TASK_STATE_BACKENDS.keys())
+        raise ValueError(
+            f"不支持的任务状态存储: {backend}\n"
+            f"支持的存储类型: {available}"
+        )
+
+    if backend == 'sqlite':
+        db_path = Config.TASK_STATE_DB or os.path.join(history_root_dir, "task_states.db")
+        logger.debug(f"任务状态存储: sqlite ({db_path})")
+        return SQLiteTaskStateStore(db_path, Config.TASK_STATE_TTL)
+
+    logger.debug(f"任务状态存储: {backend}")
+    return TASK_STATE_BACKENDS[backend](Config.TASK_STATE_TTL)
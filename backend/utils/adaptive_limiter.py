@@ -0,0 +1,293 @@
+"""服务商自适应并发控制（AIMD）
+
+每个图片服务商一个并发限制器，所有任务共享：
+- 请求成功且延迟正常：并发上限加性增长（每一轮约 +1）
+- 遇到 429 限流：并发上限减半
+- 遇到 5xx / 超时 / 网络错误：并发上限乘以 0.75
+- 延迟明显高于基线（服务商开始排队）：并发上限乘以 0.9
+
+同一轮拥塞只降低一次：降低之前已经发出的请求再报告失败时不再重复降低。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from .retry_policy import classify_error
+
+logger = logging.getLogger(__name__)
+
+# 默认配置（可在服务商配置中通过 max_concurrency / min_concurrency / initial_concurrency 覆盖）
+DEFAULT_MAX_CONCURRENCY = 15
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_INITIAL_CONCURRENCY = 4
+
+# 各类错误对应的并发上限乘数
+BACKOFF_FACTORS = {
+    "throttle": 0.5,
+    "server": 0.75,
+    "timeout": 0.75,
+    "network": 0.75,
+}
+LATENCY_BACKOFF = 0.9
+# 延迟超过基线的多少倍视为拥塞
+LATENCY_TOLERANCE = 2.0
+# 延迟 EWMA 的平滑系数
+LATENCY_SMOOTHING = 0.2
+
+
+class _Waiter:
+    """等待并发名额的请求"""
+
+    __slots__ = ("future", "loop", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+class _Ticket:
+    """一次占用的并发名额"""
+
+    __slots__ = ("seq", "saturated", "started")
+
+    def __init__(self, seq: int, saturated: bool):
+        self.seq = seq
+        self.saturated = saturated
+        # 请求开始时间（计算延迟用）
+        self.started = time.monotonic()
+
+    def restart(self):
+        """重新开始计时（拿到名额后还要等待其他配额时，等待时间不计入延迟）"""
+        self.started = time.monotonic()
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器（线程安全，可在任意事件循环中使用）"""
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int = DEFAULT_MAX_CONCURRENCY,
+        min_limit: int = DEFAULT_MIN_CONCURRENCY,
+        initial_limit: int = DEFAULT_INITIAL_CONCURRENCY
+    ):
+        """
+        Args:
+            name: 限制器名称（服务商名称）
+            max_limit: 并发上限的最大值
+            min_limit: 并发上限的最小值
+            initial_limit: 初始并发上限
+        """
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+        self._next_seq = 0
+        self._last_decrease_seq = 0
+
+        self._latency_ewma: Optional[float] = None
+        self._latency_baseline: Optional[float] = None
+
+        self._counts = {"success": 0, "throttle": 0, "server": 0, "timeout": 0, "network": 0, "client": 0, "other": 0}
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def load(self) -> int:
+        """进行中和等待中的请求数"""
+        with self._lock:
+            return self._in_flight + len(self._waiters)
+
+    def settings(self):
+        """限制器参数（用于判断配置是否变化）"""
+        return self.max_limit, self.min_limit
+
+    def _wake_waiters(self):
+        """按当前上限放行等待的请求（持有锁时调用）"""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.future.cancelled():
+                continue
+            waiter.granted = True
+            self._in_flight += 1
+            waiter.loop.call_soon_threadsafe(_set_granted, waiter.future)
+
+    async def acquire(self) -> _Ticket:
+        """等待一个并发名额"""
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                return self._issue_ticket()
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # 名额已经分配但调用方被取消，归还名额
+                    self._in_flight -= 1
+                    self._wake_waiters()
+                else:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+            raise
+
+        with self._lock:
+            return self._issue_ticket()
+
+    def _issue_ticket(self) -> _Ticket:
+        self._next_seq += 1
+        return _Ticket(self._next_seq, saturated=self._in_flight >= self.limit or bool(self._waiters))
+
+    def release(self, ticket: _Ticket, outcome: str, latency: Optional[float] = None):
+        """
+        归还名额并根据结果调整并发上限
+
+        Args:
+            ticket: acquire 返回的名额
+            outcome: 'success' 或 classify_error 的结果
+            latency: 请求耗时（秒），仅在成功时使用
+        """
+        with self._lock:
+            self._in_flight -= 1
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+            old_limit = self._limit
+
+            if outcome == "success" and latency is not None:
+                congested = self._observe_latency(latency)
+                if congested:
+                    self._decrease(ticket, LATENCY_BACKOFF)
+                elif ticket.saturated:
+                    # 加性增长：每完成约一轮（limit 个请求）上限 +1
+                    self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            elif outcome in BACKOFF_FACTORS:
+                self._decrease(ticket, BACKOFF_FACTORS[outcome])
+
+            if int(self._limit) != int(old_limit):
+                logger.info(
+                    f"🎚️ [{self.name}] 并发上限 {int(old_limit)} → {self.limit} "
+                    f"(原因: {outcome}, 进行中: {self._in_flight})"
+                )
+
+            self._wake_waiters()
+
+    def _observe_latency(self, latency: float) -> bool:
+        """记录一次成功请求的耗时，返回是否处于拥塞（持有锁时调用）"""
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+            self._latency_baseline = latency
+            return False
+
+        self._latency_ewma += LATENCY_SMOOTHING * (latency - self._latency_ewma)
+        if latency < self._latency_baseline:
+            self._latency_baseline = latency
+        else:
+            # 基线缓慢上浮，适应服务商整体变慢
+            self._latency_baseline += 0.01 * (latency - self._latency_baseline)
+        return self._latency_ewma > self._latency_baseline * LATENCY_TOLERANCE
+
+    def _decrease(self, ticket: _Ticket, factor: float):
+        """乘性降低（同一轮拥塞只降低一次，持有锁时调用）"""
+        if ticket.seq <= self._last_decrease_seq:
+            return
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        self._last_decrease_seq = self._next_seq
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[_Ticket]:
+        """
+        占用一个并发名额执行上游请求，并根据结果自动调整上限
+
+        用法：
+            async with limiter.slot():
+                await generator.agenerate_image(...)
+
+        Yields:
+            占用的名额（可调用 restart() 重新开始计时）
+        """
+        ticket = await self.acquire()
+        ticket.restart()
+        try:
+            yield ticket
+        except asyncio.CancelledError:
+            self.release(ticket, "other")
+            raise
+        except Exception as e:
+            self.release(ticket, classify_error(e))
+            raise
+        else:
+            self.release(ticket, "success", time.monotonic() - ticket.started)
+
+    def stats(self) -> Dict[str, Any]:
+        """当前状态"""
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "latency_ms": round(self._latency_ewma * 1000) if self._latency_ewma is not None else None,
+                "baseline_latency_ms": (
+                    round(self._latency_baseline * 1000) if self._latency_baseline is not None else None
+                ),
+                "outcomes": dict(self._counts),
+            }
+
+
+def _set_granted(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(name: str, config: Optional[Dict[str, Any]] = None) -> AdaptiveLimiter:
+    """
+    获取（或创建）服务商的并发限制器
+
+    同名限制器只创建一次，所有任务共享；max/min 配置变化时重建。
+
+    Args:
+        name: 服务商名称
+        config: 服务商配置，可包含 max_concurrency / min_concurrency / initial_concurrency
+
+    Returns:
+        AdaptiveLimiter 实例
+    """
+    config = config or {}
+    max_limit = int(config.get('max_concurrency') or DEFAULT_MAX_CONCURRENCY)
+    min_limit = int(config.get('min_concurrency') or DEFAULT_MIN_CONCURRENCY)
+    initial_limit = int(config.get('initial_concurrency') or min(DEFAULT_INITIAL_CONCURRENCY, max_limit))
+
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None or limiter.settings() != (max(1, max_limit), max(1, min(min_limit, max(1, max_limit)))):
+            limiter = AdaptiveLimiter(name, max_limit, min_limit, initial_limit)
+            _limiters[name] = limiter
+        return limiter
+
+
+def get_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有服务商的并发状态"""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return {name: limiter.stats() for name, limiter in limiters}
@@ -0,0 +1,180 @@
+"""后台 asyncio 事件循环
+
+Flask 路由是同步的，图片生成引擎是 asyncio 的。本模块在一个守护线程中
+运行全局事件循环，同步代码通过它提交协程、或逐个消费异步生成器产出的事件。
+"""
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 异步生成器结束标记
+_DONE = object()
+
+
+class _RaisedError:
+    """在队列中传递异步生成器抛出的异常"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class AsyncRunner:
+    """在独立线程中运行的 asyncio 事件循环"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """获取事件循环（首次访问时启动后台线程）"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._run_loop,
+                    name="async-engine",
+                    daemon=True
+                )
+                self._thread.start()
+                logger.debug("后台事件循环已启动")
+        return self._loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        """当前线程是否就是事件循环线程"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        提交协程到后台事件循环
+
+        Args:
+            coro: 协程对象
+
+        Returns:
+            concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        在后台事件循环中运行协程并阻塞等待结果
+
+        Args:
+            coro: 协程对象
+            timeout: 超时时间（秒）
+
+        Returns:
+            协程返回值
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("不能在事件循环线程中同步等待协程，请直接 await")
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """
+        以同步方式逐个消费异步生成器的产出（用于 SSE 响应）
+
+        同步迭代器被关闭时（如客户端断开连接），后台的异步生成器会被取消。
+
+        Args:
+            agen: 异步生成器
+
+        Yields:
+            异步生成器产出的每一项
+        """
+        items: "queue.Queue[Any]" = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+            except BaseException as e:
+                items.put(_RaisedError(e))
+                if not isinstance(e, Exception):
+                    raise
+            finally:
+                items.put(_DONE)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = items.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _RaisedError):
+                    if isinstance(item.error, asyncio.CancelledError):
+                        break
+                    raise item.error
+                yield item
+        finally:
+            if not future.done():
+                future.cancel()
+
+
+async def aiterate_in_thread(iterable: Iterable) -> AsyncIterator:
+    """
+    在线程中消费同步迭代器，以异步迭代器的方式产出（iterate 的反向，用于阻塞的流式 HTTP 响应）
+
+    异步迭代被取消或提前结束时，线程在取得下一项后关闭同步迭代器。
+
+    Args:
+        iterable: 同步迭代器（如流式文本生成）
+
+    Yields:
+        同步迭代器产出的每一项
+    """
+    loop = asyncio.get_running_loop()
+    items: "asyncio.Queue[Any]" = asyncio.Queue()
+    stopped = threading.Event()
+
+    def pump():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        except BaseException as e:
+            loop.call_soon_threadsafe(items.put_nowait, _RaisedError(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            loop.call_soon_threadsafe(items.put_nowait, _DONE)
+
+    loop.run_in_executor(None, pump)
+    try:
+        while True:
+            item = await items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _RaisedError):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
+
+_runner_instance: Optional[AsyncRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_async_runner() -> AsyncRunner:
+    """获取全局后台事件循环"""
+    global _runner_instance
+    with _runner_lock:
+        if _runner_instance is None:
+            _runner_instance = AsyncRunner()
+    return _runner_instance
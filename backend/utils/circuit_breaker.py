@@ -0,0 +1,339 @@
+"""服务商熔断器与健康评分
+
+每个图片服务商一个熔断器，所有任务共享：
+- closed（正常）：记录最近一段时间的请求结果和耗时
+- open（熔断）：最近错误率过高或连续失败，新请求直接失败，不再逐页重试
+- half_open（探测）：熔断一段时间后只放行少量探测请求，成功则恢复，失败则再次熔断（熔断时间加倍）
+
+只有 5xx / 超时 / 网络错误算作服务商故障；429 限流由并发限制器处理，
+4xx 参数错误、安全过滤等说明服务商本身可用，按成功计入。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from .retry_policy import UpstreamError, classify_error
+
+logger = logging.getLogger(__name__)
+
+# 默认配置（可在服务商配置中通过 breaker_* 覆盖）
+DEFAULT_FAILURE_RATE = 0.5  # 窗口内错误率达到该值时熔断
+DEFAULT_MIN_REQUESTS = 5  # 窗口内至少有这么多请求才按错误率判断
+DEFAULT_CONSECUTIVE_FAILURES = 5  # 连续失败次数达到该值时熔断
+DEFAULT_WINDOW = 60  # 统计窗口（秒）
+DEFAULT_OPEN_SECONDS = 30  # 熔断后多久开始探测（秒）
+DEFAULT_SLOW_LATENCY = 120  # 平均耗时超过该值（秒）时健康分开始下降
+
+MAX_OPEN_SECONDS = 300  # 连续探测失败时熔断时间的上限（秒）
+HALF_OPEN_PROBES = 1  # 探测状态下同时放行的请求数
+
+# 计为服务商故障的错误类型
+FAILURE_KINDS = ("server", "timeout", "network")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(UpstreamError):
+    """服务商处于熔断状态（不重试）"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(
+            f"图片服务商 {name} 暂时不可用（已熔断，约 {max(1, round(retry_in))} 秒后自动探测恢复）\n"
+            "可能原因：\n"
+            "1. 服务商接口持续返回 5xx 错误\n"
+            "2. 服务商响应过慢或网络不通\n"
+            "解决方案：\n"
+            "1. 稍后重试失败的图片\n"
+            "2. 在系统设置中切换到其他图片服务商",
+            retry_after=retry_in,
+            retryable=False
+        )
+        self.provider = name
+
+
+class CircuitBreaker:
+    """服务商熔断器（线程安全，可在任意事件循环中使用）"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        min_requests: int = DEFAULT_MIN_REQUESTS,
+        consecutive_failures: int = DEFAULT_CONSECUTIVE_FAILURES,
+        window: float = DEFAULT_WINDOW,
+        open_seconds: float = DEFAULT_OPEN_SECONDS,
+        slow_latency: float = DEFAULT_SLOW_LATENCY
+    ):
+        """
+        Args:
+            name: 熔断器名称（服务商名称）
+            failure_rate: 触发熔断的错误率
+            min_requests: 按错误率判断所需的最少请求数
+            consecutive_failures: 触发熔断的连续失败次数
+            window: 统计窗口（秒）
+            open_seconds: 熔断后开始探测的等待时间（秒）
+            slow_latency: 健康评分的耗时基准（秒）
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = max(1, min_requests)
+        self.consecutive_failures = max(1, consecutive_failures)
+        self.window = window
+        self.open_seconds = open_seconds
+        self.slow_latency = slow_latency
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        # 窗口内的请求结果：(时间, 是否失败, 耗时)
+        self._events: Deque[Tuple[float, bool, Optional[float]]] = deque()
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._current_open_seconds = open_seconds
+        self._probes = 0
+        self._trips = 0
+
+    def settings(self):
+        """熔断器参数（用于判断配置是否变化）"""
+        return (
+            self.failure_rate, self.min_requests, self.consecutive_failures,
+            self.window, self.open_seconds, self.slow_latency
+        )
+
+    @property
+    def state(self) -> str:
+        """当前状态（closed / open / half_open）"""
+        with self._lock:
+            return self._state
+
+    @property
+    def available(self) -> bool:
+        """是否可以放行新请求（熔断中且未到探测时间、或探测名额已满时为 False）"""
+        with self._lock:
+            if self._state == OPEN:
+                return time.monotonic() >= self._opened_at + self._current_open_seconds
+            if self._state == HALF_OPEN:
+                return self._probes < HALF_OPEN_PROBES
+            return True
+
+    @property
+    def retry_in(self) -> float:
+        """距离下次探测的秒数（未熔断时为 0）"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._current_open_seconds - time.monotonic())
+
+    def _trim(self, now: float):
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+    def _open(self, now: float, reason: str):
+        """进入熔断状态（持有锁时调用）"""
+        if self._state == HALF_OPEN:
+            self._current_open_seconds = min(MAX_OPEN_SECONDS, self._current_open_seconds * 2)
+        else:
+            self._current_open_seconds = self.open_seconds
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._trips += 1
+        logger.warning(
+            f"🔴 [{self.name}] 熔断打开（{reason}），{self._current_open_seconds:.0f} 秒后开始探测"
+        )
+
+    def before_request(self) -> bool:
+        """
+        请求前检查是否放行
+
+        Returns:
+            是否为探测请求
+
+        Raises:
+            CircuitOpenError: 服务商处于熔断状态
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN:
+                retry_in = self._opened_at + self._current_open_seconds - now
+                if retry_in > 0:
+                    raise CircuitOpenError(self.name, retry_in)
+                self._state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"🟡 [{self.name}] 熔断进入探测状态")
+
+            if self._state == HALF_OPEN:
+                if self._probes >= HALF_OPEN_PROBES:
+                    raise CircuitOpenError(self.name, 1)
+                self._probes += 1
+                return True
+            return False
+
+    def record(self, outcome: str, latency: Optional[float] = None, probe: bool = False):
+        """
+        记录一次请求结果
+
+        Args:
+            outcome: 'success' 或 classify_error 的结果
+            latency: 请求耗时（秒）
+            probe: 是否为探测请求（before_request 的返回值）
+        """
+        if outcome == "throttle":
+            # 限流说明服务商在线，交给并发限制器处理
+            self.cancel(probe)
+            return
+
+        failed = outcome in FAILURE_KINDS
+        with self._lock:
+            now = time.monotonic()
+            self._events.append((now, failed, latency if not failed else None))
+            self._trim(now)
+            self._consecutive = self._consecutive + 1 if failed else 0
+
+            if probe and self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed:
+                    self._open(now, f"探测失败: {outcome}")
+                else:
+                    self._state = CLOSED
+                    self._events.clear()
+                    self._consecutive = 0
+                    self._current_open_seconds = self.open_seconds
+                    logger.info(f"🟢 [{self.name}] 探测成功，熔断关闭")
+                return
+
+            if not failed or self._state != CLOSED:
+                return
+            if self._consecutive >= self.consecutive_failures:
+                self._open(now, f"连续失败 {self._consecutive} 次")
+                return
+            total = len(self._events)
+            failures = sum(1 for event in self._events if event[1])
+            if total >= self.min_requests and failures / total >= self.failure_rate:
+                self._open(now, f"错误率 {failures}/{total}")
+
+    def cancel(self, probe: bool):
+        """请求被取消（或结果不计入）时归还探测名额"""
+        if not probe:
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        熔断保护下执行上游请求，并记录结果
+
+        用法：
+            async with breaker.guard():
+                await generator.agenerate_image(...)
+
+        Raises:
+            CircuitOpenError: 服务商处于熔断状态（不会执行请求）
+        """
+        probe = self.before_request()
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.cancel(probe)
+            raise
+        except Exception as e:
+            self.record(classify_error(e), time.monotonic() - started, probe)
+            raise
+        else:
+            self.record("success", time.monotonic() - started, probe)
+
+    def _health_score(self, total: int, failures: int, latencies) -> int:
+        """健康评分 0-100：成功率 × 耗时系数（持有锁时调用）"""
+        if self._state == OPEN:
+            return 0
+        if total == 0:
+            score = 100
+        else:
+            score = 100 * (1 - failures / total)
+            if latencies:
+                average = sum(latencies) / len(latencies)
+                if average > self.slow_latency:
+                    score *= self.slow_latency / average
+        if self._state == HALF_OPEN:
+            score = min(score, 50)
+        return round(score)
+
+    def stats(self) -> Dict[str, Any]:
+        """当前状态和滚动窗口内的健康指标"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            total = len(self._events)
+            failures = sum(1 for event in self._events if event[1])
+            latencies = sorted(event[2] for event in self._events if event[2] is not None)
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0, round(self._opened_at + self._current_open_seconds - now))
+            return {
+                "state": self._state,
+                "health_score": self._health_score(total, failures, latencies),
+                "requests": total,
+                "failures": failures,
+                "error_rate": round(failures / total, 3) if total else 0.0,
+                "consecutive_failures": self._consecutive,
+                "latency_ms": round(sum(latencies) / len(latencies) * 1000) if latencies else None,
+                "p95_latency_ms": (
+                    round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000)
+                    if latencies else None
+                ),
+                "retry_in": retry_in,
+                "trips": self._trips,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, config: Optional[Dict[str, Any]] = None) -> CircuitBreaker:
+    """
+    获取（或创建）服务商的熔断器
+
+    同名熔断器只创建一次，所有任务共享；配置变化时重建。
+
+    Args:
+        name: 服务商名称
+        config: 服务商配置，可包含 breaker_failure_rate / breaker_min_requests /
+                breaker_consecutive_failures / breaker_window / breaker_open_seconds /
+                breaker_slow_latency
+
+    Returns:
+        CircuitBreaker 实例
+    """
+    config = config or {}
+    breaker = CircuitBreaker(
+        name,
+        failure_rate=float(config.get('breaker_failure_rate') or DEFAULT_FAILURE_RATE),
+        min_requests=int(config.get('breaker_min_requests') or DEFAULT_MIN_REQUESTS),
+        consecutive_failures=int(config.get('breaker_consecutive_failures') or DEFAULT_CONSECUTIVE_FAILURES),
+        window=float(config.get('breaker_window') or DEFAULT_WINDOW),
+        open_seconds=float(config.get('breaker_open_seconds') or DEFAULT_OPEN_SECONDS),
+        slow_latency=float(config.get('breaker_slow_latency') or DEFAULT_SLOW_LATENCY),
+    )
+
+    with _breakers_lock:
+        existing = _breakers.get(name)
+        if existing is not None and existing.settings() == breaker.settings():
+            return existing
+        _breakers[name] = breaker
+        return breaker
+
+
+def get_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有服务商的熔断状态和健康评分"""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {name: breaker.stats() for name, breaker in breakers}
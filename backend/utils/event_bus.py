@@ -0,0 +1,163 @@
+"""进程内事件总线（按 task_id 发布/订阅）
+
+生成任务的进度事件除了写入持久化事件日志，还发布到本进程的事件总线：
+- 每个任务一个主题，保留最近的若干个事件（有界重放缓冲区）
+- 订阅者各自记录读到的位置，任意多个 SSE 连接读同一份缓冲区，发布者只负责追加和唤醒，
+  不会被读得慢的订阅者拖住
+- 订阅者落后太多（需要的事件已经被挤出缓冲区）、或任务不在本进程执行时，
+  由调用方回退到持久化事件日志
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.config import Config
+
+# 每个主题保留的事件数
+DEFAULT_BUFFER_SIZE = 256
+# 主题关闭后继续保留的时间（秒），方便刚断开的客户端重连
+CLOSED_TOPIC_TTL = 60
+# 读取和关闭主题时清理过期主题的最小间隔（秒）
+EVICT_INTERVAL = 5
+
+# (事件 ID, 事件类型, JSON 数据)
+BusEvent = Tuple[int, str, str]
+
+
+class BusRead(NamedTuple):
+    """一次读取的结果"""
+    events: List[BusEvent]
+    # 发布者已经结束（不会再有新事件）
+    closed: bool
+
+
+class _Topic:
+    def __init__(self, after_id: int, buffer_size: int):
+        self.events: Deque[BusEvent] = deque(maxlen=buffer_size)
+        # 缓冲区覆盖 (covered_after, 最新事件] 区间内的所有事件
+        self.covered_after = after_id
+        self.closed_at: Optional[float] = None
+        self.changed = threading.Condition()
+
+
+class EventBus:
+    """按主题发布/订阅事件的进程内总线（线程安全）"""
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Args:
+            buffer_size: 每个主题保留的事件数
+        """
+        self.buffer_size = max(1, buffer_size)
+        self._topics: Dict[str, _Topic] = {}
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+
+    def open(self, key: str, after_id: int = 0):
+        """
+        开始发布主题（发布者调用）
+
+        Args:
+            key: 主题（task_id）
+            after_id: 该主题在持久化日志中已有的最后一个事件 ID，之前的事件不在缓冲区中
+        """
+        with self._lock:
+            self._evict()
+            self._topics[key] = _Topic(after_id, self.buffer_size)
+
+    def publish(self, key: str, event_id: int, event: str, data: str):
+        """
+        发布事件（主题未打开时忽略）
+
+        Args:
+            key: 主题
+            event_id: 事件 ID（单调递增）
+            event: 事件类型
+            data: 序列化后的 JSON 数据（所有订阅者共用）
+        """
+        topic = self._topics.get(key)
+        if topic is None:
+            return
+        with topic.changed:
+            if len(topic.events) == topic.events.maxlen:
+                topic.covered_after = topic.events[0][0]
+            topic.events.append((event_id, event, data))
+            topic.changed.notify_all()
+
+    def close(self, key: str):
+        """结束发布（缓冲区继续保留一段时间）"""
+        self._maybe_evict()
+        topic = self._topics.get(key)
+        if topic is None:
+            return
+        with topic.changed:
+            topic.closed_at = time.monotonic()
+            topic.changed.notify_all()
+
+    def read(self, key: str, after_id: int, timeout: float = 0) -> Optional[BusRead]:
+        """
+        读取 after_id 之后的事件，没有新事件时最多等待 timeout 秒
+
+        Args:
+            key: 主题
+            after_id: 订阅者已经收到的最后一个事件 ID
+            timeout: 等待时间（秒）
+
+        Returns:
+            BusRead；主题不在本进程、或需要的事件已经被挤出缓冲区时返回 None（应读取持久化日志）
+        """
+        self._maybe_evict()
+        topic = self._topics.get(key)
+        if topic is None:
+            return None
+        with topic.changed:
+            if after_id < topic.covered_after:
+                return None
+            if timeout > 0 and topic.closed_at is None and not self._has_after(topic, after_id):
+                topic.changed.wait(timeout)
+                if after_id < topic.covered_after:
+                    return None
+            events = [item for item in topic.events if item[0] > after_id]
+            return BusRead(events, topic.closed_at is not None)
+
+    @staticmethod
+    def _has_after(topic: _Topic, after_id: int) -> bool:
+        return bool(topic.events) and topic.events[-1][0] > after_id
+
+    def _maybe_evict(self):
+        """距离上次清理超过 EVICT_INTERVAL 时清理过期主题（任务结束后没有新任务开始时也能清理）"""
+        if time.monotonic() - self._last_evict < EVICT_INTERVAL:
+            return
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """删除关闭已久的主题（持有 _lock 时调用）"""
+        now = time.monotonic()
+        self._last_evict = now
+        expired = [
+            key for key, topic in self._topics.items()
+            if topic.closed_at is not None and now - topic.closed_at > CLOSED_TOPIC_TTL
+        ]
+        for key in expired:
+            del self._topics[key]
+
+    def stats(self) -> Dict[str, int]:
+        """主题数量（用于健康检查）"""
+        with self._lock:
+            live = sum(1 for topic in self._topics.values() if topic.closed_at is None)
+            return {"topics": len(self._topics), "live": live}
+
+
+_bus_instance: Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """获取全局事件总线"""
+    global _bus_instance
+    with _bus_lock:
+        if _bus_instance is None:
+            _bus_instance = EventBus(Config.EVENT_BUFFER_SIZE)
+        return _bus_instance
@@ -0,0 +1,91 @@
+"""文件元信息缓存
+
+为图片接口提供内容哈希 ETag 和真实的 MIME 类型。
+结果按 (路径, 大小, 修改时间) 缓存，文件被重新生成后自动失效。
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+# 缓存条目数上限
+_CACHE_SIZE = 8192
+
+# 文件头魔数 -> MIME 类型
+_MAGIC_NUMBERS = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+class FileMeta(NamedTuple):
+    """文件元信息"""
+    etag: str
+    mimetype: str
+    size: int
+    mtime: float
+
+
+_cache: "OrderedDict[Tuple[str, int, int], FileMeta]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def sniff_image_mimetype(header: bytes) -> str:
+    """
+    根据文件头判断图片类型
+
+    Args:
+        header: 文件开头的若干字节（至少 12 字节）
+
+    Returns:
+        MIME 类型，无法识别时返回 application/octet-stream
+    """
+    for magic, mimetype in _MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return mimetype
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def get_file_meta(path: str) -> FileMeta:
+    """
+    获取文件的 ETag（内容 SHA-1）和 MIME 类型
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        FileMeta
+
+    Raises:
+        OSError: 文件不存在或无法读取
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+
+    with _cache_lock:
+        meta = _cache.get(key)
+        if meta is not None:
+            _cache.move_to_end(key)
+            return meta
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        header = f.read(64 * 1024)
+        mimetype = sniff_image_mimetype(header)
+        while header:
+            digest.update(header)
+            header = f.read(64 * 1024)
+
+    meta = FileMeta(digest.hexdigest(), mimetype, stat.st_size, stat.st_mtime)
+
+    with _cache_lock:
+        _cache[key] = meta
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return meta
@@ -1,70 +1,24 @@
 """Google GenAI 客户端封装"""
-import time
-import random
-from functools import wraps
+from typing import Iterator
+
 from google import genai
 from google.genai import types
 
 # 导入统一的错误解析函数
 from ..generators.google_genai import parse_genai_error
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .retry_policy import retry_on_error
 
 
-def retry_on_429(max_retries=3, base_delay=2):
-    """429 错误自动重试装饰器（带智能错误解析）"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    error_str = str(e).lower()
-
-                    # 不可重试的错误类型
-                    non_retryable = [
-                        "401", "unauthenticated",  # 认证错误
-                        "403", "permission_denied", "forbidden",  # 权限错误
-                        "404", "not_found",  # 资源不存在
-                        "invalid_argument",  # 参数错误
-                        "safety", "blocked", "filter",  # 安全过滤
-                    ]
-
-                    should_retry = True
-                    for keyword in non_retryable:
-                        if keyword in error_str:
-                            should_retry = False
-                            break
-
-                    if not should_retry:
-                        # 直接抛出，不重试
-                        raise Exception(parse_genai_error(e))
-
-                    # 可重试的错误
-                    if attempt < max_retries - 1:
-                        if "429" in error_str or "resource_exhausted" in error_str:
-                            wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            print(f"[重试] 遇到资源限制，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                        else:
-                            wait_time = min(2 ** attempt, 10) + random.uniform(0, 1)
-                            print(f"[重试] 请求失败，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                        time.sleep(wait_time)
-                        continue
-
-                    # 重试次数耗尽
-                    raise Exception(parse_genai_error(e))
-
-            # 理论上不会到这里，但保险起见
-            raise Exception(parse_genai_error(last_error))
-        return wrapper
-    return decorator
+def _friendly_error(error: Exception) -> Exception:
+    """放弃重试时转换为友好的错误提示"""
+    return Exception(parse_genai_error(error))
 
 
 class GenAIClient:
     """GenAI 客户端封装类（已弃用，请使用 GoogleGenAIGenerator）"""
 
-    def __init__(self, api_key: str = None, base_url: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None, rate_limiter: RateLimiter = None):
         self.api_key = api_key
         if not self.api_key:
             raise ValueError(
@@ -88,6 +42,11 @@ class GenAIClient:
 
         self.client = genai.Client(**client_kwargs)
 
+        # 主动限流（未传入时按 API Key 获取，默认不限制）
+        self.rate_limiter = rate_limiter or get_rate_limiter(
+            f"text:google_gemini:{base_url or ''}", {"api_key": api_key}
+        )
+
         # 默认安全设置：全部关闭
         self.default_safety_settings = [
             types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
@@ -96,7 +55,7 @@ class GenAIClient:
             types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
         ]
 
-    @retry_on_429(max_retries=3, base_delay=2)
+    @retry_on_error(max_retries=3, base_delay=2, on_giveup=_friendly_error)
     def generate_text(
         self,
         prompt: str,
@@ -125,6 +84,71 @@ class GenAIClient:
         Returns:
             生成的文本
         """
+        contents, generate_content_config = self._build_text_request(
+            prompt, temperature, max_output_tokens, use_search, use_thinking, images
+        )
+
+        result = ""
+        with self.rate_limiter.slot():
+            for chunk in self.client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            ):
+                if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+                    continue
+                result += chunk.text
+
+        return result
+
+    def stream_text(
+        self,
+        prompt: str,
+        model: str = "gemini-3-pro-preview",
+        temperature: float = 1.0,
+        max_output_tokens: int = 8000,
+        use_search: bool = False,
+        use_thinking: bool = False,
+        images: list = None,
+        system_prompt: str = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        流式生成文本（参数同 generate_text）
+
+        开始输出之后无法重试，出错时直接抛出友好的错误提示。
+
+        Yields:
+            新生成的文本片段
+        """
+        contents, generate_content_config = self._build_text_request(
+            prompt, temperature, max_output_tokens, use_search, use_thinking, images
+        )
+
+        with self.rate_limiter.slot():
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=generate_content_config,
+                ):
+                    if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+                        continue
+                    if chunk.text:
+                        yield chunk.text
+            except Exception as e:
+                raise _friendly_error(e) from e
+
+    def _build_text_request(
+        self,
+        prompt: str,
+        temperature: float,
+        max_output_tokens: int,
+        use_search: bool,
+        use_thinking: bool,
+        images: list
+    ):
+        """构建文本生成的 contents 和 GenerateContentConfig"""
         parts = [types.Part(text=prompt)]
 
         if images:
@@ -159,21 +183,9 @@ class GenAIClient:
         if use_thinking:
             config_kwargs["thinking_config"] = types.ThinkingConfig(thinking_level="HIGH")
 
-        generate_content_config = types.GenerateContentConfig(**config_kwargs)
+        return contents, types.GenerateContentConfig(**config_kwargs)
 
-        result = ""
-        for chunk in self.client.models.generate_content_stream(
-            model=model,
-            contents=contents,
-            config=generate_content_config,
-        ):
-            if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
-                continue
-            result += chunk.text
-
-        return result
-
-    @retry_on_429(max_retries=5, base_delay=3)  # 图片生成重试更多次
+    @retry_on_error(max_retries=5, base_delay=3, on_giveup=_friendly_error)  # 图片生成重试更多次
     def generate_image(
         self,
         prompt: str,
@@ -213,17 +225,18 @@ class GenAIClient:
         )
 
         image_data = None
-        for chunk in self.client.models.generate_content_stream(
-            model=model,
-            contents=contents,
-            config=generate_content_config,
-        ):
-            if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                for part in chunk.candidates[0].content.parts:
-                    # 检查是否有图片数据
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        image_data = part.inline_data.data
-                        break
+        with self.rate_limiter.slot():
+            for chunk in self.client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            ):
+                if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+                    for part in chunk.candidates[0].content.parts:
+                        # 检查是否有图片数据
+                        if hasattr(part, 'inline_data') and part.inline_data:
+                            image_data = part.inline_data.data
+                            break
 
         if not image_data:
             raise ValueError(
@@ -0,0 +1,124 @@
+"""对冲请求（hedged requests）
+
+图片生成的耗时长尾很重：个别页面要等上百秒，整个任务的 finish 都被它拖住。
+启用对冲后，一个请求发出后超过该线路最近耗时的某个分位数仍未返回，
+就再发一个相同的请求（优先换一条线路，只有一条线路时发到同一条线路），
+先返回的结果生效，另一个请求被取消。
+
+额外请求数受任务级预算限制（平均每页 hedge_budget 次），服务商整体变慢时不会把请求量翻倍。
+
+服务商配置：
+    hedge_percentile: 95  # 超过最近耗时的该分位数时发起对冲请求（不配置则不启用）
+    hedge_min_delay: 10  # 发起对冲请求前至少等待的时间（秒，可选）
+    hedge_budget: 0.2  # 单个任务平均每页可以额外发起的请求数（可选）
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .retry_policy import RetryBudget
+
+# 默认配置（可在服务商配置中通过 hedge_* 覆盖）
+DEFAULT_MIN_DELAY = 10.0
+DEFAULT_BUDGET_PER_PAGE = 0.2
+
+# 每条线路保留的最近请求耗时数量
+LATENCY_SAMPLES = 100
+# 样本少于该数量时不发起对冲请求（分位数还不可靠）
+MIN_SAMPLES = 10
+
+
+class LatencyTracker:
+    """线路最近请求的耗时（线程安全）
+
+    成功的请求记录实际耗时；被取消的请求（对冲中落败或任务取消）记录取消前已经等待的时间，
+    作为耗时的下限。失败的请求不记录（快速失败会拉低分位数）。
+    """
+
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        """记录一次请求的耗时（秒）"""
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        最近耗时的分位数
+
+        Args:
+            percent: 分位（0-100）
+
+        Returns:
+            耗时（秒）；样本不足 MIN_SAMPLES 时返回 None
+        """
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        position = min(len(samples) - 1, max(0, math.ceil(len(samples) * percent / 100) - 1))
+        return samples[position]
+
+
+class HedgeSettings:
+    """服务商的对冲配置"""
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Args:
+            config: 服务商配置（hedge_percentile / hedge_min_delay / hedge_budget）
+        """
+        self.percentile = min(float(config.get('hedge_percentile') or 0), 100.0)
+        self.min_delay = float(config.get('hedge_min_delay') or DEFAULT_MIN_DELAY)
+        budget = config.get('hedge_budget')
+        self.budget_per_page = float(budget) if budget is not None else DEFAULT_BUDGET_PER_PAGE
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用对冲"""
+        return self.percentile > 0 and self.budget_per_page > 0
+
+    def delay(self, tracker: LatencyTracker) -> Optional[float]:
+        """
+        发起对冲请求前的等待时间
+
+        Returns:
+            秒数；未启用或样本不足时返回 None（不对冲）
+        """
+        if not self.enabled:
+            return None
+        latency = tracker.percentile(self.percentile)
+        if latency is None:
+            return None
+        return max(latency, self.min_delay)
+
+    def task_budget(self, pages: int) -> Optional[RetryBudget]:
+        """
+        单个任务的对冲预算
+
+        Args:
+            pages: 任务的页数
+
+        Returns:
+            RetryBudget（每次对冲消耗一次）；未启用时返回 None
+        """
+        if not self.enabled:
+            return None
+        return RetryBudget(reserve=pages * self.budget_per_page)
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    """获取线路的耗时统计（同名共享）"""
+    with _trackers_lock:
+        tracker = _trackers.get(name)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[name] = tracker
+        return tracker
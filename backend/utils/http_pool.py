@@ -0,0 +1,200 @@
+"""HTTP 连接池
+
+每个服务商（按 base_url 区分）共享一个连接池，包含：
+- 同步的 requests.Session（带 keep-alive 的 HTTPAdapter）
+- 异步的 httpx.AsyncClient（按事件循环创建）
+
+同一服务商的所有生成器、文本客户端都复用同一个连接池，
+避免每次请求都重新建立 TCP / TLS 连接。
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .json_body import JsonBody
+
+logger = logging.getLogger(__name__)
+
+# 默认连接池配置（可在服务商配置中通过 pool_size / pool_per_host 覆盖）
+DEFAULT_POOL_SIZE = 32  # 整个连接池的最大连接数
+DEFAULT_POOL_PER_HOST = 16  # 单个主机的最大连接数
+DEFAULT_KEEPALIVE_EXPIRY = 60  # 空闲连接保持时间（秒）
+# requests 为多少个不同主机缓存连接池（API 域名 + 图片 CDN 域名）
+POOL_HOSTS = 10
+
+
+class HttpPool:
+    """单个服务商的 HTTP 连接池"""
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pool_per_host: int = DEFAULT_POOL_PER_HOST,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY
+    ):
+        """
+        初始化连接池
+
+        Args:
+            name: 连接池名称（用于日志）
+            pool_size: 最大连接数
+            pool_per_host: 单个主机的最大连接数
+            keepalive_expiry: 空闲连接保持时间（秒）
+        """
+        self.name = name
+        self.pool_size = pool_size
+        self.pool_per_host = min(pool_per_host, pool_size)
+        self.keepalive_expiry = keepalive_expiry
+
+        # 同步会话：pool_block=True 时超出单主机上限的请求会排队等待
+        adapter = HTTPAdapter(
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=self.pool_per_host,
+            pool_block=True
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # 异步客户端与事件循环绑定，每个事件循环一个
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._host_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        logger.debug(f"创建连接池 [{name}]: pool_size={pool_size}, pool_per_host={self.pool_per_host}")
+
+    def settings(self) -> Tuple[int, int, float]:
+        """连接池参数（用于判断配置是否变化）"""
+        return self.pool_size, self.pool_per_host, self.keepalive_expiry
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环对应的异步客户端（必须在事件循环中调用）"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取目标主机的并发信号量（httpx 只支持总连接数限制）"""
+        loop = asyncio.get_running_loop()
+        semaphores = self._host_semaphores.setdefault(loop, {})
+        host = urlsplit(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.pool_per_host)
+        return semaphores[host]
+
+    async def arequest(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        发送异步请求（受单主机连接数限制）
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            **kwargs: 传给 httpx 的其他参数
+
+        Returns:
+            httpx.Response
+        """
+        async with self._host_semaphore(url):
+            return await self.get_async_client().request(method, url, **kwargs)
+
+    def post_json(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> requests.Response:
+        """
+        发送 JSON POST 请求（请求体分块写入连接，见 JsonBody）
+
+        Args:
+            url: 请求地址
+            payload: 请求体，可包含 EncodedJSON
+            headers: 其他请求头
+            **kwargs: 传给 requests 的其他参数
+
+        Returns:
+            requests.Response
+        """
+        body = JsonBody(payload)
+        return self.session.post(url, data=body, headers={**(headers or {}), **body.headers}, **kwargs)
+
+    async def apost_json(
+        self,
+        url: str,
+        payload: Any,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any
+    ) -> httpx.Response:
+        """异步发送 JSON POST 请求（参数与 post_json 相同）"""
+        body = JsonBody(payload)
+        # body.aiter() 可以重复迭代，跟随 307/308 重定向时会重发请求体
+        return await self.arequest(
+            "POST", url, content=body.aiter(), headers={**(headers or {}), **body.headers}, **kwargs
+        )
+
+    def close(self):
+        """关闭同步会话（异步客户端随事件循环回收）"""
+        self.session.close()
+
+
+_pools: Dict[str, HttpPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_http_pool(name: str, config: Optional[Dict[str, Any]] = None) -> HttpPool:
+    """
+    获取（或创建）指定名称的连接池
+
+    同名连接池只创建一次；如果服务商配置中的连接池参数发生变化，则重建并关闭旧连接池的会话。
+
+    Args:
+        name: 连接池名称，通常为 "类型:base_url"
+        config: 服务商配置，可包含 pool_size / pool_per_host / pool_keepalive
+
+    Returns:
+        HttpPool 实例
+    """
+    config = config or {}
+    pool_size = int(config.get('pool_size') or DEFAULT_POOL_SIZE)
+    pool_per_host = int(config.get('pool_per_host') or DEFAULT_POOL_PER_HOST)
+    keepalive_expiry = float(config.get('pool_keepalive') or DEFAULT_KEEPALIVE_EXPIRY)
+
+    with _pools_lock:
+        old = _pools.get(name)
+        if old is not None and old.settings() == (pool_size, min(pool_per_host, pool_size), keepalive_expiry):
+            return old
+        pool = HttpPool(name, pool_size, pool_per_host, keepalive_expiry)
+        _pools[name] = pool
+
+    if old is not None:
+        logger.debug(f"连接池 [{name}] 参数变化，已重建")
+        old.close()
+    return pool
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有连接池的配置概览"""
+    with _pools_lock:
+        return {
+            name: {
+                "pool_size": pool.pool_size,
+                "pool_per_host": pool.pool_per_host,
+            }
+            for name, pool in _pools.items()
+        }
@@ -1,7 +1,23 @@
 """图片压缩工具"""
 import io
+import logging
+import math
+import time
 from PIL import Image
-from typing import Optional
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# 缩小尺寸时的最小边长（像素）
+MIN_DIMENSION = 512
+# 按尺寸模型估算缩放比例时预留的余量
+SCALE_SAFETY = 0.95
+
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
 
 
 def compress_image(
@@ -9,17 +25,23 @@ def compress_image(
     max_size_kb: int = 200,  # 默认200KB
     quality_start: int = 85,
     quality_min: int = 20,
-    max_dimension: int = 2048
+    max_dimension: int = 2048,
+    max_encodes: int = 8
 ) -> bytes:
     """
     压缩图片到指定大小以内
 
+    先用二分法查找满足大小要求的最高质量；最低质量仍然太大时，
+    按 "JPEG 大小与像素数近似成正比" 估算缩放比例，而不是每次缩小 10%。
+    每次调用最多编码 max_encodes 次，用完后返回已得到的最小结果。
+
     Args:
         image_data: 原始图片数据
         max_size_kb: 最大文件大小（KB）
         quality_start: 起始压缩质量（1-100）
         quality_min: 最低压缩质量（1-100）
         max_dimension: 最大边长（像素）
+        max_encodes: 最多编码次数
 
     Returns:
         压缩后的图片数据
@@ -30,6 +52,14 @@ def compress_image(
     if len(image_data) <= max_size_bytes:
         return image_data
 
+    started = time.perf_counter()
+    encodes = 0
+
+    def encode(img: Image.Image, quality: int) -> bytes:
+        nonlocal encodes
+        encodes += 1
+        return _encode_jpeg(img, quality)
+
     try:
         # 打开图片
         img = Image.open(io.BytesIO(image_data))
@@ -52,45 +82,109 @@ def compress_image(
             new_height = int(height * ratio)
             img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-        # 逐步降低质量直到满足大小要求
-        quality = quality_start
-        compressed_data = None
-
-        while quality >= quality_min:
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            compressed_data = output.getvalue()
-
-            if len(compressed_data) <= max_size_bytes:
-                break
-
-            quality -= 5
+        quality, compressed_data = _search_quality(
+            img, encode, max_size_bytes, quality_start, quality_min, max_encodes
+        )
 
-        # 如果还是太大，进一步缩小尺寸
+        # 最低质量仍然太大，按尺寸模型缩小
+        scale = 1.0
         if len(compressed_data) > max_size_bytes:
-            width, height = img.size
-            while len(compressed_data) > max_size_bytes and max(width, height) > 512:
-                width = int(width * 0.9)
-                height = int(height * 0.9)
-                img_resized = img.resize((width, height), Image.Resampling.LANCZOS)
-
-                output = io.BytesIO()
-                img_resized.save(output, format='JPEG', quality=quality_min, optimize=True)
-                compressed_data = output.getvalue()
+            scaled = img
+            while len(compressed_data) > max_size_bytes and encodes < max_encodes:
+                width, height = scaled.size
+                if max(width, height) <= MIN_DIMENSION:
+                    break
+
+                # 大小约与像素数成正比：边长按 sqrt(目标/当前) 缩放
+                factor = math.sqrt(max_size_bytes / len(compressed_data)) * SCALE_SAFETY
+                factor = max(factor, MIN_DIMENSION / max(width, height))
+                scaled = scaled.resize(
+                    (max(1, int(width * factor)), max(1, int(height * factor))),
+                    Image.Resampling.LANCZOS
+                )
+                scale *= factor
+                compressed_data = encode(scaled, quality_min)
+                quality = quality_min
+
+            # 缩小后满足要求，剩余的编码次数用来把质量提回去
+            if len(compressed_data) <= max_size_bytes:
+                quality, compressed_data = _bisect_quality(
+                    scaled, encode, max_size_bytes, quality_min, compressed_data,
+                    quality_start, max_encodes - encodes
+                )
 
         original_size_kb = len(image_data) / 1024
         compressed_size_kb = len(compressed_data) / 1024
         compression_ratio = (1 - compressed_size_kb / original_size_kb) * 100
-
-        print(f"[图片压缩] {original_size_kb:.1f}KB → {compressed_size_kb:.1f}KB (压缩 {compression_ratio:.1f}%)")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        logger.debug(
+            f"[图片压缩] {original_size_kb:.1f}KB → {compressed_size_kb:.1f}KB "
+            f"(压缩 {compression_ratio:.1f}%, quality={quality}, scale={scale:.2f}, "
+            f"编码 {encodes} 次, {elapsed_ms:.0f}ms)"
+        )
+        if compressed_size_kb > max_size_kb:
+            logger.warning(
+                f"[图片压缩] 压缩后仍超过目标大小: {compressed_size_kb:.1f}KB > {max_size_kb}KB"
+            )
 
         return compressed_data
 
     except Exception as e:
-        print(f"[图片压缩] 压缩失败，返回原图: {e}")
+        logger.warning(f"[图片压缩] 压缩失败，返回原图: {e}")
         return image_data
 
 
+def _search_quality(
+    img: Image.Image,
+    encode,
+    max_size_bytes: int,
+    quality_start: int,
+    quality_min: int,
+    max_encodes: int
+) -> Tuple[int, bytes]:
+    """
+    二分查找满足大小要求的最高 JPEG 质量
+
+    Returns:
+        (质量, 编码结果)；最低质量也不满足时返回最低质量的编码结果
+    """
+    data = encode(img, quality_start)
+    if len(data) <= max_size_bytes or max_encodes < 2:
+        return quality_start, data
+
+    smallest = encode(img, quality_min)
+    if len(smallest) > max_size_bytes:
+        return quality_min, smallest
+
+    return _bisect_quality(
+        img, encode, max_size_bytes, quality_min, smallest, quality_start, max_encodes - 2
+    )
+
+
+def _bisect_quality(
+    img: Image.Image,
+    encode,
+    max_size_bytes: int,
+    low: int,
+    low_data: bytes,
+    high: int,
+    encodes_left: int
+) -> Tuple[int, bytes]:
+    """在 (low, high) 之间二分查找，不变式：low 满足要求（编码结果为 low_data），high 不满足或未知"""
+    best_quality, best_data = low, low_data
+    while high - low > 1 and encodes_left > 0:
+        mid = (low + high) // 2
+        data = encode(img, mid)
+        encodes_left -= 1
+        if len(data) <= max_size_bytes:
+            low, best_quality, best_data = mid, mid, data
+        else:
+            high = mid
+
+    return best_quality, best_data
+
+
 def compress_images(images: list[bytes], max_size_kb: int = 200) -> list[bytes]:
     """
     批量压缩图片
@@ -0,0 +1,141 @@
+"""流式 JSON 请求体
+
+带参考图的请求体里，base64 图片占了绝大部分字节。如果用 json=payload，
+会先把整个请求体序列化成一个大字符串再编码成 bytes，每个请求都要复制好几份。
+
+这里把请求体拆成块：JSON 结构和普通字段正常序列化（很小），
+预先编码好的片段（EncodedJSON，如缓存中参考图的 data URI）原样引用、不复制，
+发送时逐块写入连接，并带上准确的 Content-Length。
+"""
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Union
+
+# 小于该大小的相邻块合并后再发送，避免过多的小写入
+COALESCE_SIZE = 16 * 1024
+
+
+class EncodedJSON:
+    """已经编码好的 JSON 值（bytes），放入请求体时不再序列化"""
+
+    __slots__ = ("raw",)
+
+    def __init__(self, raw: bytes):
+        """
+        Args:
+            raw: 合法的 JSON 值（UTF-8 编码），如 b'"data:image/jpeg;base64,..."'
+        """
+        self.raw = raw
+
+    @classmethod
+    def string(cls, *parts: bytes) -> "EncodedJSON":
+        """
+        用若干段不需要转义的 ASCII 内容（如 base64）拼成一个 JSON 字符串
+
+        Args:
+            *parts: 字符串内容的各段
+
+        Returns:
+            EncodedJSON
+        """
+        return cls(b"".join((b'"', *parts, b'"')))
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+
+class JsonBody:
+    """可重复迭代的分块 JSON 请求体（同步和异步 HTTP 客户端都可以使用）"""
+
+    def __init__(self, payload: Any):
+        """
+        Args:
+            payload: 请求体，可以在任意位置包含 EncodedJSON
+        """
+        self._chunks: List[Union[bytes, memoryview]] = []
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self._encode(payload)
+        self._flush()
+        self.length = sum(len(chunk) for chunk in self._chunks)
+
+    def _write(self, data: bytes):
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= COALESCE_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._chunks.append(b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def _encode(self, value: Any):
+        if isinstance(value, EncodedJSON):
+            if len(value.raw) < COALESCE_SIZE:
+                self._write(value.raw)
+            else:
+                # 大片段直接引用，不复制
+                self._flush()
+                self._chunks.append(memoryview(value.raw))
+        elif isinstance(value, dict):
+            self._write(b"{")
+            for i, (key, item) in enumerate(value.items()):
+                if i:
+                    self._write(b",")
+                self._write(json.dumps(str(key), ensure_ascii=False).encode("utf-8") + b":")
+                self._encode(item)
+            self._write(b"}")
+        elif isinstance(value, (list, tuple)):
+            self._write(b"[")
+            for i, item in enumerate(value):
+                if i:
+                    self._write(b",")
+                self._encode(item)
+            self._write(b"]")
+        else:
+            self._write(json.dumps(value, ensure_ascii=False, allow_nan=False).encode("utf-8"))
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """发送该请求体需要的请求头"""
+        return {
+            "Content-Type": "application/json",
+            "Content-Length": str(self.length),
+        }
+
+    def __len__(self) -> int:
+        # requests 据此设置 Content-Length，而不是使用 chunked 编码
+        return self.length
+
+    def __iter__(self) -> Iterator[Union[bytes, memoryview]]:
+        return iter(self._chunks)
+
+    async def __aiter__(self) -> AsyncIterator[Union[bytes, memoryview]]:
+        for chunk in self._chunks:
+            yield chunk
+
+    def aiter(self) -> "AsyncJsonBody":
+        """
+        异步请求体（httpx.AsyncClient 的 content 参数）
+
+        JsonBody 同时是同步可迭代对象，直接传给 httpx.AsyncClient 会被当作同步请求体，
+        所以包一层只支持异步迭代的对象；每次迭代都从头开始，307/308 重定向时 httpx 可以重发请求体。
+        """
+        return AsyncJsonBody(self)
+
+    def getvalue(self) -> bytes:
+        """完整的请求体（仅用于调试）"""
+        return b"".join(self._chunks)
+
+
+class AsyncJsonBody:
+    """JsonBody 的异步视图（可重复迭代）"""
+
+    __slots__ = ("body",)
+
+    def __init__(self, body: JsonBody):
+        self.body = body
+
+    def __aiter__(self) -> AsyncIterator[Union[bytes, memoryview]]:
+        return self.body.__aiter__()
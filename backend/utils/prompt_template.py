@@ -0,0 +1,174 @@
+"""提示词模板
+
+模板在加载时解析一次（与 str.format 语法相同），之后：
+- partial() 先填入部分字段（如整个任务共用的大纲），得到新的模板并缓存，
+  同一任务的每一页不再重复插入完整大纲
+- render() 的结果按参数缓存，重试时直接复用
+"""
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from string import Formatter
+from typing import Any, List, Optional, Tuple, Union
+
+_formatter = Formatter()
+
+# 字段名中第一个 . 或 [ 之前的部分是根字段名（如 "page.content" 的根字段为 "page"）
+_FIELD_ROOT = re.compile(r"[^.\[]*")
+
+# 模板片段：字面量，或 (字段名, 根字段名, 转换, 格式说明)
+_Field = Tuple[str, str, Optional[str], str]
+_Part = Union[str, _Field]
+
+
+class _LRU:
+    """线程安全的小型 LRU 缓存"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        if key is None:
+            return None
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: Any):
+        if key is None:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+def _cache_key(values: dict) -> Optional[tuple]:
+    """参数的缓存键（参数不可哈希时返回 None，不缓存）"""
+    key = tuple(sorted(values.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class PromptTemplate:
+    """预解析的提示词模板"""
+
+    def __init__(self, text: str, cache_size: int = 256):
+        """
+        Args:
+            text: 模板文本（str.format 语法）
+            cache_size: 渲染结果缓存的条目数
+        """
+        parts: List[_Part] = []
+        for literal, field_name, format_spec, conversion in _formatter.parse(text):
+            if literal:
+                parts.append(literal)
+            if field_name is not None:
+                root = _FIELD_ROOT.match(field_name).group()
+                parts.append((field_name, root, conversion, format_spec or ""))
+        self._init(text, parts, cache_size)
+
+    def _init(self, text: str, parts: List[_Part], cache_size: int):
+        # 合并相邻的字面量
+        merged: List[_Part] = []
+        for part in parts:
+            if isinstance(part, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += part
+            else:
+                merged.append(part)
+        self.text = text
+        self._parts = tuple(merged)
+        self.fields = frozenset(part[1] for part in merged if not isinstance(part, str))
+        self._cache_size = cache_size
+        self._partials = _LRU(8)
+        self._rendered = _LRU(cache_size)
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+    @staticmethod
+    def _format_field(field: _Field, values: dict) -> str:
+        field_name, _, conversion, format_spec = field
+        value, _ = _formatter.get_field(field_name, (), values)
+        value = _formatter.convert_field(value, conversion)
+        return _formatter.format_field(value, format_spec)
+
+    def partial(self, **values: Any) -> "PromptTemplate":
+        """
+        填入部分字段，返回只包含剩余字段的模板（结果会被缓存）
+
+        Args:
+            **values: 要填入的字段
+
+        Returns:
+            新模板
+        """
+        key = _cache_key(values)
+        template = self._partials.get(key)
+        if template is not None:
+            return template
+
+        parts: List[_Part] = []
+        for part in self._parts:
+            if not isinstance(part, str) and part[1] in values:
+                parts.append(self._format_field(part, values))
+            else:
+                parts.append(part)
+
+        template = PromptTemplate.__new__(PromptTemplate)
+        template._init(self.text, parts, self._cache_size)
+        self._partials.put(key, template)
+        return template
+
+    def render(self, **values: Any) -> str:
+        """
+        渲染模板（与 str.format 结果相同，相同参数直接返回缓存）
+
+        Raises:
+            KeyError: 缺少模板字段
+        """
+        key = _cache_key(values)
+        rendered = self._rendered.get(key)
+        if rendered is not None:
+            return rendered
+
+        rendered = "".join(
+            part if isinstance(part, str) else self._format_field(part, values)
+            for part in self._parts
+        )
+        self._rendered.put(key, rendered)
+        return rendered
+
+
+# 换行符（\r\n、\r、\n）连续出现，或两个以上空格
+_WHITESPACE_RUN = re.compile(r"(?:\r\n?|\n)+| {2,}")
+
+
+def _collapse_whitespace(match: "re.Match") -> str:
+    run = match.group()
+    if run[0] == " ":
+        return " "
+    newlines = run.count("\n") + run.count("\r") - run.count("\r\n")
+    return "\n" * min(newlines, 2)
+
+
+@lru_cache(maxsize=256)
+def normalize_prompt(prompt: str) -> str:
+    """
+    清理和标准化提示词（单次线性扫描，结果会被缓存）
+
+    - 去掉首尾空白和 NUL 字符
+    - 统一换行符为 \\n，连续三个以上换行压缩为两个
+    - 连续空格压缩为一个
+    """
+    cleaned = prompt.strip().replace("\x00", "")
+    return _WHITESPACE_RUN.sub(_collapse_whitespace, cleaned)
@@ -0,0 +1,297 @@
+"""客户端主动限流（令牌桶）
+
+按服务商 + API Key 限制请求速率和同时进行的请求数，在发出请求前等待，
+而不是等上游返回 429 之后再退避：
+- requests_per_minute：每分钟请求数（令牌桶，容量为 burst）
+- max_concurrent_requests：同时进行的请求数
+
+状态保存在 SQLite 中（写事务使用 BEGIN IMMEDIATE，相互串行），
+同一台机器上的多个线程和 worker 进程共享同一份配额。
+并发名额带租约过期时间，进程崩溃后没有归还的名额会自动回收。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from backend.config import Config
+from .sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# burst 未配置时允许的突发量（秒数 × 每秒配额）
+DEFAULT_BURST_SECONDS = 10
+# 并发名额的租约时间（秒），超过后视为持有者已经退出
+LEASE_TTL = 600
+# 等待并发名额时的轮询间隔（秒）
+POLL_INTERVAL = 0.2
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_buckets (
+        bucket TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS rate_leases (
+        lease_id TEXT PRIMARY KEY,
+        bucket TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_rate_leases_bucket ON rate_leases(bucket);
+"""
+
+
+class RateLimiter:
+    """令牌桶 + 并发上限（线程和进程间共享）"""
+
+    def __init__(
+        self,
+        bucket: str,
+        requests_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        db: Optional[SQLiteDatabase] = None
+    ):
+        """
+        Args:
+            bucket: 配额名称（服务商 + API Key 摘要）
+            requests_per_minute: 每分钟请求数，None 表示不限制
+            burst: 令牌桶容量（允许的突发请求数）
+            max_concurrent: 同时进行的请求数，None 表示不限制
+            db: 状态数据库（限制未配置时可以为 None）
+        """
+        self.bucket = bucket
+        self.requests_per_minute = requests_per_minute or None
+        self.max_concurrent = max_concurrent or None
+        self.rate = self.requests_per_minute / 60.0 if self.requests_per_minute else None
+        if burst:
+            self.burst = max(1, int(burst))
+        elif self.rate:
+            self.burst = max(1, int(self.rate * DEFAULT_BURST_SECONDS))
+        else:
+            self.burst = None
+        self.db = db
+
+    @property
+    def unlimited(self) -> bool:
+        """是否没有配置任何限制"""
+        return self.rate is None and self.max_concurrent is None
+
+    def settings(self):
+        """限流参数（用于判断配置是否变化）"""
+        return self.requests_per_minute, self.burst, self.max_concurrent
+
+    def _try_acquire(self) -> Tuple[Optional[str], float]:
+        """
+        尝试取得一个令牌和一个并发名额
+
+        Returns:
+            (租约 ID, 0) 或 (None, 建议等待的秒数)
+        """
+        lease_id = uuid.uuid4().hex
+        with self.db.transaction() as conn:
+            now = time.time()
+
+            if self.max_concurrent:
+                conn.execute("DELETE FROM rate_leases WHERE expires_at < ?", (now,))
+                (active,) = conn.execute(
+                    "SELECT COUNT(*) FROM rate_leases WHERE bucket = ?", (self.bucket,)
+                ).fetchone()
+                if active >= self.max_concurrent:
+                    return None, POLL_INTERVAL
+
+            if self.rate:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ?", (self.bucket,)
+                ).fetchone()
+                tokens = float(self.burst)
+                if row is not None:
+                    tokens = min(tokens, row[0] + max(0.0, now - row[1]) * self.rate)
+                if tokens < 1:
+                    return None, (1 - tokens) / self.rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.bucket, tokens - 1, now)
+                )
+
+            if self.max_concurrent:
+                conn.execute(
+                    "INSERT INTO rate_leases (lease_id, bucket, expires_at) VALUES (?, ?, ?)",
+                    (lease_id, self.bucket, now + LEASE_TTL)
+                )
+        return lease_id, 0.0
+
+    def acquire(self) -> Optional[str]:
+        """
+        阻塞等待配额
+
+        Returns:
+            租约 ID（传给 release），未配置限制时返回 None
+        """
+        if self.unlimited:
+            return None
+        started = time.monotonic()
+        while True:
+            lease_id, wait = self._try_acquire()
+            if lease_id is not None:
+                self._log_wait(started)
+                return lease_id
+            time.sleep(wait)
+
+    async def aacquire(self) -> Optional[str]:
+        """
+        异步等待配额（返回值同 acquire）
+
+        数据库写入在线程池中执行，不阻塞事件循环。
+        """
+        if self.unlimited:
+            return None
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(self._try_acquire))
+            try:
+                lease_id, wait = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # 等待期间被取消：线程中的尝试仍会完成，取得的名额要归还
+                attempt.add_done_callback(lambda done: self._release_abandoned(loop, done))
+                raise
+            if lease_id is not None:
+                self._log_wait(started)
+                return lease_id
+            await asyncio.sleep(wait)
+
+    def _release_abandoned(self, loop: asyncio.AbstractEventLoop, attempt: asyncio.Future):
+        """归还调用方已经放弃的尝试取得的名额"""
+        if attempt.cancelled() or attempt.exception() is not None:
+            return
+        lease_id, _ = attempt.result()
+        if lease_id is not None:
+            loop.run_in_executor(None, self.release, lease_id)
+
+    def _log_wait(self, started: float):
+        waited = time.monotonic() - started
+        if waited >= 1:
+            logger.debug(f"⏱️ [{self.bucket}] 主动限流，等待 {waited:.1f} 秒")
+
+    def release(self, lease_id: Optional[str]):
+        """归还并发名额"""
+        if lease_id is None or not self.max_concurrent:
+            return
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM rate_leases WHERE lease_id = ?", (lease_id,))
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        在配额内执行一次请求（同步）
+
+        用法：
+            with rate_limiter.slot():
+                response = session.post(...)
+        """
+        lease_id = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(lease_id)
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """在配额内执行一次请求（异步，用法同 slot）"""
+        lease_id = await self.aacquire()
+        try:
+            yield
+        finally:
+            if lease_id is not None:
+                # 即使调用方被取消，也要等名额归还完成
+                await asyncio.shield(asyncio.to_thread(self.release, lease_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """当前配额状态"""
+        result: Dict[str, Any] = {
+            "requests_per_minute": self.requests_per_minute,
+            "burst": self.burst,
+            "max_concurrent": self.max_concurrent,
+        }
+        if self.unlimited:
+            return result
+        conn = self.db.connection()
+        now = time.time()
+        if self.rate:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ?", (self.bucket,)
+            ).fetchone()
+            tokens = float(self.burst)
+            if row is not None:
+                tokens = min(tokens, row[0] + max(0.0, now - row[1]) * self.rate)
+            result["tokens"] = round(tokens, 2)
+        if self.max_concurrent:
+            (active,) = conn.execute(
+                "SELECT COUNT(*) FROM rate_leases WHERE bucket = ? AND expires_at >= ?",
+                (self.bucket, now)
+            ).fetchone()
+            result["in_flight"] = active
+        return result
+
+
+_db: Optional[SQLiteDatabase] = None
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _get_db() -> SQLiteDatabase:
+    """限流状态数据库（持有 _limiters_lock 时调用）"""
+    global _db
+    if _db is None:
+        db_path = Config.RATE_LIMIT_DB or os.path.join(
+            Path(__file__).parent.parent.parent, "history", "rate_limits.db"
+        )
+        _db = SQLiteDatabase(db_path, SCHEMA)
+    return _db
+
+
+def get_rate_limiter(scope: str, config: Optional[Dict[str, Any]] = None) -> RateLimiter:
+    """
+    获取（或创建）服务商 + API Key 的限流器
+
+    同一配额只创建一次，所有线程共享；配置变化时重建。
+
+    Args:
+        scope: 服务商标识（如 "image:vertex"）
+        config: 服务商配置，可包含 requests_per_minute / burst / max_concurrent_requests，
+                按其中的 api_key 区分配额
+
+    Returns:
+        RateLimiter 实例（未配置限制时不会访问数据库）
+    """
+    config = config or {}
+    key_digest = hashlib.sha256(str(config.get('api_key') or '').encode('utf-8')).hexdigest()[:12]
+    bucket = f"{scope}:{key_digest}"
+    requests_per_minute = float(config.get('requests_per_minute') or 0) or None
+    burst = int(config.get('burst') or 0) or None
+    max_concurrent = int(config.get('max_concurrent_requests') or 0) or None
+
+    with _limiters_lock:
+        limiter = _limiters.get(bucket)
+        candidate = RateLimiter(bucket, requests_per_minute, burst, max_concurrent)
+        if limiter is not None and limiter.settings() == candidate.settings():
+            return limiter
+        if not candidate.unlimited:
+            candidate.db = _get_db()
+        _limiters[bucket] = candidate
+        return candidate
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有已配置限制的配额状态"""
+    with _limiters_lock:
+        limiters = [limiter for limiter in _limiters.values() if not limiter.unlimited]
+    return {limiter.bucket: limiter.stats() for limiter in limiters}
@@ -0,0 +1,165 @@
+"""参考图片缓存
+
+同一张参考图（封面、用户上传的图片）在一个任务里会被每一页重复使用。
+这里按内容哈希缓存压缩结果及其 data URI 编码（已编码为 JSON 字符串，
+可直接放入流式请求体），所有生成器共用，每张图只压缩、编码一次。
+缓存按总字节数做 LRU 淘汰。
+"""
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from backend.config import Config
+from .file_meta import sniff_image_mimetype
+from .json_body import EncodedJSON
+from .image_compressor import compress_image
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceImage:
+    """压缩后的参考图及其编码"""
+
+    __slots__ = ("digest", "data", "mime_type", "data_uri_json")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.mime_type = sniff_image_mimetype(data[:16])
+        if self.mime_type == "application/octet-stream":
+            self.mime_type = "image/png"
+        # 请求体里直接引用这段 bytes，不再逐页做 base64 和 JSON 转义
+        self.data_uri_json = EncodedJSON.string(
+            f"data:{self.mime_type};base64,".encode("ascii"),
+            base64.b64encode(data)
+        )
+
+    @property
+    def data_uri(self) -> str:
+        """data URI 字符串"""
+        return self.data_uri_json.raw[1:-1].decode("ascii")
+
+    @property
+    def nbytes(self) -> int:
+        """缓存占用的字节数（原始数据 + data URI）"""
+        return len(self.data) + len(self.data_uri_json)
+
+
+class ReferenceImageCache:
+    """按内容哈希索引的参考图 LRU 缓存"""
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: 缓存总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, int], ReferenceImage]" = OrderedDict()
+        self._bytes = 0
+        # 同一个对象可能以多个键出现（原图哈希、压缩后哈希），字节数只计一次
+        self._refs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        # 正在压缩的图片，同一张图并发请求时只压缩一次
+        self._inflight: Dict[Tuple[str, int], threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Tuple[str, int]) -> Optional[ReferenceImage]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Tuple[str, int], entry: ReferenceImage):
+        if key in self._entries:
+            return
+        self._entries[key] = entry
+        refs = self._refs.get(id(entry), 0)
+        if refs == 0:
+            self._bytes += entry.nbytes
+        self._refs[id(entry)] = refs + 1
+        self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            refs = self._refs.pop(id(entry)) - 1
+            if refs == 0:
+                self._bytes -= entry.nbytes
+            else:
+                self._refs[id(entry)] = refs
+
+    def get(self, image_data: bytes, max_size_kb: int = 200) -> ReferenceImage:
+        """
+        获取压缩并编码后的参考图
+
+        Args:
+            image_data: 原始图片数据
+            max_size_kb: 压缩目标大小（KB）
+
+        Returns:
+            ReferenceImage
+        """
+        key = (hashlib.sha256(image_data).hexdigest(), max_size_kb)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            inflight = self._inflight.setdefault(key, threading.Lock())
+
+        with inflight:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+
+            try:
+                entry = ReferenceImage(compress_image(image_data, max_size_kb=max_size_kb))
+                logger.debug(
+                    f"参考图已缓存: {len(image_data)} -> {len(entry.data)} bytes "
+                    f"({entry.digest[:12]})"
+                )
+                with self._lock:
+                    self._store(key, entry)
+                    # 压缩结果再次传入时（如已压缩的封面）直接命中
+                    self._store((entry.digest, max_size_kb), entry)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        return entry
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache_instance: Optional[ReferenceImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_reference_cache() -> ReferenceImageCache:
+    """获取全局参考图缓存"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ReferenceImageCache(Config.REFERENCE_CACHE_MAX_BYTES)
+    return _cache_instance
+
+
+def get_reference_image(image_data: bytes, max_size_kb: int = 200) -> ReferenceImage:
+    """压缩并编码参考图（结果会被缓存）"""
+    return get_reference_cache().get(image_data, max_size_kb)
@@ -0,0 +1,408 @@
+"""统一的重试策略
+
+生成器、文本客户端和图片服务共用同一套重试规则：
+- 按错误类型决定是否重试：4xx 参数/认证错误、安全过滤不重试
+- 指数退避加随机抖动；服务端返回 Retry-After 时按其等待
+- 重试预算：服务商级（重试次数不超过请求数的一定比例）和任务级（总重试次数上限），
+  服务商整体出问题时不会因为层层重试把请求量放大数倍
+"""
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Retry-After 超过该时间（秒）时不再等待，直接失败
+MAX_RETRY_AFTER = 60
+
+# 服务商级重试预算：窗口内重试次数 <= 保底次数 + 请求数 * 比例
+PROVIDER_RETRY_RATIO = 0.2
+PROVIDER_RETRY_RESERVE = 10
+PROVIDER_RETRY_WINDOW = 60
+
+_STATUS_PATTERN = re.compile(r"(?:状态码|status(?:_code)?)\D{0,3}(\d{3})|^\s*(\d{3})\s+[A-Z_]{4,}", re.IGNORECASE)
+_THROTTLE_KEYWORDS = ("rate limit", "resource_exhausted", "too many requests", "限流", "频率")
+_TIMEOUT_KEYWORDS = ("timeout", "timed out", "超时")
+_NETWORK_KEYWORDS = ("connection", "连接")
+# 不可重试的错误（认证、权限、参数、安全过滤）
+_NON_RETRYABLE_KEYWORDS = (
+    "unauthenticated", "permission_denied", "invalid_argument",
+    "safety", "blocked",
+)
+# 4xx 中可以重试的状态码
+_RETRYABLE_CLIENT_STATUS = (408, 409, 425, 429)
+
+
+class UpstreamError(Exception):
+    """上游接口返回的错误（携带状态码和 Retry-After）"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: Optional[bool] = None
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        # 明确指定是否可重试（None 表示按错误类型判断）
+        self.retryable = retryable
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头
+
+    Args:
+        value: 秒数或 HTTP 日期
+
+    Returns:
+        需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    """异常及其 __cause__（生成器把原始错误转换为友好提示时会保留原始错误）"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for item in _error_chain(error):
+        status = getattr(item, "status_code", None)
+        if isinstance(status, int):
+            return status
+        match = _STATUS_PATTERN.search(str(item))
+        if match:
+            return int(match.group(1) or match.group(2))
+    return None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    判断上游错误的类型
+
+    Args:
+        error: 生成器抛出的异常
+
+    Returns:
+        'throttle'（429 限流）/ 'server'（5xx）/ 'timeout' / 'network' / 'client'（其他 4xx）/ 'other'
+    """
+    if any(isinstance(item, (asyncio.TimeoutError, TimeoutError)) for item in _error_chain(error)):
+        return "timeout"
+
+    status = _status_code(error)
+    if status is not None:
+        if status == 429:
+            return "throttle"
+        if status >= 500:
+            return "server"
+        if status == 408:
+            return "timeout"
+        if status >= 400 and status not in _RETRYABLE_CLIENT_STATUS:
+            return "client"
+
+    lowered = " ".join(str(item) for item in _error_chain(error)).lower()
+    if "429" in lowered or any(keyword in lowered for keyword in _THROTTLE_KEYWORDS):
+        return "throttle"
+    if any(keyword in lowered for keyword in _TIMEOUT_KEYWORDS):
+        return "timeout"
+    if any(keyword in lowered for keyword in _NETWORK_KEYWORDS):
+        return "network"
+    return "other"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """错误是否值得重试（4xx 参数/认证错误、安全过滤等不重试）"""
+    if any(getattr(item, "retryable", None) is False for item in _error_chain(error)):
+        return False
+    if classify_error(error) == "client":
+        return False
+    lowered = " ".join(str(item) for item in _error_chain(error)).lower()
+    return not any(keyword in lowered for keyword in _NON_RETRYABLE_KEYWORDS)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    for item in _error_chain(error):
+        retry_after = getattr(item, "retry_after", None)
+        if retry_after is not None:
+            return float(retry_after)
+    return None
+
+
+class RetryBudget:
+    """
+    重试预算
+
+    在 window 秒内，重试次数不超过 reserve + 请求数 * ratio。
+    ratio=0、window=None 时就是固定的重试次数上限（用于单个任务）。
+    """
+
+    def __init__(self, ratio: float = 0.0, reserve: int = 0, window: Optional[float] = None):
+        """
+        Args:
+            ratio: 每个请求可以换取的重试次数
+            reserve: 保底重试次数
+            window: 统计窗口（秒），None 表示不过期
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fixed(cls, max_retries: int) -> "RetryBudget":
+        """固定次数的重试预算"""
+        return cls(ratio=0.0, reserve=max_retries)
+
+    def _trim(self, now: float):
+        if self.window is None:
+            return
+        for events in (self._requests, self._retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    def record_request(self):
+        """记录一次请求（含重试）"""
+        if self.ratio <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._requests.append(now)
+            self._trim(now)
+
+    def try_acquire(self) -> bool:
+        """申请一次重试，预算用完时返回 False"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= self.reserve + len(self._requests) * self.ratio:
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "limit": int(self.reserve + len(self._requests) * self.ratio),
+            }
+
+
+class RoutedRetryBudget(RetryBudget):
+    """
+    按线路区分的重试预算
+
+    同一个请求的多次尝试可能落在不同的线路上（重试时避开失败过的线路、被限流时换线路），
+    每次尝试的请求数记入实际使用的线路，重试由最近一次尝试所在线路的预算承担。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.current: Optional[RetryBudget] = None
+
+    def use(self, budget: RetryBudget):
+        """在某条线路上发出一次请求"""
+        budget.record_request()
+        self.current = budget
+
+    def record_request(self):
+        """请求数在 use 时记入对应线路"""
+
+    def try_acquire(self) -> bool:
+        """申请一次重试（还没有发出过请求时不限制）"""
+        return self.current is None or self.current.try_acquire()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.current.stats() if self.current is not None else {}
+
+
+class RetryPolicy:
+    """重试策略"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        budgets: Sequence[RetryBudget] = ()
+    ):
+        """
+        Args:
+            max_attempts: 最多尝试次数（含第一次）
+            base_delay: 第一次重试的基准等待时间（秒）
+            max_delay: 单次等待时间上限（秒）
+            budgets: 重试预算，全部允许时才会重试
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budgets = tuple(budgets)
+
+    def with_budgets(self, *budgets: Optional[RetryBudget]) -> "RetryPolicy":
+        """返回追加了重试预算的新策略"""
+        return RetryPolicy(
+            self.max_attempts, self.base_delay, self.max_delay,
+            self.budgets + tuple(budget for budget in budgets if budget is not None)
+        )
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """第 attempt 次失败（从 0 开始）后的等待时间：指数退避 + 抖动，限流时加倍"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if classify_error(error) == "throttle":
+            ceiling = min(self.max_delay, ceiling * 2)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def next_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        判断第 attempt 次失败（从 0 开始）后是否重试
+
+        Returns:
+            重试前的等待时间（秒）；None 表示不再重试
+        """
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+
+        retry_after = _retry_after(error)
+        if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+            logger.warning(f"服务端要求 {retry_after:.0f} 秒后重试，超过上限，不再重试")
+            return None
+
+        for budget in self.budgets:
+            if not budget.try_acquire():
+                logger.warning("重试预算已用完，不再重试")
+                return None
+
+        if retry_after is not None:
+            return retry_after
+        return self.backoff(attempt, error)
+
+    def _record_request(self):
+        for budget in self.budgets:
+            budget.record_request()
+
+    async def arun(self, func: Callable[[], Awaitable[Any]], label: str = "请求") -> Any:
+        """
+        按策略执行异步函数，失败时重试
+
+        Args:
+            func: 无参数的异步函数（每次尝试调用一次）
+            label: 日志中的名称
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            最后一次尝试的异常
+        """
+        attempt = 0
+        while True:
+            self._record_request()
+            try:
+                return await func()
+            except Exception as e:
+                delay = self.next_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"⏳ {label} 失败 ({classify_error(e)})，{delay:.1f}秒后重试 "
+                    f"(尝试 {attempt + 1}/{self.max_attempts}): {str(e)[:100]}"
+                )
+                await asyncio.sleep(delay)
+
+    def run(self, func: Callable[[], Any], label: str = "请求") -> Any:
+        """按策略执行同步函数（参数同 arun）"""
+        attempt = 0
+        while True:
+            self._record_request()
+            try:
+                return func()
+            except Exception as e:
+                delay = self.next_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"⏳ {label} 失败 ({classify_error(e)})，{delay:.1f}秒后重试 "
+                    f"(尝试 {attempt + 1}/{self.max_attempts}): {str(e)[:100]}"
+                )
+                time.sleep(delay)
+
+
+def retry_on_error(
+    max_retries: int = 3,
+    base_delay: float = 2,
+    on_giveup: Optional[Callable[[Exception], Exception]] = None
+):
+    """
+    按统一重试策略重试的装饰器（同时支持同步和异步函数）
+
+    Args:
+        max_retries: 最多尝试次数
+        base_delay: 第一次重试的基准等待时间（秒）
+        on_giveup: 放弃重试时把原始错误转换为友好提示（可选）
+    """
+    policy = RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+
+    def giveup(error: Exception):
+        if on_giveup is None:
+            raise error
+        raise on_giveup(error) from error
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await policy.arun(lambda: func(*args, **kwargs), label=func.__qualname__)
+                except Exception as e:
+                    giveup(e)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return policy.run(lambda: func(*args, **kwargs), label=func.__qualname__)
+            except Exception as e:
+                giveup(e)
+        return wrapper
+    return decorator
+
+
+_budgets: Dict[str, RetryBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(name: str) -> RetryBudget:
+    """获取服务商级重试预算（同名共享，图片服务商按线路区分）"""
+    with _budgets_lock:
+        budget = _budgets.get(name)
+        if budget is None:
+            budget = RetryBudget(PROVIDER_RETRY_RATIO, PROVIDER_RETRY_RESERVE, PROVIDER_RETRY_WINDOW)
+            _budgets[name] = budget
+        return budget
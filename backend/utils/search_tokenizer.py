@@ -0,0 +1,91 @@
+"""全文检索分词
+
+SQLite FTS5 自带的分词器无法切分中文，这里在写入索引前自行分词：
+- 中日韩文字按相邻两字（bigram）切分，每段末尾的单字额外保留一个，
+  这样单字查询也能通过前缀匹配命中
+- 其他文字按单词切分并转为小写
+
+分词结果以空格连接后写入 FTS5（unicode61 分词器按空格切分）。
+FTS5 只能按词前缀匹配，英文等关键词改为在索引文本上做子串匹配（LIKE），
+这样 "atte" 也能找到 "Latte"。
+"""
+import re
+from typing import List, Optional
+
+# 中日韩文字（汉字、假名、谚文）
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_PATTERN = re.compile(f"([{_CJK_CHARS}]+)|([^\\W_{_CJK_CHARS}]+)")
+
+
+def _cjk_bigrams(run: str) -> List[str]:
+    """把一段连续的中日韩文字切分为 bigram"""
+    tokens = [run[i:i + 2] for i in range(len(run) - 1)]
+    tokens.append(run[-1])
+    return tokens
+
+
+def tokenize_for_index(text: str) -> str:
+    """
+    把文本转换为写入 FTS5 索引的分词串
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        以空格分隔的分词结果
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text or ""):
+        cjk_run, word = match.groups()
+        if cjk_run:
+            tokens.extend(_cjk_bigrams(cjk_run))
+        else:
+            tokens.append(word.lower())
+    return " ".join(tokens)
+
+
+def build_match_query(keyword: str) -> Optional[str]:
+    """
+    把用户输入关键词中的中日韩文字转换为 FTS5 MATCH 查询
+
+    - 每段中文转换为相邻 bigram 组成的短语，等价于子串匹配
+    - 单个汉字使用前缀匹配
+    - 多个片段之间为 AND 关系
+    - 其他文字不参与（见 substring_terms）
+
+    Args:
+        keyword: 用户输入的关键词
+
+    Returns:
+        MATCH 查询字符串，关键词中没有中日韩文字时返回 None
+    """
+    clauses = []
+    for match in _TOKEN_PATTERN.finditer(keyword or ""):
+        cjk_run = match.group(1)
+        if not cjk_run:
+            continue
+        if len(cjk_run) > 1:
+            bigrams = [cjk_run[i:i + 2] for i in range(len(cjk_run) - 1)]
+            clauses.append('"' + " ".join(bigrams) + '"')
+        else:
+            clauses.append(f'"{cjk_run}"*')
+    return " ".join(clauses) or None
+
+
+def substring_terms(keyword: str) -> List[str]:
+    """
+    用户输入关键词中的非中日韩单词（小写），在索引文本上按子串匹配
+
+    单词只包含字母和数字（不含 % 和 _），可以直接放进 LIKE 模式。
+
+    Args:
+        keyword: 用户输入的关键词
+
+    Returns:
+        单词列表（多个单词之间为 AND 关系）
+    """
+    return [
+        match.group(2).lower()
+        for match in _TOKEN_PATTERN.finditer(keyword or "")
+        if match.group(2)
+    ]
@@ -0,0 +1,59 @@
+"""SQLite 数据库封装
+
+为各个服务提供统一的 SQLite 访问方式：
+- 每个线程一个连接（sqlite3 连接不能跨线程共享）
+- WAL 模式，读写互不阻塞，多个 worker 进程可同时访问
+- transaction() 使用 BEGIN IMMEDIATE，写事务之间串行，不会丢失更新
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class SQLiteDatabase:
+    """线程安全的 SQLite 数据库"""
+
+    def __init__(self, db_path: str, schema: str = ""):
+        """
+        初始化数据库
+
+        Args:
+            db_path: 数据库文件路径
+            schema: 建表语句（应使用 IF NOT EXISTS）
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        if schema:
+            self.connection().executescript(schema)
+
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        写事务（出错时自动回滚）
+
+        Yields:
+            当前线程的数据库连接
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
@@ -1,46 +1,26 @@
 """Text API 客户端封装"""
-import time
-import random
-import base64
-import requests
-from functools import wraps
-from typing import List, Optional, Union
-from .image_compressor import compress_image
-
-
-def retry_on_429(max_retries=3, base_delay=2):
-    """429 错误自动重试装饰器"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    error_str = str(e)
-                    if "429" in error_str or "rate" in error_str.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            print(f"[重试] 遇到限流，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
-                            time.sleep(wait_time)
-                            continue
-                    raise
-            raise Exception(
-                f"Text API 重试 {max_retries} 次后仍失败。\n"
-                "可能原因：\n"
-                "1. API持续限流或配额不足\n"
-                "2. 网络连接持续不稳定\n"
-                "3. API服务暂时不可用\n"
-                "建议：稍后再试，或联系API服务提供商"
-            )
-        return wrapper
-    return decorator
+import json
+import logging
+from typing import Iterator, List, Optional, Union
+from .reference_images import get_reference_image
+from .http_pool import get_http_pool
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .retry_policy import UpstreamError, parse_retry_after, retry_on_error
+
+logger = logging.getLogger(__name__)
 
 
 class TextChatClient:
     """Text API 客户端封装类"""
 
-    def __init__(self, api_key: str = None, base_url: str = None, endpoint_type: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        endpoint_type: str = None,
+        pool_config: Optional[dict] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
         self.api_key = api_key
         if not self.api_key:
             raise ValueError(
@@ -57,9 +37,13 @@ class TextChatClient:
             endpoint = '/' + endpoint
         self.chat_endpoint = f"{self.base_url}{endpoint}"
 
-    def _encode_image_to_base64(self, image_data: bytes) -> str:
-        """将图片数据编码为 base64"""
-        return base64.b64encode(image_data).decode('utf-8')
+        # 同一 base_url 的文本客户端共享连接池
+        self.http_pool = get_http_pool(f"text:{self.base_url}", pool_config)
+
+        # 主动限流（未传入时按 API Key 获取，默认不限制）
+        self.rate_limiter = rate_limiter or get_rate_limiter(
+            f"text:openai_compatible:{base_url or ''}", {"api_key": api_key}
+        )
 
     def _build_content_with_images(
         self,
@@ -83,11 +67,8 @@ class TextChatClient:
 
         for img in images:
             if isinstance(img, bytes):
-                # 压缩图片到 200KB 以内
-                compressed_img = compress_image(img, max_size_kb=200)
-                # 图片数据，转为 base64 data URL
-                base64_data = self._encode_image_to_base64(compressed_img)
-                image_url = f"data:image/png;base64,{base64_data}"
+                # 压缩图片到 200KB 以内，转为 base64 data URL（结果按内容缓存）
+                image_url = get_reference_image(img, max_size_kb=200).data_uri_json
             else:
                 # 已经是 URL
                 image_url = img
@@ -99,31 +80,17 @@ class TextChatClient:
 
         return content
 
-    @retry_on_429(max_retries=3, base_delay=2)
-    def generate_text(
+    def _build_payload(
         self,
         prompt: str,
-        model: str = "gemini-3-pro-preview",
-        temperature: float = 1.0,
-        max_output_tokens: int = 8000,
+        model: str,
+        temperature: float,
+        max_output_tokens: int,
         images: List[Union[bytes, str]] = None,
         system_prompt: str = None,
-        **kwargs
-    ) -> str:
-        """
-        生成文本（支持图片输入）
-
-        Args:
-            prompt: 提示词
-            model: 模型名称
-            temperature: 温度
-            max_output_tokens: 最大输出 token
-            images: 图片列表（可选）
-            system_prompt: 系统提示词（可选）
-
-        Returns:
-            生成的文本
-        """
+        stream: bool = False
+    ) -> dict:
+        """构建 chat/completions 请求体"""
         messages = []
 
         # 添加系统提示词
@@ -140,34 +107,142 @@ class TextChatClient:
             "content": content
         })
 
-        payload = {
+        return {
             "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_output_tokens,
-            "stream": False
+            "stream": stream
         }
 
-        headers = {
+    def _headers(self, stream: bool = False) -> dict:
+        return {
             "Content-Type": "application/json",
-            "Accept": "application/json",
+            "Accept": "text/event-stream" if stream else "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
 
-        response = requests.post(
-            self.chat_endpoint,
-            json=payload,
-            headers=headers,
-            timeout=300  # 5分钟超时
+    @retry_on_error(max_retries=3, base_delay=2)
+    def generate_text(
+        self,
+        prompt: str,
+        model: str = "gemini-3-pro-preview",
+        temperature: float = 1.0,
+        max_output_tokens: int = 8000,
+        images: List[Union[bytes, str]] = None,
+        system_prompt: str = None,
+        **kwargs
+    ) -> str:
+        """
+        生成文本（支持图片输入）
+
+        Args:
+            prompt: 提示词
+            model: 模型名称
+            temperature: 温度
+            max_output_tokens: 最大输出 token
+            images: 图片列表（可选）
+            system_prompt: 系统提示词（可选）
+
+        Returns:
+            生成的文本
+        """
+        payload = self._build_payload(
+            prompt, model, temperature, max_output_tokens, images, system_prompt
+        )
+
+        with self.rate_limiter.slot():
+            response = self.http_pool.post_json(
+                self.chat_endpoint,
+                payload,
+                headers=self._headers(),
+                timeout=300  # 5分钟超时
+            )
+
+        self._raise_for_status(response, model)
+        return self._extract_text(response.json())
+
+    def stream_text(
+        self,
+        prompt: str,
+        model: str = "gemini-3-pro-preview",
+        temperature: float = 1.0,
+        max_output_tokens: int = 8000,
+        images: List[Union[bytes, str]] = None,
+        system_prompt: str = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        流式生成文本（"stream": true，逐段返回模型输出）
+
+        连接失败或上游返回错误时按重试策略重试；开始输出之后的错误直接抛出。
+        服务端不支持流式、直接返回完整 JSON 时，一次性返回全部文本。
+
+        Args:
+            同 generate_text
+
+        Yields:
+            新生成的文本片段
+        """
+        payload = self._build_payload(
+            prompt, model, temperature, max_output_tokens, images, system_prompt, stream=True
         )
 
+        with self.rate_limiter.slot():
+            response = self._open_stream(payload, model)
+            try:
+                content_type = response.headers.get("Content-Type", "")
+                if "text/event-stream" not in content_type:
+                    yield self._extract_text(response.json())
+                    return
+
+                response.encoding = "utf-8"
+                # chunk_size=None：收到一块就处理一块，不等凑满固定大小
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        logger.debug(f"跳过无法解析的流式数据: {data[:100]}")
+                        continue
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            yield delta
+            finally:
+                response.close()
+
+    @retry_on_error(max_retries=3, base_delay=2)
+    def _open_stream(self, payload: dict, model: str):
+        """发起流式请求，直到收到响应头（状态码非 200 时抛出错误）"""
+        response = self.http_pool.post_json(
+            self.chat_endpoint,
+            payload,
+            headers=self._headers(stream=True),
+            stream=True,
+            timeout=(30, 300)  # 连接超时 30 秒，两段输出之间最多等待 5 分钟
+        )
+        try:
+            self._raise_for_status(response, model)
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def _raise_for_status(self, response, model: str):
+        """上游返回非 200 状态码时抛出带说明的错误"""
         if response.status_code != 200:
             error_detail = response.text[:500]
             status_code = response.status_code
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
 
             # 根据状态码给出更详细的错误信息
             if status_code == 401:
-                raise Exception(
+                raise UpstreamError(
                     "❌ API Key 认证失败\n\n"
                     "【可能原因】\n"
                     "1. API Key 无效或已过期\n"
@@ -176,10 +251,12 @@ class TextChatClient:
                     "【解决方案】\n"
                     "1. 在系统设置页面检查 API Key 是否正确\n"
                     "2. 重新获取 API Key\n"
-                    f"\n【请求地址】{self.chat_endpoint}"
+                    f"\n【请求地址】{self.chat_endpoint}",
+                    status_code=status_code,
+                    retry_after=retry_after
                 )
             elif status_code == 403:
-                raise Exception(
+                raise UpstreamError(
                     "❌ 权限被拒绝\n\n"
                     "【可能原因】\n"
                     "1. API Key 没有访问该模型的权限\n"
@@ -188,10 +265,12 @@ class TextChatClient:
                     "【解决方案】\n"
                     "1. 检查 API 权限配置\n"
                     "2. 尝试使用其他模型\n"
-                    f"\n【原始错误】{error_detail[:200]}"
+                    f"\n【原始错误】{error_detail[:200]}",
+                    status_code=status_code,
+                    retry_after=retry_after
                 )
             elif status_code == 404:
-                raise Exception(
+                raise UpstreamError(
                     "❌ 模型不存在或 API 端点错误\n\n"
                     "【可能原因】\n"
                     f"1. 模型 '{model}' 不存在或已下线\n"
@@ -199,29 +278,35 @@ class TextChatClient:
                     "【解决方案】\n"
                     "1. 检查模型名称是否正确\n"
                     "2. 检查 Base URL 配置\n"
-                    f"\n【请求地址】{self.chat_endpoint}"
+                    f"\n【请求地址】{self.chat_endpoint}",
+                    status_code=status_code,
+                    retry_after=retry_after
                 )
             elif status_code == 429:
-                raise Exception(
+                raise UpstreamError(
                     "⏳ API 配额或速率限制\n\n"
                     "【说明】\n"
                     "请求频率过高或配额已用尽。\n\n"
                     "【解决方案】\n"
                     "1. 稍后再试（等待 1-2 分钟）\n"
                     "2. 检查 API 配额使用情况\n"
-                    "3. 考虑升级计划获取更多配额"
+                    "3. 考虑升级计划获取更多配额",
+                    status_code=status_code,
+                    retry_after=retry_after
                 )
             elif status_code >= 500:
-                raise Exception(
+                raise UpstreamError(
                     f"⚠️ API 服务器错误 ({status_code})\n\n"
                     "【说明】\n"
                     "这是服务端的临时故障，与您的配置无关。\n\n"
                     "【解决方案】\n"
                     "1. 稍等几分钟后重试\n"
-                    "2. 如果持续出现，检查服务商状态页"
+                    "2. 如果持续出现，检查服务商状态页",
+                    status_code=status_code,
+                    retry_after=retry_after
                 )
             else:
-                raise Exception(
+                raise UpstreamError(
                     f"❌ API 请求失败 (状态码: {status_code})\n\n"
                     f"【原始错误】\n{error_detail}\n\n"
                     f"【请求地址】{self.chat_endpoint}\n"
@@ -229,12 +314,14 @@ class TextChatClient:
                     "【通用解决方案】\n"
                     "1. 检查 API Key 是否正确\n"
                     "2. 检查 Base URL 配置\n"
-                    "3. 检查模型名称是否正确"
+                    "3. 检查模型名称是否正确",
+                    status_code=status_code,
+                    retry_after=retry_after
                 )
 
-        result = response.json()
-
-        # 提取生成的文本
+    @staticmethod
+    def _extract_text(result: dict) -> str:
+        """从非流式响应中提取生成的文本"""
         if "choices" in result and len(result["choices"]) > 0:
             return result["choices"][0]["message"]["content"]
         else:
@@ -259,6 +346,8 @@ def get_text_chat_client(provider_config: dict):
             - api_key: API密钥
             - base_url: API基础URL（可选）
             - endpoint_type: 自定义端点路径（可选）
+            - pool_size / pool_per_host: 连接池大小（可选）
+            - requests_per_minute / max_concurrent_requests: 主动限流（可选）
 
     Returns:
         GenAIClient 或 TextChatClient
@@ -268,8 +357,16 @@ def get_text_chat_client(provider_config: dict):
     base_url = provider_config.get('base_url')
     endpoint_type = provider_config.get('endpoint_type')
 
+    rate_limiter = get_rate_limiter(f"text:{provider_type}:{base_url or ''}", provider_config)
+
     if provider_type == 'google_gemini':
         from .genai_client import GenAIClient
-        return GenAIClient(api_key=api_key, base_url=base_url)
+        return GenAIClient(api_key=api_key, base_url=base_url, rate_limiter=rate_limiter)
     else:
-        return TextChatClient(api_key=api_key, base_url=base_url, endpoint_type=endpoint_type)
+        return TextChatClient(
+            api_key=api_key,
+            base_url=base_url,
+            endpoint_type=endpoint_type,
+            pool_config=provider_config,
+            rate_limiter=rate_limiter
+        )
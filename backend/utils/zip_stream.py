@@ -0,0 +1,217 @@
+"""流式 ZIP 打包
+
+边读文件边输出 ZIP 数据，内存占用与归档大小无关：
+- 图片本身已经是压缩格式，全部使用 STORED（不再做 deflate）
+- 每个文件的 CRC 写在文件数据之后的 data descriptor 中，可以边读边算
+- 归档总长度只取决于文件名和文件大小，下载前即可确定 Content-Length，
+  并能按任意字节区间输出（支持 Range 断点续传）
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+# 读取文件的块大小
+CHUNK_SIZE = 64 * 1024
+
+# ZIP 结构
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIR = struct.Struct("<IHHHHIIH")
+
+_ZIP_VERSION = 20
+# bit 3: CRC/大小写在 data descriptor 中；bit 11: 文件名为 UTF-8
+_FLAGS = 0x0008 | 0x0800
+# 不支持 ZIP64，单个归档不超过 4GB
+_ZIP_LIMIT = 0xFFFFFFFF
+
+# 文件 CRC 缓存：(路径, 大小, 修改时间) -> CRC，断点续传时无需重新计算
+_CRC_CACHE_SIZE = 4096
+_crc_cache: "OrderedDict[Tuple[str, int, int], int]" = OrderedDict()
+_crc_cache_lock = threading.Lock()
+
+
+def _cached_crc(key: Tuple[str, int, int]) -> Optional[int]:
+    with _crc_cache_lock:
+        crc = _crc_cache.get(key)
+        if crc is not None:
+            _crc_cache.move_to_end(key)
+        return crc
+
+
+def _store_crc(key: Tuple[str, int, int], crc: int):
+    with _crc_cache_lock:
+        _crc_cache[key] = crc
+        _crc_cache.move_to_end(key)
+        while len(_crc_cache) > _CRC_CACHE_SIZE:
+            _crc_cache.popitem(last=False)
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    """把时间戳转换为 ZIP 使用的 DOS 日期时间"""
+    t = time.localtime(max(mtime, 315532800))  # 不早于 1980-01-01
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipEntry:
+    """归档中的一个文件"""
+
+    def __init__(self, path: str, arcname: str):
+        """
+        Args:
+            path: 磁盘上的文件路径
+            arcname: 归档内的文件名
+        """
+        stat = os.stat(path)
+        self.path = path
+        self.arcname = arcname.encode("utf-8")
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.offset = 0  # 本地文件头在归档中的偏移
+        self._crc: Optional[int] = _cached_crc(self._cache_key())
+
+    def _cache_key(self) -> Tuple[str, int, int]:
+        return self.path, self.size, self.mtime_ns
+
+    @property
+    def crc(self) -> int:
+        """文件 CRC32（未知时读取文件计算）"""
+        if self._crc is None:
+            crc = 0
+            with open(self.path, "rb") as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+            self.set_crc(crc)
+        return self._crc
+
+    def set_crc(self, crc: int):
+        self._crc = crc
+        _store_crc(self._cache_key(), crc)
+
+    def local_header(self) -> bytes:
+        return _LOCAL_HEADER.pack(
+            0x04034B50, _ZIP_VERSION, _FLAGS, 0, self.dos_time, self.dos_date,
+            0, 0, 0, len(self.arcname), 0
+        ) + self.arcname
+
+    def data_descriptor(self) -> bytes:
+        return _DATA_DESCRIPTOR.pack(0x08074B50, self.crc, self.size, self.size)
+
+    def central_header(self) -> bytes:
+        return _CENTRAL_HEADER.pack(
+            0x02014B50, _ZIP_VERSION, _ZIP_VERSION, _FLAGS, 0, self.dos_time, self.dos_date,
+            self.crc, self.size, self.size, len(self.arcname), 0, 0, 0, 0,
+            0o100644 << 16, self.offset
+        ) + self.arcname
+
+
+class ZipStream:
+    """按字节区间输出的流式 ZIP 归档"""
+
+    def __init__(self, files: List[Tuple[str, str]]):
+        """
+        Args:
+            files: [(磁盘路径, 归档内文件名), ...]，按给定顺序写入
+
+        Raises:
+            ValueError: 归档超过 4GB
+        """
+        self.entries = [ZipEntry(path, arcname) for path, arcname in files]
+
+        # 计算布局：[本地文件头 + 数据 + data descriptor] * N + 中央目录 + 结束记录
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            offset += _LOCAL_HEADER.size + len(entry.arcname) + entry.size + _DATA_DESCRIPTOR.size
+        self.central_dir_offset = offset
+        self.central_dir_size = sum(
+            _CENTRAL_HEADER.size + len(entry.arcname) for entry in self.entries
+        )
+        self.size = self.central_dir_offset + self.central_dir_size + _END_OF_CENTRAL_DIR.size
+
+        if self.size > _ZIP_LIMIT or len(self.entries) > 0xFFFF:
+            raise ValueError(
+                "打包文件过大（超过 4GB 或 65535 个文件）\n"
+                "解决方案：减少一次导出的记录数量"
+            )
+
+    @property
+    def etag(self) -> str:
+        """归档版本标识（文件名、大小、修改时间都不变时不变，用于 If-Range）"""
+        digest = zlib.crc32(b"".join(
+            entry.arcname + struct.pack("<QQ", entry.size, entry.mtime_ns)
+            for entry in self.entries
+        ))
+        return f"zip-{len(self.entries)}-{self.size}-{digest:08x}"
+
+    def _segments(self) -> Iterator[Tuple[int, int, object]]:
+        """按顺序产出 (偏移, 长度, 内容)，内容为 bytes 生成函数或 ZipEntry（文件数据）"""
+        for entry in self.entries:
+            header_size = _LOCAL_HEADER.size + len(entry.arcname)
+            yield entry.offset, header_size, entry.local_header
+            yield entry.offset + header_size, entry.size, entry
+            yield entry.offset + header_size + entry.size, _DATA_DESCRIPTOR.size, entry.data_descriptor
+        yield self.central_dir_offset, self.central_dir_size, self._central_directory
+        yield self.central_dir_offset + self.central_dir_size, _END_OF_CENTRAL_DIR.size, self._end_record
+
+    def _central_directory(self) -> bytes:
+        return b"".join(entry.central_header() for entry in self.entries)
+
+    def _end_record(self) -> bytes:
+        return _END_OF_CENTRAL_DIR.pack(
+            0x06054B50, 0, 0, len(self.entries), len(self.entries),
+            self.central_dir_size, self.central_dir_offset, 0
+        )
+
+    @staticmethod
+    def _read_file(entry: ZipEntry, start: int, end: int) -> Iterator[bytes]:
+        """读取文件的 [start, end) 区间；完整读取时顺便计算 CRC"""
+        compute_crc = start == 0 and end == entry.size and entry._crc is None
+        crc = 0
+        with open(entry.path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"文件在打包过程中被修改: {entry.path}")
+                if compute_crc:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if compute_crc:
+            entry.set_crc(crc)
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        输出归档的 [start, end) 区间
+
+        Args:
+            start: 起始偏移
+            end: 结束偏移（不含），为 None 时到归档末尾
+
+        Yields:
+            归档数据块
+        """
+        end = self.size if end is None else min(end, self.size)
+        for offset, length, content in self._segments():
+            if offset + length <= start or length == 0:
+                continue
+            if offset >= end:
+                break
+            lo = max(start, offset) - offset
+            hi = min(end, offset + length) - offset
+            if isinstance(content, ZipEntry):
+                yield from self._read_file(content, lo, hi)
+            else:
+                yield content()[lo:hi]
@@ -12,12 +12,21 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 @pytest.fixture
-def app():
-    """创建测试用 Flask 应用"""
+def app(tmp_path, monkeypatch):
+    """创建测试用 Flask 应用（任务队列、幂等键、大纲缓存的数据库放在临时目录）"""
     from backend.app import create_app
-    app = create_app()
-    app.config['TESTING'] = True
-    return app
+    from backend.config import Config
+    from backend.services import idempotency, jobs, outline_cache
+
+    monkeypatch.setattr(Config, 'JOB_DB', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(Config, 'IDEMPOTENCY_DB', str(tmp_path / 'idempotency.db'))
+    monkeypatch.setattr(Config, 'OUTLINE_CACHE_DB', str(tmp_path / 'outline_cache.db'))
+    monkeypatch.setattr(jobs, '_queue_instance', None)
+    monkeypatch.setattr(jobs, '_workers_instance', None)
+    monkeypatch.setattr(idempotency, '_store_instance', None)
+    monkeypatch.setattr(outline_cache, '_cache_instance', None)
+
+    return create_app({'TESTING': True})
 
 
 @pytest.fixture
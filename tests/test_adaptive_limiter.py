@@ -0,0 +1,105 @@
+"""
+自适应并发限制器（AIMD）测试
+"""
+import asyncio
+
+import pytest
+
+from backend.utils.adaptive_limiter import BACKOFF_FACTORS, AdaptiveLimiter
+
+
+def acquire(limiter, count=1):
+    async def scenario():
+        return [await limiter.acquire() for _ in range(count)]
+    return asyncio.run(scenario())
+
+
+def test_no_increase_when_not_saturated():
+    limiter = AdaptiveLimiter("aimd_idle", max_limit=10, initial_limit=4)
+    for _ in range(20):
+        (ticket,) = acquire(limiter)
+        assert not ticket.saturated
+        limiter.release(ticket, "success", 0.1)
+    assert limiter.limit == 4
+
+
+def test_additive_increase_when_saturated():
+    limiter = AdaptiveLimiter("aimd_busy", max_limit=10, initial_limit=2)
+    # 每完成约一轮（limit 个饱和请求）上限 +1：2 → 2.5 → 2.9 → 3.24
+    for _ in range(3):
+        first, second = acquire(limiter, 2)
+        assert (first.saturated, second.saturated) == (False, True)
+        limiter.release(first, "success", 0.1)
+        limiter.release(second, "success", 0.1)
+    assert limiter.limit == 3
+
+
+def test_increase_stops_at_max_limit():
+    limiter = AdaptiveLimiter("aimd_max", max_limit=2, initial_limit=2)
+    for _ in range(10):
+        tickets = acquire(limiter, 2)
+        for ticket in tickets:
+            limiter.release(ticket, "success", 0.1)
+    assert limiter.limit == 2
+
+
+@pytest.mark.parametrize("outcome", sorted(BACKOFF_FACTORS))
+def test_multiplicative_decrease_per_error_class(outcome):
+    limiter = AdaptiveLimiter(f"aimd_{outcome}", max_limit=15, initial_limit=8)
+    (ticket,) = acquire(limiter)
+    limiter.release(ticket, outcome)
+    assert limiter.limit == int(8 * BACKOFF_FACTORS[outcome])
+
+
+@pytest.mark.parametrize("outcome", ["client", "other"])
+def test_non_congestion_errors_keep_limit(outcome):
+    limiter = AdaptiveLimiter(f"aimd_{outcome}", max_limit=15, initial_limit=8)
+    (ticket,) = acquire(limiter)
+    limiter.release(ticket, outcome)
+    assert limiter.limit == 8
+
+
+def test_decrease_once_per_round():
+    limiter = AdaptiveLimiter("aimd_round", max_limit=15, initial_limit=8)
+    tickets = acquire(limiter, 3)
+    # 同一轮发出的请求先后报告限流，只降低一次
+    for ticket in tickets:
+        limiter.release(ticket, "throttle")
+    assert limiter.limit == 4
+
+    (ticket,) = acquire(limiter)
+    limiter.release(ticket, "throttle")
+    assert limiter.limit == 2
+
+
+def test_cancellation_is_not_penalized():
+    limiter = AdaptiveLimiter("aimd_cancel", max_limit=15, initial_limit=2)
+
+    async def scenario():
+        entered = asyncio.Semaphore(0)
+
+        async def hold():
+            async with limiter.slot():
+                entered.release()
+                await asyncio.sleep(60)
+
+        async def wait_for_slot():
+            async with limiter.slot():
+                pass
+
+        holders = [asyncio.create_task(hold()) for _ in range(2)]
+        for _ in holders:
+            await entered.acquire()
+        # 一个请求在排队时被取消，另外两个在占用名额时被取消
+        waiter = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0)
+        assert limiter.load == 3
+        waiter.cancel()
+        for holder in holders:
+            holder.cancel()
+        await asyncio.gather(waiter, *holders, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert limiter.limit == 2
+    assert limiter.load == 0
+    assert limiter.stats()["outcomes"]["other"] == 2
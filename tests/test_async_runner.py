@@ -0,0 +1,113 @@
+"""
+后台事件循环测试
+"""
+import asyncio
+import threading
+
+import pytest
+
+from backend.utils.async_runner import AsyncRunner, aiterate_in_thread
+
+
+@pytest.fixture
+def runner():
+    runner = AsyncRunner()
+    yield runner
+    runner.loop.call_soon_threadsafe(runner.loop.stop)
+
+
+def test_run_returns_result_from_loop_thread(runner):
+    async def work():
+        await asyncio.sleep(0.01)
+        return threading.current_thread().name
+
+    assert runner.run(work()) == "async-engine"
+
+
+def test_run_propagates_errors(runner):
+    async def work():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        runner.run(work())
+
+
+def test_run_refuses_to_block_loop_thread(runner):
+    async def inner():
+        return 1
+
+    async def outer():
+        with pytest.raises(RuntimeError):
+            runner.run(inner())
+        return True
+
+    assert runner.run(outer())
+
+
+def test_iterate_yields_items_and_errors(runner):
+    async def events():
+        yield 1
+        yield 2
+        raise ValueError("boom")
+
+    received = []
+    with pytest.raises(ValueError, match="boom"):
+        for item in runner.iterate(events()):
+            received.append(item)
+    assert received == [1, 2]
+
+
+def test_closing_iterator_cancels_generator(runner):
+    cancelled = threading.Event()
+
+    async def events():
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    iterator = runner.iterate(events())
+    assert next(iterator) == "first"
+    # 模拟客户端断开连接
+    iterator.close()
+    assert cancelled.wait(5)
+
+
+def test_aiterate_in_thread_closes_source_when_stopped_early():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.set()
+
+    async def consume():
+        received = []
+        async for item in aiterate_in_thread(source()):
+            received.append(item)
+            if len(received) == 2:
+                break
+        return received
+
+    assert asyncio.run(consume()) == [0, 1]
+    assert closed.wait(5)
+
+
+def test_aiterate_in_thread_propagates_errors():
+    def source():
+        yield 1
+        raise ValueError("boom")
+
+    async def consume():
+        received = []
+        with pytest.raises(ValueError, match="boom"):
+            async for item in aiterate_in_thread(source()):
+                received.append(item)
+        return received
+
+    assert asyncio.run(consume()) == [1]
@@ -0,0 +1,107 @@
+"""
+服务商熔断器测试
+"""
+import asyncio
+
+import pytest
+
+from backend.utils.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from backend.utils.retry_policy import UpstreamError
+
+
+def make_breaker(**kwargs):
+    settings = dict(consecutive_failures=3, min_requests=4, failure_rate=0.5, open_seconds=0.05)
+    settings.update(kwargs)
+    return CircuitBreaker("test", **settings)
+
+
+def fail(breaker, times=1, outcome="server"):
+    for _ in range(times):
+        breaker.record(outcome, probe=breaker.before_request())
+
+
+def test_consecutive_failures_open_breaker():
+    breaker = make_breaker()
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert not breaker.available
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_error_rate_opens_breaker():
+    breaker = make_breaker(consecutive_failures=10)
+    for outcome in ("success", "server", "success", "timeout"):
+        breaker.record(outcome, probe=breaker.before_request())
+    assert breaker.state == OPEN
+    assert breaker.stats()["error_rate"] == 0.5
+
+
+def test_client_errors_and_throttling_do_not_count_as_failures():
+    breaker = make_breaker()
+    fail(breaker, 5, outcome="client")
+    fail(breaker, 5, outcome="throttle")
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failures"] == 0
+
+
+def test_probe_success_closes_breaker():
+    breaker = make_breaker()
+    fail(breaker, 3)
+    asyncio.run(asyncio.sleep(0.06))
+
+    assert breaker.available
+    probe = breaker.before_request()
+    assert probe is True
+    assert breaker.state == HALF_OPEN
+    # 探测期间只放行一个请求
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.record("success", 0.1, probe)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["requests"] == 0
+
+
+def test_probe_failure_doubles_open_time():
+    breaker = make_breaker()
+    fail(breaker, 3)
+    asyncio.run(asyncio.sleep(0.06))
+
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert 0.05 < breaker.retry_in <= 0.1
+    assert breaker.stats()["trips"] == 2
+
+
+def test_guard_records_outcomes_and_releases_cancelled_probe():
+    breaker = make_breaker()
+
+    async def failing():
+        async with breaker.guard():
+            raise UpstreamError("Bad Gateway", status_code=502)
+
+    for _ in range(3):
+        with pytest.raises(UpstreamError):
+            asyncio.run(failing())
+    assert breaker.state == OPEN
+
+    async def cancelled_probe():
+        await asyncio.sleep(0.06)
+        async with breaker.guard():
+            raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled_probe())
+    # 被取消的探测请求归还名额，下一个请求仍可以探测
+    assert breaker.state == HALF_OPEN
+    assert breaker.available
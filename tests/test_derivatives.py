@@ -0,0 +1,89 @@
+"""
+衍生文件（缩略图）流水线测试
+"""
+import io
+import os
+import random
+
+import pytest
+from PIL import Image
+
+from backend.services.derivatives import DERIVATIVES, DerivativePipeline, _build_derivatives
+from backend.utils import image_compressor
+
+THUMB_KB = DERIVATIVES["thumb_"]
+
+
+def noise_png(width=300, height=300, seed=0):
+    """随机噪点图（超过缩略图目标大小）"""
+    data = random.Random(seed).randbytes(width * height * 3)
+    output = io.BytesIO()
+    Image.frombytes("RGB", (width, height), data).save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def source(tmp_path):
+    """任务目录中的一张原图"""
+    path = tmp_path / "0.png"
+    path.write_bytes(noise_png())
+    return str(tmp_path), "0.png"
+
+
+@pytest.mark.parametrize("executor_type", ["thread", "process"])
+def test_generates_thumbnail(source, executor_type):
+    task_dir, filename = source
+    pipeline = DerivativePipeline(executor_type, max_workers=1)
+
+    future = pipeline.submit(task_dir, filename)
+    assert future.result(timeout=60) == ["thumb_0.png"]
+
+    thumb_path = os.path.join(task_dir, "thumb_0.png")
+    assert os.path.getsize(thumb_path) <= THUMB_KB * 1024
+    assert Image.open(thumb_path).format == "JPEG"
+    assert sorted(os.listdir(task_dir)) == ["0.png", "thumb_0.png"]
+    assert pipeline.pending(task_dir, filename) is None
+    pipeline._executor.shutdown()
+
+
+def test_falls_back_to_thread_pool(source):
+    task_dir, filename = source
+    pipeline = DerivativePipeline("process", max_workers=1)
+    # 进程池已经关闭（如被系统回收），提交会失败
+    pipeline._get_executor().shutdown()
+
+    future = pipeline.submit(task_dir, filename)
+
+    assert future.result(timeout=30) == ["thumb_0.png"]
+    assert pipeline.executor_type == "thread"
+    assert os.path.exists(os.path.join(task_dir, "thumb_0.png"))
+    pipeline._executor.shutdown()
+
+
+def test_discards_thumbnail_when_source_changes(source, monkeypatch):
+    task_dir, filename = source
+    source_path = os.path.join(task_dir, filename)
+    compress = image_compressor.compress_image
+
+    def overwrite_during_compress(image_data, max_size_kb=200):
+        # 生成缩略图期间原图被重新生成
+        stat = os.stat(source_path)
+        os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        return compress(image_data, max_size_kb=max_size_kb)
+
+    monkeypatch.setattr(image_compressor, "compress_image", overwrite_during_compress)
+
+    assert _build_derivatives(task_dir, filename) == []
+    assert sorted(os.listdir(task_dir)) == ["0.png"]
+
+
+def test_invalidate_removes_stale_thumbnail(source):
+    task_dir, filename = source
+    pipeline = DerivativePipeline("thread", max_workers=1)
+    pipeline.submit(task_dir, filename).result(timeout=30)
+
+    pipeline.invalidate(task_dir, filename)
+    assert not os.path.exists(os.path.join(task_dir, "thumb_0.png"))
+    # 没有缩略图时不报错
+    pipeline.invalidate(task_dir, filename)
+    pipeline._executor.shutdown()
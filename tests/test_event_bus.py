@@ -0,0 +1,41 @@
+"""
+进程内事件总线测试
+"""
+from backend.utils import event_bus as event_bus_module
+from backend.utils.event_bus import EventBus
+
+
+def test_read_returns_events_after_id():
+    bus = EventBus(buffer_size=4)
+    bus.open("task_a")
+    for event_id in range(1, 4):
+        bus.publish("task_a", event_id, "progress", "{}")
+
+    result = bus.read("task_a", 1)
+    assert [event[0] for event in result.events] == [2, 3]
+    assert not result.closed
+
+
+def test_lagging_reader_falls_back_to_log():
+    bus = EventBus(buffer_size=2)
+    bus.open("task_a")
+    for event_id in range(1, 5):
+        bus.publish("task_a", event_id, "progress", "{}")
+
+    assert bus.read("task_a", 1) is None
+    assert [event[0] for event in bus.read("task_a", 2).events] == [3, 4]
+    assert bus.read("task_missing", 0) is None
+
+
+def test_closed_topics_are_evicted_without_new_topics(monkeypatch):
+    monkeypatch.setattr(event_bus_module, "CLOSED_TOPIC_TTL", 0)
+    monkeypatch.setattr(event_bus_module, "EVICT_INTERVAL", 0)
+    bus = EventBus()
+    bus.open("task_a")
+    bus.open("task_b")
+    bus.close("task_a")
+    bus.close("task_b")
+
+    # 关闭和读取时都会清理过期的主题
+    assert bus.read("task_a", 0) is None
+    assert bus.stats() == {"topics": 0, "live": 0}
@@ -0,0 +1,78 @@
+"""
+对冲请求测试
+"""
+import asyncio
+import uuid
+
+from backend.generators.router import ImageProviderRouter, ProviderRoute
+from backend.utils.hedging import MIN_SAMPLES, HedgeSettings, LatencyTracker
+from backend.utils.retry_policy import RetryBudget
+
+
+def make_route(**config):
+    """创建一条独立的线路（名称唯一，不与其他测试共享限流器和耗时统计）"""
+    name = f"hedge_{uuid.uuid4().hex[:8]}"
+    config = dict({"type": "image_api", "api_key": "test", "base_url": "http://127.0.0.1:9"}, **config)
+    return ProviderRoute(name, name, config)
+
+
+def test_percentile_needs_enough_samples():
+    tracker = LatencyTracker()
+    for latency in range(1, MIN_SAMPLES):
+        tracker.record(float(latency))
+    assert tracker.percentile(95) is None
+
+    tracker.record(float(MIN_SAMPLES))
+    assert tracker.percentile(50) == MIN_SAMPLES / 2
+    assert tracker.percentile(100) == MIN_SAMPLES
+
+
+def test_settings_delay_and_budget():
+    assert not HedgeSettings({}).enabled
+    assert HedgeSettings({"hedge_percentile": 95}).task_budget(10).reserve == 2
+
+    tracker = LatencyTracker()
+    for _ in range(MIN_SAMPLES):
+        tracker.record(1.0)
+    settings = HedgeSettings({"hedge_percentile": 95, "hedge_min_delay": 5})
+    assert settings.delay(tracker) == 5
+
+
+def test_cancelled_loser_latency_is_recorded():
+    slow = make_route(hedge_percentile=90, hedge_min_delay=0.05)
+    fast = make_route()
+    for _ in range(MIN_SAMPLES):
+        slow.latency.record(0.05)
+    router = ImageProviderRouter([slow, fast])
+
+    async def call(route):
+        await asyncio.sleep(5 if route is slow else 0.01)
+        return route.name.encode()
+
+    async def scenario():
+        # 把快线路标记为失败过，让第一个请求落在慢线路上
+        return await router.agenerate(call, {fast.name}, hedge_budget=RetryBudget(reserve=1))
+
+    image_data, winner = asyncio.run(scenario())
+    assert winner is fast
+    assert image_data == fast.name.encode()
+    # 被取消的慢请求按已等待的时间记录
+    assert len(slow.latency._samples) == MIN_SAMPLES + 1
+    assert slow.latency._samples[-1] >= 0.05
+
+
+def test_failed_call_latency_is_not_recorded():
+    route = make_route()
+    router = ImageProviderRouter([route])
+
+    async def call(_):
+        raise ValueError("bad request")
+
+    async def scenario():
+        try:
+            await router.agenerate(call, set())
+        except ValueError:
+            pass
+
+    asyncio.run(scenario())
+    assert len(route.latency._samples) == 0
@@ -0,0 +1,107 @@
+"""
+历史记录存储测试
+"""
+import json
+import os
+
+import pytest
+
+from backend.services.history import HistoryService
+
+
+@pytest.fixture
+def history(temp_history_dir):
+    return HistoryService(temp_history_dir)
+
+
+def test_create_update_and_get_record(history, sample_outline):
+    record_id = history.create_record("秋季穿搭", sample_outline, task_id="task_a")
+
+    assert history.update_record(record_id, status="completed", thumbnail="0.png")
+    record = history.get_record(record_id)
+    assert record["title"] == "秋季穿搭"
+    assert record["outline"] == sample_outline
+    assert record["images"] == {"task_id": "task_a", "generated": []}
+    assert record["status"] == "completed"
+    assert record["thumbnail"] == "0.png"
+    assert history.update_record("missing", status="completed") is False
+
+
+def test_list_records_is_paginated_newest_first(history, sample_outline):
+    record_ids = [history.create_record(f"记录{i}", sample_outline) for i in range(5)]
+
+    first_page = history.list_records(page=1, page_size=2)
+    assert [r["id"] for r in first_page["records"]] == record_ids[::-1][:2]
+    assert first_page["total"] == 5
+    assert first_page["total_pages"] == 3
+    assert "outline" not in first_page["records"][0]
+
+
+def test_status_counts_follow_updates_and_deletes(history, sample_outline):
+    first = history.create_record("记录1", sample_outline)
+    second = history.create_record("记录2", sample_outline)
+    history.update_record(first, status="completed")
+
+    assert history.get_statistics() == {"total": 2, "by_status": {"draft": 1, "completed": 1}}
+    assert [r["id"] for r in history.list_records(status="completed")["records"]] == [first]
+
+    history.delete_record(second)
+    assert history.get_statistics() == {"total": 1, "by_status": {"completed": 1}}
+    assert history.get_record(second) is None
+
+
+def test_legacy_json_index_is_migrated_once(temp_history_dir, sample_history_record):
+    with open(os.path.join(temp_history_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"records": [{"id": sample_history_record["id"]}, {"id": "missing-file"}]}, f)
+    with open(os.path.join(temp_history_dir, f"{sample_history_record['id']}.json"), "w", encoding="utf-8") as f:
+        json.dump(sample_history_record, f, ensure_ascii=False)
+
+    history = HistoryService(temp_history_dir)
+
+    record = history.get_record(sample_history_record["id"])
+    assert record["title"] == sample_history_record["title"]
+    assert record["images"] == sample_history_record["images"]
+    assert history.get_task_status("task_12345678") == "completed"
+    assert not os.path.exists(os.path.join(temp_history_dir, "index.json"))
+    assert os.path.exists(os.path.join(temp_history_dir, "index.json.migrated"))
+
+    # 再次启动不会重复导入
+    assert HistoryService(temp_history_dir).get_statistics()["total"] == 1
+
+
+def make_task_dir(history_dir, task_id, count):
+    task_dir = os.path.join(history_dir, task_id)
+    os.makedirs(task_dir)
+    for index in range(count):
+        for name in (f"{index}.png", f"thumb_{index}.png"):
+            open(os.path.join(task_dir, name), "wb").close()
+
+
+def test_scan_task_syncs_latest_record(history, temp_history_dir, sample_outline):
+    history.create_record("旧记录", sample_outline, task_id="task_a")
+    latest = history.create_record("新记录", sample_outline, task_id="task_a")
+    make_task_dir(temp_history_dir, "task_a", 2)
+
+    result = history.scan_and_sync_task_images("task_a")
+    assert result["record_id"] == latest
+    assert result["images"] == ["0.png", "1.png"]
+    assert result["status"] == "partial"
+    assert history.get_task_status("task_a") == "partial"
+
+
+def test_scan_all_tasks_reports_orphans_and_skips_unchanged(history, temp_history_dir, sample_outline):
+    record_id = history.create_record("记录", sample_outline, task_id="task_a")
+    make_task_dir(temp_history_dir, "task_a", len(sample_outline["pages"]))
+    make_task_dir(temp_history_dir, "task_orphan", 1)
+
+    result = history.scan_all_tasks()
+    assert result["synced"] == 1
+    assert result["orphan_tasks"] == ["task_orphan"]
+    record = history.get_record(record_id)
+    assert record["status"] == "completed"
+    assert record["thumbnail"] == "0.png"
+
+    # 图片没有变化时不再写入
+    updated_at = record["updated_at"]
+    history.scan_all_tasks()
+    assert history.get_record(record_id)["updated_at"] == updated_at
@@ -0,0 +1,74 @@
+"""
+历史记录全文检索测试
+"""
+import pytest
+
+from backend.services.history import HistoryService
+
+
+@pytest.fixture
+def history(temp_history_dir):
+    return HistoryService(temp_history_dir)
+
+
+def make_outline(*contents):
+    return {"pages": [{"index": i, "type": "content", "content": c} for i, c in enumerate(contents)]}
+
+
+def search_titles(history, keyword):
+    return [record["title"] for record in history.search_records(keyword)["records"]]
+
+
+def test_cjk_substring_matches_title_and_content(history):
+    history.create_record("秋季穿搭指南", make_outline("基础款搭配"))
+    history.create_record("咖啡探店", make_outline("手冲咖啡的萃取"))
+
+    assert search_titles(history, "穿搭") == ["秋季穿搭指南"]
+    assert search_titles(history, "季穿") == ["秋季穿搭指南"]
+    assert search_titles(history, "萃取") == ["咖啡探店"]
+    assert search_titles(history, "搭") == ["秋季穿搭指南"]
+    assert search_titles(history, "烘焙") == []
+
+
+def test_latin_substring_matches_inside_words(history):
+    history.create_record("Latte Art 入门", make_outline("拉花技巧"))
+    history.create_record("周末 brunch", make_outline("Avocado toast"))
+
+    assert search_titles(history, "atte") == ["Latte Art 入门"]
+    assert search_titles(history, "LATTE") == ["Latte Art 入门"]
+    assert search_titles(history, "cado") == ["周末 brunch"]
+    assert search_titles(history, "unch") == ["周末 brunch"]
+
+
+def test_mixed_keywords_are_combined_with_and(history):
+    history.create_record("Latte Art 入门", make_outline("拉花技巧"))
+    history.create_record("Latte 测评", make_outline("超市咖啡"))
+
+    assert search_titles(history, "atte 拉花") == ["Latte Art 入门"]
+    assert history.search_records("atte")["total"] == 2
+
+
+def test_title_hits_rank_first(history):
+    history.create_record("早餐合集", make_outline("Latte 和面包"))
+    history.create_record("Latte 合集", make_outline("咖啡"))
+
+    assert search_titles(history, "latte") == ["Latte 合集", "早餐合集"]
+
+
+def test_updated_outline_is_reindexed(history):
+    record_id = history.create_record("咖啡探店", make_outline("手冲咖啡"))
+    history.update_record(record_id, outline=make_outline("冷萃 cold brew"))
+
+    assert search_titles(history, "手冲") == []
+    assert search_titles(history, "冷萃") == ["咖啡探店"]
+    assert search_titles(history, "brew") == ["咖啡探店"]
+
+
+def test_missing_index_rows_are_backfilled(history, temp_history_dir):
+    history.create_record("秋季穿搭指南", make_outline("基础款搭配"))
+    with history.db.transaction() as conn:
+        conn.execute("DELETE FROM records_fts")
+    assert search_titles(history, "穿搭") == []
+
+    # 升级已有数据库时，启动时为没有索引的记录补建索引
+    assert search_titles(HistoryService(temp_history_dir), "穿搭") == ["秋季穿搭指南"]
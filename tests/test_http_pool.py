@@ -0,0 +1,131 @@
+"""
+HTTP 连接池和流式 JSON 请求体测试
+"""
+import asyncio
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.utils.http_pool import HttpPool, get_http_pool
+from backend.utils.json_body import COALESCE_SIZE, EncodedJSON, JsonBody
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """/old 重定向到 /new，/new 返回收到的请求体"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.startswith("/old"):
+            self.send_response(int(self.path.rsplit("/", 1)[-1]))
+            self.send_header("Location", "/new")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_payload():
+    image = b"A" * (COALESCE_SIZE * 2)
+    return {
+        "model": "测试模型",
+        "images": [EncodedJSON.string(b"data:image/png;base64,", image), EncodedJSON(b'"small"')],
+        "n": 1,
+        "options": {"ratio": 0.5, "tags": ["a", None, True]},
+    }, {
+        "model": "测试模型",
+        "images": ["data:image/png;base64," + image.decode(), "small"],
+        "n": 1,
+        "options": {"ratio": 0.5, "tags": ["a", None, True]},
+    }
+
+
+def test_body_matches_json_dumps():
+    payload, plain = make_payload()
+    body = JsonBody(payload)
+    expected = json.dumps(plain, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    assert body.getvalue() == expected
+    assert len(body) == len(expected)
+    assert body.headers["Content-Length"] == str(len(expected))
+    # 可以重复迭代
+    assert b"".join(body) == b"".join(body) == expected
+
+
+def test_async_body_can_be_iterated_twice():
+    payload, _ = make_payload()
+    body = JsonBody(payload)
+
+    async def collect():
+        return [b"".join([bytes(chunk) async for chunk in body.aiter()]) for _ in range(2)]
+
+    first, second = asyncio.run(collect())
+    assert first == second == body.getvalue()
+
+
+@pytest.mark.parametrize("status", [307, 308])
+def test_post_json_follows_redirect(server, status):
+    payload, plain = make_payload()
+    pool = HttpPool("test")
+    try:
+        response = pool.post_json(f"{server}/old/{status}", payload)
+        assert response.status_code == 200
+        assert response.json() == plain
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize("status", [307, 308])
+def test_apost_json_follows_redirect(server, status):
+    payload, plain = make_payload()
+    pool = HttpPool("test")
+
+    async def post():
+        try:
+            return await pool.apost_json(f"{server}/old/{status}", payload)
+        finally:
+            await pool.get_async_client().aclose()
+
+    response = asyncio.run(post())
+    pool.close()
+    assert response.status_code == 200
+    assert response.json() == plain
+
+
+def test_pool_reused_when_settings_unchanged():
+    name = f"test:{uuid.uuid4().hex[:8]}"
+    pool = get_http_pool(name, {"pool_size": 8})
+    assert get_http_pool(name, {"pool_size": 8, "api_key": "other"}) is pool
+
+
+def test_pool_rebuilt_and_old_session_closed_when_settings_change(monkeypatch):
+    name = f"test:{uuid.uuid4().hex[:8]}"
+    old = get_http_pool(name, {"pool_size": 8})
+    closed = []
+    monkeypatch.setattr(old.session, "close", lambda: closed.append(old))
+
+    pool = get_http_pool(name, {"pool_size": 16})
+
+    assert pool is not old
+    assert pool.pool_size == 16
+    assert closed == [old]
+    assert get_http_pool(name, {"pool_size": 16}) is pool
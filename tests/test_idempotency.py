@@ -0,0 +1,163 @@
+"""
+生成请求幂等处理测试
+"""
+import threading
+import time
+
+import pytest
+
+from backend.config import Config
+from backend.routes.image_routes import _run_idempotent
+from backend.services import idempotency
+from backend.services.idempotency import (
+    DONE,
+    PENDING,
+    IdempotencyStore,
+    client_idempotency_key,
+    derive_idempotency_key,
+    is_replayable,
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"), ttl=3600)
+    monkeypatch.setattr(idempotency, "_store_instance", store)
+    return store
+
+
+def test_derived_key_ignores_dict_order():
+    first = derive_idempotency_key("retry", {"task_id": "a", "page": {"index": 1, "content": "x"}})
+    second = derive_idempotency_key("retry", {"page": {"content": "x", "index": 1}, "task_id": "a"})
+    assert first == second
+    assert first != derive_idempotency_key("regenerate", {"task_id": "a", "page": {"index": 1, "content": "x"}})
+
+
+def test_reserve_complete_and_release(store):
+    assert store.reserve("k", "task_a") is None
+    assert store.reserve("k", "task_b")["status"] == PENDING
+
+    store.complete("k", {"success": True})
+    record = store.reserve("k", "task_b")
+    assert record["status"] == DONE
+    assert record["task_id"] == "task_a"
+    assert record["result"] == {"success": True}
+
+    store.release("k")
+    assert store.reserve("k", "task_b") is None
+
+
+def test_takeover_replaces_previous_owner(store):
+    store.reserve("k", "task_a")
+    store.complete("k", {"success": True})
+
+    store.takeover("k", "task_b")
+    record = store.reserve("k", "task_c")
+    assert record["status"] == PENDING
+    assert record["task_id"] == "task_b"
+    assert record["result"] is None
+
+
+def test_stale_pending_record_is_reclaimed(store):
+    store.reserve("k", "task_a")
+    with store.db.transaction() as conn:
+        conn.execute("UPDATE idempotency_keys SET updated_at = ?", (time.time() - idempotency.PENDING_TIMEOUT - 1,))
+
+    assert store.reserve("k", "task_b") is None
+
+
+def test_acquire_waits_for_running_request(store, monkeypatch):
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL", 0.05)
+    store.reserve("k", "task_a")
+    threading.Timer(0.2, store.complete, ("k", {"success": True})).start()
+
+    record = store.acquire("k", "task_b")
+    assert record["result"] == {"success": True}
+    assert record["waited"] is True
+
+
+def test_replay_window_applies_only_to_derived_keys(monkeypatch):
+    monkeypatch.setattr(Config, "IDEMPOTENCY_REPLAY_WINDOW", 30)
+    old = time.time() - 60
+    derived = derive_idempotency_key("retry", {"task_id": "a"})
+    client = client_idempotency_key("retry", "abc")
+
+    assert not is_replayable(derived, {}, old)
+    assert is_replayable(derived, {}, time.time())
+    assert is_replayable(derived, {"waited": True}, old)
+    assert is_replayable(client, {}, old)
+
+
+def run_counted(calls, result):
+    def run():
+        calls.append(1)
+        return dict(result)
+    return run
+
+
+def test_duplicate_request_is_replayed(app, store):
+    calls = []
+    material = {"task_id": "task_a", "page": {"index": 0}}
+    with app.test_request_context(json=material):
+        first = _run_idempotent("retry", "task_a", material, run_counted(calls, {"success": True, "index": 0}))
+        second = _run_idempotent("retry", "task_a", material, run_counted(calls, {"success": True, "index": 0}))
+
+    assert len(calls) == 1
+    assert "deduplicated" not in first
+    assert second == {"success": True, "index": 0, "deduplicated": True}
+
+
+def test_failed_request_is_not_replayed(app, store):
+    calls = []
+    material = {"task_id": "task_a", "page": {"index": 0}}
+    with app.test_request_context(json=material):
+        _run_idempotent("retry", "task_a", material, run_counted(calls, {"success": False}))
+        result = _run_idempotent("retry", "task_a", material, run_counted(calls, {"success": True}))
+
+    assert len(calls) == 2
+    assert "deduplicated" not in result
+
+
+def test_expired_derived_key_is_taken_over(app, store, monkeypatch):
+    monkeypatch.setattr(Config, "IDEMPOTENCY_REPLAY_WINDOW", 0)
+    calls = []
+    material = {"task_id": "task_a", "page": {"index": 0}}
+    with app.test_request_context(json=material):
+        _run_idempotent("regenerate", "task_a", material, run_counted(calls, {"success": True}))
+        time.sleep(0.01)
+        _run_idempotent("regenerate", "task_a", material, run_counted(calls, {"success": True}))
+    assert len(calls) == 2
+
+    # 客户端提供的幂等键在 TTL 内始终复用结果
+    headers = {"Idempotency-Key": "click-1"}
+    with app.test_request_context(json=material, headers=headers):
+        _run_idempotent("regenerate", "task_a", material, run_counted(calls, {"success": True}))
+        time.sleep(0.01)
+        result = _run_idempotent("regenerate", "task_a", material, run_counted(calls, {"success": True}))
+    assert len(calls) == 3
+    assert result["deduplicated"] is True
+
+
+def test_concurrent_duplicates_run_once(app, store, monkeypatch):
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL", 0.05)
+    calls = []
+    results = []
+    material = {"task_id": "task_a", "page": {"index": 0}}
+
+    def slow_run():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"success": True}
+
+    def request():
+        with app.test_request_context(json=material):
+            results.append(_run_idempotent("regenerate", "task_a", material, slow_run))
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(bool(result.get("deduplicated")) for result in results) == [False, True, True]
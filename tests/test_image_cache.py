@@ -0,0 +1,56 @@
+"""
+图片接口 HTTP 缓存测试
+"""
+import os
+
+import pytest
+from PIL import Image
+
+from backend.routes import image_routes
+
+
+@pytest.fixture
+def history_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_routes, "HISTORY_ROOT", str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def task_id(history_root):
+    """在临时 history 目录下创建带一张图片和缩略图的任务"""
+    task_id = "task_cache"
+    task_dir = os.path.join(history_root, task_id)
+    os.makedirs(task_dir)
+    Image.new("RGB", (8, 8), "red").save(os.path.join(task_dir, "0.png"))
+    Image.new("RGB", (4, 4), "red").save(os.path.join(task_dir, "thumb_0.png"))
+    return task_id
+
+
+def test_plain_url_is_revalidated(client, task_id):
+    response = client.get(f"/api/images/{task_id}/0.png")
+
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+    assert not response.cache_control.immutable
+    assert response.headers.get("ETag")
+    assert response.headers.get("Last-Modified")
+
+
+def test_overwritten_image_is_not_served_from_cache(client, history_root, task_id):
+    url = f"/api/images/{task_id}/0.png?thumbnail=false"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # /regenerate 原地覆盖同名文件
+    Image.new("RGB", (8, 8), "blue").save(os.path.join(history_root, task_id, "0.png"))
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_versioned_url_is_immutable(client, task_id):
+    response = client.get(f"/api/images/{task_id}/0.png?t=123")
+
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age > 0
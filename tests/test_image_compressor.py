@@ -0,0 +1,76 @@
+"""
+图片压缩测试
+"""
+import io
+import random
+
+import pytest
+from PIL import Image
+
+from backend.utils import image_compressor
+from backend.utils.image_compressor import compress_image
+
+
+def noise_png(width, height, seed=0):
+    """随机噪点图（几乎无法压缩，需要降质量和缩小尺寸）"""
+    data = random.Random(seed).randbytes(width * height * 3)
+    output = io.BytesIO()
+    Image.frombytes("RGB", (width, height), data).save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module")
+def large_image():
+    return noise_png(1200, 1200)
+
+
+@pytest.fixture
+def encodes(monkeypatch):
+    """记录 JPEG 编码次数"""
+    calls = []
+    encode = image_compressor._encode_jpeg
+
+    def counting(img, quality):
+        calls.append((img.size, quality))
+        return encode(img, quality)
+
+    monkeypatch.setattr(image_compressor, "_encode_jpeg", counting)
+    return calls
+
+
+def test_small_image_returned_unchanged(encodes):
+    data = noise_png(16, 16)
+    assert compress_image(data, max_size_kb=200) is data
+    assert encodes == []
+
+
+@pytest.mark.parametrize("max_size_kb", [100, 300])
+def test_output_within_max_size(large_image, encodes, max_size_kb):
+    compressed = compress_image(large_image, max_size_kb=max_size_kb)
+
+    assert len(compressed) <= max_size_kb * 1024
+    assert Image.open(io.BytesIO(compressed)).format == "JPEG"
+    assert len(encodes) <= 8
+
+
+@pytest.mark.parametrize("max_encodes", [1, 2, 3, 5])
+def test_stays_within_encode_budget(large_image, encodes, max_encodes):
+    compressed = compress_image(large_image, max_size_kb=100, max_encodes=max_encodes)
+
+    assert len(encodes) <= max_encodes
+    assert len(compressed) < len(large_image)
+
+
+def test_quality_search_keeps_original_dimensions(encodes):
+    # 降低质量就能满足要求时不缩小尺寸
+    data = noise_png(400, 400)
+    compressed = compress_image(data, max_size_kb=60)
+
+    assert len(compressed) <= 60 * 1024
+    assert Image.open(io.BytesIO(compressed)).size == (400, 400)
+    assert {size for size, _ in encodes} == {(400, 400)}
+
+
+def test_invalid_image_returned_unchanged():
+    data = b"not an image" * 50000
+    assert compress_image(data, max_size_kb=1) is data
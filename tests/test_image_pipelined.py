@@ -0,0 +1,142 @@
+"""
+一键生成（边生成大纲边生成图片）测试
+"""
+import asyncio
+import io
+import os
+import uuid
+
+import pytest
+from PIL import Image
+
+from backend.generators.router import ImageProviderRouter, ProviderRoute
+from backend.services.derivatives import get_derivative_pipeline
+from backend.services.image import ImageService
+from backend.services.task_state import MemoryTaskStateStore
+
+
+def png_bytes(color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def service(tmp_path):
+    """不读取配置的 ImageService：单条线路，任务状态保存在内存中"""
+    name = f"pipelined_{uuid.uuid4().hex[:8]}"
+    route = ProviderRoute(name, name, {"type": "image_api", "api_key": "test", "base_url": "http://127.0.0.1:9"})
+    service = ImageService.__new__(ImageService)
+    service.router = ImageProviderRouter([route])
+    service.provider_config = route.config
+    service.history_root_dir = str(tmp_path)
+    service.task_states = MemoryTaskStateStore(ttl=3600)
+    service.derivatives = get_derivative_pipeline()
+    return service
+
+
+def fake_generate(calls, fail=(), block=None):
+    """替代 _agenerate_single_image：记录调用顺序和参考图，写出一张图片"""
+    async def generate(page, task_id, reference_image=None, retry_count=0, full_outline="",
+                       user_images=None, user_topic="", task_dir=None, retry_budget=None,
+                       hedge_budget=None):
+        calls.append((page["index"], reference_image))
+        if block is not None:
+            await block.wait()
+        if page["index"] in fail:
+            return page["index"], False, None, "boom", "fake"
+        filename = f"{page['index']}.png"
+        with open(os.path.join(task_dir, filename), "wb") as f:
+            f.write(png_bytes())
+        return page["index"], True, filename, None, "fake"
+    return generate
+
+
+async def outline_stream(pages, error=None):
+    for page in pages:
+        yield {"event": "page", "data": page}
+        await asyncio.sleep(0)
+    if error:
+        yield {"event": "error", "data": {"error": error}}
+        return
+    yield {"event": "finish", "data": {"pages": pages, "outline": "outline"}}
+
+
+def run_pipelined(service, outline_events, task_id="task_a"):
+    async def collect():
+        return [event async for event in service.agenerate_images_pipelined(outline_events, task_id)]
+    return asyncio.run(collect())
+
+
+def page(index, page_type="content"):
+    return {"index": index, "type": page_type, "content": f"page {index}"}
+
+
+def test_cover_page_is_generated_before_content(service):
+    calls = []
+    service._agenerate_single_image = fake_generate(calls)
+    pages = [page(0), page(1, "cover"), page(2)]
+
+    events = run_pipelined(service, outline_stream(pages))
+
+    # type 为 cover 的页面先生成且不带参考图，其余页面以封面为参考图
+    assert calls[0] == (1, None)
+    assert sorted(index for index, _ in calls[1:]) == [0, 2]
+    assert all(reference for _, reference in calls[1:])
+
+    progress = [e["data"] for e in events if e["event"] == "progress"]
+    assert progress[0]["index"] == 1 and progress[0]["phase"] == "cover"
+    assert {p["phase"] for p in progress[1:]} == {"content"}
+
+
+def test_first_page_is_cover_when_outline_has_no_cover(service):
+    calls = []
+    service._agenerate_single_image = fake_generate(calls)
+    pages = [page(0), page(1), page(2)]
+
+    run_pipelined(service, outline_stream(pages))
+
+    assert calls[0] == (0, None)
+    assert sorted(index for index, _ in calls[1:]) == [1, 2]
+    assert all(reference for _, reference in calls[1:])
+
+
+def test_outline_error_cancels_page_tasks(service):
+    calls = []
+    never = asyncio.Event()
+    service._agenerate_single_image = fake_generate(calls, block=never)
+    pages = [page(0, "cover"), page(1)]
+
+    events = run_pipelined(service, outline_stream(pages, error="outline failed"))
+
+    # 封面已经开始生成，大纲失败后被取消；内容页还在等封面，也不会再生成
+    assert [index for index, _ in calls] == [0]
+    assert [e for e in events if e["event"] == "complete"] == []
+    assert any(e["event"] == "outline_error" for e in events)
+
+    finish = events[-1]
+    assert finish["event"] == "finish"
+    assert finish["data"]["success"] is False
+    assert finish["data"]["error"] == "outline failed"
+    assert finish["data"]["completed"] == 0
+
+
+def test_finish_totals(service):
+    calls = []
+    service._agenerate_single_image = fake_generate(calls, fail={2})
+    pages = [page(0, "cover"), page(1), page(2), page(3)]
+
+    events = run_pipelined(service, outline_stream(pages))
+
+    finish = events[-1]
+    assert finish["event"] == "finish"
+    assert finish["data"]["success"] is False
+    assert finish["data"]["total"] == 4
+    assert finish["data"]["completed"] == 3
+    assert finish["data"]["failed"] == 1
+    assert finish["data"]["failed_indices"] == [2]
+    assert sorted(finish["data"]["images"]) == ["0.png", "1.png", "3.png"]
+
+    state = service.task_states.get("task_a")
+    assert state["pages"] == pages
+    assert state["failed"] == {2: "boom"}
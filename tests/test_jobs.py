@@ -0,0 +1,173 @@
+"""
+后台生成任务队列测试
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.config import Config
+from backend.services.jobs import DONE, QUEUED, RUNNING, JobQueue, JobWorkers
+
+
+def wait_until(predicate, timeout=10.0):
+    """轮询直到条件成立"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"), ttl=3600)
+
+
+def test_submit_is_deduplicated_while_job_is_active(queue, sample_pages):
+    assert queue.submit("task_a", sample_pages) is True
+    assert queue.submit("task_a", sample_pages) is False
+    assert queue.get("task_a")["status"] == QUEUED
+
+
+def test_claim_hands_each_job_to_one_worker(queue, sample_pages):
+    queue.submit("task_a", sample_pages, user_images=[b"img"])
+
+    task_id, payload, attempt = queue.claim("worker-1")
+    assert task_id == "task_a"
+    assert attempt == 1
+    assert payload["pages"] == sample_pages
+    assert payload["user_images"] == [b"img"]
+    assert queue.claim("worker-2") is None
+    assert queue.get("task_a")["status"] == RUNNING
+
+
+def test_heartbeat_reports_jobs_owned_by_other_workers(queue, sample_pages):
+    queue.submit("task_a", sample_pages)
+    queue.claim("worker-1")
+
+    assert queue.heartbeat(["task_a"], "worker-1") == []
+    assert queue.heartbeat(["task_a"], "worker-2") == ["task_a"]
+
+
+def test_expired_lease_is_taken_over(queue, sample_pages):
+    queue.submit("task_a", sample_pages)
+    queue.claim("worker-1")
+    with queue.db.transaction() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - queue.LEASE_SECONDS - 1,))
+
+    task_id, _, attempt = queue.claim("worker-2")
+    assert task_id == "task_a"
+    assert attempt == 2
+    # 原来的 worker 不能再写入结束状态
+    queue.finish("task_a", "worker-1", DONE)
+    assert queue.get("task_a")["status"] == RUNNING
+
+
+def test_resubmit_keeps_events_and_marks_resume(queue, sample_pages):
+    queue.submit("task_a", sample_pages)
+    queue.claim("worker-1")
+    first = queue.append_event("task_a", "complete", {"index": 0})
+    assert queue.resubmit("task_a") is False  # 仍在执行
+
+    queue.finish("task_a", "worker-1", "failed", "boom")
+    assert queue.resubmit("task_a") is True
+    _, payload, _ = queue.claim("worker-2")
+    assert payload["resume"] is True
+    assert [event[0] for event in queue.events_after("task_a")] == [first]
+
+
+def test_stream_replays_events_after_last_event_id(queue, sample_pages):
+    queue.submit("task_a", sample_pages)
+    queue.claim("worker-1")
+    first = queue.append_event("task_a", "progress", {"index": 0})
+    queue.append_event("task_a", "finish", {"success": True})
+    queue.finish("task_a", "worker-1", DONE)
+
+    body = "".join(queue.stream("task_a", last_event_id=first))
+    assert "event: progress" not in body
+    assert "event: finish" in body
+
+
+def test_cancel_only_applies_to_active_jobs(queue, sample_pages):
+    queue.submit("task_a", sample_pages)
+    assert queue.cancel("task_a") is True
+    assert queue.cancel("task_a") is False
+    assert [event[1] for event in queue.events_after("task_a")] == ["cancelled"]
+
+
+def test_workers_run_more_jobs_than_two_at_once(queue, sample_pages, monkeypatch):
+    release = threading.Event()
+
+    async def fake_generate(self, task_id, payload, attempt):
+        await asyncio.to_thread(release.wait, 10)
+        await asyncio.to_thread(self.queue.finish, task_id, self.owner, DONE)
+
+    monkeypatch.setattr(JobWorkers, "_generate", fake_generate)
+    workers = JobWorkers(queue, Config.JOB_WORKERS)
+    task_ids = [f"task_{i}" for i in range(5)]
+    for task_id in task_ids:
+        queue.submit(task_id, sample_pages)
+
+    workers.start()
+    try:
+        workers.notify()
+        assert wait_until(lambda: all(queue.get(t)["status"] == RUNNING for t in task_ids))
+        release.set()
+        assert wait_until(lambda: all(queue.get(t)["status"] == DONE for t in task_ids))
+    finally:
+        release.set()
+        workers.stop()
+
+
+def test_workers_respect_concurrency_cap(queue, sample_pages, monkeypatch):
+    release = threading.Event()
+
+    async def fake_generate(self, task_id, payload, attempt):
+        await asyncio.to_thread(release.wait, 10)
+        await asyncio.to_thread(self.queue.finish, task_id, self.owner, DONE)
+
+    monkeypatch.setattr(JobWorkers, "_generate", fake_generate)
+    workers = JobWorkers(queue, 2)
+    task_ids = [f"task_{i}" for i in range(3)]
+    for task_id in task_ids:
+        queue.submit(task_id, sample_pages)
+
+    def statuses():
+        return [queue.get(t)["status"] for t in task_ids]
+
+    workers.start()
+    try:
+        assert wait_until(lambda: statuses().count(RUNNING) == 2)
+        time.sleep(0.3)
+        assert statuses().count(QUEUED) == 1
+        release.set()
+        assert wait_until(lambda: all(status == DONE for status in statuses()))
+    finally:
+        release.set()
+        workers.stop()
+
+
+def test_stream_polls_slowly_when_local_publisher_stopped(queue, sample_pages, monkeypatch):
+    monkeypatch.setattr(JobQueue, "STREAM_POLL_INTERVAL", 0.05)
+    queue.submit("task_orphaned", sample_pages)
+    queue.claim("worker-1")
+    # 本进程的发布者已经停止（如租约丢失），数据库中任务仍在执行
+    queue.bus.open("task_orphaned")
+    queue.bus.close("task_orphaned")
+
+    calls = []
+    original_get = queue.get
+
+    def counting_get(task_id):
+        calls.append(task_id)
+        return original_get(task_id)
+
+    monkeypatch.setattr(queue, "get", counting_get)
+    threading.Timer(0.3, queue.finish, ("task_orphaned", "worker-1", DONE)).start()
+
+    body = "".join(queue.stream("task_orphaned"))
+    assert body == ""
+    assert len(calls) < 20
@@ -0,0 +1,133 @@
+"""
+大纲缓存测试
+"""
+import types
+
+import pytest
+
+from backend.services import outline_cache
+from backend.services.outline import OutlineService
+from backend.services.outline_cache import OutlineCache, normalize_topic, outline_cache_key
+
+PROVIDER = {"type": "openai_compatible", "base_url": "http://127.0.0.1:9", "model": "m1", "api_key": "key-1"}
+PARAMS = {"model": "m1", "temperature": 1.0, "max_output_tokens": 8000}
+
+
+def key_for(topic="猫咪日常", images=None, template="template", provider=PROVIDER, params=PARAMS):
+    return outline_cache_key(topic, images, template, "text", provider, params)
+
+
+class Clock:
+    """可手动推进的时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outline_cache, "time", types.SimpleNamespace(time=clock))
+    return clock
+
+
+def result(name):
+    return {"success": True, "outline": name, "pages": [], "has_images": False}
+
+
+def test_topic_normalization():
+    assert normalize_topic("  猫咪　 日常\n") == "猫咪 日常"
+    assert normalize_topic("ＡＢＣ　１２３") == "ABC 123"
+    assert key_for(" 猫咪  日常 ") == key_for("猫咪 日常")
+    assert key_for("猫咪 日常") != key_for("猫咪日常")
+
+
+def test_key_ignores_api_key():
+    assert key_for(provider=dict(PROVIDER, api_key="key-2")) == key_for()
+    assert key_for(provider=dict(PROVIDER, model="m2")) != key_for()
+    assert key_for(params=dict(PARAMS, temperature=0.5)) != key_for()
+
+
+def test_key_depends_on_images_and_template():
+    assert key_for(images=[b"a", b"b"]) != key_for(images=[b"b", b"a"])
+    assert key_for(images=[]) == key_for(images=None)
+    assert key_for(template="other") != key_for()
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = OutlineCache(str(tmp_path / "outline_cache.db"), ttl=60, max_entries=10)
+    cache.put("a", result("a"))
+
+    clock.now += 59
+    assert cache.get("a") == result("a")
+
+    clock.now += 2
+    assert cache.get("a") is None
+
+
+def test_trims_least_recently_used(tmp_path, clock):
+    cache = OutlineCache(str(tmp_path / "outline_cache.db"), ttl=3600, max_entries=2)
+    cache.put("a", result("a"))
+    clock.now += 1
+    cache.put("b", result("b"))
+    clock.now += 1
+    # 读取 a 之后，最久未使用的是 b
+    assert cache.get("a") is not None
+    clock.now += 1
+    cache.put("c", result("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == result("a")
+    assert cache.get("c") == result("c")
+
+
+class CountingClient:
+    """记录调用次数的文本模型客户端"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_text(self, prompt, images=None, **params):
+        self.calls += 1
+        return f"[封面]\n第 {self.calls} 次生成<page>[内容]\n正文"
+
+
+@pytest.fixture
+def text_client(monkeypatch):
+    client = CountingClient()
+    config = {"active_provider": "text", "providers": {"text": PROVIDER}}
+    monkeypatch.setattr(OutlineService, "_load_text_config", lambda self: config)
+    monkeypatch.setattr(OutlineService, "_get_client", lambda self: client)
+    return client
+
+
+def test_outline_route_uses_cache(client, text_client):
+    first = client.post('/api/outline', json={'topic': '猫咪日常'}).get_json()
+    second = client.post('/api/outline', json={'topic': ' 猫咪日常 '}).get_json()
+
+    assert text_client.calls == 1
+    assert first["success"] and "cached" not in first
+    assert second["cached"] is True
+    assert second["outline"] == first["outline"]
+
+
+@pytest.mark.parametrize("request_kwargs", [
+    {"json": {"topic": "猫咪日常", "no_cache": True}},
+    {"query_string": {"no_cache": "1"}, "json": {"topic": "猫咪日常"}},
+    {"data": {"topic": "猫咪日常", "no_cache": "true"}, "content_type": "multipart/form-data"},
+])
+def test_outline_route_no_cache_bypasses_cache(client, text_client, request_kwargs):
+    client.post('/api/outline', json={'topic': '猫咪日常'})
+
+    bypassed = client.post('/api/outline', **request_kwargs).get_json()
+    assert text_client.calls == 2
+    assert "cached" not in bypassed
+    assert "第 2 次生成" in bypassed["outline"]
+
+    # 跳过缓存生成的结果会写回缓存
+    cached = client.post('/api/outline', json={'topic': '猫咪日常'}).get_json()
+    assert text_client.calls == 2
+    assert cached["outline"] == bypassed["outline"]
@@ -0,0 +1,51 @@
+"""
+大纲解析测试
+"""
+import pytest
+
+from backend.services.outline import OutlinePageParser, OutlineService
+
+OUTLINE = (
+    "[封面]\n秋季穿搭指南\n<page>\n[内容]\n基础款搭配\n"
+    "<PAGE>\n[内容]\n配色技巧\n<Page>\n[总结]\n穿搭要点"
+)
+
+
+def stream_pages(text, size):
+    """按固定长度切分输出，模拟流式增量"""
+    parser = OutlinePageParser()
+    pages = []
+    for start in range(0, len(text), size):
+        pages.extend(parser.feed(text[start:start + size]))
+    return pages
+
+
+@pytest.mark.parametrize("size", [1, 3, 5, 1000])
+def test_streamed_pages_match_full_parse(size):
+    full = OutlineService._parse_outline(OUTLINE)
+    streamed = stream_pages(OUTLINE, size)
+
+    assert [page["type"] for page in full] == ["cover", "content", "content", "summary"]
+    # 最后一页在输出结束后才能确定，其余页面与完整解析一致
+    assert streamed == full[:-1]
+
+
+def test_tag_split_across_deltas():
+    parser = OutlinePageParser()
+    assert parser.feed("[封面]\n标题\n<pa") == []
+    assert parser.feed("ge>\n[内容]\n正文") == [{"index": 0, "type": "cover", "content": "[封面]\n标题"}]
+
+
+def test_empty_segments_keep_indices():
+    text = "<page>\n[封面]\n标题\n<page>\n<page>\n[内容]\n正文"
+    full = OutlineService._parse_outline(text)
+
+    assert [page["index"] for page in full] == [1, 3]
+    assert stream_pages(text, 2) == full[:-1]
+
+
+def test_dash_separator_fallback():
+    text = "[封面]\n标题\n---\n[内容]\n正文"
+
+    assert stream_pages(text, 4) == []
+    assert [page["content"] for page in OutlineService._parse_outline(text)] == ["[封面]\n标题", "[内容]\n正文"]
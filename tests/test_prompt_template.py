@@ -0,0 +1,123 @@
+"""
+提示词模板测试
+"""
+import os
+import random
+
+import pytest
+
+from backend.utils.prompt_template import PromptTemplate, normalize_prompt
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "backend", "prompts")
+
+
+def clean_prompt(prompt: str) -> str:
+    """原 JiMengGenerator._clean_prompt 的实现（normalize_prompt 应与其结果相同）"""
+    if not isinstance(prompt, str):
+        prompt = str(prompt)
+
+    cleaned = prompt.strip()
+
+    cleaned = cleaned.replace('\x00', '')
+    cleaned = cleaned.replace('\r\n', '\n')
+    cleaned = cleaned.replace('\r', '\n')
+
+    while '\n\n\n' in cleaned:
+        cleaned = cleaned.replace('\n\n\n', '\n\n')
+
+    while '  ' in cleaned:
+        cleaned = cleaned.replace('  ', ' ')
+
+    return cleaned
+
+
+class Page:
+    def __init__(self, content):
+        self.content = content
+
+
+VALUES = {
+    "full_outline": "第一页\n\n<page>\n\n第二页 {不是字段}",
+    "user_topic": "秋天的咖啡",
+    "page_content": "[封面]\n标题：秋日限定",
+    "page_type": "cover",
+    "count": 3,
+    "ratio": 0.5,
+    "page": Page("正文"),
+    "items": ["a", "b"],
+}
+
+TEMPLATES = [
+    "大纲：{full_outline}\n主题：{user_topic}\n本页：{page_content}（{page_type}）",
+    "{{字面量}} {page_type!r} {count:03d} {ratio:.1%} {user_topic:>8}",
+    "{page.content} / {items[1]} / {page_type!s:^10}",
+    "{page_type}{page_type}{user_topic}",
+    "没有字段的模板",
+]
+
+
+def test_fields():
+    template = PromptTemplate("{page.content} {items[0]} {user_topic!r:>4} {{x}}")
+    assert template.fields == {"page", "items", "user_topic"}
+
+
+@pytest.mark.parametrize("text", TEMPLATES)
+def test_render_matches_str_format(text):
+    assert PromptTemplate(text).render(**VALUES) == text.format(**VALUES)
+
+
+@pytest.mark.parametrize("text", TEMPLATES)
+@pytest.mark.parametrize("task_fields", [
+    ("full_outline", "user_topic"),
+    ("page", "count"),
+    (),
+])
+def test_partial_then_render_matches_str_format(text, task_fields):
+    template = PromptTemplate(text)
+    task_values = {name: VALUES[name] for name in task_fields}
+    page_values = {name: value for name, value in VALUES.items() if name not in task_fields}
+
+    partial = template.partial(**task_values)
+    assert partial.render(**page_values) == text.format(**VALUES)
+    # 再次使用缓存的模板，结果不变
+    assert template.partial(**task_values) is partial
+    assert partial.render(**page_values) == text.format(**VALUES)
+
+
+@pytest.mark.parametrize("filename", ["image_prompt.txt", "image_prompt_short.txt"])
+def test_bundled_templates_match_str_format(filename):
+    with open(os.path.join(PROMPTS_DIR, filename), encoding="utf-8") as f:
+        text = f.read()
+    template = PromptTemplate(text)
+    task = template.partial(full_outline=VALUES["full_outline"], user_topic=VALUES["user_topic"])
+    rendered = task.render(page_content=VALUES["page_content"], page_type=VALUES["page_type"])
+    assert rendered == text.format(**VALUES)
+
+
+def test_missing_field_raises_key_error():
+    with pytest.raises(KeyError):
+        PromptTemplate("{page_content} {page_type}").partial(page_content="x").render()
+
+
+@pytest.mark.parametrize("prompt", [
+    "  前后空白  ",
+    "a\r\nb\rc\nd",
+    "a\n\n\n\n\nb",
+    "a\r\n\r\n\r\n\r\nb",
+    "a\r\r\r\nb",
+    "多个    空格   和\n \n \n换行",
+    "\x00开头\x00和\n\x00\n\x00\n结尾\x00",
+    " \x00 ",
+    "\r\x00\n",
+    "",
+])
+def test_normalize_prompt_matches_clean_prompt(prompt):
+    assert normalize_prompt(prompt) == clean_prompt(prompt)
+
+
+def test_normalize_prompt_matches_clean_prompt_random():
+    rng = random.Random(0)
+    alphabet = [" ", " ", "\n", "\r", "\r\n", "\x00", "\t", "a", "页"]
+    for _ in range(2000):
+        prompt = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        assert normalize_prompt(prompt) == clean_prompt(prompt), repr(prompt)
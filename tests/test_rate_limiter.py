@@ -0,0 +1,117 @@
+"""
+客户端主动限流测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from backend.utils import rate_limiter as rate_limiter_module
+from backend.utils.rate_limiter import SCHEMA, RateLimiter
+from backend.utils.sqlite_db import SQLiteDatabase
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "rate_limits.db")
+
+
+def make_limiter(db_path, **kwargs):
+    """每次新建数据库连接，模拟另一个 worker 进程"""
+    return RateLimiter("image:test", db=SQLiteDatabase(db_path, SCHEMA), **kwargs)
+
+
+def test_token_bucket_limits_burst(db_path):
+    limiter = make_limiter(db_path, requests_per_minute=60, burst=2)
+
+    assert limiter._try_acquire()[0] is not None
+    assert limiter._try_acquire()[0] is not None
+    lease_id, wait = limiter._try_acquire()
+    assert lease_id is None
+    assert 0 < wait <= 1.0
+
+
+def test_token_bucket_is_shared_between_processes(db_path):
+    first = make_limiter(db_path, requests_per_minute=60, burst=2)
+    second = make_limiter(db_path, requests_per_minute=60, burst=2)
+
+    assert first._try_acquire()[0] is not None
+    assert second._try_acquire()[0] is not None
+    assert first._try_acquire()[0] is None
+    assert second._try_acquire()[0] is None
+
+
+def test_concurrent_leases_are_shared_and_released(db_path):
+    first = make_limiter(db_path, max_concurrent=1)
+    second = make_limiter(db_path, max_concurrent=1)
+
+    lease_id, _ = first._try_acquire()
+    assert lease_id is not None
+    assert second._try_acquire()[0] is None
+
+    first.release(lease_id)
+    assert second._try_acquire()[0] is not None
+
+
+def test_expired_lease_is_reclaimed(db_path, monkeypatch):
+    limiter = make_limiter(db_path, max_concurrent=1)
+    monkeypatch.setattr(rate_limiter_module, "LEASE_TTL", -1)
+    assert limiter._try_acquire()[0] is not None
+
+    # 持有者没有归还，租约过期后名额自动回收
+    assert limiter._try_acquire()[0] is not None
+
+
+def test_aslot_does_not_block_event_loop(db_path):
+    limiter = make_limiter(db_path, max_concurrent=1)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        async def request():
+            async with limiter.aslot():
+                await asyncio.sleep(0.1)
+
+        tick_task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        await asyncio.gather(request(), request())
+        elapsed = time.monotonic() - started
+        tick_task.cancel()
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(scenario())
+    # 两个请求依次占用唯一的名额，等待期间事件循环仍在运行
+    assert elapsed >= 0.2
+    assert ticks >= 10
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_lease(db_path):
+    limiter = make_limiter(db_path, max_concurrent=1)
+
+    async def scenario():
+        holder = await limiter.aacquire()
+        waiter = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0.3)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.to_thread(limiter.release, holder)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_unlimited_limiter_skips_database():
+    limiter = RateLimiter("image:test")
+
+    assert limiter.unlimited
+    assert limiter.acquire() is None
+    assert asyncio.run(limiter.aacquire()) is None
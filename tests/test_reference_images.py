@@ -0,0 +1,111 @@
+"""
+参考图片缓存测试
+"""
+import io
+import random
+import threading
+import time
+
+from PIL import Image
+
+from backend.utils import reference_images
+from backend.utils.reference_images import ReferenceImageCache
+
+
+def png(color):
+    output = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(output, format="PNG")
+    return output.getvalue()
+
+
+def noise_png(width, height):
+    """随机噪点图（超过压缩目标大小）"""
+    data = random.Random(0).randbytes(width * height * 3)
+    output = io.BytesIO()
+    Image.frombytes("RGB", (width, height), data).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_lru_eviction_is_bounded_by_bytes():
+    images = [png("red"), png("green"), png("blue")]
+    largest = max(ReferenceImageCache(10 ** 6).get(image).nbytes for image in images)
+    cache = ReferenceImageCache(max_bytes=largest * 2 + largest // 2)
+
+    red = cache.get(images[0])
+    cache.get(images[1])
+    # 读取 red 之后，最久未使用的是 green
+    assert cache.get(images[0]) is red
+    cache.get(images[2])
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+    assert cache.get(images[0]) is red
+    misses = stats["misses"]
+    cache.get(images[1])
+    assert cache.stats()["misses"] == misses + 1
+
+
+def test_single_entry_larger_than_limit_is_kept():
+    cache = ReferenceImageCache(max_bytes=1)
+    entry = cache.get(png("red"))
+    assert cache.get(png("red")) is entry
+    assert cache.stats()["entries"] == 1
+
+
+def test_keyed_by_content_hash_and_target_size():
+    cache = ReferenceImageCache(max_bytes=10 ** 6)
+    image = png("red")
+
+    first = cache.get(image, max_size_kb=200)
+    # 内容相同的另一份数据命中同一条目
+    assert cache.get(bytes(bytearray(image)), max_size_kb=200) is first
+    # 压缩目标不同时分开缓存
+    assert cache.get(image, max_size_kb=100) is not first
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_compressed_result_is_also_a_key():
+    cache = ReferenceImageCache(max_bytes=10 ** 8)
+    large = noise_png(300, 300)
+    entry = cache.get(large, max_size_kb=50)
+    assert len(entry.data) <= 50 * 1024 < len(large)
+
+    # 已压缩的结果（如封面）再次传入时直接命中，字节数只计一次
+    assert cache.get(entry.data, max_size_kb=50) is entry
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == entry.nbytes
+    assert stats["misses"] == 1
+
+
+def test_concurrent_requests_compress_once(monkeypatch):
+    calls = []
+
+    def slow_compress(image_data, max_size_kb=200):
+        calls.append(max_size_kb)
+        time.sleep(0.1)
+        return image_data
+
+    monkeypatch.setattr(reference_images, "compress_image", slow_compress)
+    cache = ReferenceImageCache(max_bytes=10 ** 6)
+    image = png("red")
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get(image))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [200]
+    assert len({id(result) for result in results}) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (7, 1)
@@ -0,0 +1,130 @@
+"""
+统一重试策略测试
+"""
+import asyncio
+
+import pytest
+
+from backend.utils.retry_policy import (
+    RetryBudget,
+    RetryPolicy,
+    RoutedRetryBudget,
+    UpstreamError,
+    classify_error,
+    is_retryable,
+    parse_retry_after,
+    retry_on_error,
+)
+
+
+@pytest.mark.parametrize("error, kind, retryable", [
+    (UpstreamError("Too Many Requests", status_code=429), "throttle", True),
+    (UpstreamError("Bad Gateway", status_code=502), "server", True),
+    (UpstreamError("Unauthorized", status_code=401), "client", False),
+    (UpstreamError("Conflict", status_code=409), "other", True),
+    (Exception("API 请求失败，状态码: 503"), "server", True),
+    (Exception("429 RESOURCE_EXHAUSTED"), "throttle", True),
+    (Exception("请求超时"), "timeout", True),
+    (TimeoutError(), "timeout", True),
+    (Exception("Connection reset by peer"), "network", True),
+    (Exception("content blocked by safety filter"), "other", False),
+    (UpstreamError("server busy", status_code=503, retryable=False), "server", False),
+])
+def test_classify_and_retryable(error, kind, retryable):
+    assert classify_error(error) == kind
+    assert is_retryable(error) is retryable
+
+
+def test_classification_follows_cause():
+    try:
+        try:
+            raise UpstreamError("Too Many Requests", status_code=429)
+        except UpstreamError as e:
+            raise Exception("图片生成失败，请稍后重试") from e
+    except Exception as friendly:
+        assert classify_error(friendly) == "throttle"
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_budget_ratio_grows_with_requests():
+    budget = RetryBudget(ratio=0.5, reserve=1, window=60)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+    for _ in range(4):
+        budget.record_request()
+    assert budget.try_acquire()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    assert budget.stats() == {"requests": 4, "retries": 3, "limit": 3}
+
+
+def test_policy_stops_on_non_retryable_error():
+    calls = []
+
+    @retry_on_error(max_retries=3, base_delay=0)
+    def call():
+        calls.append(1)
+        raise UpstreamError("Bad Request", status_code=400)
+
+    with pytest.raises(UpstreamError):
+        call()
+    assert len(calls) == 1
+
+
+def test_policy_honours_retry_after_and_budget():
+    policy = RetryPolicy(max_attempts=5, base_delay=0, budgets=[RetryBudget.fixed(1)])
+    error = UpstreamError("Too Many Requests", status_code=429, retry_after=0.5)
+
+    assert policy.next_delay(error, 0) == 0.5
+    # 预算用完后不再重试
+    assert policy.next_delay(error, 1) is None
+    # Retry-After 过长时直接失败
+    assert RetryPolicy(max_attempts=5).next_delay(
+        UpstreamError("Too Many Requests", status_code=429, retry_after=3600), 0
+    ) is None
+
+
+def test_routed_budget_charges_route_of_last_attempt():
+    exhausted = RetryBudget.fixed(0)
+    healthy = RetryBudget.fixed(1)
+    budget = RoutedRetryBudget()
+
+    # 还没有发出请求时不限制
+    assert budget.try_acquire()
+
+    budget.use(exhausted)
+    assert not budget.try_acquire()
+
+    budget.use(healthy)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_exhausted_route_does_not_block_retries_on_other_routes():
+    budgets = {"a": RetryBudget.fixed(0), "b": RetryBudget.fixed(5)}
+    attempts = []
+
+    def run(route_name):
+        route_budget = RoutedRetryBudget()
+        policy = RetryPolicy(max_attempts=3, base_delay=0).with_budgets(route_budget)
+
+        async def call():
+            attempts.append(route_name)
+            route_budget.use(budgets[route_name])
+            raise UpstreamError("服务端错误", status_code=503)
+
+        try:
+            asyncio.run(policy.arun(call))
+        except UpstreamError:
+            pass
+
+    run("a")
+    run("b")
+    assert attempts == ["a", "b", "b", "b"]
@@ -0,0 +1,123 @@
+"""
+图片服务商路由测试
+"""
+import asyncio
+import uuid
+from collections import Counter
+
+import pytest
+
+from backend.generators.router import ImageProviderRouter, ProviderRoute
+from backend.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from backend.utils.retry_policy import UpstreamError
+
+
+def make_route(**config):
+    """创建一条独立的线路（名称唯一，不与其他测试共享限流器和熔断器）"""
+    name = f"router_{uuid.uuid4().hex[:8]}"
+    config = dict({"type": "image_api", "api_key": "test", "base_url": "http://127.0.0.1:9"}, **config)
+    return ProviderRoute(name, name, config)
+
+
+def open_breaker(route):
+    """让线路进入熔断状态"""
+    route.breaker = CircuitBreaker(route.name, consecutive_failures=1, open_seconds=60)
+    route.breaker.record("server", probe=route.breaker.before_request())
+    assert not route.breaker.available
+
+
+def test_open_breaker_route_is_skipped():
+    broken = make_route(weight=10)
+    healthy = make_route()
+    open_breaker(broken)
+    router = ImageProviderRouter([broken, healthy])
+
+    assert router.candidates() == [healthy]
+
+    calls = []
+
+    async def call(route):
+        calls.append(route.name)
+        return b"image"
+
+    image_data, route = asyncio.run(router.agenerate(call, set()))
+    assert (image_data, route) == (b"image", healthy)
+    assert calls == [healthy.name]
+
+
+def test_all_routes_open_raises_circuit_open():
+    routes = [make_route(), make_route()]
+    for route in routes:
+        open_breaker(route)
+    router = ImageProviderRouter(routes)
+
+    async def call(route):
+        raise AssertionError("熔断中的线路不应被调用")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(router.agenerate(call, set()))
+
+
+def test_weighted_selection():
+    heavy = make_route(weight=3, high_concurrency=True, initial_concurrency=8)
+    light = make_route(weight=1, high_concurrency=True, initial_concurrency=8)
+    router = ImageProviderRouter([light, heavy])
+
+    async def scenario():
+        release = asyncio.Event()
+        started = Counter()
+
+        async def call(route):
+            started[route.name] += 1
+            await release.wait()
+            return b"image"
+
+        requests = [asyncio.create_task(router.agenerate(call, set())) for _ in range(8)]
+        while sum(started.values()) < 8:
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*requests)
+        return started
+
+    # 进行中请求数按权重 3:1 分配
+    started = asyncio.run(scenario())
+    assert started == {heavy.name: 6, light.name: 2}
+
+
+def test_failover_after_throttle():
+    throttled = make_route(weight=10)
+    backup = make_route()
+    router = ImageProviderRouter([throttled, backup])
+    calls = []
+
+    async def call(route):
+        calls.append(route.name)
+        if route is throttled:
+            raise UpstreamError("rate limited", status_code=429)
+        return b"image"
+
+    failed = set()
+    image_data, route = asyncio.run(router.agenerate(call, failed))
+
+    assert (image_data, route) == (b"image", backup)
+    assert calls == [throttled.name, backup.name]
+    assert failed == {throttled.name}
+
+
+def test_client_error_does_not_fail_over():
+    broken = make_route(weight=10)
+    backup = make_route()
+    router = ImageProviderRouter([broken, backup])
+    calls = []
+
+    async def call(route):
+        calls.append(route.name)
+        raise UpstreamError("bad request", status_code=400)
+
+    failed = set()
+    with pytest.raises(UpstreamError):
+        asyncio.run(router.agenerate(call, failed))
+
+    # 其他错误交给重试策略，重试时避开这条线路
+    assert calls == [broken.name]
+    assert failed == {broken.name}
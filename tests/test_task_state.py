@@ -0,0 +1,55 @@
+"""
+任务状态存储测试
+"""
+import asyncio
+
+import pytest
+
+from backend.services.task_state import MemoryTaskStateStore, SQLiteTaskStateStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTaskStateStore(ttl=3600)
+    return SQLiteTaskStateStore(str(tmp_path / "task_states.db"), ttl=3600)
+
+
+def test_mark_generated_clears_previous_failure(store, sample_pages):
+    store.create("task_a", sample_pages, full_outline="outline", user_topic="topic")
+    store.mark_failed("task_a", 1, "boom")
+    assert store.get("task_a")["failed"] == {1: "boom"}
+
+    store.mark_generated("task_a", 1, "1.png", "jm")
+    state = store.get("task_a")
+    assert state["generated"] == {1: "1.png"}
+    assert state["failed"] == {}
+    assert state["providers"] == {1: "jm"}
+
+
+def test_images_round_trip(store, sample_pages):
+    store.create("task_a", sample_pages, user_images=[b"first", b"second"])
+    store.set_cover("task_a", b"cover")
+
+    state = store.get("task_a")
+    assert state["user_images"] == [b"first", b"second"]
+    assert state["cover_image"] == b"cover"
+
+
+def test_marks_from_worker_threads_are_visible(store, sample_pages):
+    store.create("task_a", sample_pages)
+
+    async def scenario():
+        await asyncio.gather(*[
+            asyncio.to_thread(store.mark_generated, "task_a", page["index"], f"{page['index']}.png")
+            for page in sample_pages
+        ])
+
+    asyncio.run(scenario())
+    assert sorted(store.get("task_a")["generated"]) == [page["index"] for page in sample_pages]
+
+
+def test_delete_removes_task(store, sample_pages):
+    store.create("task_a", sample_pages, user_images=[b"image"])
+    store.delete("task_a")
+    assert store.get("task_a") is None
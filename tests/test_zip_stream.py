@@ -0,0 +1,85 @@
+"""
+流式 ZIP 下载测试
+"""
+import io
+import os
+import zipfile
+
+import pytest
+
+from backend.routes.history_routes import _zip_response
+from backend.utils.zip_stream import ZipStream
+
+
+@pytest.fixture
+def files(tmp_path):
+    result = []
+    for index, size in enumerate([1000, 0, 70000]):
+        path = tmp_path / f"{index}.png"
+        path.write_bytes(os.urandom(size))
+        result.append((str(path), f"测试/{index}.png"))
+    return result
+
+
+def read_all(archive, start=0, end=None):
+    return b"".join(archive.iter_bytes(start, end))
+
+
+def test_archive_is_valid_zip(files):
+    archive = ZipStream(files)
+    data = read_all(archive)
+
+    assert len(data) == archive.size
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [arcname for _, arcname in files]
+        with open(files[2][0], "rb") as f:
+            assert zf.read(files[2][1]) == f.read()
+
+
+def test_ranges_match_full_archive(files):
+    archive = ZipStream(files)
+    full = read_all(archive)
+
+    # 区间落在文件头、文件数据、中央目录内部以及跨越多个片段
+    for start, end in [(0, 10), (25, 1100), (1040, 40000), (archive.size - 30, archive.size), (5, 5)]:
+        assert read_all(ZipStream(files), start, end) == full[start:end]
+
+
+def test_etag_changes_when_file_changes(files):
+    etag = ZipStream(files).etag
+    assert ZipStream(files).etag == etag
+
+    with open(files[0][0], "ab") as f:
+        f.write(b"more")
+    assert ZipStream(files).etag != etag
+
+
+def test_range_request_returns_partial_content(app, files):
+    archive = ZipStream(files)
+    full = read_all(archive)
+
+    with app.test_request_context(headers={"Range": "bytes=100-1199"}):
+        response = _zip_response(files, "测试.zip")
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == f"bytes 100-1199/{archive.size}"
+        assert b"".join(response.response) == full[100:1200]
+
+
+def test_stale_if_range_returns_full_archive(app, files):
+    archive = ZipStream(files)
+
+    headers = {"Range": "bytes=100-199", "If-Range": '"zip-stale"'}
+    with app.test_request_context(headers=headers):
+        response = _zip_response(files, "images.zip")
+        assert response.status_code == 200
+        assert response.content_length == archive.size
+
+
+def test_unsatisfiable_range(app, files):
+    archive = ZipStream(files)
+
+    with app.test_request_context(headers={"Range": f"bytes={archive.size + 10}-"}):
+        response = _zip_response(files, "images.zip")
+        assert response.status_code == 416
+        assert response.headers["Content-Range"] == f"bytes */{archive.size}"